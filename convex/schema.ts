@@ -932,6 +932,8 @@ export default defineSchema({
     failureCount: v.optional(v.number()),
     lastFailureAt: v.optional(v.number()),
     lastSuccessAt: v.optional(v.number()),
+    // Response-cache hits logged for this service (summed by services:stats)
+    cacheHitCount: v.optional(v.number()),
   }).index("by_category", ["categoryId"])
     .index("by_active", ["isActive"])
     .index("by_name", ["name"])
@@ -976,7 +978,7 @@ export default defineSchema({
     campaignId: v.optional(v.id("campaigns")),
     contentBatchId: v.optional(v.id("contentBatches")),
     status: v.union(v.literal("success"), v.literal("failed"),
-      v.literal("timeout"), v.literal("rate_limited")),
+      v.literal("timeout"), v.literal("rate_limited"), v.literal("cache_hit")),
     durationMs: v.optional(v.number()),
     errorMessage: v.optional(v.string()),
     retryAttempt: v.number(),
@@ -1,5 +1,7 @@
 import { mutation, query } from "./_generated/server";
+import type { MutationCtx } from "./_generated/server";
 import { v } from "convex/values";
+import type { Infer } from "convex/values";
 import { ConvexError } from "convex/values";
 
 // List all service categories ordered by sortOrder
@@ -458,43 +460,89 @@ export const listChainOverrides = query({
 // EXECUTION LOGGING
 // ═══════════════════════════════════════════
 
+const executionLogFields = {
+  serviceId: v.id("services"),
+  categoryName: v.string(),
+  agentName: v.string(),
+  taskId: v.optional(v.id("tasks")),
+  campaignId: v.optional(v.id("campaigns")),
+  contentBatchId: v.optional(v.id("contentBatches")),
+  status: v.union(v.literal("success"), v.literal("failed"),
+    v.literal("timeout"), v.literal("rate_limited"), v.literal("cache_hit")),
+  durationMs: v.optional(v.number()),
+  errorMessage: v.optional(v.string()),
+  retryAttempt: v.number(),
+  estimatedCost: v.optional(v.number()),
+};
+
+// Buffered writers (service_chain.py) stamp entries client-side so the log
+// reflects when the attempt ran, not when the batch was flushed.
+const executionLogEntry = v.object({
+  ...executionLogFields,
+  executedAt: v.optional(v.number()),
+});
+
+async function recordExecution(
+  ctx: MutationCtx,
+  args: Infer<typeof executionLogEntry>,
+) {
+  const { executedAt, ...fields } = args;
+  const at = executedAt ?? Date.now();
+  // Checked before writing anything so a rejected batch entry leaves no trace
+  const svc = await ctx.db.get(args.serviceId);
+  if (!svc) throw new ConvexError(`Unknown service: ${args.serviceId}`);
+  await ctx.db.insert("serviceExecutionLog", {
+    ...fields,
+    executedAt: at,
+  });
+
+  // Served from service_chain's response cache; the provider wasn't called,
+  // so only the hit counter changes
+  if (args.status === "cache_hit") {
+    await ctx.db.patch(args.serviceId, { cacheHitCount: (svc.cacheHitCount ?? 0) + 1 });
+    return;
+  }
+
+  // Update service health fields
+  const updates: Record<string, unknown> = {
+    lastHealthCheck: at,
+  };
+  if (args.status === "success") {
+    updates.lastHealthStatus = "healthy";
+    updates.lastSuccessAt = at;
+    updates.failureCount = 0;
+  } else {
+    const newCount = (svc.failureCount ?? 0) + 1;
+    updates.failureCount = newCount;
+    updates.lastFailureAt = at;
+    updates.lastHealthStatus = newCount >= 3 ? "unreachable" : "degraded";
+  }
+  await ctx.db.patch(args.serviceId, updates);
+}
+
 export const logServiceExecution = mutation({
-  args: {
-    serviceId: v.id("services"),
-    categoryName: v.string(),
-    agentName: v.string(),
-    taskId: v.optional(v.id("tasks")),
-    campaignId: v.optional(v.id("campaigns")),
-    contentBatchId: v.optional(v.id("contentBatches")),
-    status: v.union(v.literal("success"), v.literal("failed"),
-      v.literal("timeout"), v.literal("rate_limited")),
-    durationMs: v.optional(v.number()),
-    errorMessage: v.optional(v.string()),
-    retryAttempt: v.number(),
-    estimatedCost: v.optional(v.number()),
-  },
+  args: executionLogFields,
   handler: async (ctx, args) => {
-    await ctx.db.insert("serviceExecutionLog", {
-      ...args,
-      executedAt: Date.now(),
-    });
+    await recordExecution(ctx, args);
+  },
+});
 
-    // Update service health fields
-    const updates: Record<string, unknown> = {
-      lastHealthCheck: Date.now(),
-    };
-    if (args.status === "success") {
-      updates.lastHealthStatus = "healthy";
-      updates.lastSuccessAt = Date.now();
-      updates.failureCount = 0;
-    } else {
-      const svc = await ctx.db.get(args.serviceId);
-      const newCount = (svc?.failureCount ?? 0) + 1;
-      updates.failureCount = newCount;
-      updates.lastFailureAt = Date.now();
-      updates.lastHealthStatus = newCount >= 3 ? "unreachable" : "degraded";
+// Entry errors (e.g. a service deleted since the call) are returned by index,
+// like upsertFromManifestBatch, so one bad record doesn't drop the batch.
+export const logServiceExecutionBatch = mutation({
+  args: { entries: v.array(executionLogEntry) },
+  handler: async (ctx, args) => {
+    // Apply in order so failureCount streaks match the attempt sequence
+    const rejected = [];
+    for (let index = 0; index < args.entries.length; index++) {
+      try {
+        await recordExecution(ctx, args.entries[index]);
+      } catch (e) {
+        if (!(e instanceof ConvexError)) throw e;
+        rejected.push({ index, error: String(e.data) });
+      }
     }
-    await ctx.db.patch(args.serviceId, updates);
+    return { logged: args.entries.length - rejected.length, rejected };
   },
 });
 
@@ -502,76 +550,58 @@ export const logServiceExecution = mutation({
 // MANIFEST SYNC (used by sync_services.py)
 // ═══════════════════════════════════════════
 
-export const upsertFromManifest = mutation({
-  args: {
-    categoryName: v.string(),
-    name: v.string(),
-    displayName: v.string(),
-    description: v.string(),
-    scriptPath: v.string(),
-    mcpServer: v.optional(v.string()),
-    apiKeyEnvVar: v.string(),
-    costInfo: v.string(),
-    useCases: v.array(v.string()),
-    docsUrl: v.optional(v.string()),
-    defaultPriority: v.number(),
-    manifestVersion: v.optional(v.string()),
-    integrationType: v.optional(v.union(
-      v.literal("script"), v.literal("mcp"),
-      v.literal("both"), v.literal("local")
-    )),
-    selfHostedConfig: v.optional(v.object({
-      dockerCompose: v.optional(v.string()),
-      healthCheckUrl: v.optional(v.string()),
-      defaultPort: v.optional(v.number()),
-    })),
-    freeTier: v.optional(v.boolean()),
-  },
-  handler: async (ctx, args) => {
-    // Resolve category
-    const category = await ctx.db
-      .query("serviceCategories")
-      .withIndex("by_name", (q) => q.eq("name", args.categoryName))
-      .unique();
-    if (!category) throw new ConvexError(`Unknown category: ${args.categoryName}`);
-
-    // Check if service already exists
-    const existing = await ctx.db
-      .query("services")
-      .withIndex("by_name", (q) => q.eq("name", args.name))
-      .first();
-
-    if (existing) {
-      // Update metadata but preserve isActive, priority, apiKeyConfigured, apiKeyValue
-      await ctx.db.patch(existing._id, {
-        displayName: args.displayName,
-        description: args.description,
-        scriptPath: args.scriptPath,
-        mcpServer: args.mcpServer,
-        apiKeyEnvVar: args.apiKeyEnvVar,
-        costInfo: args.costInfo,
-        useCases: args.useCases,
-        docsUrl: args.docsUrl,
-        manifestVersion: args.manifestVersion,
-        integrationType: args.integrationType,
-        selfHostedConfig: args.selfHostedConfig,
-        freeTier: args.freeTier,
-      });
-      return { action: "updated" as const, id: existing._id };
-    }
-
-    // Insert new service (inactive by default)
-    const id = await ctx.db.insert("services", {
-      categoryId: category._id,
-      name: args.name,
+const manifestFields = {
+  categoryName: v.string(),
+  name: v.string(),
+  displayName: v.string(),
+  description: v.string(),
+  scriptPath: v.string(),
+  mcpServer: v.optional(v.string()),
+  apiKeyEnvVar: v.string(),
+  costInfo: v.string(),
+  useCases: v.array(v.string()),
+  docsUrl: v.optional(v.string()),
+  defaultPriority: v.number(),
+  manifestVersion: v.optional(v.string()),
+  integrationType: v.optional(v.union(
+    v.literal("script"), v.literal("mcp"),
+    v.literal("both"), v.literal("local")
+  )),
+  selfHostedConfig: v.optional(v.object({
+    dockerCompose: v.optional(v.string()),
+    healthCheckUrl: v.optional(v.string()),
+    defaultPort: v.optional(v.number()),
+  })),
+  freeTier: v.optional(v.boolean()),
+};
+
+const manifestEntry = v.object(manifestFields);
+
+async function upsertManifestEntry(
+  ctx: MutationCtx,
+  args: Infer<typeof manifestEntry>,
+) {
+  // Resolve category
+  const category = await ctx.db
+    .query("serviceCategories")
+    .withIndex("by_name", (q) => q.eq("name", args.categoryName))
+    .unique();
+  if (!category) throw new ConvexError(`Unknown category: ${args.categoryName}`);
+
+  // Check if service already exists
+  const existing = await ctx.db
+    .query("services")
+    .withIndex("by_name", (q) => q.eq("name", args.name))
+    .first();
+
+  if (existing) {
+    // Update metadata but preserve isActive, priority, apiKeyConfigured, apiKeyValue
+    await ctx.db.patch(existing._id, {
       displayName: args.displayName,
       description: args.description,
-      isActive: false,
-      priority: args.defaultPriority,
-      apiKeyEnvVar: args.apiKeyEnvVar,
-      apiKeyConfigured: false,
       scriptPath: args.scriptPath,
       mcpServer: args.mcpServer,
+      apiKeyEnvVar: args.apiKeyEnvVar,
       costInfo: args.costInfo,
       useCases: args.useCases,
       docsUrl: args.docsUrl,
@@ -580,7 +610,54 @@ export const upsertFromManifest = mutation({
       selfHostedConfig: args.selfHostedConfig,
       freeTier: args.freeTier,
     });
-    return { action: "created" as const, id };
+    return { action: "updated" as const, id: existing._id };
+  }
+
+  // Insert new service (inactive by default)
+  const id = await ctx.db.insert("services", {
+    categoryId: category._id,
+    name: args.name,
+    displayName: args.displayName,
+    description: args.description,
+    isActive: false,
+    priority: args.defaultPriority,
+    apiKeyEnvVar: args.apiKeyEnvVar,
+    apiKeyConfigured: false,
+    scriptPath: args.scriptPath,
+    mcpServer: args.mcpServer,
+    costInfo: args.costInfo,
+    useCases: args.useCases,
+    docsUrl: args.docsUrl,
+    manifestVersion: args.manifestVersion,
+    integrationType: args.integrationType,
+    selfHostedConfig: args.selfHostedConfig,
+    freeTier: args.freeTier,
+  });
+  return { action: "created" as const, id };
+}
+
+export const upsertFromManifest = mutation({
+  args: manifestFields,
+  handler: async (ctx, args) => {
+    return await upsertManifestEntry(ctx, args);
+  },
+});
+
+// One round trip for a whole sync run. Entry errors (e.g. unknown category)
+// are returned per entry so one bad manifest doesn't roll back the rest.
+export const upsertFromManifestBatch = mutation({
+  args: { entries: v.array(manifestEntry) },
+  handler: async (ctx, args) => {
+    const results = [];
+    for (const entry of args.entries) {
+      try {
+        results.push({ name: entry.name, ...(await upsertManifestEntry(ctx, entry)) });
+      } catch (e) {
+        if (!(e instanceof ConvexError)) throw e;
+        results.push({ name: entry.name, error: String(e.data) });
+      }
+    }
+    return results;
   },
 });
 
@@ -615,6 +692,7 @@ export const stats = query({
       degraded: all.filter((s) => s.lastHealthStatus === "degraded" || s.lastHealthStatus === "unreachable").length,
       inactive: all.filter((s) => !s.isActive).length,
       freeTier: all.filter((s) => s.freeTier).length,
+      cacheHits: all.reduce((n, s) => n + (s.cacheHitCount ?? 0), 0),
     };
   },
 });
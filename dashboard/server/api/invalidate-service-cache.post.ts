@@ -0,0 +1,21 @@
+import { exec } from 'node:child_process'
+import { promisify } from 'node:util'
+
+const execAsync = promisify(exec)
+
+// Drops resolved chains from the shared Python chain cache after the
+// dashboard changes service priority or activation.
+export default defineEventHandler(async () => {
+  try {
+    const { stdout } = await execAsync(
+      'python3 scripts/lib/chain_cache.py invalidate',
+      { cwd: '/var/www/vibe-marketing', timeout: 10000 }
+    )
+    return { success: true, output: stdout.trim() }
+  } catch (error: any) {
+    return {
+      success: false,
+      error: error.message || 'Cache invalidation failed',
+    }
+  }
+})
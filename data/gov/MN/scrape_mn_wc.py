@@ -26,6 +26,7 @@ Usage:
   python3 scrape_mn_wc.py --resume            # resume from checkpoint
   python3 scrape_mn_wc.py --status            # show scrape status
   python3 scrape_mn_wc.py --sample 20         # test first N prefixes
+  python3 scrape_mn_wc.py --resume --metrics-file /var/lib/node_exporter/mn_wc.prom
 """
 
 import argparse
@@ -204,6 +205,8 @@ def load_seen_keys():
 
 def append_records(records):
     """Append records to CSV."""
+    if _metrics is not None:
+        _metrics.records(len(records))
     write_header = not CSV_FILE.exists() or CSV_FILE.stat().st_size == 0
     with open(CSV_FILE, "a", newline="", encoding="utf-8") as f:
         writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS, extrasaction="ignore")
@@ -213,6 +216,47 @@ def append_records(records):
             writer.writerow(rec)
 
 
+# ---------------------------------------------------------------------------
+# Live metrics
+# ---------------------------------------------------------------------------
+
+_metrics = None  # scrape_metrics.ScrapeMetrics when --metrics-file/--metrics-port is given
+
+
+def enable_metrics(textfile, port):
+    """Export live metrics (Prometheus textfile and/or localhost HTTP).
+
+    scrape_metrics.py is shared with the NM scraper, one directory up. The
+    final snapshot (running=0) is written by close_metrics() on a clean exit
+    only; after a crash the last snapshot keeps running=1 and goes stale.
+    """
+    global _metrics
+    sys.path.insert(0, str(SCRIPT_DIR.parent))
+    from scrape_metrics import ScrapeMetrics
+    _metrics = ScrapeMetrics("mn_wc", textfile, port).start()
+    print(f"  {_metrics.describe()}")
+
+
+def close_metrics():
+    """Write the final snapshot (running=0) after a clean run."""
+    if _metrics is not None:
+        _metrics.close()
+
+
+def timed(kind, fn, *args):
+    """Call fn(*args), reporting its latency and any error to the metrics."""
+    started = time.monotonic()
+    error = ""
+    try:
+        return fn(*args)
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        if _metrics is not None:
+            _metrics.request(0, kind, time.monotonic() - started, error)
+
+
 # ---------------------------------------------------------------------------
 # Playwright browser session
 # ---------------------------------------------------------------------------
@@ -352,7 +396,7 @@ class MNWCBrowser:
         'ok', 'empty', 'excessive', 'error:<msg>'
         """
         try:
-            html, emp_count, excessive = self._submit_search(prefix)
+            html, emp_count, excessive = timed("search", self._submit_search, prefix)
         except Exception as e:
             return [], f"error: search failed: {e}"
 
@@ -366,7 +410,7 @@ class MNWCBrowser:
         click_count = min(emp_count, MAX_EMPLOYERS_PER_PREFIX)
         for i in range(click_count):
             try:
-                detail_html = self._click_employer(i)
+                detail_html = timed("detail", self._click_employer, i)
                 if detail_html:
                     records = parse_detail_html(detail_html, prefix)
                     all_records.extend(records)
@@ -495,6 +539,8 @@ def crawl(resume=False, prefix=None, sample=None):
     total_new = state.get("total_records", 0)
     total_emp_clicks = state.get("total_employers_clicked", 0)
     errors = state.get("errors", 0)
+    if _metrics is not None:
+        _metrics.watch("queue_depth", lambda: len(queue), queue="prefixes")
 
     try:
         while queue:
@@ -530,6 +576,8 @@ def crawl(resume=False, prefix=None, sample=None):
                     state["errors"] = errors
                     print(f"  {pfx}  ERROR: {status}")
                     # Retry once
+                    if _metrics is not None:
+                        _metrics.retry(0, "search")
                     time.sleep(3)
                     try:
                         records, status = browser.search_and_scrape(pfx)
@@ -571,6 +619,8 @@ def crawl(resume=False, prefix=None, sample=None):
                 completed += 1
                 state["prefixes_done"].append(pfx)
                 done_set.add(pfx)
+                if _metrics is not None:
+                    _metrics.prefix_done(len(done_set) + len(queue))
 
                 # Save checkpoint every 25 prefixes
                 if completed % 25 == 0:
@@ -589,6 +639,8 @@ def crawl(resume=False, prefix=None, sample=None):
                 # Re-add to queue for retry if first attempt
                 if pfx not in done_set:
                     queue.append(pfx)
+                    if _metrics is not None:
+                        _metrics.retry(0, "search")
 
     except KeyboardInterrupt:
         print(f"\n  Interrupted! Saving checkpoint...")
@@ -672,8 +724,14 @@ def main():
     parser.add_argument("--resume", action="store_true", help="Resume from checkpoint")
     parser.add_argument("--status", action="store_true", help="Show scrape status")
     parser.add_argument("--sample", type=int, help="Process first N prefixes only")
+    parser.add_argument("--metrics-file", type=Path, metavar="PATH",
+                        help="Write live metrics to a Prometheus textfile (e.g. for node_exporter)")
+    parser.add_argument("--metrics-port", type=int, metavar="PORT",
+                        help="Serve live metrics on http://127.0.0.1:PORT/metrics")
 
     args = parser.parse_args()
+    if (args.metrics_file or args.metrics_port) and not args.status:
+        enable_metrics(args.metrics_file, args.metrics_port)
 
     if args.status:
         show_status()
@@ -681,6 +739,7 @@ def main():
         crawl(prefix=args.prefix)
     else:
         crawl(resume=args.resume, sample=args.sample)
+    close_metrics()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Check and time the PSI fast-path extractors against BeautifulSoup.
+
+Every saved page is parsed both ways. A page passes if the fast path returns
+exactly what BeautifulSoup returns, or rejects the page (FastPathError) so
+the scraper falls back. Any other difference is a mismatch and the script
+exits 1. Timings are per page, using parse_page() -- fast path plus fallback,
+i.e. what the scraper actually runs -- against BeautifulSoup alone.
+
+Pages are *.html files; the name prefix (search_*, detail_*) says which
+parser applies.
+
+Usage:
+  python3 bench_psi_parse.py                       # fixtures/psi/
+  python3 bench_psi_parse.py --iterations 500
+  python3 bench_psi_parse.py path/to/pages/ --json
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from psi_extract import FastPathError
+from scrape_nm_psi import PARSERS, decode_html, parse_page
+
+FIXTURE_DIR = Path(__file__).parent / "fixtures" / "psi"
+
+
+def page_kind(path: Path) -> str:
+    for kind in PARSERS:
+        if path.name.startswith(kind):
+            return kind
+    return ""
+
+
+def time_per_call(fn, iterations: int) -> float:
+    """Mean microseconds per call."""
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def check_page(path: Path, iterations: int) -> dict:
+    kind = page_kind(path)
+    html = decode_html(path.read_bytes())
+    args = (path.stem,) if kind == "detail" else ()
+    fast, soup = PARSERS[kind]
+
+    expected = soup(html, *args)
+    try:
+        got = fast(html, *args)
+        status = "fast" if got == expected else "MISMATCH"
+    except FastPathError as e:
+        got, status = str(e), "fallback"
+
+    soup_us = time_per_call(lambda: soup(html, *args), iterations)
+    page_us = time_per_call(lambda: parse_page(kind, html, *args), iterations)
+    return {
+        "page": path.name,
+        "kind": kind,
+        "bytes": len(html),
+        "status": status,
+        "soup_us": round(soup_us, 1),
+        "fast_us": round(page_us, 1),
+        "speedup": round(soup_us / page_us, 1) if page_us else 0.0,
+        "expected": expected if status == "MISMATCH" else None,
+        "got": got if status != "fast" else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare PSI fast-path extractors with BeautifulSoup")
+    parser.add_argument("dirs", nargs="*", type=Path, default=[FIXTURE_DIR],
+                        help=f"Directories of saved pages (default {FIXTURE_DIR})")
+    parser.add_argument("--iterations", type=int, default=100,
+                        help="Timing iterations per page (default 100)")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    pages = sorted(p for d in args.dirs for p in d.glob("*.html") if page_kind(p))
+    if not pages:
+        print("No search_*.html or detail_*.html pages found.", file=sys.stderr)
+        sys.exit(1)
+
+    results = [check_page(p, args.iterations) for p in pages]
+    mismatches = [r for r in results if r["status"] == "MISMATCH"]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'page':<34} {'status':<9} {'soup µs':>9} {'fast µs':>9} {'speedup':>8}")
+        for r in results:
+            print(f"{r['page']:<34} {r['status']:<9} {r['soup_us']:>9.0f} "
+                  f"{r['fast_us']:>9.0f} {r['speedup']:>7.1f}x")
+        soup_total = sum(r["soup_us"] for r in results)
+        fast_total = sum(r["fast_us"] for r in results)
+        fallbacks = sum(r["status"] == "fallback" for r in results)
+        print(f"\n{len(results)} pages, {fallbacks} fell back, {len(mismatches)} mismatched | "
+              f"mean {soup_total / len(results):.0f} µs -> {fast_total / len(results):.0f} µs "
+              f"per page ({soup_total / fast_total:.1f}x)")
+        for r in mismatches:
+            print(f"\nMISMATCH {r['page']}:\n  soup: {r['expected']}\n  fast: {r['got']}")
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -105,13 +105,14 @@ async def main():
 
     checkpoint.save()
     csv_file.close()
+    csv_rows = checkpoint.compact_csv()
 
     elapsed = time.time() - stats["start_time"]
     print(f"\nComplete!", flush=True)
     print(f"  Records: {stats['details_fetched']}", flush=True)
     print(f"  Duration: {elapsed:.0f}s ({elapsed/3600:.1f}h)", flush=True)
     print(f"  Rate: {stats['details_fetched']/elapsed:.1f}/s", flush=True)
-    print(f"  Output: {OUTPUT_CSV}", flush=True)
+    print(f"  Output: {OUTPUT_CSV} ({csv_rows} unique rows)", flush=True)
 
     await session.close()
 
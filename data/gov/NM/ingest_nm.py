@@ -2,7 +2,8 @@
 """
 Ingest New Mexico CID contractor data into PostgreSQL.
 
-Source: CSV from scrape_nm_psi.py (PSI Exams portal scrape)
+Source: CSV from scrape_nm_psi.py (PSI Exams portal scrape), or the
+        staging.nm_psi table it streams into with --stage
 Target: master.contractors, master.licenses, master.tradespersons, master.categories
 
 NM Construction Industries Division (CID) licenses contractors through
@@ -16,14 +17,17 @@ Data fields from scrape:
   - Meta: license_id, license_application_id, company_id
 
 Usage:
-  python3 ingest_nm.py                  # full ingest
+  python3 ingest_nm.py                  # full ingest (COPY + set-based merge, safe to re-run)
   python3 ingest_nm.py --sample 500     # limit rows for testing
   python3 ingest_nm.py --status         # show row counts
   python3 ingest_nm.py --purge          # delete all NM CID PSI data
+  python3 ingest_nm.py --from-staging   # merge new/changed rows from staging.nm_psi
+  python3 ingest_nm.py --follow 120     # ...and repeat every 120s while a scrape runs
 """
 
 import argparse
 import csv
+import io
 import json
 import re
 import sys
@@ -32,7 +36,9 @@ from datetime import datetime
 from pathlib import Path
 
 import psycopg2
-from psycopg2.extras import execute_values, Json
+from psycopg2.extras import execute_values
+
+from psi_staging import COLUMNS as STAGING_COLUMNS, STAGING_TABLE, ensure_staging_table
 
 SCRIPT_DIR = Path(__file__).parent
 RAW_DIR = SCRIPT_DIR / "raw"
@@ -210,6 +216,107 @@ def clean_volume(volume_str):
     return volume_str.strip()
 
 
+# ----- Row preparation -----
+
+def prepare_row(row):
+    """Clean one scraped record into the values the master tables need.
+
+    Shared by the CSV ingest and the staging merge. Returns (prepared, None),
+    or (None, reason) with reason "no_name" or "no_license" for rows that
+    can't be ingested.
+    """
+    # Parse CSV fields
+    company_name = (row.get("company_name") or "").strip()
+    license_number = (row.get("license_number") or "").strip()
+    phone_raw = (row.get("phone") or "").strip()
+    license_status = (row.get("license_status") or "").strip()
+    issue_date_str = (row.get("issue_date") or "").strip()
+    expiry_date_str = (row.get("expiry_date") or "").strip()
+    volume_raw = (row.get("volume") or "").strip()
+    street = (row.get("street") or "").strip()
+    city = (row.get("city") or "").strip()
+    zip_code = (row.get("zip_code") or "").strip()
+    qp_name = (row.get("qp_name") or "").strip()
+    qp_cert_no = (row.get("qp_certificate_no") or "").strip()
+    qp_class = (row.get("qp_classification") or "").strip()
+    qp_attach_date = (row.get("qp_attach_date") or "").strip()
+    qp_status = (row.get("qp_status") or "").strip()
+    license_id = (row.get("license_id") or "").strip()
+    license_app_id = (row.get("license_application_id") or "").strip()
+    company_id = (row.get("company_id") or "").strip()
+
+    if not company_name:
+        return None, "no_name"
+    if not license_number:
+        return None, "no_license"
+
+    # Trade classification
+    trade = classify_trade(qp_class)
+
+    # Entity type
+    entity_type, entity_type_desc = determine_entity_type(company_name)
+
+    # Status mapping
+    status, status_desc = STATUS_MAP.get(
+        license_status, (license_status.upper().replace(" ", "_"), license_status)
+    )
+
+    # Build normalized name
+    contractor_name = company_name.upper().strip()
+
+    # Raw data
+    raw_data = {
+        "psi_license_id": license_id,
+        "psi_license_app_id": license_app_id,
+        "psi_company_id": company_id,
+    }
+    if volume_raw:
+        raw_data["volume"] = volume_raw
+    if qp_name:
+        raw_data["qp_name"] = qp_name
+        raw_data["qp_cert_no"] = qp_cert_no
+        raw_data["qp_classification"] = qp_class
+
+    tp_raw = None
+    if qp_name:
+        tp_raw = {
+            "license_number": license_number,
+            "qp_cert_no": qp_cert_no,
+            "qp_classification": qp_class,
+            "qp_attach_date": qp_attach_date,
+            "qp_status": qp_status,
+        }
+
+    return {
+        "license_id": license_id,
+        "license_number": license_number,
+        "company_name": company_name,
+        "normalized": normalize_name(contractor_name),
+        # Dedup: (UPPER(name), UPPER(city))
+        "dedup_key": (contractor_name, city.upper().strip()),
+        "phone": clean_phone(phone_raw),
+        "street": street or None,
+        "city": city or None,
+        "zip": zip_code or None,
+        "entity_type": entity_type,
+        "entity_type_desc": entity_type_desc,
+        "trade": trade,
+        # License classification info
+        "classification": trade,
+        "classification_desc": qp_class if qp_class else "Contractor",
+        "raw_classification": qp_class or "Contractor",
+        "status": status,
+        "status_desc": status_desc,
+        "issue_date": parse_date(issue_date_str),
+        "expiration_date": parse_date(expiry_date_str),
+        "raw_data": raw_data,
+        "qp_name": qp_name or None,
+        "qp_class": qp_class,
+        "qp_cert_no": qp_cert_no,
+        "tp_raw": tp_raw,
+    }, None
+
+
 # ----- Meta tracking -----
 
 def register_source(cur, records_available):
@@ -252,29 +359,134 @@ def finish_source(cur, source_id, records_ingested):
     """, (records_ingested, source_id))
 
 
-# ----- Batch flush helpers -----
+# ----- Set-based load -----
+#
+# Both the CSV ingest and the staging merge clean records with prepare_row(),
+# COPY them into a temp table (temp tables are never WAL-logged) and update
+# the master tables with a handful of set-based statements in one
+# transaction, instead of a round trip per contractor. Loading is
+# idempotent: licenses and QPs are updated in place by license number,
+# contractors and categories are only added if missing, so re-running an
+# ingest no longer duplicates rows.
+
+MERGE_COLUMNS = [
+    ("license_number", "TEXT PRIMARY KEY"),
+    ("name_key", "TEXT"), ("city_key", "TEXT"),
+    ("business_name", "TEXT"), ("business_name_normalized", "TEXT"),
+    ("phone", "TEXT"), ("street", "TEXT"), ("city", "TEXT"), ("zip", "TEXT"),
+    ("entity_type", "TEXT"), ("entity_type_desc", "TEXT"),
+    ("trade", "TEXT"), ("classification", "TEXT"), ("classification_desc", "TEXT"),
+    ("raw_classification", "TEXT"),
+    ("status", "TEXT"), ("status_desc", "TEXT"),
+    ("issue_date", "DATE"), ("expiration_date", "DATE"),
+    ("raw_data", "JSONB"),
+    ("qp_name", "TEXT"), ("qp_class", "TEXT"), ("qp_cert_no", "TEXT"), ("tp_raw", "JSONB"),
+]
+
+
+def _key_sql(col):
+    return f"UPPER(BTRIM(COALESCE({col}, '')))"
+
+
+def _copy_value(value):
+    """One field in COPY text format (\\N is NULL, so '' stays '')."""
+    if value is None:
+        return "\\N"
+    if isinstance(value, dict):
+        value = json.dumps(value)
+    return (str(value).replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+
+def load_prepared(cur, prepared):
+    """COPY prepare_row() results into the nm_psi_merge temp table.
+
+    One row per license number; the table is dropped at commit.
+    """
+    cols = ",\n            ".join(f"{name} {kind}" for name, kind in MERGE_COLUMNS)
+    cur.execute(f"""
+        CREATE TEMP TABLE nm_psi_merge (
+            {cols},
+            contractor_id BIGINT
+        ) ON COMMIT DROP
+    """)
+    buf = io.StringIO()
+    for p in prepared:
+        values = (
+            p["license_number"], p["dedup_key"][0], p["dedup_key"][1],
+            p["company_name"], p["normalized"],
+            p["phone"], p["street"], p["city"], p["zip"],
+            p["entity_type"], p["entity_type_desc"],
+            p["trade"], p["classification"], p["classification_desc"],
+            p["raw_classification"],
+            p["status"], p["status_desc"],
+            p["issue_date"], p["expiration_date"],
+            p["raw_data"],
+            p["qp_name"], p["qp_class"], p["qp_cert_no"], p["tp_raw"],
+        )
+        buf.write("\t".join(_copy_value(v) for v in values) + "\n")
+    buf.seek(0)
+    names = ", ".join(name for name, _ in MERGE_COLUMNS)
+    cur.copy_expert(f"COPY nm_psi_merge ({names}) FROM STDIN", buf)
+    cur.execute("ANALYZE nm_psi_merge")
+
+
+def merge_prepared(cur):
+    """Apply nm_psi_merge to the master tables. Returns counts; the caller commits."""
+    counts = {}
 
-def _flush_contractors(cur, batch):
-    if not batch:
-        return []
-    sql = """
+    # Contractors: one per (UPPER(name), UPPER(city)) not already in NM
+    cur.execute(f"""
         INSERT INTO master.contractors (
             business_name, business_name_normalized, dba_name,
             phone, email, street, city, state, zip, county,
             entity_type, entity_type_desc,
             owner_name, source
-        ) VALUES %s
-        RETURNING id
-    """
-    template = "(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"
-    result = execute_values(cur, sql, batch, template=template, fetch=True)
-    return [r[0] for r in result]
-
-
-def _flush_licenses(cur, batch):
-    if not batch:
-        return
-    execute_values(cur, """
+        )
+        SELECT DISTINCT ON (m.name_key, m.city_key)
+            m.business_name, m.business_name_normalized, NULL,
+            m.phone, NULL, m.street, m.city, %s, m.zip, NULL,
+            m.entity_type, m.entity_type_desc,
+            NULL, %s
+        FROM nm_psi_merge m
+        WHERE NOT EXISTS (
+            SELECT 1 FROM master.contractors c
+            WHERE c.state = %s
+              AND {_key_sql('c.business_name')} = m.name_key
+              AND {_key_sql('c.city')} = m.city_key
+        )
+        ORDER BY m.name_key, m.city_key, m.license_number
+    """, (STATE, SOURCE, STATE))
+    counts["contractors_new"] = cur.rowcount
+
+    cur.execute(f"""
+        UPDATE nm_psi_merge m SET contractor_id = c.id
+        FROM (
+            SELECT DISTINCT ON (name_key, city_key) id, name_key, city_key
+            FROM (
+                SELECT id, {_key_sql('business_name')} AS name_key,
+                       {_key_sql('city')} AS city_key
+                FROM master.contractors WHERE state = %s
+            ) k
+            ORDER BY name_key, city_key, id
+        ) c
+        WHERE c.name_key = m.name_key AND c.city_key = m.city_key
+    """, (STATE,))
+
+    # Licenses: update in place by license number, insert the rest
+    cur.execute("""
+        UPDATE master.licenses l SET
+            contractor_id = m.contractor_id,
+            classification = m.classification,
+            classification_desc = m.classification_desc,
+            status = m.status, status_desc = m.status_desc,
+            issue_date = m.issue_date, expiration_date = m.expiration_date,
+            raw_data = m.raw_data
+        FROM nm_psi_merge m
+        WHERE l.state = %s AND l.source = %s AND l.license_number = m.license_number
+    """, (STATE, SOURCE))
+    counts["licenses_updated"] = cur.rowcount
+    cur.execute("""
         INSERT INTO master.licenses (
             contractor_id, state, license_number,
             license_type, license_type_desc,
@@ -282,55 +494,73 @@ def _flush_licenses(cur, batch):
             status, status_desc,
             issue_date, expiration_date,
             source, source_url, raw_data
-        ) VALUES %s
-    """, batch, template="(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)")
-
+        )
+        SELECT m.contractor_id, %s, m.license_number,
+               'Contractor', 'CID Contractor License',
+               m.classification, m.classification_desc,
+               m.status, m.status_desc,
+               m.issue_date, m.expiration_date,
+               %s, %s, m.raw_data
+        FROM nm_psi_merge m
+        WHERE NOT EXISTS (
+            SELECT 1 FROM master.licenses l
+            WHERE l.state = %s AND l.source = %s AND l.license_number = m.license_number
+        )
+    """, (STATE, SOURCE, SOURCE_URL, STATE, SOURCE))
+    counts["licenses_new"] = cur.rowcount
 
-def _flush_tradespersons(cur, batch):
-    if not batch:
-        return
-    execute_values(cur, """
+    # QPs: keyed by the license they qualify
+    cur.execute("""
+        UPDATE master.tradespersons t SET
+            name = m.qp_name, trade = m.trade, classification = m.qp_class,
+            certification_number = m.qp_cert_no,
+            employer_contractor_id = m.contractor_id,
+            raw_data = m.tp_raw
+        FROM nm_psi_merge m
+        WHERE m.qp_name IS NOT NULL
+          AND t.source = %s AND t.raw_data->>'license_number' = m.license_number
+    """, (SOURCE,))
+    cur.execute("""
         INSERT INTO master.tradespersons (
             name, trade, classification,
             certification_number, state,
             employer_contractor_id,
             source, raw_data
-        ) VALUES %s
-    """, batch, template="(%s, %s, %s, %s, %s, %s, %s, %s)")
-
+        )
+        SELECT m.qp_name, m.trade, m.qp_class, m.qp_cert_no, %s,
+               m.contractor_id, %s, m.tp_raw
+        FROM nm_psi_merge m
+        WHERE m.qp_name IS NOT NULL
+          AND NOT EXISTS (
+            SELECT 1 FROM master.tradespersons t
+            WHERE t.source = %s AND t.raw_data->>'license_number' = m.license_number
+          )
+    """, (STATE, SOURCE, SOURCE))
+    counts["tradespersons_new"] = cur.rowcount
 
-def _flush_categories(cur, batch):
-    if not batch:
-        return
-    execute_values(cur, """
+    cur.execute("""
         INSERT INTO master.categories (contractor_id, trade, raw_classification, source)
-        VALUES %s
-    """, batch, template="(%s, %s, %s, %s)")
-
-
-# ----- Contractor cache -----
-
-def build_contractor_cache(cur):
-    """Load existing NM contractors into dedup cache.
+        SELECT DISTINCT ON (m.contractor_id, m.trade)
+            m.contractor_id, m.trade, m.raw_classification, %s
+        FROM nm_psi_merge m
+        WHERE NOT EXISTS (
+            SELECT 1 FROM master.categories c
+            WHERE c.contractor_id = m.contractor_id AND c.trade = m.trade
+        )
+        ORDER BY m.contractor_id, m.trade, m.license_number
+    """, (SOURCE,))
+    counts["categories_new"] = cur.rowcount
 
-    Dedup key: (UPPER(business_name), city) for NM data since we have addresses.
-    """
-    cur.execute("""
-        SELECT id, UPPER(COALESCE(business_name, '')), UPPER(COALESCE(city, ''))
-        FROM master.contractors
-        WHERE state = 'NM'
-    """)
-    cache = {}
-    for row in cur.fetchall():
-        key = (row[1].strip(), row[2].strip())
-        cache[key] = row[0]
-    return cache
+    cur.execute("SELECT COUNT(*) FROM master.licenses WHERE state = %s AND source = %s",
+                (STATE, SOURCE))
+    counts["licenses_total"] = cur.fetchone()[0]
+    return counts
 
 
 # ----- Main ingestion -----
 
 def ingest(pg, limit=None):
-    """Ingest NM CID PSI license CSV."""
+    """Ingest NM CID PSI license CSV in one set-based transaction."""
     if not INPUT_CSV.exists():
         print(f"  ERROR: {INPUT_CSV} not found. Run scrape_nm_psi.py first.")
         return 0
@@ -346,232 +576,120 @@ def ingest(pg, limit=None):
     run_id = start_run(cur, source_id)
     pg.commit()
 
-    contractor_cache = build_contractor_cache(cur)
-    print(f"  Loaded {len(contractor_cache):,} existing NM contractors")
-
-    # Counters
+    t0 = time.time()
     total = 0
     errors = 0
-    contractors_new = 0
-    contractors_reused = 0
-    licenses_inserted = 0
-    tradespersons_inserted = 0
-    categories_inserted = 0
     skipped_no_name = 0
-
-    # Batch buffers
-    license_batch = []
-    tradesperson_batch = []
-    category_batch = []
-
-    # Dedup
-    category_seen = set()
-    license_seen = set()
-
-    t0 = time.time()
+    duplicates = 0
+    prepared = {}  # license_number -> prepared row; first occurrence wins
 
     with open(INPUT_CSV, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            total += 1
-            if limit and total > limit:
+        for row in csv.DictReader(f):
+            if limit and total >= limit:
                 break
-
+            total += 1
             try:
-                # Parse CSV fields
-                company_name = (row.get("company_name") or "").strip()
-                license_number = (row.get("license_number") or "").strip()
-                phone_raw = (row.get("phone") or "").strip()
-                license_status = (row.get("license_status") or "").strip()
-                issue_date_str = (row.get("issue_date") or "").strip()
-                expiry_date_str = (row.get("expiry_date") or "").strip()
-                volume_raw = (row.get("volume") or "").strip()
-                street = (row.get("street") or "").strip()
-                city = (row.get("city") or "").strip()
-                state = (row.get("state") or "NM").strip()
-                zip_code = (row.get("zip_code") or "").strip()
-                qp_name = (row.get("qp_name") or "").strip()
-                qp_cert_no = (row.get("qp_certificate_no") or "").strip()
-                qp_class = (row.get("qp_classification") or "").strip()
-                qp_attach_date = (row.get("qp_attach_date") or "").strip()
-                qp_status = (row.get("qp_status") or "").strip()
-                license_id = (row.get("license_id") or "").strip()
-                license_app_id = (row.get("license_application_id") or "").strip()
-                company_id = (row.get("company_id") or "").strip()
-
-                if not company_name:
-                    skipped_no_name += 1
-                    continue
-
-                if not license_number:
-                    errors += 1
-                    continue
-
-                # Skip exact duplicate licenses
-                lic_dedup_key = license_number
-                if lic_dedup_key in license_seen:
-                    continue
-                license_seen.add(lic_dedup_key)
-
-                # Parse dates
-                issue_date = parse_date(issue_date_str)
-                expiration_date = parse_date(expiry_date_str)
-
-                # Clean phone
-                phone = clean_phone(phone_raw)
-
-                # Trade classification
-                trade = classify_trade(qp_class)
-
-                # Entity type
-                entity_type, entity_type_desc = determine_entity_type(company_name)
-
-                # Status mapping
-                status, status_desc = STATUS_MAP.get(
-                    license_status, (license_status.upper().replace(" ", "_"), license_status)
-                )
-
-                # Build normalized name
-                contractor_name = company_name.upper().strip()
-                normalized = normalize_name(contractor_name)
-
-                # Dedup: (UPPER(name), UPPER(city))
-                dedup_key = (contractor_name, city.upper().strip())
-
-                contractor_id = contractor_cache.get(dedup_key)
-                if contractor_id is None:
-                    ids = _flush_contractors(cur, [(
-                        company_name,          # business_name
-                        normalized,            # business_name_normalized
-                        None,                  # dba_name
-                        phone,                 # phone
-                        None,                  # email
-                        street or None,        # street
-                        city or None,          # city
-                        STATE,                 # state
-                        zip_code or None,      # zip
-                        None,                  # county
-                        entity_type,           # entity_type
-                        entity_type_desc,      # entity_type_desc
-                        None,                  # owner_name
-                        SOURCE,                # source
-                    )])
-                    contractor_id = ids[0]
-                    contractor_cache[dedup_key] = contractor_id
-                    contractors_new += 1
-                else:
-                    contractors_reused += 1
-
-                # License classification info
-                classification = trade
-                classification_desc = qp_class if qp_class else "Contractor"
-
-                # Raw data
-                raw_data = {
-                    "psi_license_id": license_id,
-                    "psi_license_app_id": license_app_id,
-                    "psi_company_id": company_id,
-                }
-                if volume_raw:
-                    raw_data["volume"] = volume_raw
-                if qp_name:
-                    raw_data["qp_name"] = qp_name
-                    raw_data["qp_cert_no"] = qp_cert_no
-                    raw_data["qp_classification"] = qp_class
-
-                license_batch.append((
-                    contractor_id,
-                    STATE,
-                    license_number,
-                    "Contractor",          # license_type
-                    "CID Contractor License",  # license_type_desc
-                    classification,        # classification
-                    classification_desc,   # classification_desc
-                    status,                # status
-                    status_desc,           # status_desc
-                    issue_date,            # issue_date
-                    expiration_date,       # expiration_date
-                    SOURCE,                # source
-                    SOURCE_URL,            # source_url
-                    Json(raw_data),        # raw_data
-                ))
-                licenses_inserted += 1
-
-                # Insert QP as tradesperson if available
-                if qp_name:
-                    tp_raw = {
-                        "license_number": license_number,
-                        "qp_cert_no": qp_cert_no,
-                        "qp_classification": qp_class,
-                        "qp_attach_date": qp_attach_date,
-                        "qp_status": qp_status,
-                    }
-
-                    tradesperson_batch.append((
-                        qp_name,              # name
-                        trade,                # trade
-                        qp_class,             # classification
-                        qp_cert_no,           # certification_number
-                        STATE,                # state
-                        contractor_id,        # employer_contractor_id
-                        SOURCE,               # source
-                        Json(tp_raw),         # raw_data
-                    ))
-                    tradespersons_inserted += 1
-
-                # Insert category
-                cat_key = (contractor_id, trade)
-                if cat_key not in category_seen:
-                    category_seen.add(cat_key)
-                    category_batch.append((
-                        contractor_id,
-                        trade,
-                        qp_class or "Contractor",
-                        SOURCE,
-                    ))
-                    categories_inserted += 1
-
-                # Flush batches
-                if len(license_batch) >= FLUSH_EVERY:
-                    _flush_licenses(cur, license_batch)
-                    _flush_tradespersons(cur, tradesperson_batch)
-                    _flush_categories(cur, category_batch)
-                    license_batch, tradesperson_batch, category_batch = [], [], []
-                    pg.commit()
-
+                p, skip = prepare_row(row)
             except Exception as e:
                 errors += 1
                 if errors <= 10:
                     print(f"    ERROR row {total}: {e}")
-
-            # Progress
-            if total % 5000 == 0:
-                elapsed = time.time() - t0
-                rate = total / elapsed if elapsed > 0 else 0
-                print(f"    [{total:,}] new_co={contractors_new:,} reused={contractors_reused:,} "
-                      f"lic={licenses_inserted:,} tp={tradespersons_inserted:,} "
-                      f"cat={categories_inserted:,} err={errors} {rate:.0f}/s")
-
-    # Final flush
-    _flush_licenses(cur, license_batch)
-    _flush_tradespersons(cur, tradesperson_batch)
-    _flush_categories(cur, category_batch)
-
-    finish_run(cur, run_id, total, contractors_new, errors)
-    finish_source(cur, source_id, licenses_inserted)
+                continue
+            if skip == "no_name":
+                skipped_no_name += 1
+            elif skip == "no_license":
+                errors += 1
+            elif p["license_number"] in prepared:
+                duplicates += 1
+            else:
+                prepared[p["license_number"]] = p
+    print(f"  Prepared {len(prepared):,} licenses ({time.time() - t0:.1f}s)")
+
+    load_prepared(cur, prepared.values())
+    t1 = time.time()
+    counts = merge_prepared(cur)
+
+    finish_run(cur, run_id, total, counts["contractors_new"], errors)
+    finish_source(cur, source_id, counts["licenses_total"])
     pg.commit()
 
-    elapsed = time.time() - t0
-    print(f"\n  Ingestion complete ({elapsed:.0f}s):")
+    print(f"\n  Ingestion complete ({time.time() - t0:.1f}s, merge {time.time() - t1:.1f}s):")
     print(f"    Rows processed:     {total:,}")
     print(f"    Skipped (no name):  {skipped_no_name:,}")
-    print(f"    Contractors new:    {contractors_new:,}")
-    print(f"    Contractors reused: {contractors_reused:,}")
-    print(f"    Licenses:           {licenses_inserted:,}")
-    print(f"    Tradespersons (QP): {tradespersons_inserted:,}")
-    print(f"    Categories:         {categories_inserted:,}")
+    print(f"    Duplicate licenses: {duplicates:,}")
+    print(f"    Contractors new:    {counts['contractors_new']:,}")
+    print(f"    Licenses:           +{counts['licenses_new']:,} new, "
+          f"{counts['licenses_updated']:,} updated")
+    print(f"    Tradespersons (QP): +{counts['tradespersons_new']:,}")
+    print(f"    Categories:         +{counts['categories_new']:,}")
     print(f"    Errors:             {errors}")
-    return contractors_new
+    return counts["contractors_new"]
+
+
+# ----- Merge from staging -----
+#
+# scrape_nm_psi.py --stage streams records into staging.nm_psi while it
+# scrapes. Each merge takes the rows added or changed since their last merge
+# and runs them through the same set-based load as the CSV ingest.
+
+def merge_from_staging(pg, limit=None):
+    """Merge pending staging.nm_psi rows into master tables. Returns rows merged."""
+    cur = pg.cursor()
+    ensure_staging_table(cur)
+    cur.execute(f"SELECT COUNT(*) FROM {STAGING_TABLE}")
+    staged = cur.fetchone()[0]
+    cur.execute(f"""
+        SELECT {', '.join(STAGING_COLUMNS)}, updated_at FROM {STAGING_TABLE}
+        WHERE merged_at IS NULL OR merged_at < updated_at
+        ORDER BY updated_at
+        LIMIT %s
+    """, (limit,))
+    pending = cur.fetchall()
+    if not pending:
+        pg.commit()
+        print(f"  Staging: {staged:,} rows, nothing new to merge")
+        return 0
+
+    source_id = register_source(cur, staged)
+    run_id = start_run(cur, source_id)
+    pg.commit()
+    t0 = time.time()
+
+    # Latest staged version of each license number wins
+    prepared = {}
+    skipped_no_name = errors = 0
+    for values in pending:
+        p, skip = prepare_row(dict(zip(STAGING_COLUMNS, values)))
+        if skip == "no_name":
+            skipped_no_name += 1
+        elif skip == "no_license":
+            errors += 1
+        else:
+            prepared[p["license_number"]] = p
+
+    load_prepared(cur, prepared.values())
+    counts = merge_prepared(cur)
+
+    # Stamp each row with the version merged, so changes staged meanwhile
+    # stay pending for the next merge
+    license_id_col = STAGING_COLUMNS.index("license_id")
+    execute_values(cur, f"""
+        UPDATE {STAGING_TABLE} s SET merged_at = v.updated_at
+        FROM (VALUES %s) AS v(license_id, updated_at)
+        WHERE s.license_id = v.license_id
+    """, [(values[license_id_col], values[-1]) for values in pending],
+        template="(%s, %s::timestamptz)", page_size=FLUSH_EVERY)
+
+    finish_run(cur, run_id, len(pending), counts["contractors_new"], errors)
+    finish_source(cur, source_id, counts["licenses_total"])
+    pg.commit()
+
+    print(f"  Merged {len(pending):,} staged rows ({time.time() - t0:.1f}s): "
+          f"contractors +{counts['contractors_new']:,}, "
+          f"licenses +{counts['licenses_new']:,} ~{counts['licenses_updated']:,}, "
+          f"QPs +{counts['tradespersons_new']:,}, categories +{counts['categories_new']:,}, "
+          f"skipped (no name) {skipped_no_name:,}, errors {errors}")
+    return len(pending)
 
 
 # ----- Status display -----
@@ -601,6 +719,16 @@ def show_status():
     """)
     print(f"  Categories:    {cur.fetchone()[0]:>10,}")
 
+    cur.execute("SELECT to_regclass(%s)", (STAGING_TABLE,))
+    if cur.fetchone()[0]:
+        cur.execute(f"""
+            SELECT COUNT(*), COUNT(*) FILTER (WHERE merged_at IS NULL OR merged_at < updated_at),
+                   MAX(updated_at)
+            FROM {STAGING_TABLE}
+        """)
+        staged, unmerged, last = cur.fetchone()
+        print(f"  Staged:        {staged:>10,}  ({unmerged:,} not merged, last {last or '-'})")
+
     # By source
     cur.execute("""
         SELECT source, COUNT(*) FROM master.contractors
@@ -722,6 +850,10 @@ def main():
     parser.add_argument("--sample", type=int, help="Limit rows for testing")
     parser.add_argument("--status", action="store_true", help="Show row counts")
     parser.add_argument("--purge", action="store_true", help="Delete all NM CID PSI data")
+    parser.add_argument("--from-staging", action="store_true",
+                        help="Merge new/changed rows from staging.nm_psi instead of reading the CSV")
+    parser.add_argument("--follow", type=float, metavar="SECONDS",
+                        help="With staging: merge again every SECONDS until interrupted")
     args = parser.parse_args()
 
     if args.status:
@@ -736,6 +868,22 @@ def main():
     print("  New Mexico (NM) CID PSI Ingestion")
     print("=" * 60)
 
+    if args.from_staging or args.follow:
+        pg = get_pg()
+        try:
+            while True:
+                merge_from_staging(pg, limit=args.sample)
+                if not args.follow:
+                    break
+                time.sleep(args.follow)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            pg.rollback()
+            pg.close()
+        show_status()
+        return
+
     pg = get_pg()
     try:
         new_count = ingest(pg, limit=args.sample)
@@ -162,6 +162,7 @@ async def main():
     # Step 8: Finalize
     checkpoint.save()
     csv_file.close()
+    csv_rows = checkpoint.compact_csv()
 
     elapsed = time.time() - stats["start_time"]
     print(f"\n=== Scraping Complete ===", flush=True)
@@ -169,7 +170,7 @@ async def main():
     print(f"  Duration: {elapsed:.0f}s ({elapsed/3600:.1f}h)", flush=True)
     if elapsed > 0:
         print(f"  Rate: {stats['details_fetched']/elapsed:.1f}/s", flush=True)
-    print(f"  Output: {OUTPUT_CSV}", flush=True)
+    print(f"  Output: {OUTPUT_CSV} ({csv_rows} unique rows)", flush=True)
 
     await session.close()
 
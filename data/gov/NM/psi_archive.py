@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Compressed archive of raw PSI portal responses, for offline replay.
+
+Every response body is gzip-compressed once and appended to a pack file;
+bodies are content-addressed by SHA-256, so a page fetched twice with the
+same bytes is stored once. Each blob is a complete gzip member, so a pack is
+itself a valid multi-member .gz file.
+
+A live scrape archives through submit(), which queues put() on one writer
+thread so compression, pack appends and index commits stay off the event
+loop (and stay serialized).
+
+index.db (SQLite) maps requests to blobs:
+  blobs      sha256 -> pack, offset, length, size
+  responses  kind ("search"/"detail"), key (prefix or license_id),
+             page (search start row, 0 for details), fetched_at, sha256
+
+Usage:
+  python3 psi_archive.py                 # stats for archive/
+  python3 psi_archive.py path/to/archive
+"""
+
+import argparse
+import asyncio
+import gzip
+import hashlib
+import sqlite3
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+DEFAULT_ARCHIVE_DIR = Path(__file__).parent / "archive"
+PACK_MAX_BYTES = 256 * 1024 * 1024  # Start a new pack past this size
+COMPRESS_LEVEL = 6
+
+
+class ResponseArchive:
+    """Append-only, content-addressed store of raw response bodies."""
+
+    def __init__(self, root: Path = DEFAULT_ARCHIVE_DIR):
+        self.root = root
+        self.pack_dir = root / "packs"
+        self.pack_dir.mkdir(parents=True, exist_ok=True)
+        # Written from the writer thread, read from the caller's
+        self.db = sqlite3.connect(root / "index.db", isolation_level=None,
+                                  check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                sha256 TEXT PRIMARY KEY,
+                pack TEXT NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                size INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS responses (
+                id INTEGER PRIMARY KEY,
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                fetched_at TEXT NOT NULL,
+                sha256 TEXT NOT NULL,
+                charset TEXT
+            );
+            CREATE INDEX IF NOT EXISTS responses_request
+                ON responses (kind, key, page, fetched_at);
+        """)
+        self._pack: Optional[Path] = None
+        self._readers: dict[str, object] = {}
+        self._writer: Optional[ThreadPoolExecutor] = None
+
+    def _current_pack(self) -> Path:
+        if self._pack is None:
+            packs = sorted(self.pack_dir.glob("pack-*.gz"))
+            self._pack = packs[-1] if packs else self.pack_dir / "pack-00001.gz"
+        if self._pack.exists() and self._pack.stat().st_size >= PACK_MAX_BYTES:
+            number = int(self._pack.stem.split("-")[1]) + 1
+            self._pack = self.pack_dir / f"pack-{number:05d}.gz"
+        return self._pack
+
+    def put(self, kind: str, key: str, page: int, raw: bytes,
+            charset: Optional[str] = None) -> str:
+        """Archive one response body; returns its SHA-256.
+
+        The blob is flushed to its pack before it is indexed, so a crash
+        can leave unreferenced bytes in a pack but never a dangling index row.
+        """
+        digest = hashlib.sha256(raw).hexdigest()
+        known = self.db.execute("SELECT 1 FROM blobs WHERE sha256 = ?", (digest,)).fetchone()
+        if not known:
+            blob = gzip.compress(raw, compresslevel=COMPRESS_LEVEL, mtime=0)
+            pack = self._current_pack()
+            with open(pack, "ab") as f:
+                offset = f.tell()
+                f.write(blob)
+            self.db.execute("INSERT OR IGNORE INTO blobs VALUES (?, ?, ?, ?, ?)",
+                            (digest, pack.name, offset, len(blob), len(raw)))
+        self.db.execute(
+            "INSERT INTO responses (kind, key, page, fetched_at, sha256, charset) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (kind, key, page, datetime.now().isoformat(), digest, charset))
+        return digest
+
+    def submit(self, kind: str, key: str, page: int, raw: bytes,
+               charset: Optional[str] = None) -> "asyncio.Future[str]":
+        """put() on the writer thread; await the returned future for its SHA-256."""
+        if self._writer is None:
+            self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="archive")
+        return asyncio.get_running_loop().run_in_executor(
+            self._writer, self.put, kind, key, page, raw, charset)
+
+    def get(self, digest: str) -> bytes:
+        row = self.db.execute("SELECT pack, offset, length FROM blobs WHERE sha256 = ?",
+                              (digest,)).fetchone()
+        if row is None:
+            raise KeyError(digest)
+        pack, offset, length = row
+        f = self._readers.get(pack)
+        if f is None:
+            f = self._readers[pack] = open(self.pack_dir / pack, "rb")
+        f.seek(offset)
+        return gzip.decompress(f.read(length))
+
+    def latest(self, kind: str, key: str, page: int = 0) -> Optional[tuple[bytes, Optional[str]]]:
+        """(body, charset) of the most recent response to a request, or None."""
+        row = self.db.execute(
+            "SELECT sha256, charset FROM responses WHERE kind = ? AND key = ? AND page = ? "
+            "ORDER BY fetched_at DESC, id DESC LIMIT 1",
+            (kind, key, page)).fetchone()
+        if row is None:
+            return None
+        return self.get(row[0]), row[1]
+
+    def keys(self, kind: str, page: Optional[int] = None) -> list[str]:
+        """Distinct request keys archived for `kind` (optionally one page)."""
+        sql = "SELECT DISTINCT key FROM responses WHERE kind = ?"
+        params: tuple = (kind,)
+        if page is not None:
+            sql += " AND page = ?"
+            params += (page,)
+        return sorted(k for (k,) in self.db.execute(sql + " ORDER BY key", params))
+
+    def latest_fetches(self, kind: str, page: Optional[int] = None) -> dict[str, str]:
+        """Newest fetched_at per request key archived for `kind` (optionally one page)."""
+        sql = "SELECT key, MAX(fetched_at) FROM responses WHERE kind = ?"
+        params: tuple = (kind,)
+        if page is not None:
+            sql += " AND page = ?"
+            params += (page,)
+        return dict(self.db.execute(sql + " GROUP BY key", params))
+
+    def stats(self) -> dict:
+        responses = dict(self.db.execute("SELECT kind, COUNT(*) FROM responses GROUP BY kind"))
+        blobs, raw, stored = self.db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(length), 0) FROM blobs").fetchone()
+        return {
+            "responses": responses,
+            "blobs": blobs,
+            "raw_bytes": raw,
+            "stored_bytes": stored,
+            "packs": len(list(self.pack_dir.glob("pack-*.gz"))),
+        }
+
+    def summary(self) -> str:
+        s = self.stats()
+        kinds = ", ".join(f"{n} {kind}" for kind, n in sorted(s["responses"].items())) or "empty"
+        ratio = s["raw_bytes"] / s["stored_bytes"] if s["stored_bytes"] else 0
+        return (f"Archive {self.root}: {kinds} responses, {s['blobs']} unique bodies, "
+                f"{s['raw_bytes'] / 1e6:.1f} MB -> {s['stored_bytes'] / 1e6:.1f} MB "
+                f"({ratio:.1f}x) in {s['packs']} pack(s)")
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.shutdown(wait=True)
+            self._writer = None
+        for f in self._readers.values():
+            f.close()
+        self._readers.clear()
+        self.db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show PSI response archive stats")
+    parser.add_argument("root", nargs="?", type=Path, default=DEFAULT_ARCHIVE_DIR,
+                        help=f"Archive directory (default {DEFAULT_ARCHIVE_DIR})")
+    args = parser.parse_args()
+    if not (args.root / "index.db").exists():
+        print(f"No archive at {args.root}", file=sys.stderr)
+        sys.exit(1)
+    archive = ResponseArchive(args.root)
+    print(archive.summary())
+    archive.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,548 @@
+#!/usr/bin/env python3
+"""
+Fast-path extractors for PSI Exams search and detail pages.
+
+The BeautifulSoup parsers in scrape_nm_psi.py build a full lxml tree for every
+page only to read a handful of cells. These extractors run a small tokenizer
+that tracks just the table structure (table/tbody/tr/td/th) plus precompiled
+patterns for the few other elements the pages need (the hidden form, inputs,
+links). They return exactly what parse_search_results / parse_detail return.
+
+Anything the tokenizer can't model the way lxml would -- stray or misnested
+tags, malformed attributes, text loose inside a table, comments or scripts
+inside a field, entities lxml may decode differently -- raises
+FastPathError. Callers then fall back to BeautifulSoup, so the
+fast path is only trusted on pages it fully understands.
+
+Stdlib only; the comparison and timing harness is bench_psi_parse.py.
+"""
+
+import html as htmllib
+import re
+from typing import Optional
+
+# ---------------------------------------------------------------------------
+# Patterns
+# ---------------------------------------------------------------------------
+
+TOTAL_RE = re.compile(r"Displaying\s+\d+\s+to\s+\d+\s+of\s+(\d+)\s+records")
+LICENSE_ID_RE = re.compile(r'licenseId:\s*"(\d+)"')
+LICENSE_APP_ID_RE = re.compile(r'licenseApplicationId:\s*"(\d+)"')
+
+# Comments and raw-text elements (script, style, title, textarea) are
+# skipped by the tokenizer; any field whose text overlaps one goes to the
+# fallback.
+RAW_TEXT = r"""(script|style|title|textarea)\b(?:[^>"']|"[^"<>]*"|'[^'<>]*')*>.*?</\1\s*>"""
+SKIP_RE = re.compile(r"<(?:!--.*?-->|!\[CDATA\[.*?\]\]>|" + RAW_TEXT + ")", re.I | re.S)
+# One pass over the page: each match is either a skipped region (comment,
+# doctype, raw text) or a complete tag (group 3 = name) with its attributes.
+SCAN_RE = re.compile(
+    r"<(?:!--.*?-->|!\[CDATA\[.*?\]\]>|![a-zA-Z][^>]*>|\?[^>]*>|" + RAW_TEXT +
+    r"|(/?)([a-zA-Z][a-zA-Z0-9:-]*)((?:[^>\"']|\"[^\"]*\"|'[^']*')*)>)",
+    re.I | re.S,
+)
+TAG_RE = re.compile(r"<(/?)([a-zA-Z][a-zA-Z0-9:-]*)(?:[^>\"']|\"[^\"]*\"|'[^']*')*>")
+ANY_TAG_RE = re.compile(r"<[a-zA-Z/!?](?:[^>\"']|\"[^\"]*\"|'[^']*')*>")
+MARKUP_START_RE = re.compile(r"<[a-zA-Z/!?]")
+END_TAG_RE = re.compile(r"</[a-zA-Z][^>]*>")
+# Attribute lists lxml and this tokenizer split the same way.
+STRICT_ATTRS_RE = re.compile(
+    r"""(?:\s+[^\s"'>/=<]+(?:\s*=\s*(?:"[^"<>]*"|'[^'<>]*'|[^\s"'=<>`]+))?)*\s*/?"""
+)
+ATTR_RE = re.compile(
+    r"""([^\s=/>"']+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>"']+)))?"""
+)
+FORM_RE = re.compile(r"<form\b((?:[^>\"']|\"[^\"]*\"|'[^']*')*)>", re.I)
+FORM_END_RE = re.compile(r"</form\s*>", re.I)
+INPUT_RE = re.compile(r"<input\b((?:[^>\"']|\"[^\"]*\"|'[^']*')*)>", re.I)
+LINK_RE = re.compile(r"<a\b((?:[^>\"']|\"[^\"]*\"|'[^']*')*)>(.*?)</a\s*>", re.I | re.S)
+LINK_OPEN_RE = re.compile(r"<a\b", re.I)
+ENTITY_RE = re.compile(r"&(?!(?:#\d+|#[xX][0-9a-fA-F]+|amp|lt|gt|quot|apos|nbsp);|\s|$)")
+NUMERIC_REF_RE = re.compile(r"&#(?:(\d+)|[xX]([0-9a-fA-F]+));")
+ROWALT_RE = re.compile(r"<tr\b[^>]*\browalt\b", re.I)
+QP_HEADING_RE = re.compile(r"QP Details")
+
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input",
+             "link", "meta", "param", "source", "track", "wbr"}
+RAW_TEXT_TAGS = {"script", "style", "title", "textarea"}
+TABLE_TAGS = {"table", "tbody", "thead", "tfoot", "tr", "td", "th"}
+SECTION_TAGS = ("table", "tbody", "thead", "tfoot")
+CELL_TAGS = ("td", "th")
+# Besides cells and rows, the only things lxml leaves in place directly
+# inside a table or row (rather than moving them) that we allow.
+IN_TABLE_TAGS = {"form", "input"}
+CONTAINER_TAGS = {"table", "tbody", "thead", "tfoot", "tr"}
+
+DETAIL_FIELDS = [
+    "company_name", "license_number", "phone", "license_status",
+    "issue_date", "expiry_date", "volume",
+    "street", "city", "state", "zip_code", "company_id",
+    "qp_name", "qp_certificate_no", "qp_classification",
+    "qp_attach_date", "qp_status",
+]
+
+HIDDEN_FIELDS = {
+    "businessNm": "company_name",
+    "licenseNumber": "license_number",
+    "street": "street",
+    "city": "city",
+    "state": "state",
+    "zipCode": "zip_code",
+    "companyId": "company_id",
+}
+
+
+class FastPathError(Exception):
+    """The page has something the fast path doesn't model; use the fallback."""
+
+
+# ---------------------------------------------------------------------------
+# Text helpers
+# ---------------------------------------------------------------------------
+
+def _unescape(s: str) -> str:
+    """html.unescape, restricted to entities lxml decodes the same way."""
+    if "&" not in s:
+        return s
+    if ENTITY_RE.search(s):
+        raise FastPathError("unsupported entity")
+    for m in NUMERIC_REF_RE.finditer(s):
+        code = int(m.group(1)) if m.group(1) else int(m.group(2), 16)
+        if (code < 0x20 and code not in (0x09, 0x0A, 0x0D)) or code == 0x7F \
+                or 0xD800 <= code <= 0xDFFF or 0xFDD0 <= code <= 0xFDEF \
+                or (code & 0xFFFE) == 0xFFFE or code > 0x10FFFF:
+            raise FastPathError("unsupported character reference")
+    return htmllib.unescape(s)
+
+
+def normalize_newlines(html: str) -> str:
+    """lxml reports CR and CRLF line breaks as LF, in text and attributes."""
+    if "\r" not in html:
+        return html
+    return html.replace("\r\n", "\n").replace("\r", "\n")
+
+
+def _segments(fragment: str) -> list[str]:
+    """Text nodes of an HTML fragment, unescaped, in document order."""
+    if "<!" in fragment or "<?" in fragment or SKIP_RE.search(fragment):
+        raise FastPathError("comment or script in field")
+    parts = ANY_TAG_RE.split(fragment)
+    for part in parts:
+        if "<" in part:
+            raise FastPathError("unparsed markup in field")
+    if len(parts) > 1:
+        _check_nesting(fragment)
+    return [_unescape(p) for p in parts if p]
+
+
+def _check_nesting(fragment: str) -> list[str]:
+    """Every end tag inside a field must close the innermost open element.
+
+    Returns the elements still open at the end of the fragment.
+    """
+    open_tags = []
+    for m in TAG_RE.finditer(fragment):
+        tag = m.group(2).lower()
+        if tag in VOID_TAGS:
+            continue
+        if not m.group(1):
+            open_tags.append(tag)
+        elif open_tags and open_tags[-1] == tag:
+            open_tags.pop()
+        else:
+            raise FastPathError(f"misnested </{tag}> in field")
+    return open_tags
+
+
+def text_strip(fragment: str) -> str:
+    """Equivalent of Tag.get_text(strip=True)."""
+    return "".join(s for s in (seg.strip() for seg in _segments(fragment)) if s)
+
+
+def text_plain(fragment: str) -> str:
+    """Equivalent of Tag.text.strip()."""
+    return "".join(_segments(fragment)).strip()
+
+
+def parse_attrs(raw: str) -> dict[str, str]:
+    """Attributes of a start tag, names lowercased, first occurrence wins."""
+    attrs: dict[str, str] = {}
+    for m in ATTR_RE.finditer(raw):
+        name = m.group(1).lower()
+        if name in attrs:
+            continue
+        value = m.group(2)
+        if value is None:
+            value = m.group(3)
+        if value is None:
+            value = m.group(4)
+        attrs[name] = _unescape(value) if value is not None else ""
+    return attrs
+
+
+def _has_class(node: "Node", name: str) -> bool:
+    # Substring test first so most cells never have their attributes parsed.
+    return name in node.raw_attrs and name in node.attrs.get("class", "").split()
+
+
+# ---------------------------------------------------------------------------
+# Table tokenizer
+# ---------------------------------------------------------------------------
+
+class Node:
+    """A table element: tag, attributes and the span of its content."""
+
+    __slots__ = ("tag", "raw_attrs", "_attrs", "start", "content_start",
+                 "content_end", "end", "parent", "children")
+
+    def __init__(self, tag: str, raw_attrs: str, start: int, content_start: int,
+                 parent: Optional["Node"]):
+        self.tag = tag
+        self.raw_attrs = raw_attrs
+        self._attrs: Optional[dict] = None
+        self.start = start
+        self.content_start = content_start
+        self.content_end = -1
+        self.end = -1
+        self.parent = parent
+        self.children: list[Node] = []
+
+    @property
+    def attrs(self) -> dict[str, str]:
+        if self._attrs is None:
+            self._attrs = parse_attrs(self.raw_attrs)
+        return self._attrs
+
+    def descendants(self, tag: str):
+        for child in self.children:
+            if child.tag == tag:
+                yield child
+            yield from child.descendants(tag)
+
+    def next_sibling(self, tag: str) -> Optional["Node"]:
+        if self.parent is None:
+            return None
+        siblings = self.parent.children
+        for sib in siblings[siblings.index(self) + 1:]:
+            if sib.tag == tag:
+                return sib
+        return None
+
+
+class TableTree:
+    """Table structure of a page, with lxml's implied closing of tr/td.
+
+    Only tables are modelled. A <tr> closes any open row or cell in its
+    table section; a <td>/<th> closes any open cell in its row. Anything
+    lxml would have to repair in a less obvious way (a row outside a table,
+    a cell outside a row, a mismatched end tag, an unclosed table) raises
+    FastPathError.
+    """
+
+    def __init__(self, html: str):
+        self.html = html
+        self.root = Node("#root", "", 0, 0, None)
+        self.skipped: list[tuple[int, int]] = []
+        self.by_tag: dict[str, list[Node]] = {tag: [] for tag in TABLE_TAGS}
+        self._build()
+
+    def _build(self):
+        html = self.html
+        stack = [self.root]
+        prev_end = 0
+        for m in SCAN_RE.finditer(html):
+            self._check_gap(html[prev_end:m.start()], stack[-1].tag)
+            prev_end = m.end()
+            tag = m.group(3)
+            if tag is None:
+                self.skipped.append(m.span())
+                continue
+            tag = tag.lower()
+            raw = m.group(4)
+            if raw and not STRICT_ATTRS_RE.fullmatch(raw):
+                raise FastPathError(f"malformed <{tag}> attributes")
+            if tag not in TABLE_TAGS:
+                if tag in RAW_TEXT_TAGS:
+                    raise FastPathError(f"unterminated <{tag}>")
+                if stack[-1].tag in CONTAINER_TAGS and tag not in IN_TABLE_TAGS:
+                    raise FastPathError(f"<{tag}> directly inside a table")
+                continue
+            if m.group(2):
+                self._close(stack, tag, m.start(), m.end())
+            else:
+                self._open(stack, tag, m.group(4), m.start(), m.end())
+        self._check_gap(html[prev_end:], stack[-1].tag)
+        if len(stack) > 1:
+            raise FastPathError(f"unclosed <{stack[-1].tag}>")
+        self.root.content_end = self.root.end = len(html)
+
+    @staticmethod
+    def _check_gap(text: str, parent: str):
+        """Text between two scanned tags must really be text."""
+        if "<" in text and MARKUP_START_RE.search(text):
+            raise FastPathError("tag the scanner could not delimit")
+        if parent in CONTAINER_TAGS and text.strip():
+            raise FastPathError("text directly inside a table")
+
+    def _pop_to(self, stack: list, tags: tuple, at: int):
+        """Implicitly close open elements until the top is one of `tags`."""
+        while stack[-1].tag not in tags:
+            node = stack.pop()
+            if node.tag == "#root" or node.tag in SECTION_TAGS:
+                raise FastPathError("table element outside its container")
+            self._implied_end(node, at)
+
+    def _implied_end(self, node: Node, at: int):
+        """End a cell or row that has no end tag of its own.
+
+        lxml only closes it where we do if nothing inside is still open.
+        """
+        node.content_end = node.end = at
+        if node.tag in CELL_TAGS and _check_nesting(self.fragment(node)):
+            raise FastPathError("unclosed element in implicitly closed cell")
+
+    def _open(self, stack: list, tag: str, raw_attrs: str, start: int, end: int):
+        if tag == "table":
+            if stack[-1].tag not in ("#root", "td", "th"):
+                raise FastPathError("table outside a cell")
+        elif tag == "tr":
+            self._pop_to(stack, SECTION_TAGS, start)
+        elif tag in CELL_TAGS:
+            self._pop_to(stack, ("tr",), start)
+        else:  # tbody/thead/tfoot
+            self._pop_to(stack, ("table",), start)
+        node = Node(tag, raw_attrs, start, end, stack[-1])
+        stack[-1].children.append(node)
+        stack.append(node)
+        self.by_tag[tag].append(node)
+
+    def _close(self, stack: list, tag: str, start: int, end: int):
+        """Close `tag`, implicitly closing only what lxml would close with it."""
+        closable = {
+            "table": ("tbody", "thead", "tfoot", "tr", "td", "th"),
+            "tbody": ("tr", "td", "th"),
+            "thead": ("tr", "td", "th"),
+            "tfoot": ("tr", "td", "th"),
+            "tr": ("td", "th"),
+        }.get(tag, ())
+        depth = len(stack) - 1
+        while stack[depth].tag != tag:
+            if stack[depth].tag not in closable:
+                raise FastPathError(f"unexpected </{tag}>")
+            depth -= 1
+        while len(stack) > depth:
+            node = stack.pop()
+            if node.tag == tag:
+                node.content_end, node.end = start, end
+            else:
+                self._implied_end(node, start)
+
+    def all(self, tag: str) -> list[Node]:
+        """Every `tag` element, in document order."""
+        return self.by_tag[tag]
+
+    def fragment(self, node: Node) -> str:
+        return self.html[node.content_start:node.content_end]
+
+    def text(self, node: Node) -> str:
+        return text_strip(self.fragment(node))
+
+    def in_skipped(self, pos: int) -> bool:
+        return any(start <= pos < end for start, end in self.skipped)
+
+    def innermost(self, tag: str, pos: int) -> Optional[Node]:
+        """Deepest `tag` element whose content contains `pos`."""
+        found = None
+        node = self.root
+        while True:
+            for child in node.children:
+                if child.content_start <= pos < child.content_end:
+                    node = child
+                    if child.tag == tag:
+                        found = child
+                    break
+            else:
+                return found
+
+
+def _first_link(fragment: str) -> Optional[tuple[dict, str]]:
+    """(attrs, inner html) of the first <a> in a fragment, if any."""
+    m = LINK_RE.search(fragment)
+    if not m:
+        if LINK_OPEN_RE.search(fragment):
+            raise FastPathError("unclosed link")
+        return None
+    if LINK_OPEN_RE.search(m.group(2)):
+        raise FastPathError("nested link")
+    return parse_attrs(m.group(1)), m.group(2)
+
+
+# ---------------------------------------------------------------------------
+# Search results
+# ---------------------------------------------------------------------------
+
+def extract_search_results(html: str) -> tuple[int, list[dict]]:
+    """Fast equivalent of scrape_nm_psi.parse_search_results."""
+    m = TOTAL_RE.search(html)
+    if not m:
+        return 0, []
+    total = int(m.group(1))
+
+    tree = TableTree(normalize_newlines(html))
+    rows = [tr for tr in tree.all("tr") if _has_class(tr, "rowalt")]
+    tagged = [t for t in ROWALT_RE.finditer(tree.html) if not tree.in_skipped(t.start())]
+    if len(rows) != len(tagged):
+        raise FastPathError("rowalt count mismatch")
+
+    results = []
+    for row in rows:
+        tds = list(row.descendants("td"))
+        if len(tds) < 7:
+            continue
+
+        license_id = ""
+        license_app_id = ""
+        link = _first_link(tree.fragment(tds[2]))
+        if link and link[0].get("onclick"):
+            onclick = link[0]["onclick"]
+            id_match = LICENSE_ID_RE.search(onclick)
+            app_match = LICENSE_APP_ID_RE.search(onclick)
+            if id_match:
+                license_id = id_match.group(1)
+            if app_match:
+                license_app_id = app_match.group(1)
+
+        company_name = text_plain(link[1]) if link else tree.text(tds[2])
+
+        results.append({
+            "license_number": tree.text(tds[1]),
+            "company_name": company_name,
+            "address": tree.text(tds[3]),
+            "city_zip": tree.text(tds[4]),
+            "expiry_date": tree.text(tds[5]),
+            "status": tree.text(tds[6]),
+            "license_id": license_id,
+            "license_application_id": license_app_id,
+        })
+
+    return total, results
+
+
+# ---------------------------------------------------------------------------
+# Detail page
+# ---------------------------------------------------------------------------
+
+def _hidden_form(tree: "TableTree") -> Optional[str]:
+    html = tree.html
+    for m in FORM_RE.finditer(html):
+        if tree.in_skipped(m.start()):
+            continue
+        if parse_attrs(m.group(1)).get("name") == "hiddenform":
+            end = FORM_END_RE.search(html, m.end())
+            if not end:
+                raise FastPathError("unclosed hiddenform")
+            body = html[m.end():end.start()]
+            if FORM_RE.search(body) or SKIP_RE.search(body):
+                raise FastPathError("unexpected markup in hiddenform")
+            return body
+    return None
+
+
+def extract_detail(html: str, license_id: str) -> Optional[dict]:
+    """Fast equivalent of scrape_nm_psi.parse_detail."""
+    html = normalize_newlines(html)
+    tree = TableTree(html)
+    result = {field: "" for field in DETAIL_FIELDS}
+
+    form = _hidden_form(tree)
+    if form is not None:
+        for m in INPUT_RE.finditer(form):
+            attrs = parse_attrs(m.group(1))
+            if attrs.get("type") != "hidden":
+                continue
+            field = HIDDEN_FIELDS.get(attrs.get("name", ""))
+            if field:
+                result[field] = attrs.get("value", "").strip()
+
+    labels = [td for td in tree.all("td") if _has_class(td, "fieldlabel")]
+    texts = [tree.text(td) for td in labels]
+
+    def sibling_text(td: Node) -> Optional[str]:
+        nxt = td.next_sibling("td")
+        return tree.text(nxt) if nxt else None
+
+    for i, text in enumerate(texts):
+        has_next = i + 1 < len(labels)
+        if text == "Phone Number" and has_next:
+            result["phone"] = texts[i + 1]
+        elif text == "License Status" and has_next:
+            value = sibling_text(labels[i])
+            if value is not None:
+                result["license_status"] = value
+        elif text == "Issue Date" and has_next:
+            result["issue_date"] = texts[i + 1]
+        elif text == "Expiry Date":
+            value = sibling_text(labels[i])
+            if value is not None:
+                result["expiry_date"] = value
+        elif text == "Volume" and has_next:
+            result["volume"] = texts[i + 1]
+
+    for field, label in (("company_name", "Company Name"),
+                         ("license_number", "License Number")):
+        if result[field]:
+            continue
+        for td, text in zip(labels, texts):
+            if text == label:
+                value = sibling_text(td)
+                if value is not None:
+                    result[field] = value
+                    break
+
+    if not (result["license_number"] or result["company_name"]):
+        raise FastPathError("no license number or company name")
+
+    _extract_qp(tree, result)
+    return result
+
+
+def _extract_qp(tree: TableTree, result: dict):
+    html = tree.html
+    pos = -1
+    for m in QP_HEADING_RE.finditer(html):
+        if tree.in_skipped(m.start()):
+            raise FastPathError("QP heading inside comment or script")
+        tag_open = html.rfind("<", 0, m.start())
+        if tag_open > html.rfind(">", 0, m.start()):
+            continue  # inside a tag's attributes
+        pos = m.start()
+        break
+    if pos < 0:
+        # lxml drops stray end tags and the text either side becomes one
+        # string, so the heading may still exist for BeautifulSoup.
+        if "QP Details" in END_TAG_RE.sub("", html):
+            raise FastPathError("QP heading split by an end tag")
+        return
+
+    qp_section = tree.innermost("tr", pos)
+    if not qp_section:
+        return
+    qp_table_row = qp_section.next_sibling("tr")
+    if not qp_table_row:
+        return
+    qp_table = next(qp_table_row.descendants("table"), None)
+    if not qp_table:
+        return
+    qp_data_rows = [tr for tr in qp_table.descendants("tr") if "style" in tr.attrs]
+    if not qp_data_rows:
+        return
+    qp_tds = list(qp_data_rows[0].descendants("td"))
+    if len(qp_tds) < 5:
+        return
+
+    link = _first_link(tree.fragment(qp_tds[0]))
+    result["qp_name"] = text_plain(link[1]) if link else tree.text(qp_tds[0])
+    result["qp_certificate_no"] = tree.text(qp_tds[1])
+    result["qp_classification"] = tree.text(qp_tds[2])
+    result["qp_attach_date"] = tree.text(qp_tds[3])
+    result["qp_status"] = tree.text(qp_tds[4])
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Stream scraped NM PSI records into Postgres staging (staging.nm_psi).
+
+The scraper (scrape_nm_psi.py --stage) hands every detail record to a
+StagingSink as it is written. The sink buffers them and, every
+STAGING_BATCH records or STAGING_INTERVAL seconds, COPYs the batch into a
+temp table and upserts it into staging.nm_psi keyed on license_id, so
+re-sending a record (resume, replay, re-scrape) is harmless. updated_at
+only moves when a record's content changes; ingest_nm.py --from-staging
+merges rows whose updated_at is newer than their merged_at.
+
+COPY runs in a worker thread so the scraper's event loop keeps going. If the
+database is unreachable the batch is kept and retried on the next flush;
+the checkpoint journal and CSV remain the source of truth either way.
+"""
+
+import asyncio
+import csv
+import io
+import time
+from typing import Callable, Optional
+
+STAGING_TABLE = "staging.nm_psi"
+STAGING_BATCH = 200  # Records per COPY
+STAGING_INTERVAL = 30.0  # Seconds; flush at least this often while scraping
+
+# Same order as scrape_nm_psi.CSV_COLUMNS
+COLUMNS = [
+    "license_number", "company_name", "phone", "license_status",
+    "issue_date", "expiry_date", "volume",
+    "street", "city", "state", "zip_code",
+    "qp_name", "qp_certificate_no", "qp_classification",
+    "qp_attach_date", "qp_status",
+    "license_id", "license_application_id", "company_id",
+]
+DATA_COLUMNS = [c for c in COLUMNS if c != "license_id"]
+
+
+def ensure_staging_table(cur):
+    cur.execute("CREATE SCHEMA IF NOT EXISTS staging")
+    cols = ",\n            ".join(f"{c} TEXT" for c in DATA_COLUMNS)
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {STAGING_TABLE} (
+            license_id TEXT PRIMARY KEY,
+            {cols},
+            scraped_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            merged_at TIMESTAMPTZ
+        )
+    """)
+    cur.execute(f"""
+        CREATE INDEX IF NOT EXISTS nm_psi_unmerged
+        ON {STAGING_TABLE} (updated_at)
+        WHERE merged_at IS NULL OR merged_at < updated_at
+    """)
+
+
+def copy_batch(cur, rows: list[dict]) -> int:
+    """COPY rows into staging and upsert on license_id; returns rows changed.
+
+    The caller commits.
+    """
+    latest = {r["license_id"]: r for r in rows if r.get("license_id")}
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for r in latest.values():
+        writer.writerow([r.get(c, "") for c in COLUMNS])
+    buf.seek(0)
+
+    cur.execute(f"""
+        CREATE TEMP TABLE IF NOT EXISTS nm_psi_batch
+        (LIKE {STAGING_TABLE} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS
+    """)
+    cur.copy_expert(f"COPY nm_psi_batch ({', '.join(COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buf)
+    assignments = ", ".join(f"{c} = EXCLUDED.{c}" for c in DATA_COLUMNS)
+    current = ", ".join(f"s.{c}" for c in DATA_COLUMNS)
+    incoming = ", ".join(f"EXCLUDED.{c}" for c in DATA_COLUMNS)
+    cur.execute(f"""
+        INSERT INTO {STAGING_TABLE} AS s ({', '.join(COLUMNS)})
+        SELECT {', '.join(COLUMNS)} FROM nm_psi_batch
+        ON CONFLICT (license_id) DO UPDATE SET {assignments}, updated_at = NOW()
+        WHERE ({current}) IS DISTINCT FROM ({incoming})
+    """)
+    return cur.rowcount
+
+
+class StagingSink:
+    """Buffers detail records and streams them into staging in batches."""
+
+    def __init__(self, connect: Callable, batch_size: int = STAGING_BATCH,
+                 interval: float = STAGING_INTERVAL):
+        self.connect = connect
+        self.batch_size = batch_size
+        self.interval = interval
+        self.buffer: list[dict] = []
+        self.sent = 0
+        self.changed = 0
+        self.failures = 0
+        self._conn = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._ticker: Optional[asyncio.Task] = None
+        self._flushes: set[asyncio.Task] = set()
+        self._last_flush = time.monotonic()
+
+    def add(self, row: dict):
+        """Queue one record (a dict keyed by COLUMNS); never blocks."""
+        self.buffer.append(row)
+        if self._ticker is None:
+            self._lock = asyncio.Lock()
+            self._ticker = asyncio.create_task(self._tick())
+        if len(self.buffer) >= self.batch_size:
+            task = asyncio.create_task(self.flush())
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _tick(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            if self.buffer and time.monotonic() - self._last_flush >= self.interval:
+                await self.flush()
+
+    async def flush(self):
+        async with self._lock:
+            batch, self.buffer = self.buffer, []
+            if not batch:
+                return
+            self._last_flush = time.monotonic()
+            try:
+                changed = await asyncio.to_thread(self._copy, batch)
+            except Exception as e:
+                self.failures += 1
+                self.buffer[:0] = batch  # Retry with the next flush
+                print(f"  [staging] COPY of {len(batch)} records failed, will retry: {e}",
+                      flush=True)
+                return
+            self.sent += len(batch)
+            self.changed += changed
+
+    def _copy(self, batch: list[dict]) -> int:
+        if self._conn is None:
+            self._conn = self.connect()
+            with self._conn.cursor() as cur:
+                ensure_staging_table(cur)
+            self._conn.commit()
+        try:
+            with self._conn.cursor() as cur:
+                changed = copy_batch(cur, batch)
+            self._conn.commit()
+            return changed
+        except Exception:
+            try:
+                self._conn.close()
+            finally:
+                self._conn = None  # Reconnect on the next attempt
+            raise
+
+    async def close(self):
+        """Flush what is left and disconnect."""
+        if self._ticker is not None:
+            self._ticker.cancel()
+            await asyncio.gather(self._ticker, *self._flushes, return_exceptions=True)
+            await self.flush()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def summary(self) -> str:
+        pending = f", {len(self.buffer)} NOT staged" if self.buffer else ""
+        return (f"Staging ({STAGING_TABLE}): {self.sent} records sent, "
+                f"{self.changed} new or changed, {self.failures} failed flushes{pending}")
@@ -84,10 +84,11 @@ async def main():
 
     checkpoint.save()
     csv_file.close()
+    csv_rows = checkpoint.compact_csv()
 
     elapsed = time.time() - stats["start_time"]
     print(f"\nComplete! {stats['details_fetched']} records in {elapsed:.0f}s", flush=True)
-    print(f"Output: {OUTPUT_CSV}", flush=True)
+    print(f"Output: {OUTPUT_CSV} ({csv_rows} unique rows)", flush=True)
     await session.close()
 
 
@@ -7,11 +7,16 @@ Target: CSV at data/gov/NM/raw/nm_psi_all.csv
 
 Strategy:
   1. Create N parallel sessions, solve CAPTCHA once per session (manual)
-  2. Build a prefix tree of license-number prefixes (3-digit or 4-digit)
-     where no single prefix returns >= 300 records (the server cap)
-  3. For each prefix, paginate through search results (20 per page)
-  4. For each result row, fetch the detail page for full data
-  5. Write all records to CSV with checkpoint tracking
+  2. Load the prefix tree (prefix_tree.json) of license-number prefixes
+     where no single prefix returns >= 300 records (the server cap). A
+     prefix that reaches the cap mid-run is split and its children queued;
+     --discover re-probes every leaf's count first
+  3. For each prefix, paginate through search results (20 per page) on
+     one session
+  4. For each result row, fetch the detail page for full data; with several
+     sessions, detail jobs go to a shared queue any session can serve
+  5. Journal each record as it arrives (scrape_checkpoint.db), append it to
+     the CSV, and rewrite the CSV deduplicated from the journal at the end
 
 CAPTCHA handling:
   - On startup, creates sessions, downloads CAPTCHAs to data/gov/NM/captcha_*.jpg
@@ -25,28 +30,61 @@ Usage:
   # Step 2: Run with manually solved CAPTCHAs
   python3 scrape_nm_psi.py --captcha-answers "abc12,def34,ghi56,jkl78,mno90"
 
-  # Step 3: Resume from checkpoint
+  # Step 3: Resume from checkpoint (skips every license already journaled)
   python3 scrape_nm_psi.py --resume
 
+  # Rebuild the deduplicated CSV from the checkpoint journal
+  python3 scrape_nm_psi.py --compact
+
+  # Keep every raw response, then re-run parsing offline after a parser change
+  python3 scrape_nm_psi.py --captcha-answers "abc12" --archive
+  python3 scrape_nm_psi.py --replay
+
+  # Weekly delta: refetch only licenses whose search row changed, write a change set
+  python3 scrape_nm_psi.py --captcha-answers "abc12" --refresh
+
+  # Stream records into Postgres staging while scraping (merge: ingest_nm.py --from-staging)
+  python3 scrape_nm_psi.py --captcha-answers "abc12" --stage
+
+  # Export live metrics for node_exporter's textfile collector (or --metrics-port 9464)
+  python3 scrape_nm_psi.py --captcha-answers "abc12" --metrics-file /var/lib/node_exporter/nm_psi.prom
+
+  # Refresh prefix counts (splitting/merging the tree) before scraping
+  python3 scrape_nm_psi.py --captcha-answers "abc12" --discover
+
   # Quick test with one session and limited prefixes
   python3 scrape_nm_psi.py --captcha-answers "abc12" --limit-prefixes 10
+
+Each session adapts its request rate (AIMD): detail concurrency grows while
+the portal answers quickly and is cut on errors, timeouts and latency
+spikes, never above MAX_CONCURRENT_DETAILS. Progress lines show the limits.
+
+Search and detail pages are parsed in a process pool (--parse-workers N,
+0 = inline); the run summary reports how much event-loop time that freed.
 """
 
 import argparse
 import asyncio
+import contextlib
 import csv
+import hashlib
 import json
 import os
 import re
+import sqlite3
 import sys
 import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import Awaitable, Callable, Optional
 
 import aiohttp
 from bs4 import BeautifulSoup
 
+from psi_archive import ResponseArchive
+from psi_extract import TOTAL_RE, FastPathError, extract_detail, extract_search_results
+
 # ---------------------------------------------------------------------------
 # Configuration
 # ---------------------------------------------------------------------------
@@ -55,6 +93,11 @@ SCRIPT_DIR = Path(__file__).parent
 RAW_DIR = SCRIPT_DIR / "raw"
 OUTPUT_CSV = RAW_DIR / "nm_psi_all.csv"
 CHECKPOINT_FILE = SCRIPT_DIR / "scrape_checkpoint.json"
+PREFIX_TREE_FILE = SCRIPT_DIR / "prefix_tree.json"
+ARCHIVE_DIR = SCRIPT_DIR / "archive"
+REPLAY_CSV = RAW_DIR / "nm_psi_replay.csv"
+REPLAY_CHECKPOINT_FILE = SCRIPT_DIR / "replay_checkpoint.json"
+SNAPSHOT_FILE = SCRIPT_DIR / "psi_snapshot.db"
 CAPTCHA_DIR = SCRIPT_DIR
 
 BASE_URL = "https://public.psiexams.com"
@@ -66,6 +109,8 @@ SEARCH_PAGE_URL = f"{BASE_URL}/search.jsp?cid=445"
 COMPANY_TYPE = "445"  # Contractor
 RECORDS_PER_PAGE = 20
 MAX_RESULTS_CAP = 300  # Server-side result limit
+MAX_PREFIX_LEN = 6  # License numbers are 4-6 digits
+COLLAPSE_BELOW = 240  # Merge split prefixes back once their children total this or less
 
 # Concurrency settings
 MAX_CONCURRENT_SEARCHES = 8
@@ -76,10 +121,29 @@ DETAIL_SEMAPHORE_PER_SESSION = 5
 MAX_RETRIES = 3
 RETRY_BASE_DELAY = 1.0
 
-# Rate limiting
+# Rate limiting (starting/minimum delays; AdaptiveLimiter raises them under errors)
 SEARCH_DELAY = 0.05  # seconds between searches per session
 DETAIL_DELAY = 0.02  # seconds between detail fetches
 
+# Search-row fields whose change means a license's detail page must be refetched (--refresh)
+FINGERPRINT_FIELDS = ("license_number", "company_name", "address", "city_zip",
+                      "status", "expiry_date", "license_application_id")
+
+# Detail jobs queued for the shared pool before search workers wait
+DETAIL_BACKLOG = 2 * MAX_RESULTS_CAP
+
+# Adaptive concurrency (AIMD) per session; MAX_CONCURRENT_DETAILS is the ceiling
+DETAIL_CONCURRENCY_START = 2
+AIMD_DECREASE = 0.5  # Multiply the limit by this on an error, timeout or latency spike
+LATENCY_SPIKE_FACTOR = 3.0  # Slower than this many times the baseline is a spike
+LATENCY_SPIKE_MIN = 2.0  # ...but never below this many seconds
+LATENCY_EWMA_ALPHA = 0.05
+MIN_BACKOFF_DELAY = 0.25  # First pacing delay once concurrency is at the floor
+MAX_PACING_DELAY = 10.0
+
+# HTML parsing runs in worker processes (0 = inline on the event loop)
+PARSE_WORKERS = min(4, os.cpu_count() or 1)
+
 # CSV columns
 CSV_COLUMNS = [
     "license_number", "company_name", "phone", "license_status",
@@ -94,11 +158,17 @@ CSV_COLUMNS = [
 # ---------------------------------------------------------------------------
 # Prefix tree builder
 # ---------------------------------------------------------------------------
+#
+# The search is by license-number prefix and the server returns at most
+# MAX_RESULTS_CAP rows, so every prefix that hits the cap is split into its
+# ten one-digit-longer children until each leaf fits. The tree and the last
+# count seen for every node are kept in PREFIX_TREE_FILE and reused, so only
+# prefixes whose counts changed cost extra searches on later runs.
 
-def build_prefix_list() -> list[str]:
-    """Build the list of license-number prefixes to search.
+def survey_prefix_list() -> list[str]:
+    """License-number prefixes from the original one-off survey.
 
-    Uses survey data to determine which prefixes need drill-down.
+    Only used to seed the prefix tree on a first run.
     Non-capped 2-digit prefixes are used directly.
     Capped 2-digit prefixes drill into 3-digit.
     Capped 3-digit prefixes drill into 4-digit.
@@ -156,20 +226,571 @@ def build_prefix_list() -> list[str]:
     return prefixes
 
 
+class PrefixTree:
+    """Persisted license-number prefix tree with last seen result counts.
+
+    nodes maps prefix -> {"count": int | None, "split": bool, "probed_at": str}.
+    A split node hit the cap and is covered by its ten children; every other
+    node is a leaf and is searched directly. count is None until probed.
+    """
+
+    def __init__(self, path: Path = PREFIX_TREE_FILE):
+        self.path = path
+        self.nodes: dict[str, dict] = {}
+
+    @classmethod
+    def load_or_seed(cls, path: Path = PREFIX_TREE_FILE) -> "PrefixTree":
+        """The saved tree, or one seeded from the survey prefixes."""
+        tree = cls(path)
+        if path.exists():
+            tree.nodes = json.loads(path.read_text())["nodes"]
+        else:
+            tree.seed(survey_prefix_list())
+        return tree
+
+    def seed(self, leaves: list[str]):
+        """Build an unprobed tree whose leaves include `leaves`.
+
+        Every ancestor of a leaf is marked split; siblings the survey never
+        listed are added as empty leaves so the tree still covers every
+        license number.
+        """
+        self.nodes = {}
+        for leaf in leaves:
+            self.nodes[leaf] = {"count": None, "split": False, "probed_at": ""}
+            for i in range(1, len(leaf)):
+                self.nodes[leaf[:i]] = {"count": None, "split": True, "probed_at": ""}
+        for prefix in [p for p, n in self.nodes.items() if n["split"]]:
+            for child in self.children(prefix):
+                self.nodes.setdefault(child, {"count": 0, "split": False, "probed_at": ""})
+
+    def save(self):
+        data = {
+            "max_results_cap": MAX_RESULTS_CAP,
+            "saved_at": datetime.now().isoformat(),
+            "nodes": dict(sorted(self.nodes.items())),
+        }
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data, indent=1))
+        tmp.replace(self.path)
+
+    @staticmethod
+    def children(prefix: str) -> list[str]:
+        return [f"{prefix}{d}" for d in range(10)]
+
+    def leaves(self) -> list[str]:
+        return sorted(p for p, n in self.nodes.items() if not n["split"])
+
+    def is_split(self, prefix: str) -> bool:
+        return self.nodes.get(prefix, {}).get("split", False)
+
+    def record(self, prefix: str, count: int) -> list[str]:
+        """Store a probe result; returns new children if the prefix must split."""
+        node = self.nodes.setdefault(prefix, {"count": None, "split": False, "probed_at": ""})
+        node["count"] = count
+        node["probed_at"] = datetime.now().isoformat(timespec="seconds")
+        if count < MAX_RESULTS_CAP or node["split"]:
+            return []
+        if len(prefix) >= MAX_PREFIX_LEN:
+            print(f"  WARNING: prefix {prefix} still returns {count} records at "
+                  f"{MAX_PREFIX_LEN} digits; rows past the cap are missed")
+            return []
+        node["split"] = True
+        children = self.children(prefix)
+        for child in children:
+            self.nodes.setdefault(child, {"count": None, "split": False, "probed_at": ""})
+        return children
+
+    def collapse(self) -> int:
+        """Merge split nodes whose children now fit comfortably in one search.
+
+        Only nodes whose ten children are all probed leaves are merged, and
+        only below COLLAPSE_BELOW so a little growth doesn't re-split them.
+        Returns the number of nodes merged.
+        """
+        merged = 0
+        for prefix in sorted((p for p, n in self.nodes.items() if n["split"]),
+                             key=len, reverse=True):
+            kids = [self.nodes.get(c) for c in self.children(prefix)]
+            if any(k is None or k["split"] or k["count"] is None for k in kids):
+                continue
+            total = sum(k["count"] for k in kids)
+            if total > COLLAPSE_BELOW:
+                continue
+            for child in self.children(prefix):
+                del self.nodes[child]
+            node = self.nodes[prefix]
+            node["split"] = False
+            node["count"] = total
+            node["probed_at"] = min(k["probed_at"] for k in kids)
+            merged += 1
+        return merged
+
+    def summary(self) -> str:
+        leaves = [self.nodes[p] for p in self.leaves()]
+        known = [n["count"] for n in leaves if n["count"] is not None]
+        split = sum(n["split"] for n in self.nodes.values())
+        return (f"{len(leaves)} leaf prefixes ({len(leaves) - len(known)} unprobed), "
+                f"{split} split, ~{sum(known)} records in probed leaves")
+
+
+def build_prefix_list() -> list[str]:
+    """The license-number prefixes to search: leaves of the saved prefix tree."""
+    return PrefixTree.load_or_seed().leaves()
+
+
+# ---------------------------------------------------------------------------
+# HTML parsing
+# ---------------------------------------------------------------------------
+#
+# Building a BeautifulSoup/lxml tree is CPU-bound and, run inline, stalls
+# every session's network I/O for its duration. Pages are handed to a
+# process pool as raw bytes and come back as plain dicts, so the event loop
+# only moves bytes around while the parsers work in parallel.
+#
+# Each page first goes through the fast-path extractors in psi_extract.py;
+# the BeautifulSoup parsers below only run for pages the fast path rejects.
+
+def decode_html(raw: bytes, charset: Optional[str] = None) -> str:
+    """Decode a response body the way the portal serves it."""
+    if charset:
+        try:
+            return raw.decode(charset, errors="replace")
+        except LookupError:
+            pass
+    try:
+        return raw.decode("utf-8")
+    except UnicodeDecodeError:
+        return raw.decode("cp1252", errors="replace")
+
+
+def soup_parse_search_results(html: str) -> tuple[int, list[dict]]:
+    """Parse search results HTML into structured data (BeautifulSoup)."""
+    soup = BeautifulSoup(html, "lxml")
+
+    # Extract total count
+    total = 0
+    m = re.search(r"Displaying\s+\d+\s+to\s+\d+\s+of\s+(\d+)\s+records", html)
+    if m:
+        total = int(m.group(1))
+    else:
+        return 0, []
+
+    results = []
+    rows = soup.find_all("tr", class_="rowalt")
+    for row in rows:
+        tds = row.find_all("td")
+        if len(tds) < 7:
+            continue
+
+        # Extract license_id and license_application_id from onclick
+        license_id = ""
+        license_app_id = ""
+        link = tds[2].find("a")
+        if link and link.get("onclick"):
+            onclick = link["onclick"]
+            id_match = re.search(r'licenseId:\s*"(\d+)"', onclick)
+            app_match = re.search(r'licenseApplicationId:\s*"(\d+)"', onclick)
+            if id_match:
+                license_id = id_match.group(1)
+            if app_match:
+                license_app_id = app_match.group(1)
+
+        company_name = link.text.strip() if link else tds[2].get_text(strip=True)
+
+        results.append({
+            "license_number": tds[1].get_text(strip=True),
+            "company_name": company_name,
+            "address": tds[3].get_text(strip=True),
+            "city_zip": tds[4].get_text(strip=True),
+            "expiry_date": tds[5].get_text(strip=True),
+            "status": tds[6].get_text(strip=True),
+            "license_id": license_id,
+            "license_application_id": license_app_id,
+        })
+
+    return total, results
+
+
+def soup_parse_detail(html: str, license_id: str) -> Optional[dict]:
+    """Parse detail page HTML (BeautifulSoup)."""
+    soup = BeautifulSoup(html, "lxml")
+
+    # Find "Company Details" section
+    result = {
+        "company_name": "",
+        "license_number": "",
+        "phone": "",
+        "license_status": "",
+        "issue_date": "",
+        "expiry_date": "",
+        "volume": "",
+        "street": "",
+        "city": "",
+        "state": "",
+        "zip_code": "",
+        "company_id": "",
+        "qp_name": "",
+        "qp_certificate_no": "",
+        "qp_classification": "",
+        "qp_attach_date": "",
+        "qp_status": "",
+    }
+
+    # Extract from hidden form fields (most reliable)
+    hidden_form = soup.find("form", {"name": "hiddenform"})
+    if hidden_form:
+        for inp in hidden_form.find_all("input", {"type": "hidden"}):
+            name = inp.get("name", "")
+            val = inp.get("value", "").strip()
+            if name == "businessNm":
+                result["company_name"] = val
+            elif name == "licenseNumber":
+                result["license_number"] = val
+            elif name == "street":
+                result["street"] = val
+            elif name == "city":
+                result["city"] = val
+            elif name == "state":
+                result["state"] = val
+            elif name == "zipCode":
+                result["zip_code"] = val
+            elif name == "companyId":
+                result["company_id"] = val
+
+    # Parse the visible table for phone, dates, volume, status
+    # The detail table has rows with label/value pairs
+    all_tds = soup.find_all("td", class_="fieldlabel")
+    for i, td in enumerate(all_tds):
+        text = td.get_text(strip=True)
+
+        if text == "Phone Number" and i + 1 < len(all_tds):
+            result["phone"] = all_tds[i + 1].get_text(strip=True)
+        elif text == "License Status" and i + 1 < len(all_tds):
+            # Status is in the next <td> which may not have class fieldlabel
+            next_td = td.find_next_sibling("td")
+            if next_td:
+                result["license_status"] = next_td.get_text(strip=True)
+        elif text == "Issue Date" and i + 1 < len(all_tds):
+            result["issue_date"] = all_tds[i + 1].get_text(strip=True)
+        elif text == "Expiry Date":
+            next_td = td.find_next_sibling("td")
+            if next_td:
+                result["expiry_date"] = next_td.get_text(strip=True)
+        elif text == "Volume" and i + 1 < len(all_tds):
+            result["volume"] = all_tds[i + 1].get_text(strip=True)
+
+    # Fallback: parse Company Name from visible table
+    if not result["company_name"]:
+        for td in all_tds:
+            if td.get_text(strip=True) == "Company Name":
+                next_td = td.find_next_sibling("td")
+                if next_td:
+                    result["company_name"] = next_td.get_text(strip=True)
+                    break
+
+    # Fallback: parse License Number from visible table
+    if not result["license_number"]:
+        for td in all_tds:
+            if td.get_text(strip=True) == "License Number":
+                next_td = td.find_next_sibling("td")
+                if next_td:
+                    result["license_number"] = next_td.get_text(strip=True)
+                    break
+
+    # Parse QP (Qualifying Party) details
+    # QP table has headers: Name, Certificate No, Classification, Attach Date, Status
+    qp_heading = soup.find(string=re.compile(r"QP Details"))
+    if qp_heading:
+        # Find the QP table rows
+        qp_section = qp_heading.find_parent("tr")
+        if qp_section:
+            qp_table_row = qp_section.find_next_sibling("tr")
+            if qp_table_row:
+                qp_table = qp_table_row.find("table")
+                if qp_table:
+                    qp_data_rows = qp_table.find_all("tr", style=True)
+                    if qp_data_rows:
+                        # Take the first QP (there may be multiple)
+                        qp_row = qp_data_rows[0]
+                        qp_tds = qp_row.find_all("td")
+                        if len(qp_tds) >= 5:
+                            qp_link = qp_tds[0].find("a")
+                            result["qp_name"] = qp_link.text.strip() if qp_link else qp_tds[0].get_text(strip=True)
+                            result["qp_certificate_no"] = qp_tds[1].get_text(strip=True)
+                            result["qp_classification"] = qp_tds[2].get_text(strip=True)
+                            result["qp_attach_date"] = qp_tds[3].get_text(strip=True)
+                            result["qp_status"] = qp_tds[4].get_text(strip=True)
+
+    return result
+
+
+PARSERS = {
+    "search": (extract_search_results, soup_parse_search_results),
+    "detail": (extract_detail, soup_parse_detail),
+}
+
+
+def parse_page(kind: str, html: str, *args) -> tuple[object, bool]:
+    """Parse with the fast path, falling back to BeautifulSoup.
+
+    Returns (parsed, used_fallback).
+    """
+    fast, soup = PARSERS[kind]
+    try:
+        return fast(html, *args), False
+    except FastPathError:
+        return soup(html, *args), True
+
+
+def parse_search_results(html: str) -> tuple[int, list[dict]]:
+    """Parse search results HTML into structured data."""
+    return parse_page("search", html)[0]
+
+
+def parse_search_total(html: str) -> Optional[int]:
+    """Result count from a search page: 0 for "no records", None if unrecognised."""
+    m = TOTAL_RE.search(html)
+    if m:
+        return int(m.group(1))
+    if "No Records Found" in html or "No record found" in html:
+        return 0
+    return None
+
+
+def parse_detail(html: str, license_id: str) -> Optional[dict]:
+    """Parse detail page HTML."""
+    return parse_page("detail", html, license_id)[0]
+
+
+def _parse_job(kind: str, raw: bytes, charset: Optional[str], args: tuple):
+    """Process-pool entry point. Returns (parsed, used_fallback, cpu_seconds)."""
+    started = time.process_time()
+    parsed, fallback = parse_page(kind, decode_html(raw, charset), *args)
+    return parsed, fallback, time.process_time() - started
+
+
+class ParserPool:
+    """Parses response bodies in worker processes with bounded in-flight work.
+
+    A slot is taken before the body is read, so once `max_pending` pages are
+    queued for parsing, callers stop draining sockets instead of buffering
+    more HTML in memory. With workers=0 parsing runs inline on the event
+    loop, which is also what the stats compare against.
+    """
+
+    def __init__(self, workers: int = PARSE_WORKERS, max_pending: int = 0):
+        self.workers = workers
+        self.max_pending = max_pending or max(1, workers) * 4
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.pages = 0
+        self.fallbacks = 0
+        self.bytes_parsed = 0
+        self.parse_seconds = 0.0   # CPU time spent parsing, wherever it ran
+        self.loop_seconds = 0.0    # Of which, time the event loop was blocked
+        self.started = time.monotonic()
+
+    def _slot(self) -> asyncio.Semaphore:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        return self._slots
+
+    async def parse_response(self, resp: "aiohttp.ClientResponse", kind: str, *args,
+                             record: Optional[Callable[[bytes, Optional[str]], Awaitable]] = None):
+        """Read `resp` and parse it with the `kind` parser.
+
+        `record`, if given, is called with the raw body and charset and
+        returns an awaitable (used to archive responses off the event loop).
+        It runs alongside parsing and is awaited before the slot is freed.
+        """
+        async with self._slot():
+            raw = await resp.read()
+            recorded = record(raw, resp.charset) if record is not None else None
+            try:
+                return await self.parse(kind, raw, resp.charset, *args)
+            finally:
+                if recorded is not None:
+                    await recorded
+
+    async def parse(self, kind: str, raw: bytes, charset: Optional[str], *args):
+        if self.workers <= 0:
+            started = time.perf_counter()
+            parsed, fallback, cpu = _parse_job(kind, raw, charset, args)
+            self.loop_seconds += time.perf_counter() - started
+        else:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            loop = asyncio.get_running_loop()
+            parsed, fallback, cpu = await loop.run_in_executor(
+                self._executor, _parse_job, kind, raw, charset, args,
+            )
+        self.pages += 1
+        self.fallbacks += fallback
+        self.bytes_parsed += len(raw)
+        self.parse_seconds += cpu
+        return parsed
+
+    def summary(self) -> str:
+        """One-line report of parse work and event-loop time recovered."""
+        wall = time.monotonic() - self.started
+        recovered = max(0.0, self.parse_seconds - self.loop_seconds)
+        where = f"{self.workers} workers" if self.workers > 0 else "inline"
+        return (f"Parsing ({where}): {self.pages} pages "
+                f"({self.fallbacks} via BeautifulSoup), "
+                f"{self.bytes_parsed / 1e6:.1f} MB, {self.parse_seconds:.1f}s CPU | "
+                f"event loop blocked {self.loop_seconds:.1f}s, "
+                f"recovered {recovered:.1f}s ({recovered / wall * 100 if wall else 0:.0f}% of wall)")
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+_parser_pool: Optional[ParserPool] = None
+
+
+def get_parser_pool() -> ParserPool:
+    """Shared pool used by every PSISession in this process."""
+    global _parser_pool
+    if _parser_pool is None:
+        _parser_pool = ParserPool(PARSE_WORKERS)
+    return _parser_pool
+
+
+# ---------------------------------------------------------------------------
+# Adaptive concurrency
+# ---------------------------------------------------------------------------
+#
+# Each session paces its own requests with AIMD, the rule TCP uses for its
+# congestion window: after a full window of healthy responses the limit goes
+# up by one; an error, timeout or latency spike cuts it by a factor. Only
+# requests that started after the last cut can cause another one, so a
+# burst of failures from the same overload counts once. Once concurrency is
+# at the floor, further cuts double the delay between requests instead, and
+# healthy windows halve it back before concurrency grows again. The ceiling
+# is never exceeded, whatever the server does.
+
+class AdaptiveLimiter:
+    """AIMD limit on concurrent requests plus a pacing delay.
+
+    `async with limiter:` waits for a slot; observe() reports each finished
+    request. `reason` says why the limit last changed.
+    """
+
+    def __init__(self, name: str, ceiling: int, start: int = 1,
+                 base_delay: float = 0.0, floor: int = 1):
+        self.name = name
+        self.floor = floor
+        self.ceiling = ceiling
+        self.limit = max(floor, min(start, ceiling))
+        self.base_delay = base_delay
+        self.delay = base_delay
+        self.in_flight = 0
+        self.baseline: Optional[float] = None  # EWMA of healthy latency
+        self.reason = "start"
+        self.changes = 0
+        self._successes = 0
+        self._cut_at = 0.0
+        self._cond: Optional[asyncio.Condition] = None
+
+    def _condition(self) -> asyncio.Condition:
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    async def __aenter__(self):
+        cond = self._condition()
+        async with cond:
+            await cond.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+        return self
+
+    async def __aexit__(self, *exc):
+        cond = self._condition()
+        async with cond:
+            self.in_flight -= 1
+            cond.notify(max(1, self.limit - self.in_flight))
+
+    def observe(self, started: float, latency: float, error: str = "") -> Optional[str]:
+        """Record one finished request (monotonic start time, seconds taken).
+
+        `error` is empty for a healthy response, otherwise a short reason
+        ("timeout", "HTTP 503", ...). Returns a description of the change if
+        the limit or delay moved, else None.
+        """
+        if not error and self.baseline is not None and latency > max(
+                LATENCY_SPIKE_MIN, self.baseline * LATENCY_SPIKE_FACTOR):
+            error = f"latency {latency:.1f}s vs {self.baseline:.1f}s baseline"
+        elif not error:
+            self.baseline = latency if self.baseline is None else (
+                self.baseline + LATENCY_EWMA_ALPHA * (latency - self.baseline))
+
+        if error:
+            self._successes = 0
+            if started < self._cut_at:
+                return None  # Already cut for this overload
+            self._cut_at = time.monotonic()
+            if self.limit > self.floor:
+                return self._change(max(self.floor, int(self.limit * AIMD_DECREASE)),
+                                    self.delay, error)
+            return self._change(self.limit, min(MAX_PACING_DELAY,
+                                                max(self.delay * 2, MIN_BACKOFF_DELAY)), error)
+
+        self._successes += 1
+        if self._successes < self.limit:
+            return None
+        self._successes = 0
+        if self.delay > self.base_delay:
+            return self._change(self.limit, max(self.base_delay, self.delay / 2), "healthy")
+        if self.limit < self.ceiling:
+            return self._change(self.limit + 1, self.delay, "healthy")
+        return None
+
+    def _change(self, limit: int, delay: float, reason: str) -> Optional[str]:
+        if limit == self.limit and delay == self.delay:
+            return None
+        before = self.describe()
+        self.limit, self.delay, self.reason = limit, delay, reason
+        self.changes += 1
+        return f"{before} -> {self.limit}/{self.ceiling} @{self.delay:.2f}s: {reason}"
+
+    def describe(self) -> str:
+        return f"{self.name} {self.limit}/{self.ceiling} @{self.delay:.2f}s"
+
+
 # ---------------------------------------------------------------------------
 # Session management
 # ---------------------------------------------------------------------------
 
+def raise_for_overload(resp: "aiohttp.ClientResponse"):
+    """Treat 429 and 5xx as errors so they are retried and slow the session down."""
+    if resp.status == 429 or resp.status >= 500:
+        resp.raise_for_status()
+
+
 class PSISession:
     """Manages a single authenticated session to PSI Exams."""
 
-    def __init__(self, session_id: int):
+    def __init__(self, session_id: int, parser: Optional[ParserPool] = None,
+                 archive: Optional[ResponseArchive] = None,
+                 detail_ceiling: int = MAX_CONCURRENT_DETAILS):
         self.session_id = session_id
+        self.parser = parser or get_parser_pool()
+        self.archive = archive
+        # Searches are sequential per session (pagination is server-side
+        # state), so only their pacing adapts.
+        self.search_limiter = AdaptiveLimiter("search", ceiling=1, base_delay=SEARCH_DELAY)
+        self.detail_limiter = AdaptiveLimiter("detail", ceiling=detail_ceiling,
+                                              start=DETAIL_CONCURRENCY_START,
+                                              base_delay=DETAIL_DELAY)
         self.jsessionid: Optional[str] = None
         self.captcha_answer: Optional[str] = None
         self.http_session: Optional[aiohttp.ClientSession] = None
         self.authenticated = False
         self.search_count = 0
+        self.search_failures = 0
         self.detail_count = 0
         self._last_num_records = 300  # Default for pagination
 
@@ -279,18 +900,7 @@ class PSISession:
         """
         if start <= 1:
             # New search - include full form data, NO start/RecordPerPage
-            data = {
-                "isCompany": "individual",
-                "requestType": "2",
-                "individualOrCompany": "NO",
-                "companyType": COMPANY_TYPE,
-                "busLicenseNumber": prefix,
-                "businessName": "",
-                "businessCity": "",
-                "businessZipCode": "",
-                "captchaAnswer": self.captcha_answer,
-                "Submit2": "Search",
-            }
+            data = self._search_form(prefix)
         else:
             # Pagination - include start/RecordPerPage, minimal params
             data = {
@@ -303,68 +913,106 @@ class PSISession:
 
         for attempt in range(MAX_RETRIES):
             try:
-                async with self.http_session.post(SEARCH_URL, data=data, timeout=aiohttp.ClientTimeout(total=30)) as resp:
-                    text = await resp.text()
+                async with self.search_limiter, self._observed(self.search_limiter), \
+                        self.http_session.post(SEARCH_URL, data=data,
+                                               timeout=aiohttp.ClientTimeout(total=30)) as resp:
+                    raise_for_overload(resp)
+                    total, results = await self.parser.parse_response(
+                        resp, "search", record=self._archiver("search", prefix, start))
                     self.search_count += 1
-                    total, results = self._parse_search_results(text)
                     # Cache NumOfRecords for pagination
                     if start <= 1 and total > 0:
                         self._last_num_records = total
                     return total, results
             except Exception as e:
                 if attempt < MAX_RETRIES - 1:
+                    self.note_retry("search")
                     delay = RETRY_BASE_DELAY * (2 ** attempt)
                     await asyncio.sleep(delay)
                 else:
                     print(f"  [S{self.session_id}] Search failed prefix={prefix} start={start}: {e}")
+                    self.search_failures += 1
                     return 0, []
 
-    def _parse_search_results(self, html: str) -> tuple[int, list[dict]]:
-        """Parse search results HTML into structured data."""
-        soup = BeautifulSoup(html, "lxml")
-
-        # Extract total count
-        total = 0
-        m = re.search(r"Displaying\s+\d+\s+to\s+\d+\s+of\s+(\d+)\s+records", html)
-        if m:
-            total = int(m.group(1))
-        else:
-            return 0, []
+    @contextlib.asynccontextmanager
+    async def _observed(self, limiter: AdaptiveLimiter):
+        """Pace one request on `limiter`, then report its latency and outcome."""
+        await asyncio.sleep(limiter.delay)
+        started = time.monotonic()
+        error = ""
+        try:
+            yield
+        except asyncio.TimeoutError:
+            error = "timeout"
+            raise
+        except aiohttp.ClientResponseError as e:
+            error = f"HTTP {e.status}"
+            raise
+        except aiohttp.ClientError as e:
+            error = type(e).__name__
+            raise
+        finally:
+            latency = time.monotonic() - started
+            change = limiter.observe(started, latency, error)
+            if _metrics is not None:
+                _metrics.request(self.session_id, limiter.name, latency, error)
+            if change:
+                print(f"  [S{self.session_id}] {change}", flush=True)
+
+    def note_retry(self, kind: str):
+        """Count a retried request (--metrics-file / --metrics-port)."""
+        if _metrics is not None:
+            _metrics.retry(self.session_id, kind)
+
+    def limits(self) -> str:
+        """Current adaptive limits, for progress output."""
+        return f"{self.search_limiter.describe()}, {self.detail_limiter.describe()}"
+
+    def _archiver(self, kind: str, key: str, page: int = 0):
+        """Callback that archives a raw response body, or None without an archive."""
+        if self.archive is None:
+            return None
+        return lambda raw, charset: self.archive.submit(kind, key, page, raw, charset)
+
+    def _search_form(self, prefix: str) -> dict:
+        """Form data for a new (first-page) search."""
+        return {
+            "isCompany": "individual",
+            "requestType": "2",
+            "individualOrCompany": "NO",
+            "companyType": COMPANY_TYPE,
+            "busLicenseNumber": prefix,
+            "businessName": "",
+            "businessCity": "",
+            "businessZipCode": "",
+            "captchaAnswer": self.captcha_answer,
+            "Submit2": "Search",
+        }
 
-        results = []
-        rows = soup.find_all("tr", class_="rowalt")
-        for row in rows:
-            tds = row.find_all("td")
-            if len(tds) < 7:
-                continue
+    async def probe_count(self, prefix: str) -> Optional[int]:
+        """Result count for a prefix, from its first page only.
 
-            # Extract license_id and license_application_id from onclick
-            license_id = ""
-            license_app_id = ""
-            link = tds[2].find("a")
-            if link and link.get("onclick"):
-                onclick = link["onclick"]
-                id_match = re.search(r'licenseId:\s*"(\d+)"', onclick)
-                app_match = re.search(r'licenseApplicationId:\s*"(\d+)"', onclick)
-                if id_match:
-                    license_id = id_match.group(1)
-                if app_match:
-                    license_app_id = app_match.group(1)
-
-            company_name = link.text.strip() if link else tds[2].get_text(strip=True)
-
-            results.append({
-                "license_number": tds[1].get_text(strip=True),
-                "company_name": company_name,
-                "address": tds[3].get_text(strip=True),
-                "city_zip": tds[4].get_text(strip=True),
-                "expiry_date": tds[5].get_text(strip=True),
-                "status": tds[6].get_text(strip=True),
-                "license_id": license_id,
-                "license_application_id": license_app_id,
-            })
-
-        return total, results
+        Returns None if the search failed or the server answered with
+        something other than a results or no-records page (e.g. the CAPTCHA
+        form after the session expired), so callers never mistake a failure
+        for an empty prefix.
+        """
+        for attempt in range(MAX_RETRIES):
+            try:
+                async with self.search_limiter, self._observed(self.search_limiter), \
+                        self.http_session.post(SEARCH_URL, data=self._search_form(prefix),
+                                               timeout=aiohttp.ClientTimeout(total=30)) as resp:
+                    raise_for_overload(resp)
+                    text = await resp.text()
+                    self.search_count += 1
+                    return parse_search_total(text)
+            except Exception as e:
+                if attempt < MAX_RETRIES - 1:
+                    self.note_retry("search")
+                    await asyncio.sleep(RETRY_BASE_DELAY * (2 ** attempt))
+                else:
+                    print(f"  [S{self.session_id}] Probe failed prefix={prefix}: {e}")
+        return None
 
     async def fetch_detail(self, license_id: str, license_app_id: str) -> Optional[dict]:
         """Fetch detail page for a single contractor.
@@ -373,136 +1021,36 @@ class PSISession:
                           issue_date, expiry_date, volume, street, city,
                           state, zip_code, qp_* fields, company_id
         """
-        data = {
-            "licenseId": license_id,
-            "licenseApplicationId": license_app_id,
-        }
-
         for attempt in range(MAX_RETRIES):
             try:
-                async with self.http_session.post(DETAIL_URL, data=data, timeout=aiohttp.ClientTimeout(total=30)) as resp:
-                    text = await resp.text()
-                    self.detail_count += 1
-                    return self._parse_detail(text, license_id)
+                async with self.detail_limiter:
+                    return await self.fetch_detail_once(license_id, license_app_id)
             except Exception as e:
                 if attempt < MAX_RETRIES - 1:
+                    self.note_retry("detail")
                     delay = RETRY_BASE_DELAY * (2 ** attempt)
                     await asyncio.sleep(delay)
                 else:
                     print(f"  [S{self.session_id}] Detail failed id={license_id}: {e}")
                     return None
 
-    def _parse_detail(self, html: str, license_id: str) -> Optional[dict]:
-        """Parse detail page HTML."""
-        soup = BeautifulSoup(html, "lxml")
-
-        # Find "Company Details" section
-        result = {
-            "company_name": "",
-            "license_number": "",
-            "phone": "",
-            "license_status": "",
-            "issue_date": "",
-            "expiry_date": "",
-            "volume": "",
-            "street": "",
-            "city": "",
-            "state": "",
-            "zip_code": "",
-            "company_id": "",
-            "qp_name": "",
-            "qp_certificate_no": "",
-            "qp_classification": "",
-            "qp_attach_date": "",
-            "qp_status": "",
-        }
+    async def fetch_detail_once(self, license_id: str, license_app_id: str) -> Optional[dict]:
+        """Single detail request without retries; raises on network errors.
 
-        # Extract from hidden form fields (most reliable)
-        hidden_form = soup.find("form", {"name": "hiddenform"})
-        if hidden_form:
-            for inp in hidden_form.find_all("input", {"type": "hidden"}):
-                name = inp.get("name", "")
-                val = inp.get("value", "").strip()
-                if name == "businessNm":
-                    result["company_name"] = val
-                elif name == "licenseNumber":
-                    result["license_number"] = val
-                elif name == "street":
-                    result["street"] = val
-                elif name == "city":
-                    result["city"] = val
-                elif name == "state":
-                    result["state"] = val
-                elif name == "zipCode":
-                    result["zip_code"] = val
-                elif name == "companyId":
-                    result["company_id"] = val
-
-        # Parse the visible table for phone, dates, volume, status
-        # The detail table has rows with label/value pairs
-        all_tds = soup.find_all("td", class_="fieldlabel")
-        for i, td in enumerate(all_tds):
-            text = td.get_text(strip=True)
-
-            if text == "Phone Number" and i + 1 < len(all_tds):
-                result["phone"] = all_tds[i + 1].get_text(strip=True)
-            elif text == "License Status" and i + 1 < len(all_tds):
-                # Status is in the next <td> which may not have class fieldlabel
-                next_td = td.find_next_sibling("td")
-                if next_td:
-                    result["license_status"] = next_td.get_text(strip=True)
-            elif text == "Issue Date" and i + 1 < len(all_tds):
-                result["issue_date"] = all_tds[i + 1].get_text(strip=True)
-            elif text == "Expiry Date":
-                next_td = td.find_next_sibling("td")
-                if next_td:
-                    result["expiry_date"] = next_td.get_text(strip=True)
-            elif text == "Volume" and i + 1 < len(all_tds):
-                result["volume"] = all_tds[i + 1].get_text(strip=True)
-
-        # Fallback: parse Company Name from visible table
-        if not result["company_name"]:
-            for td in all_tds:
-                if td.get_text(strip=True) == "Company Name":
-                    next_td = td.find_next_sibling("td")
-                    if next_td:
-                        result["company_name"] = next_td.get_text(strip=True)
-                        break
-
-        # Fallback: parse License Number from visible table
-        if not result["license_number"]:
-            for td in all_tds:
-                if td.get_text(strip=True) == "License Number":
-                    next_td = td.find_next_sibling("td")
-                    if next_td:
-                        result["license_number"] = next_td.get_text(strip=True)
-                        break
-
-        # Parse QP (Qualifying Party) details
-        # QP table has headers: Name, Certificate No, Classification, Attach Date, Status
-        qp_heading = soup.find(string=re.compile(r"QP Details"))
-        if qp_heading:
-            # Find the QP table rows
-            qp_section = qp_heading.find_parent("tr")
-            if qp_section:
-                qp_table_row = qp_section.find_next_sibling("tr")
-                if qp_table_row:
-                    qp_table = qp_table_row.find("table")
-                    if qp_table:
-                        qp_data_rows = qp_table.find_all("tr", style=True)
-                        if qp_data_rows:
-                            # Take the first QP (there may be multiple)
-                            qp_row = qp_data_rows[0]
-                            qp_tds = qp_row.find_all("td")
-                            if len(qp_tds) >= 5:
-                                qp_link = qp_tds[0].find("a")
-                                result["qp_name"] = qp_link.text.strip() if qp_link else qp_tds[0].get_text(strip=True)
-                                result["qp_certificate_no"] = qp_tds[1].get_text(strip=True)
-                                result["qp_classification"] = qp_tds[2].get_text(strip=True)
-                                result["qp_attach_date"] = qp_tds[3].get_text(strip=True)
-                                result["qp_status"] = qp_tds[4].get_text(strip=True)
-
-        return result
+        Paced and observed by detail_limiter; the caller holds its slot.
+        """
+        data = {
+            "licenseId": license_id,
+            "licenseApplicationId": license_app_id,
+        }
+        async with self._observed(self.detail_limiter), \
+                self.http_session.post(DETAIL_URL, data=data,
+                                       timeout=aiohttp.ClientTimeout(total=30)) as resp:
+            raise_for_overload(resp)
+            detail = await self.parser.parse_response(
+                resp, "detail", license_id, record=self._archiver("detail", license_id))
+            self.detail_count += 1
+            return detail
 
     async def close(self):
         """Close the HTTP session."""
@@ -510,63 +1058,285 @@ class PSISession:
             await self.http_session.close()
 
 
+class ReplaySession(PSISession):
+    """Serves search and detail pages from a ResponseArchive, never the network.
+
+    Pages go through the same parser pool and scrape_prefix() pipeline as a
+    live run, so a parser or CSV column change can be re-run at disk speed.
+    Requests missing from the archive are counted and behave like failures.
+    """
+
+    def __init__(self, session_id: int, source: ResponseArchive,
+                 parser: Optional[ParserPool] = None):
+        super().__init__(session_id, parser)
+        self.detail_limiter = AdaptiveLimiter("detail", ceiling=MAX_CONCURRENT_DETAILS,
+                                              start=MAX_CONCURRENT_DETAILS)
+        self.source = source
+        self.missing = 0
+
+    async def search(self, prefix: str, start: int = 1) -> tuple[int, list[dict]]:
+        hit = self.source.latest("search", prefix, start)
+        if hit is None:
+            self.missing += 1
+            return 0, []
+        self.search_count += 1
+        return await self.parser.parse("search", *hit)
+
+    async def fetch_detail_once(self, license_id: str, license_app_id: str) -> Optional[dict]:
+        hit = self.source.latest("detail", license_id)
+        if hit is None:
+            self.missing += 1
+            return None
+        self.detail_count += 1
+        return await self.parser.parse("detail", *hit, license_id)
+
+    async def close(self):
+        pass
+
+
 # ---------------------------------------------------------------------------
 # Checkpoint management
 # ---------------------------------------------------------------------------
 
 class Checkpoint:
-    """Track scraping progress for resume capability."""
+    """Track scraping progress for resume capability.
+
+    Progress lives in an append-only SQLite journal next to the checkpoint
+    file (scrape_checkpoint.db): one row per fetched license detail,
+    committed as soon as it arrives, and one per completed prefix. A crash
+    loses at most the detail pages in flight; --resume skips every license
+    already journaled, and compact_csv() rebuilds the output CSV from the
+    journal without the duplicate rows an appending run leaves behind.
+
+    The JSON checkpoint is only a human-readable summary now. A checkpoint
+    that is not load()ed starts a fresh journal on first write; loading one
+    with no journal yet imports the old JSON checkpoint and output CSV.
+    """
 
-    def __init__(self, path: Path):
+    def __init__(self, path: Path, csv_path: Path = OUTPUT_CSV):
         self.path = path
+        self.journal_path = path.with_suffix(".db")
+        self.csv_path = csv_path
         self.completed_prefixes: set[str] = set()
+        self.fetched_ids: set[str] = set()
         self.total_records = 0
         self.total_details = 0
         self.started_at = ""
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _journal(self, fresh: bool = False) -> sqlite3.Connection:
+        if self._conn is None:
+            if fresh:
+                for suffix in ("", "-wal", "-shm"):
+                    Path(f"{self.journal_path}{suffix}").unlink(missing_ok=True)
+            conn = sqlite3.connect(self.journal_path, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS details (
+                    license_id TEXT PRIMARY KEY,
+                    prefix TEXT NOT NULL,
+                    row TEXT NOT NULL,
+                    fetched_at TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS prefixes (
+                    prefix TEXT PRIMARY KEY,
+                    detail_count INTEGER NOT NULL,
+                    completed_at TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                );
+            """)
+            self._conn = conn
+        return self._conn
 
     def load(self):
-        if self.path.exists():
-            data = json.loads(self.path.read_text())
-            self.completed_prefixes = set(data.get("completed_prefixes", []))
-            self.total_records = data.get("total_records", 0)
-            self.total_details = data.get("total_details", 0)
-            self.started_at = data.get("started_at", "")
+        migrate = not self.journal_path.exists() and self.path.exists()
+        db = self._journal()
+        if migrate:
+            self._import_legacy(db)
+        self.completed_prefixes = {p for (p,) in db.execute("SELECT prefix FROM prefixes")}
+        self.fetched_ids = {lid for (lid,) in db.execute("SELECT license_id FROM details")}
+        meta = dict(db.execute("SELECT key, value FROM meta"))
+        self.started_at = meta.get("started_at", "")
+        self.total_records = int(meta.get("total_records", 0))
+        self.total_details = len(self.fetched_ids)
+
+    def _import_legacy(self, db: sqlite3.Connection):
+        """Seed a new journal from a prefix-level JSON checkpoint and its CSV."""
+        data = json.loads(self.path.read_text())
+        now = datetime.now().isoformat()
+        db.execute("BEGIN")
+        db.executemany("INSERT OR IGNORE INTO prefixes VALUES (?, 0, ?)",
+                       [(p, now) for p in data.get("completed_prefixes", [])])
+        db.execute("INSERT OR REPLACE INTO meta VALUES ('started_at', ?)",
+                   (data.get("started_at", ""),))
+        if self.csv_path.exists():
+            with open(self.csv_path, newline="", encoding="utf-8") as f:
+                db.executemany(
+                    "INSERT OR REPLACE INTO details VALUES (?, '', ?, ?)",
+                    [(row["license_id"], json.dumps(row), now)
+                     for row in csv.DictReader(f) if row.get("license_id")])
+        db.execute("COMMIT")
+        print(f"  Imported legacy checkpoint {self.path.name} into {self.journal_path.name}")
+
+    def _db(self) -> sqlite3.Connection:
+        """The journal for writing; a checkpoint that was never loaded starts fresh."""
+        return self._journal(fresh=self._conn is None)
 
     def save(self):
+        db = self._db()
+        db.execute("INSERT OR REPLACE INTO meta VALUES ('started_at', ?), ('total_records', ?)",
+                   (self.started_at, str(self.total_records)))
         data = {
             "completed_prefixes": sorted(self.completed_prefixes),
             "total_records": self.total_records,
             "total_details": self.total_details,
             "started_at": self.started_at,
             "last_saved": datetime.now().isoformat(),
+            "journal": self.journal_path.name,
         }
         self.path.write_text(json.dumps(data, indent=2))
 
+    def is_fetched(self, license_id: str) -> bool:
+        return license_id in self.fetched_ids
+
+    def record_detail(self, prefix: str, license_id: str, row: dict):
+        """Journal one fetched license; durable once this returns."""
+        self._db().execute(
+            "INSERT OR REPLACE INTO details VALUES (?, ?, ?, ?)",
+            (license_id, prefix, json.dumps(row), datetime.now().isoformat()))
+        if license_id not in self.fetched_ids:
+            self.fetched_ids.add(license_id)
+            self.total_details += 1
+
+    def get_detail(self, license_id: str) -> Optional[dict]:
+        row = self._journal().execute("SELECT row FROM details WHERE license_id = ?",
+                                      (license_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def forget(self, license_id: str):
+        """Drop a license that no longer exists on the portal (--refresh)."""
+        self._db().execute("DELETE FROM details WHERE license_id = ?", (license_id,))
+        if license_id in self.fetched_ids:
+            self.fetched_ids.discard(license_id)
+            self.total_details -= 1
+
     def mark_complete(self, prefix: str, detail_count: int):
+        self._db().execute("INSERT OR REPLACE INTO prefixes VALUES (?, ?, ?)",
+                           (prefix, detail_count, datetime.now().isoformat()))
         self.completed_prefixes.add(prefix)
-        self.total_details += detail_count
-        # Save periodically
+        # Refresh the JSON summary periodically
         if len(self.completed_prefixes) % 10 == 0:
             self.save()
 
+    def compact_csv(self, path: Optional[Path] = None) -> int:
+        """Rewrite the output CSV from the journal, one row per license.
+
+        Written to a temp file and renamed, so a crash never leaves a
+        truncated CSV. Returns the number of rows written.
+        """
+        path = path or self.csv_path
+        rows = [json.loads(r) for (r,) in self._journal().execute("SELECT row FROM details")]
+        rows.sort(key=lambda r: (r.get("license_number", ""), r.get("license_id", "")))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w", newline="", encoding="utf-8") as f:
+            csv_writer = csv.writer(f)
+            csv_writer.writerow(CSV_COLUMNS)
+            for r in rows:
+                csv_writer.writerow([r.get(col, "") for col in CSV_COLUMNS])
+        tmp.replace(path)
+        return len(rows)
+
+
+def fingerprint(search_row: dict) -> str:
+    """Cheap change detector for a license, from its search result row."""
+    text = "\x1f".join((search_row.get(f) or "").strip() for f in FINGERPRINT_FIELDS)
+    return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+
+class SearchSnapshot:
+    """Last seen search row and fingerprint of every license (--refresh).
+
+    Unlike the checkpoint journal this survives fresh runs: it is the
+    baseline each refresh is compared against, and only moves forward for
+    licenses whose detail page was actually refetched.
+    """
+
+    def __init__(self, path: Path = SNAPSHOT_FILE):
+        self.path = path
+        self.db = sqlite3.connect(path, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS licenses (
+                license_id TEXT PRIMARY KEY,
+                license_number TEXT NOT NULL,
+                prefix TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                row TEXT NOT NULL,
+                seen_at TEXT NOT NULL
+            )
+        """)
+
+    def load(self) -> dict[str, dict]:
+        """license_id -> {"fingerprint", "license_number", "row"}."""
+        return {
+            lid: {"fingerprint": fp, "license_number": num, "row": json.loads(row)}
+            for lid, num, fp, row in self.db.execute(
+                "SELECT license_id, license_number, fingerprint, row FROM licenses")
+        }
+
+    def update(self, seen: dict[str, tuple[str, dict]]):
+        """Store {license_id: (prefix, search_row)} as the new baseline."""
+        now = datetime.now().isoformat()
+        self.db.execute("BEGIN")
+        self.db.executemany(
+            "INSERT OR REPLACE INTO licenses VALUES (?, ?, ?, ?, ?, ?)",
+            [(lid, row.get("license_number", ""), prefix, fingerprint(row), json.dumps(row), now)
+             for lid, (prefix, row) in seen.items()])
+        self.db.execute("COMMIT")
+
+    def remove(self, license_ids: list[str]):
+        self.db.executemany("DELETE FROM licenses WHERE license_id = ?",
+                            [(lid,) for lid in license_ids])
+
+    def close(self):
+        self.db.close()
+
 
 # ---------------------------------------------------------------------------
 # Main scraping logic
 # ---------------------------------------------------------------------------
 
-async def scrape_prefix(session: PSISession, prefix: str,
-                        writer_lock: asyncio.Lock, csv_writer,
-                        detail_sem: asyncio.Semaphore,
-                        checkpoint: Checkpoint) -> int:
-    """Scrape all records for a single license number prefix.
+async def search_prefix(session: PSISession, prefix: str,
+                        checkpoint: Checkpoint,
+                        tree: Optional[PrefixTree] = None) -> Optional[list[dict]]:
+    """Run every search page for a prefix; returns its rows, one per license.
 
-    Returns number of detail records fetched.
+    Pagination is server-side state, so the whole prefix stays on `session`.
+    With a prefix tree, the first page doubles as the count probe: a prefix
+    that has grown to the server cap is split in the tree instead of being
+    scraped, and the caller queues its children.
+
+    Returns None if there is nothing to fetch (no records, or split); the
+    prefix is then already marked complete.
     """
     # First search to get total count
     total, results = await session.search(prefix, start=1)
+    if tree is not None and total > 0:
+        if tree.record(prefix, total):
+            tree.save()
+            print(f"  [S{session.session_id}] Prefix {prefix} hit the {MAX_RESULTS_CAP} cap; "
+                  f"split into {prefix}0-{prefix}9", flush=True)
+            checkpoint.mark_complete(prefix, 0)
+            return None
     if total == 0:
         checkpoint.mark_complete(prefix, 0)
-        return 0
+        return None
 
     all_results = list(results)
 
@@ -575,7 +1345,6 @@ async def scrape_prefix(session: PSISession, prefix: str,
         pages = (total + RECORDS_PER_PAGE - 1) // RECORDS_PER_PAGE
         for page in range(1, pages):  # page 0 already fetched
             start = page * RECORDS_PER_PAGE + 1
-            await asyncio.sleep(SEARCH_DELAY)
             page_total, page_results = await session.search(prefix, start=start)
             if not page_results:
                 break  # No more results
@@ -589,42 +1358,181 @@ async def scrape_prefix(session: PSISession, prefix: str,
         if lid and lid not in seen_ids:
             seen_ids.add(lid)
             unique_results.append(r)
+    return unique_results
+
+
+def merge_search_row(detail: dict, search_row: dict) -> dict:
+    """Fill gaps in a parsed detail page from its search result row."""
+    if not detail.get("license_number"):
+        detail["license_number"] = search_row.get("license_number", "")
+    if not detail.get("company_name"):
+        detail["company_name"] = search_row.get("company_name", "")
+    if not detail.get("license_status"):
+        detail["license_status"] = search_row.get("status", "")
+    if not detail.get("expiry_date"):
+        detail["expiry_date"] = search_row.get("expiry_date", "")
+
+    detail["license_id"] = search_row.get("license_id", "")
+    detail["license_application_id"] = search_row.get("license_application_id", "")
+    return detail
+
+
+async def write_detail(prefix: str, detail: dict, writer_lock: asyncio.Lock,
+                       csv_writer, checkpoint: Checkpoint):
+    """Journal, then write to CSV (and queue for Postgres staging with --stage)."""
+    record = {col: detail.get(col, "") for col in CSV_COLUMNS}
+    async with writer_lock:
+        checkpoint.record_detail(prefix, detail["license_id"], record)
+        row = [detail.get(col, "") for col in CSV_COLUMNS]
+        csv_writer.writerow(row)
+    if _staging_sink is not None:
+        _staging_sink.add(record)
+    if _metrics is not None:
+        _metrics.records()
+
+
+_staging_sink = None  # psi_staging.StagingSink when --stage is given
+
+
+def enable_staging():
+    """Stream every written record into Postgres staging (--stage).
+
+    Imported here so psycopg2 is only needed when staging is on.
+    """
+    global _staging_sink
+    from ingest_nm import get_pg
+    from psi_staging import StagingSink
+    _staging_sink = StagingSink(get_pg)
+    if _metrics is not None:
+        _metrics.watch("queue_depth", lambda: len(_staging_sink.buffer), queue="staging")
+
+
+async def close_staging():
+    """Flush the staging sink, if any, and print its summary."""
+    if _staging_sink is not None:
+        await _staging_sink.close()
+        print(f"  {_staging_sink.summary()}")
+
+
+_metrics = None  # scrape_metrics.ScrapeMetrics when --metrics-file/--metrics-port is given
+
+
+def enable_metrics(textfile: Optional[Path], port: Optional[int]):
+    """Export live metrics (Prometheus textfile and/or localhost HTTP).
+
+    scrape_metrics.py is shared with the MN scraper, one directory up. The
+    final snapshot (running=0) is written by close_metrics() on a clean exit
+    only; after a crash the last snapshot keeps running=1 and goes stale.
+    """
+    global _metrics
+    sys.path.insert(0, str(SCRIPT_DIR.parent))
+    from scrape_metrics import ScrapeMetrics
+    _metrics = ScrapeMetrics("nm_psi", textfile, port).start()
+    print(f"  {_metrics.describe()}")
+
+
+def close_metrics():
+    """Write the final snapshot (running=0) after a clean run."""
+    if _metrics is not None:
+        _metrics.close()
+
+
+def watch_run(sessions: list[PSISession], prefix_queue: asyncio.Queue):
+    """Export the prefix queue depth and each session's adaptive limits."""
+    if _metrics is None:
+        return
+    _metrics.watch("queue_depth", prefix_queue.qsize, queue="prefixes")
+    for s in sessions:
+        for limiter in (s.search_limiter, s.detail_limiter):
+            _metrics.watch("concurrency_limit", lambda l=limiter: l.limit,
+                           session=s.session_id, kind=limiter.name)
 
-    # Fetch details for each result
-    detail_count = 0
-    for search_row in unique_results:
+
+async def scrape_prefix(session: PSISession, prefix: str,
+                        writer_lock: asyncio.Lock, csv_writer,
+                        detail_sem: asyncio.Semaphore,
+                        checkpoint: Checkpoint,
+                        tree: Optional[PrefixTree] = None) -> int:
+    """Scrape all records for a single license number prefix on one session.
+
+    Returns number of detail records fetched.
+    """
+    unique_results = await search_prefix(session, prefix, checkpoint, tree)
+    if unique_results is None:
+        return 0
+
+    # Fetch details concurrently, bounded by the session's adaptive limit and
+    # by detail_sem across sessions. Each row is written and journaled as soon
+    # as its detail arrives; retry backoff happens outside both so a failing
+    # license doesn't hold a slot.
+    # Licenses journaled by an interrupted run are not fetched again.
+    async def fetch_and_write(search_row: dict) -> bool:
         lid = search_row.get("license_id", "")
         laid = search_row.get("license_application_id", "")
-        if not lid:
-            continue
+        if checkpoint.is_fetched(lid):
+            return True
 
-        async with detail_sem:
-            await asyncio.sleep(DETAIL_DELAY)
-            detail = await session.fetch_detail(lid, laid)
+        detail = None
+        for attempt in range(MAX_RETRIES):
+            try:
+                async with session.detail_limiter, detail_sem:
+                    detail = await session.fetch_detail_once(lid, laid)
+                break
+            except Exception as e:
+                if attempt < MAX_RETRIES - 1:
+                    session.note_retry("detail")
+                    await asyncio.sleep(RETRY_BASE_DELAY * (2 ** attempt))
+                else:
+                    print(f"  [S{session.session_id}] Detail failed id={lid}: {e}")
 
-        if detail:
-            # Merge search row data as fallback
-            if not detail.get("license_number"):
-                detail["license_number"] = search_row.get("license_number", "")
-            if not detail.get("company_name"):
-                detail["company_name"] = search_row.get("company_name", "")
-            if not detail.get("license_status"):
-                detail["license_status"] = search_row.get("status", "")
-            if not detail.get("expiry_date"):
-                detail["expiry_date"] = search_row.get("expiry_date", "")
+        if not detail:
+            return False
+        await write_detail(prefix, merge_search_row(detail, search_row),
+                           writer_lock, csv_writer, checkpoint)
+        return True
+
+    fetched = await asyncio.gather(*(
+        fetch_and_write(r) for r in unique_results if r.get("license_id")
+    ))
+    detail_count = sum(fetched)
 
-            detail["license_id"] = lid
-            detail["license_application_id"] = laid
+    finish_prefix(checkpoint, prefix, detail_count, len(fetched) - detail_count)
+    return detail_count
 
-            # Write to CSV
-            async with writer_lock:
-                row = [detail.get(col, "") for col in CSV_COLUMNS]
-                csv_writer.writerow(row)
 
-            detail_count += 1
+def finish_prefix(checkpoint: Checkpoint, prefix: str, fetched: int, failed: int):
+    """Mark a prefix complete, unless some of its details were never fetched.
 
-    checkpoint.mark_complete(prefix, detail_count)
-    return detail_count
+    An incomplete prefix is searched again on --resume; licenses already in
+    the journal are skipped, so only the failed ones are refetched.
+    """
+    if failed:
+        print(f"  Prefix {prefix}: {failed} detail(s) failed; left for --resume", flush=True)
+        return
+    checkpoint.mark_complete(prefix, fetched)
+
+
+async def record_progress(tag: str, prefix: str, count: int, stats: dict,
+                          writer_lock: asyncio.Lock, csv_file, limits: str):
+    """Count a finished prefix and print a progress line."""
+    stats["prefixes_done"] += 1
+    stats["details_fetched"] += count
+    if _metrics is not None:
+        _metrics.prefix_done(stats["total_prefixes"])
+
+    # Flush CSV to disk every 10 prefixes
+    if stats["prefixes_done"] % 10 == 0:
+        async with writer_lock:
+            csv_file.flush()
+
+    elapsed = time.time() - stats["start_time"]
+    rate = stats["details_fetched"] / elapsed if elapsed > 0 else 0
+    pct = stats["prefixes_done"] / stats["total_prefixes"] * 100
+    print(f"  [{tag}] Prefix {prefix}: {count} details | "
+          f"Progress: {stats['prefixes_done']}/{stats['total_prefixes']} ({pct:.1f}%) | "
+          f"Total: {stats['details_fetched']} @ {rate:.1f}/s | "
+          f"{limits}",
+          flush=True)
 
 
 async def worker(worker_id: int, session: PSISession,
@@ -633,7 +1541,8 @@ async def worker(worker_id: int, session: PSISession,
                  csv_file,
                  detail_sem: asyncio.Semaphore,
                  checkpoint: Checkpoint,
-                 stats: dict):
+                 stats: dict,
+                 tree: Optional[PrefixTree] = None):
     """Worker that processes prefixes from the queue."""
     while True:
         try:
@@ -644,31 +1553,309 @@ async def worker(worker_id: int, session: PSISession,
         try:
             count = await scrape_prefix(
                 session, prefix, writer_lock, csv_writer,
-                detail_sem, checkpoint
+                detail_sem, checkpoint, tree
             )
-            stats["prefixes_done"] += 1
-            stats["details_fetched"] += count
-
-            # Flush CSV to disk every 10 prefixes
-            if stats["prefixes_done"] % 10 == 0:
-                async with writer_lock:
-                    csv_file.flush()
-
-            # Progress
-            elapsed = time.time() - stats["start_time"]
-            rate = stats["details_fetched"] / elapsed if elapsed > 0 else 0
-            pct = stats["prefixes_done"] / stats["total_prefixes"] * 100
-            print(f"  [W{worker_id}] Prefix {prefix}: {count} details | "
-                  f"Progress: {stats['prefixes_done']}/{stats['total_prefixes']} ({pct:.1f}%) | "
-                  f"Total: {stats['details_fetched']} @ {rate:.1f}/s",
-                  flush=True)
+            if tree is not None and tree.is_split(prefix):
+                for child in tree.children(prefix):
+                    prefix_queue.put_nowait(child)
+                stats["total_prefixes"] += 10
+            await record_progress(f"W{worker_id}", prefix, count, stats,
+                                  writer_lock, csv_file, session.limits())
+
+        except Exception as e:
+            print(f"  [W{worker_id}] ERROR on prefix {prefix}: {e}", flush=True)
+
+        prefix_queue.task_done()
+
+
+class DetailPool:
+    """Stage two of a multi-session run: detail fetches any session can serve.
+
+    Search pagination needs its own session's server-side context, but a
+    detail page only needs licenseId and licenseApplicationId. Search
+    workers submit() each prefix's rows here; every session runs one puller
+    per slot of its detail ceiling, and a puller only takes a job once its
+    session's AdaptiveLimiter grants a slot. Work therefore flows to the
+    sessions that currently have capacity, and a slow session no longer
+    holds a whole prefix's backlog. There is no pool-wide cap: total
+    concurrency follows the sum of the sessions' limits. A failed fetch goes
+    back on the queue after backoff, where any session may take it. A prefix
+    is marked complete once its last job finishes, and only if every detail
+    was fetched; otherwise --resume searches it again and fetches just the
+    licenses missing from the journal.
+    """
+
+    def __init__(self, sessions: list[PSISession], writer_lock: asyncio.Lock,
+                 csv_writer, csv_file, checkpoint: Checkpoint, stats: dict):
+        self.sessions = sessions
+        self.writer_lock = writer_lock
+        self.csv_writer = csv_writer
+        self.csv_file = csv_file
+        self.checkpoint = checkpoint
+        self.stats = stats
+        # Bounded, so search workers wait instead of running far ahead
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=DETAIL_BACKLOG)
+        self.served = {s.session_id: 0 for s in sessions}
+        self.refetch = False  # True: fetch even licenses already in the journal
+        self.fetched_ids: set[str] = set()
+        self._tasks: list[asyncio.Task] = []
+        self._retries: set[asyncio.Task] = set()
+
+    def start(self):
+        if _metrics is not None:
+            _metrics.watch("queue_depth", self.queue.qsize, queue="details")
+        for session in self.sessions:
+            for _ in range(session.detail_limiter.ceiling):
+                self._tasks.append(asyncio.create_task(self._serve(session)))
+
+    async def submit(self, session: PSISession, prefix: str, rows: Optional[list[dict]]):
+        """Queue a prefix's detail jobs (None: search_prefix already finished it)."""
+        if rows is None:
+            await self._report(session, prefix, 0)
+            return
+        state = {"prefix": prefix, "pending": 0, "fetched": 0, "failed": 0}
+        jobs = []
+        for row in rows:
+            if not row.get("license_id"):
+                continue
+            if not self.refetch and self.checkpoint.is_fetched(row["license_id"]):
+                state["fetched"] += 1
+            else:
+                jobs.append(row)
+        state["pending"] = len(jobs)
+        if not jobs:
+            await self._finish(session, state)
+            return
+        for row in jobs:
+            await self.queue.put((state, row, 0))
+
+    async def drain(self):
+        """Wait for every queued job (including retries), then stop the pullers."""
+        await self.queue.join()
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _serve(self, session: PSISession):
+        while True:
+            async with session.detail_limiter:
+                state, row, attempt = await self.queue.get()
+                lid = row["license_id"]
+                detail = None
+                try:
+                    detail = await session.fetch_detail_once(
+                        lid, row.get("license_application_id", ""))
+                except Exception as e:
+                    if attempt < MAX_RETRIES - 1:
+                        session.note_retry("detail")
+                        # Back off without holding a slot; the queue keeps
+                        # counting the job until it is back in line.
+                        retry = asyncio.create_task(self._requeue((state, row, attempt + 1)))
+                        self._retries.add(retry)
+                        retry.add_done_callback(self._retries.discard)
+                        continue
+                    print(f"  [S{session.session_id}] Detail failed id={lid}: {e}", flush=True)
+                try:
+                    if detail:
+                        await write_detail(state["prefix"], merge_search_row(detail, row),
+                                           self.writer_lock, self.csv_writer, self.checkpoint)
+                        state["fetched"] += 1
+                        self.served[session.session_id] += 1
+                        self.fetched_ids.add(lid)
+                    else:
+                        state["failed"] += 1
+                    state["pending"] -= 1
+                    if state["pending"] == 0:
+                        await self._finish(session, state)
+                except Exception as e:
+                    print(f"  [S{session.session_id}] ERROR writing id={lid}: {e}", flush=True)
+                finally:
+                    self.queue.task_done()
+
+    async def _requeue(self, job: tuple):
+        await asyncio.sleep(RETRY_BASE_DELAY * (2 ** (job[2] - 1)))
+        await self.queue.put(job)
+        self.queue.task_done()
+
+    async def _finish(self, session: PSISession, state: dict):
+        finish_prefix(self.checkpoint, state["prefix"], state["fetched"], state["failed"])
+        await self._report(session, state["prefix"], state["fetched"])
+
+    async def _report(self, session: PSISession, prefix: str, count: int):
+        await record_progress(f"S{session.session_id}", prefix, count, self.stats,
+                              self.writer_lock, self.csv_file, session.limits())
+
+
+async def search_worker(worker_id: int, session: PSISession,
+                        prefix_queue: asyncio.Queue, pool: DetailPool,
+                        checkpoint: Checkpoint, stats: dict,
+                        tree: Optional[PrefixTree] = None):
+    """Stage one of a multi-session run: search prefixes on one session and
+    hand their rows to the shared detail pool."""
+    while True:
+        try:
+            prefix = prefix_queue.get_nowait()
+        except asyncio.QueueEmpty:
+            break
 
+        try:
+            rows = await search_prefix(session, prefix, checkpoint, tree)
+            if tree is not None and tree.is_split(prefix):
+                for child in tree.children(prefix):
+                    prefix_queue.put_nowait(child)
+                stats["total_prefixes"] += 10
+            await pool.submit(session, prefix, rows)
         except Exception as e:
             print(f"  [W{worker_id}] ERROR on prefix {prefix}: {e}", flush=True)
 
         prefix_queue.task_done()
 
 
+async def refresh_prefixes(sessions: list[PSISession], prefix_queue: asyncio.Queue,
+                           writer_lock: asyncio.Lock, csv_writer, csv_file,
+                           checkpoint: Checkpoint, stats: dict,
+                           tree: Optional[PrefixTree] = None) -> DetailPool:
+    """--refresh: search every prefix, fetch details only for what changed.
+
+    Each search row is fingerprinted and compared with the last snapshot.
+    Only new licenses and ones whose fingerprint changed go to the detail
+    pool. Licenses in the snapshot that a cleanly searched prefix no longer
+    lists have disappeared; they are dropped from the journal. The change
+    set (added / changed / disappeared) is written next to the CSV. The
+    snapshot only moves forward for licenses whose detail was fetched, so
+    failures are retried by the next refresh.
+    """
+    snapshot = SearchSnapshot()
+    known = snapshot.load()
+    if not known:
+        print("  No snapshot yet: every license counts as added and this run sets the baseline")
+    seen: dict[str, tuple[str, dict]] = {}
+    changes: dict[str, str] = {}
+    clean_prefixes: set[str] = set()
+
+    pool = DetailPool(sessions, writer_lock, csv_writer, csv_file, checkpoint, stats)
+    pool.refetch = True
+    pool.start()
+
+    async def search_and_diff(worker_id: int, session: PSISession):
+        while True:
+            try:
+                prefix = prefix_queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+
+            try:
+                failures = session.search_failures
+                rows = await search_prefix(session, prefix, checkpoint, tree)
+                if tree is not None and tree.is_split(prefix):
+                    for child in tree.children(prefix):
+                        prefix_queue.put_nowait(child)
+                    stats["total_prefixes"] += 10
+                elif session.search_failures == failures:
+                    clean_prefixes.add(prefix)
+                changed_rows = []
+                for row in rows or []:
+                    lid = row["license_id"]
+                    seen[lid] = (prefix, row)
+                    old = known.get(lid)
+                    if old is None:
+                        changes[lid] = "added"
+                    elif old["fingerprint"] != fingerprint(row):
+                        changes[lid] = "changed"
+                    else:
+                        continue
+                    changed_rows.append(row)
+                await pool.submit(session, prefix, None if rows is None else changed_rows)
+            except Exception as e:
+                print(f"  [W{worker_id}] ERROR on prefix {prefix}: {e}", flush=True)
+
+            prefix_queue.task_done()
+
+    await asyncio.gather(*(search_and_diff(i, s) for i, s in enumerate(sessions)))
+    await pool.drain()
+
+    def covered(license_number: str) -> bool:
+        return any(license_number[:k] in clean_prefixes for k in range(1, len(license_number) + 1))
+
+    disappeared = sorted(lid for lid, old in known.items()
+                         if lid not in seen and covered(old["license_number"]))
+    fetched = {lid: kind for lid, kind in changes.items() if lid in pool.fetched_ids}
+
+    RAW_DIR.mkdir(parents=True, exist_ok=True)
+    changes_csv = RAW_DIR / f"nm_psi_changes_{datetime.now():%Y%m%d_%H%M%S}.csv"
+    with open(changes_csv, "w", newline="", encoding="utf-8") as f:
+        changes_writer = csv.writer(f)
+        changes_writer.writerow(["change", "changed_fields"] + CSV_COLUMNS)
+        for lid in sorted(fetched, key=lambda lid: seen[lid][1].get("license_number", "")):
+            new_row = seen[lid][1]
+            fields = "" if fetched[lid] == "added" else " ".join(
+                f for f in FINGERPRINT_FIELDS
+                if (known[lid]["row"].get(f) or "").strip() != (new_row.get(f) or "").strip())
+            record = checkpoint.get_detail(lid) or {}
+            changes_writer.writerow([fetched[lid], fields] + [record.get(c, "") for c in CSV_COLUMNS])
+        for lid in disappeared:
+            old = known[lid]
+            record = checkpoint.get_detail(lid) or {
+                "license_id": lid,
+                "license_number": old["license_number"],
+                "company_name": old["row"].get("company_name", ""),
+            }
+            changes_writer.writerow(["disappeared", ""] + [record.get(c, "") for c in CSV_COLUMNS])
+            checkpoint.forget(lid)
+
+    snapshot.update({lid: v for lid, v in seen.items()
+                     if lid not in changes or lid in pool.fetched_ids})
+    snapshot.remove(disappeared)
+    snapshot.close()
+
+    added = sum(kind == "added" for kind in fetched.values())
+    print(f"\n  Refresh: {len(seen)} licenses listed, {len(seen) - len(changes)} unchanged | "
+          f"{added} added, {len(fetched) - added} changed, {len(disappeared)} disappeared, "
+          f"{len(changes) - len(fetched)} detail fetches failed (retried next refresh)")
+    print(f"  Change set: {changes_csv}")
+    return pool
+
+
+async def discover_prefix_tree(sessions: list[PSISession], tree: PrefixTree) -> int:
+    """Re-probe every leaf with count-only searches, splitting any at the cap.
+
+    An empty tree starts from the roots 1-9. Split children are probed in the
+    same pass, so the tree is complete when the queue drains. Over-split
+    nodes are merged back afterwards. Returns the number of failed probes;
+    those leaves keep their previous counts.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    for prefix in tree.leaves() or [str(d) for d in range(1, 10)]:
+        queue.put_nowait(prefix)
+    failed = 0
+
+    async def prober(session: PSISession):
+        nonlocal failed
+        while True:
+            prefix = await queue.get()
+            try:
+                count = await session.probe_count(prefix)
+                if count is None:
+                    failed += 1
+                else:
+                    for child in tree.record(prefix, count):
+                        queue.put_nowait(child)
+            finally:
+                queue.task_done()
+
+    print(f"  Probing {queue.qsize()} prefixes with {len(sessions)} session(s)...")
+    tasks = [asyncio.create_task(prober(s)) for s in sessions]
+    await queue.join()
+    for t in tasks:
+        t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    merged = tree.collapse()
+    tree.save()
+    print(f"  Prefix tree: {tree.summary()}; merged {merged}, {failed} probes failed")
+    return failed
+
+
 async def prepare_sessions(num_sessions: int):
     """Create sessions and download CAPTCHAs for manual solving."""
     sessions = []
@@ -698,7 +1885,9 @@ async def prepare_sessions(num_sessions: int):
 
 
 async def run_scrape(captcha_answers: list[str], limit_prefixes: int = 0,
-                     resume: bool = False):
+                     resume: bool = False, discover: bool = False,
+                     archive: Optional[ResponseArchive] = None,
+                     refresh: bool = False):
     """Main scraping entry point."""
     num_sessions = len(captcha_answers)
     print(f"=== NM PSI Contractor Scraper ===")
@@ -711,7 +1900,7 @@ async def run_scrape(captcha_answers: list[str], limit_prefixes: int = 0,
         print(f"  Reusing {len(session_info)} prepared sessions")
         sessions = []
         for i, info in enumerate(session_info[:num_sessions]):
-            s = PSISession(i)
+            s = PSISession(i, archive=archive)
             await s.create(reuse_jsessionid=info["jsessionid"])
             s.set_captcha(captcha_answers[i])
             sessions.append(s)
@@ -720,7 +1909,7 @@ async def run_scrape(captcha_answers: list[str], limit_prefixes: int = 0,
         print("  Creating fresh sessions...")
         sessions = []
         for i in range(num_sessions):
-            s = PSISession(i)
+            s = PSISession(i, archive=archive)
             await s.create()
             captcha_path = CAPTCHA_DIR / f"captcha_{i}.jpg"
             await s.download_captcha(captcha_path)
@@ -746,17 +1935,25 @@ async def run_scrape(captcha_answers: list[str], limit_prefixes: int = 0,
         return
 
     # Build prefix list
-    all_prefixes = build_prefix_list()
+    tree = PrefixTree.load_or_seed()
+    if discover:
+        await discover_prefix_tree(sessions, tree)
+    all_prefixes = tree.leaves()
     print(f"  Total prefixes to search: {len(all_prefixes)}")
 
     # Load checkpoint
     checkpoint = Checkpoint(CHECKPOINT_FILE)
-    if resume:
+    if refresh:
+        # Unchanged licenses keep their journaled records; every prefix is searched
+        checkpoint.load()
+        print(f"  Refresh: {checkpoint.total_details} records in the journal")
+    elif resume:
         checkpoint.load()
         print(f"  Resuming: {len(checkpoint.completed_prefixes)} prefixes already done")
 
     # Filter out completed prefixes
-    remaining = [p for p in all_prefixes if p not in checkpoint.completed_prefixes]
+    remaining = [p for p in all_prefixes
+                 if refresh or p not in checkpoint.completed_prefixes]
     if limit_prefixes > 0:
         remaining = remaining[:limit_prefixes]
     print(f"  Prefixes to process: {len(remaining)}")
@@ -772,7 +1969,7 @@ async def run_scrape(captcha_answers: list[str], limit_prefixes: int = 0,
 
     # Set up CSV
     RAW_DIR.mkdir(parents=True, exist_ok=True)
-    file_mode = "a" if resume and OUTPUT_CSV.exists() else "w"
+    file_mode = "a" if (resume or refresh) and OUTPUT_CSV.exists() else "w"
     csv_file = open(OUTPUT_CSV, file_mode, newline="", encoding="utf-8")
     csv_writer = csv.writer(csv_file)
     if file_mode == "w":
@@ -783,8 +1980,7 @@ async def run_scrape(captcha_answers: list[str], limit_prefixes: int = 0,
     prefix_queue = asyncio.Queue()
     for p in remaining:
         prefix_queue.put_nowait(p)
-
-    detail_sem = asyncio.Semaphore(MAX_CONCURRENT_DETAILS)
+    watch_run(sessions, prefix_queue)
 
     stats = {
         "start_time": time.time(),
@@ -793,37 +1989,52 @@ async def run_scrape(captcha_answers: list[str], limit_prefixes: int = 0,
         "total_prefixes": len(remaining),
     }
 
-    # Launch workers - one per session
-    tasks = []
-    for i, session in enumerate(sessions):
-        t = asyncio.create_task(
-            worker(i, session, prefix_queue, writer_lock, csv_writer,
-                   csv_file, detail_sem, checkpoint, stats)
-        )
-        tasks.append(t)
-
-    await asyncio.gather(*tasks)
+    # Two stages: one search worker per session (pagination is per-session
+    # server state); detail jobs go to a pool that every session serves.
+    if refresh:
+        pool = await refresh_prefixes(sessions, prefix_queue, writer_lock, csv_writer,
+                                      csv_file, checkpoint, stats, tree)
+    else:
+        pool = DetailPool(sessions, writer_lock, csv_writer, csv_file, checkpoint, stats)
+        pool.start()
+        await asyncio.gather(*(
+            search_worker(i, session, prefix_queue, pool, checkpoint, stats, tree)
+            for i, session in enumerate(sessions)
+        ))
+        await pool.drain()
 
     # Final save
     checkpoint.save()
     csv_file.close()
+    csv_rows = checkpoint.compact_csv()
+    tree.collapse()
+    tree.save()
 
     elapsed = time.time() - stats["start_time"]
     print(f"\n=== Scraping Complete ===")
     print(f"  Duration: {elapsed:.0f}s ({elapsed/60:.1f} min)")
     print(f"  Prefixes processed: {stats['prefixes_done']}")
     print(f"  Detail records: {stats['details_fetched']}")
-    print(f"  Output: {OUTPUT_CSV}")
+    print(f"  Output: {OUTPUT_CSV} ({csv_rows} unique rows)")
+    print(f"  Prefix tree: {tree.summary()}")
 
     # Session stats
     for s in sessions:
-        print(f"  Session {s.session_id}: {s.search_count} searches, {s.detail_count} details")
+        print(f"  Session {s.session_id}: {s.search_count} searches, {pool.served[s.session_id]} details | "
+              f"{s.limits()} after {s.search_limiter.changes + s.detail_limiter.changes} changes "
+              f"(last: {s.detail_limiter.reason})")
         await s.close()
+    print(f"  {get_parser_pool().summary()}")
+    get_parser_pool().close()
+    await close_staging()
 
 
 async def single_session_scrape(captcha_answers: list[str],
                                 limit_prefixes: int = 0,
-                                resume: bool = False):
+                                resume: bool = False,
+                                discover: bool = False,
+                                archive: Optional[ResponseArchive] = None,
+                                refresh: bool = False):
     """Scrape using a single interactive session (simplest mode).
 
     If session_info.json exists from --prepare-sessions, reuses that session.
@@ -831,7 +2042,7 @@ async def single_session_scrape(captcha_answers: list[str],
     """
     print("=== NM PSI Contractor Scraper (Single Session) ===")
 
-    session = PSISession(0)
+    session = PSISession(0, archive=archive, detail_ceiling=DETAIL_SEMAPHORE_PER_SESSION)
 
     # Always create a fresh session (JSESSIONID reuse across processes is unreliable)
     await session.create()
@@ -857,14 +2068,21 @@ async def single_session_scrape(captcha_answers: list[str],
     print("  Session authenticated!")
 
     # Run single-session scrape
-    all_prefixes = build_prefix_list()
+    tree = PrefixTree.load_or_seed()
+    if discover:
+        await discover_prefix_tree([session], tree)
+    all_prefixes = tree.leaves()
 
     checkpoint = Checkpoint(CHECKPOINT_FILE)
-    if resume:
+    if refresh:
+        checkpoint.load()
+        print(f"  Refresh: {checkpoint.total_details} records in the journal")
+    elif resume:
         checkpoint.load()
         print(f"  Resuming from checkpoint: {len(checkpoint.completed_prefixes)} done")
 
-    remaining = [p for p in all_prefixes if p not in checkpoint.completed_prefixes]
+    remaining = [p for p in all_prefixes
+                 if refresh or p not in checkpoint.completed_prefixes]
     if limit_prefixes > 0:
         remaining = remaining[:limit_prefixes]
 
@@ -874,7 +2092,7 @@ async def single_session_scrape(captcha_answers: list[str],
         checkpoint.started_at = datetime.now().isoformat()
 
     RAW_DIR.mkdir(parents=True, exist_ok=True)
-    file_mode = "a" if resume and OUTPUT_CSV.exists() else "w"
+    file_mode = "a" if (resume or refresh) and OUTPUT_CSV.exists() else "w"
     csv_file = open(OUTPUT_CSV, file_mode, newline="", encoding="utf-8")
     csv_writer = csv.writer(csv_file)
     if file_mode == "w":
@@ -892,19 +2110,121 @@ async def single_session_scrape(captcha_answers: list[str],
     prefix_queue = asyncio.Queue()
     for p in remaining:
         prefix_queue.put_nowait(p)
+    watch_run([session], prefix_queue)
 
-    await worker(0, session, prefix_queue, writer_lock, csv_writer,
-                 csv_file, detail_sem, checkpoint, stats)
+    if refresh:
+        await refresh_prefixes([session], prefix_queue, writer_lock, csv_writer,
+                               csv_file, checkpoint, stats, tree)
+    else:
+        await worker(0, session, prefix_queue, writer_lock, csv_writer,
+                     csv_file, detail_sem, checkpoint, stats, tree)
 
     checkpoint.save()
     csv_file.close()
+    csv_rows = checkpoint.compact_csv()
+    tree.collapse()
+    tree.save()
     await session.close()
 
     elapsed = time.time() - stats["start_time"]
     print(f"\n=== Complete ===")
     print(f"  Duration: {elapsed:.0f}s")
     print(f"  Records: {stats['details_fetched']}")
-    print(f"  Output: {OUTPUT_CSV}")
+    print(f"  Limits: {session.limits()}")
+    print(f"  Output: {OUTPUT_CSV} ({csv_rows} unique rows)")
+    print(f"  Prefix tree: {tree.summary()}")
+    print(f"  {get_parser_pool().summary()}")
+    get_parser_pool().close()
+    await close_staging()
+
+
+def replay_prefixes(fetched: dict[str, str]) -> list[str]:
+    """Choose the archived search prefixes a replay rebuilds from.
+
+    fetched maps each prefix archived at page 1 to its newest fetched_at.
+    The archive spans runs, so a prefix and its extensions can both be in
+    it; the newer side of each subtree wins. A prefix split mid-run was
+    archived at page 1 just before its children were searched, while one
+    merged back by PrefixTree.collapse() is searched in full by a later
+    run, after its old children.
+    """
+    children: dict[str, list[str]] = {p: [] for p in fetched}
+    roots = []
+    for p in sorted(fetched):
+        parent = next((p[:i] for i in range(len(p) - 1, 0, -1) if p[:i] in fetched), None)
+        (children[parent] if parent else roots).append(p)
+
+    newest: dict[str, str] = {}
+    for p in sorted(fetched, key=len, reverse=True):
+        newest[p] = max([fetched[p]] + [newest[c] for c in children[p]])
+
+    def choose(prefix: str) -> list[str]:
+        kids = children[prefix]
+        if not kids or fetched[prefix] >= max(newest[c] for c in kids):
+            return [prefix]
+        return [p for c in kids for p in choose(c)]
+
+    return [p for root in roots for p in choose(root)]
+
+
+async def run_replay(limit_prefixes: int = 0):
+    """Re-run the parse-and-write pipeline over archived responses, offline.
+
+    Writes REPLAY_CSV with its own checkpoint journal, so a replay never
+    touches the state of a live scrape.
+    """
+    print("=== NM PSI Contractor Scraper (Replay) ===")
+    source = ResponseArchive(ARCHIVE_DIR)
+    print(f"  {source.summary()}")
+
+    prefixes = replay_prefixes(source.latest_fetches("search", page=1))
+    if limit_prefixes > 0:
+        prefixes = prefixes[:limit_prefixes]
+    print(f"  Prefixes to replay: {len(prefixes)}")
+
+    checkpoint = Checkpoint(REPLAY_CHECKPOINT_FILE, REPLAY_CSV)
+    checkpoint.started_at = datetime.now().isoformat()
+    RAW_DIR.mkdir(parents=True, exist_ok=True)
+    csv_file = open(REPLAY_CSV, "w", newline="", encoding="utf-8")
+    csv_writer = csv.writer(csv_file)
+    csv_writer.writerow(CSV_COLUMNS)
+    writer_lock = asyncio.Lock()
+    detail_sem = asyncio.Semaphore(MAX_CONCURRENT_DETAILS)
+
+    prefix_queue = asyncio.Queue()
+    for p in prefixes:
+        prefix_queue.put_nowait(p)
+
+    stats = {
+        "start_time": time.time(),
+        "prefixes_done": 0,
+        "details_fetched": 0,
+        "total_prefixes": len(prefixes),
+    }
+
+    # Enough workers to keep the parser pool busy
+    sessions = [ReplaySession(i, source) for i in range(max(1, PARSE_WORKERS) * 2)]
+    watch_run(sessions, prefix_queue)
+    await asyncio.gather(*(
+        worker(i, s, prefix_queue, writer_lock, csv_writer,
+               csv_file, detail_sem, checkpoint, stats)
+        for i, s in enumerate(sessions)
+    ))
+
+    checkpoint.save()
+    csv_file.close()
+    csv_rows = checkpoint.compact_csv()
+    source.close()
+
+    elapsed = time.time() - stats["start_time"]
+    print(f"\n=== Replay Complete ===")
+    print(f"  Duration: {elapsed:.1f}s")
+    print(f"  Records: {stats['details_fetched']}")
+    print(f"  Requests missing from archive: {sum(s.missing for s in sessions)}")
+    print(f"  Output: {REPLAY_CSV} ({csv_rows} unique rows)")
+    print(f"  {get_parser_pool().summary()}")
+    get_parser_pool().close()
+    await close_staging()
 
 
 # ---------------------------------------------------------------------------
@@ -912,6 +2232,7 @@ async def single_session_scrape(captcha_answers: list[str],
 # ---------------------------------------------------------------------------
 
 def main():
+    global PARSE_WORKERS
     parser = argparse.ArgumentParser(description="Scrape NM CID contractors from PSI Exams")
     parser.add_argument("--prepare-sessions", type=int, metavar="N",
                         help="Create N sessions and download CAPTCHAs")
@@ -925,40 +2246,85 @@ def main():
                         help="Use single interactive session")
     parser.add_argument("--status", action="store_true",
                         help="Show checkpoint status")
+    parser.add_argument("--compact", action="store_true",
+                        help="Rebuild the output CSV from the checkpoint journal and exit")
+    parser.add_argument("--archive", action="store_true",
+                        help=f"Store every raw response in {ARCHIVE_DIR.name}/ for --replay")
+    parser.add_argument("--replay", action="store_true",
+                        help=f"Rebuild {REPLAY_CSV.name} from archived responses, no network")
+    parser.add_argument("--refresh", action="store_true",
+                        help="Search every prefix but fetch details only for new or changed "
+                             "licenses; writes a change set")
+    parser.add_argument("--stage", action="store_true",
+                        help="Also stream records into Postgres staging.nm_psi as they are scraped")
+    parser.add_argument("--metrics-file", type=Path, metavar="PATH",
+                        help="Write live metrics to a Prometheus textfile (e.g. for node_exporter)")
+    parser.add_argument("--metrics-port", type=int, metavar="PORT",
+                        help="Serve live metrics on http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--discover", action="store_true",
+                        help="Re-probe prefix counts and re-split the prefix tree before scraping")
+    parser.add_argument("--parse-workers", type=int, default=PARSE_WORKERS, metavar="N",
+                        help=f"HTML parser processes, 0 = parse inline (default {PARSE_WORKERS})")
     args = parser.parse_args()
+    PARSE_WORKERS = args.parse_workers
 
     if args.status:
         cp = Checkpoint(CHECKPOINT_FILE)
         cp.load()
-        all_prefixes = build_prefix_list()
+        tree = PrefixTree.load_or_seed()
+        all_prefixes = tree.leaves()
+        print(f"Prefix tree: {tree.summary()}")
         print(f"Total prefixes: {len(all_prefixes)}")
         print(f"Completed: {len(cp.completed_prefixes)}")
         print(f"Remaining: {len(all_prefixes) - len(cp.completed_prefixes)}")
-        print(f"Details fetched: {cp.total_details}")
+        print(f"Details fetched: {cp.total_details} (journal: {cp.journal_path.name})")
         print(f"Started: {cp.started_at}")
         if OUTPUT_CSV.exists():
             # Count lines
             with open(OUTPUT_CSV) as f:
                 lines = sum(1 for _ in f) - 1  # exclude header
             print(f"CSV rows: {lines}")
+        if (ARCHIVE_DIR / "index.db").exists():
+            archive = ResponseArchive(ARCHIVE_DIR)
+            print(archive.summary())
+            archive.close()
         return
 
-    if args.prepare_sessions:
-        asyncio.run(prepare_sessions(args.prepare_sessions))
+    if args.compact:
+        cp = Checkpoint(CHECKPOINT_FILE)
+        cp.load()
+        print(f"Wrote {cp.compact_csv()} unique rows to {OUTPUT_CSV}")
         return
 
-    answers = []
-    if args.captcha_answers:
-        answers = [a.strip() for a in args.captcha_answers.split(",")]
+    if args.metrics_file or args.metrics_port:
+        enable_metrics(args.metrics_file, args.metrics_port)
+    if args.stage:
+        enable_staging()
 
-    if args.single or len(answers) <= 1:
-        asyncio.run(single_session_scrape(
-            answers, args.limit_prefixes, args.resume
-        ))
+    if args.replay:
+        asyncio.run(run_replay(args.limit_prefixes))
+    elif args.prepare_sessions:
+        asyncio.run(prepare_sessions(args.prepare_sessions))
     else:
-        asyncio.run(run_scrape(
-            answers, args.limit_prefixes, args.resume
-        ))
+        answers = []
+        if args.captcha_answers:
+            answers = [a.strip() for a in args.captcha_answers.split(",")]
+
+        archive = ResponseArchive(ARCHIVE_DIR) if args.archive else None
+        if args.single or len(answers) <= 1:
+            asyncio.run(single_session_scrape(
+                answers, args.limit_prefixes, args.resume, args.discover, archive,
+                args.refresh
+            ))
+        else:
+            asyncio.run(run_scrape(
+                answers, args.limit_prefixes, args.resume, args.discover, archive,
+                args.refresh
+            ))
+        if archive is not None:
+            print(f"  {archive.summary()}")
+            archive.close()
+    close_metrics()
 
 
 if __name__ == "__main__":
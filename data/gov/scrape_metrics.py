@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Live metrics for the gov-data scrapers, in Prometheus text format.
+
+NM/scrape_nm_psi.py and MN/scrape_mn_wc.py both report through a
+ScrapeMetrics: per-session request counts, latency histograms, error and
+retry counters, queue depths, records written and records per second.
+Nothing here touches the network unless asked, and only the standard
+library is used, so the scrapers run unchanged without it.
+
+Two ways out, either or both:
+  textfile  rewritten every METRICS_INTERVAL seconds via a temp file and
+            os.replace(), so node_exporter's textfile collector never reads
+            a half-written file (name it *.prom inside the collector dir)
+  port      a tiny HTTP server on 127.0.0.1 serving GET /metrics
+
+Every series carries a job label ("nm_psi", "mn_wc"). govscrape_running
+drops to 0 when the scraper exits cleanly; a textfile whose
+govscrape_last_update_timestamp_seconds stops moving means it died.
+
+Usage:
+  python3 scrape_nm_psi.py ... --metrics-file /var/lib/node_exporter/nm_psi.prom
+  python3 scrape_mn_wc.py --metrics-port 9464
+"""
+
+import contextlib
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Optional
+
+METRIC_PREFIX = "govscrape_"
+METRICS_INTERVAL = 15.0  # Seconds between textfile writes / rate samples
+RATE_WINDOW = 60.0  # records_per_second is averaged over this many seconds
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# name -> (type, help)
+METRICS = {
+    "running": ("gauge", "1 while the scraper is running, 0 after a clean exit"),
+    "start_time_seconds": ("gauge", "Unix time the scraper started"),
+    "last_update_timestamp_seconds": ("gauge", "Unix time these metrics were rendered"),
+    "requests_total": ("counter", "Portal requests finished, by session and kind"),
+    "request_errors_total": ("counter", "Portal requests that failed, by error"),
+    "retries_total": ("counter", "Failed requests that were retried"),
+    "request_duration_seconds": ("histogram", "Portal request latency"),
+    "records_total": ("counter", "Records written to the output"),
+    "records_per_second": ("gauge", f"Records written per second over the last {RATE_WINDOW:.0f}s"),
+    "last_record_timestamp_seconds": ("gauge", "Unix time the last record was written"),
+    "prefixes_done_total": ("counter", "Search prefixes finished"),
+    "prefixes_total": ("gauge", "Search prefixes known so far (grows as prefixes split)"),
+    "queue_depth": ("gauge", "Items waiting in a work queue"),
+    "concurrency_limit": ("gauge", "Current adaptive concurrency limit"),
+}
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class ScrapeMetrics:
+    """Thread-safe metric registry with textfile and localhost HTTP export."""
+
+    def __init__(self, job: str, textfile: Optional[Path] = None,
+                 port: Optional[int] = None, interval: float = METRICS_INTERVAL):
+        self.job = job
+        self.textfile = Path(textfile) if textfile else None
+        self.port = port
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._values: dict[tuple, float] = {}
+        self._histograms: dict[tuple, list] = {}  # key -> [bucket counts, sum, count]
+        self._watches: list[tuple[str, tuple, Callable[[], float]]] = []
+        self._rate_samples: deque = deque()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._server: Optional[ThreadingHTTPServer] = None
+        self.set("running", 1)
+        self.set("start_time_seconds", time.time())
+
+    def _key(self, name: str, labels: dict) -> tuple:
+        if name not in METRICS:
+            raise KeyError(f"unknown metric {name!r}")
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._values[key] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = [[0] * len(LATENCY_BUCKETS), 0.0, 0]
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if value <= bound:
+                    hist[0][i] += 1
+            hist[1] += value
+            hist[2] += 1
+
+    def watch(self, name: str, fn: Callable[[], float], **labels):
+        """Gauge read from fn() at render time (queue sizes, live limits)."""
+        key = self._key(name, labels)
+        with self._lock:
+            self._watches.append((key[0], key[1], fn))
+
+    def request(self, session, kind: str, seconds: float, error: str = ""):
+        """One finished portal request: count, latency and (if failed) error."""
+        self.inc("requests_total", session=session, kind=kind)
+        self.observe("request_duration_seconds", seconds, session=session, kind=kind)
+        if error:
+            self.inc("request_errors_total", session=session, kind=kind, error=error)
+
+    def retry(self, session, kind: str):
+        self.inc("retries_total", session=session, kind=kind)
+
+    def records(self, count: int = 1):
+        self.inc("records_total", count)
+        self.set("last_record_timestamp_seconds", time.time())
+
+    def prefix_done(self, total: Optional[int] = None):
+        self.inc("prefixes_done_total")
+        if total is not None:
+            self.set("prefixes_total", total)
+
+    def _sample_rate(self):
+        now = time.monotonic()
+        with self._lock:
+            total = self._values.get(("records_total", ()), 0)
+        self._rate_samples.append((now, total))
+        while len(self._rate_samples) > 2 and now - self._rate_samples[1][0] >= RATE_WINDOW:
+            self._rate_samples.popleft()
+        t0, n0 = self._rate_samples[0]
+        self.set("records_per_second", (total - n0) / (now - t0) if now > t0 else 0.0)
+
+    def render(self) -> str:
+        """All series in Prometheus text exposition format."""
+        self.set("last_update_timestamp_seconds", time.time())
+        with self._lock:
+            values = dict(self._values)
+            histograms = {k: (list(h[0]), h[1], h[2]) for k, h in self._histograms.items()}
+            watches = list(self._watches)
+        for name, labels, fn in watches:
+            try:
+                values[(name, labels)] = float(fn())
+            except Exception:
+                pass  # A watched object that went away just drops out
+
+        job = (("job", self.job),)
+        lines = []
+        for name, (kind, help_text) in METRICS.items():
+            series = sorted((labels, v) for (n, labels), v in values.items() if n == name)
+            hists = sorted((labels, h) for (n, labels), h in histograms.items() if n == name)
+            if not series and not hists:
+                continue
+            full = METRIC_PREFIX + name
+            lines.append(f"# HELP {full} {help_text}")
+            lines.append(f"# TYPE {full} {kind}")
+            for labels, value in series:
+                lines.append(f"{full}{_labels(job + labels)} {_number(value)}")
+            for labels, (buckets, total, count) in hists:
+                for bound, n in zip(LATENCY_BUCKETS, buckets):
+                    le = (("le", _number(bound)),)
+                    lines.append(f"{full}_bucket{_labels(job + labels + le)} {n}")
+                lines.append(f"{full}_bucket{_labels(job + labels + (('le', '+Inf'),))} {count}")
+                lines.append(f"{full}_sum{_labels(job + labels)} {_number(round(total, 6))}")
+                lines.append(f"{full}_count{_labels(job + labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self):
+        """Atomically replace the textfile with the current metrics."""
+        if self.textfile is None:
+            return
+        self.textfile.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.textfile.parent, prefix=f".{self.textfile.name}.")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(self.render())
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, self.textfile)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.unlink(tmp)
+            raise
+
+    def start(self) -> "ScrapeMetrics":
+        """Start the sampling/textfile thread and the HTTP endpoint, if configured."""
+        if self.port:
+            metrics = self
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split("?")[0] not in ("/", "/metrics"):
+                        self.send_error(404)
+                        return
+                    body = metrics.render().encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, *args):
+                    pass
+
+            self._server = ThreadingHTTPServer(("127.0.0.1", self.port), Handler)
+            self._server.daemon_threads = True
+            threading.Thread(target=self._server.serve_forever, name="metrics-http",
+                             daemon=True).start()
+        self._sample_rate()
+        self.write_textfile()
+        self._thread = threading.Thread(target=self._run, name="metrics", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample_rate()
+            try:
+                self.write_textfile()
+            except OSError as e:
+                print(f"  [metrics] could not write {self.textfile}: {e}", flush=True)
+
+    def close(self):
+        """Write a final snapshot with running=0 and stop exporting."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._sample_rate()
+        self.set("running", 0)
+        self.write_textfile()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def describe(self) -> str:
+        targets = [str(self.textfile)] if self.textfile else []
+        if self.port:
+            targets.append(f"http://127.0.0.1:{self.port}/metrics")
+        return f"Metrics ({self.job}): " + ", ".join(targets)
+
@@ -0,0 +1,463 @@
+#!/usr/bin/env python3
+"""Offline benchmark for the service fallback layer.
+
+Starts a stand-in Convex HTTP server on localhost and drives resolve_chain,
+execute_with_fallback (sequential and hedged), execute_with_fallback_async,
+gather_with_fallback and execute_many against fake providers with scripted
+latency and error distributions. Shared state (chain cache, health, response
+cache, telemetry, log journal) goes to a temporary directory, so a run needs
+no network and leaves .cache/ alone.
+
+Reported per scenario: calls, provider attempts, failed calls, throughput,
+p50/p95/p99 latency per call, and overhead per attempt (wall time minus time
+spent inside providers, divided by attempts; sequential scenarios only).
+
+Usage:
+  python scripts/bench_service_chain.py
+  python scripts/bench_service_chain.py --list
+  python scripts/bench_service_chain.py --scenario overhead --scenario fallback --iterations 5000
+  python scripts/bench_service_chain.py --json
+  python scripts/bench_service_chain.py --max-overhead-us 500   # exit 1 above this (CI gate)
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+
+CAPABILITY = "bench_capability"
+AGENT = "bench"
+
+
+# ═══════════════════════════════════════════
+# STAND-IN CONVEX
+# ═══════════════════════════════════════════
+
+class _ConvexHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out in separate writes; without this, Nagle plus
+        # delayed ACKs add ~40ms per keep-alive round trip.
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        fn = body.get("path", "")
+        with self.server.lock:
+            self.server.calls[fn] = self.server.calls.get(fn, 0) + 1
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        value = self.server.chain if fn.startswith("services:resolveChain") else None
+        data = json.dumps({"status": "success", "value": value}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeConvex:
+    """Local HTTP server answering chain queries and accepting any mutation."""
+
+    def __init__(self, latency: float = 0.0):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _ConvexHandler)
+        self._server.daemon_threads = True
+        self._server.chain = []
+        self._server.calls = {}
+        self._server.latency = latency
+        self._server.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    @property
+    def calls(self) -> dict:
+        return dict(self._server.calls)
+
+    def set_chain(self, chain: list[dict]) -> None:
+        self._server.chain = chain
+
+    def start(self) -> None:
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+# ═══════════════════════════════════════════
+# FAKE PROVIDERS
+# ═══════════════════════════════════════════
+
+class FakeProvider:
+    """Provider with log-normal latency and scripted failure rates.
+
+    Each call draws one outcome: timeout (waits timeout_ms, raises
+    TimeoutError), rate limit (raises immediately), error (raises after the
+    latency draw) or success.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        median_ms: float = 0.0,
+        sigma: float = 0.5,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        timeout_rate: float = 0.0,
+        timeout_ms: float = 200.0,
+        seed: int = 0,
+    ):
+        self.name = name
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.timeout_rate = timeout_rate
+        self.timeout_ms = timeout_ms
+        self.service = {
+            "_id": f"bench_{name}",
+            "name": f"bench-{name}",
+            "displayName": f"Bench {name}",
+            "priority": 0,
+        }
+        self._rng = random.Random(f"{seed}:{name}")
+        self._lock = threading.Lock()
+        self.attempts = 0
+        self.busy = 0.0
+
+    def _draw(self) -> tuple[float, Optional[Exception]]:
+        with self._lock:
+            self.attempts += 1
+            roll = self._rng.random()
+            latency = (
+                self._rng.lognormvariate(math.log(self.median_ms), self.sigma) / 1000
+                if self.median_ms > 0 else 0.0
+            )
+        if roll < self.timeout_rate:
+            return self.timeout_ms / 1000, TimeoutError(f"{self.name} timed out")
+        roll -= self.timeout_rate
+        if roll < self.rate_limit_rate:
+            return 0.0, RuntimeError("429 rate limit exceeded")
+        roll -= self.rate_limit_rate
+        if roll < self.error_rate:
+            return latency, RuntimeError("500 internal error")
+        return latency, None
+
+    def _account(self, start: float) -> None:
+        with self._lock:
+            self.busy += time.perf_counter() - start
+
+    def call(self) -> dict:
+        start = time.perf_counter()
+        delay, error = self._draw()
+        try:
+            if delay:
+                time.sleep(delay)
+            if error is not None:
+                raise error
+            return {"provider": self.name}
+        finally:
+            self._account(start)
+
+    async def acall(self) -> dict:
+        start = time.perf_counter()
+        delay, error = self._draw()
+        try:
+            if delay:
+                await asyncio.sleep(delay)
+            if error is not None:
+                raise error
+            return {"provider": self.name}
+        finally:
+            self._account(start)
+
+
+# ═══════════════════════════════════════════
+# SCENARIOS
+# ═══════════════════════════════════════════
+
+# mode: resolve_warm | resolve_cold | sync | hedged | async | gather | many
+# health: False disables reordering/breakers so every call walks the chain.
+SCENARIOS: dict[str, dict] = {
+    "resolve_warm": {
+        "mode": "resolve_warm",
+        "providers": [{"name": "a"}],
+        "about": "resolve_chain served from the shared chain cache",
+    },
+    "resolve_cold": {
+        "mode": "resolve_cold",
+        "providers": [{"name": "a"}],
+        "about": "resolve_chain with a Convex HTTP round trip",
+    },
+    "overhead": {
+        "mode": "sync",
+        "providers": [{"name": "instant"}],
+        "about": "execute_with_fallback, one instant provider",
+    },
+    "fallback": {
+        "mode": "sync",
+        "health": False,
+        "providers": [{"name": "broken", "error_rate": 1.0}, {"name": "instant"}],
+        "about": "primary always fails instantly, secondary succeeds",
+    },
+    "flaky": {
+        "mode": "sync",
+        "scale": 0.1,
+        "providers": [
+            {"name": "flaky", "median_ms": 5, "error_rate": 0.10,
+             "rate_limit_rate": 0.05, "timeout_rate": 0.02, "timeout_ms": 50},
+            {"name": "steady", "median_ms": 10, "error_rate": 0.01},
+        ],
+        "about": "errors, rate limits and timeouts with health-based reordering",
+    },
+    "hedged": {
+        "mode": "hedged",
+        "scale": 0.1,
+        "hedge_after": 0.02,
+        "providers": [
+            {"name": "long_tail", "median_ms": 5, "sigma": 1.5},
+            {"name": "steady", "median_ms": 10, "sigma": 0.2},
+        ],
+        "about": "hedged mode against a long-tailed primary",
+    },
+    "async": {
+        "mode": "async",
+        "health": False,
+        "providers": [{"name": "broken", "error_rate": 1.0}, {"name": "instant"}],
+        "about": "execute_with_fallback_async, fallback on every call",
+    },
+    "gather": {
+        "mode": "gather",
+        "concurrency": 50,
+        "providers": [
+            {"name": "flaky", "median_ms": 5, "error_rate": 0.05, "rate_limit_rate": 0.02},
+            {"name": "steady", "median_ms": 10},
+        ],
+        "about": "gather_with_fallback, 50 in flight",
+    },
+    "many": {
+        "mode": "many",
+        "concurrency": 16,
+        "providers": [
+            {"name": "flaky", "median_ms": 5, "error_rate": 0.05, "rate_limit_rate": 0.02},
+            {"name": "steady", "median_ms": 10},
+        ],
+        "about": "execute_many, 16 threads",
+    },
+}
+
+
+def _percentile(ordered: list[float], q: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _ms(value: Optional[float]) -> Optional[float]:
+    return round(value * 1000, 3) if value is not None else None
+
+
+def run_scenario(name: str, iterations: int, convex: FakeConvex, seed: int = 0) -> dict:
+    """Run one scenario against the stand-in Convex; returns its report row."""
+    from lib.service_chain import (
+        execute_many,
+        execute_with_fallback,
+        execute_with_fallback_async,
+        gather_with_fallback,
+        resolve_chain,
+    )
+    from lib.chain_cache import get_cache
+    from lib.service_health import get_health
+
+    spec = SCENARIOS[name]
+    mode = spec["mode"]
+    providers = [FakeProvider(seed=seed, **p) for p in spec["providers"]]
+    by_name = {p.service["name"]: p for p in providers}
+    chain = [dict(p.service, priority=i + 1) for i, p in enumerate(providers)]
+    convex.set_chain(chain)
+    get_cache().invalidate()
+
+    health = get_health()
+    health.reset()
+    health_enabled = health.enabled
+    health.enabled = spec.get("health", True) and health_enabled
+
+    n = max(1, int(iterations * spec.get("scale", 1.0)))
+    latencies: list[float] = []
+    failed = 0
+
+    def sync_fn(svc):
+        return by_name[svc["name"]].call()
+
+    async def async_fn(svc):
+        return await by_name[svc["name"]].acall()
+
+    def timed(fn) -> None:
+        nonlocal failed
+        start = time.perf_counter()
+        try:
+            fn()
+        except RuntimeError:
+            failed += 1
+        latencies.append(time.perf_counter() - start)
+
+    try:
+        resolve_chain(CAPABILITY)  # warm the chain cache and connection pool
+        wall_start = time.perf_counter()
+
+        if mode == "resolve_warm":
+            for _ in range(n):
+                timed(lambda: resolve_chain(CAPABILITY))
+        elif mode == "resolve_cold":
+            for _ in range(n):
+                timed(lambda: resolve_chain(CAPABILITY, use_cache=False))
+        elif mode == "sync":
+            for _ in range(n):
+                timed(lambda: execute_with_fallback(CAPABILITY, sync_fn, AGENT))
+        elif mode == "hedged":
+            for _ in range(n):
+                timed(lambda: execute_with_fallback(
+                    CAPABILITY, sync_fn, AGENT, hedge=True, hedge_after=spec["hedge_after"],
+                ))
+        elif mode == "async":
+            async def run_async():
+                nonlocal failed
+                for _ in range(n):
+                    start = time.perf_counter()
+                    try:
+                        await execute_with_fallback_async(CAPABILITY, async_fn, AGENT)
+                    except RuntimeError:
+                        failed += 1
+                    latencies.append(time.perf_counter() - start)
+            asyncio.run(run_async())
+        elif mode == "gather":
+            async def item_fn(svc, item):
+                return await async_fn(svc)
+            results = asyncio.run(gather_with_fallback(
+                CAPABILITY, range(n), item_fn, AGENT, concurrency=spec["concurrency"],
+            ))
+            failed = sum(1 for r in results if isinstance(r, Exception))
+        elif mode == "many":
+            results = execute_many(
+                CAPABILITY, range(n), lambda svc, item: sync_fn(svc), AGENT,
+                concurrency=spec["concurrency"],
+            )
+            failed = sum(1 for r in results if isinstance(r, Exception))
+        else:
+            raise ValueError(f"Unknown mode: {mode}")
+
+        wall = time.perf_counter() - wall_start
+    finally:
+        health.enabled = health_enabled
+
+    attempts = sum(p.attempts for p in providers)
+    busy = sum(p.busy for p in providers)
+    ordered = sorted(latencies)
+    sequential = mode in ("sync", "async")
+    if sequential and attempts:
+        overhead_us = round((wall - busy) / attempts * 1e6, 1)
+    elif mode.startswith("resolve"):
+        overhead_us = round(wall / n * 1e6, 1)
+    else:
+        overhead_us = None
+    return {
+        "scenario": name,
+        "mode": mode,
+        "calls": n,
+        "attempts": attempts if not mode.startswith("resolve") else None,
+        "failed": failed,
+        "throughput_per_s": round(n / wall, 1) if wall else None,
+        "p50_ms": _ms(_percentile(ordered, 0.50)),
+        "p95_ms": _ms(_percentile(ordered, 0.95)),
+        "p99_ms": _ms(_percentile(ordered, 0.99)),
+        "overhead_us": overhead_us,
+    }
+
+
+def _isolate(state_dir: str, convex_url: str) -> None:
+    """Point every shared store and the Convex client at the benchmark sandbox."""
+    os.environ.update({
+        "CONVEX_SELF_HOSTED_URL": convex_url,
+        "SERVICE_CHAIN_CACHE_PATH": os.path.join(state_dir, "chains.db"),
+        "SERVICE_HEALTH_PATH": os.path.join(state_dir, "health.db"),
+        "SERVICE_RESPONSE_CACHE_PATH": os.path.join(state_dir, "responses.db"),
+        "SERVICE_TELEMETRY_PATH": os.path.join(state_dir, "telemetry.db"),
+        "SERVICE_LOG_JOURNAL": os.path.join(state_dir, "journal.jsonl"),
+    })
+    os.environ.pop("CONVEX_SELF_HOSTED_ADMIN_KEY", None)
+
+
+def run(names: list[str], iterations: int, seed: int = 0) -> list[dict]:
+    """Run scenarios in a sandbox. Must run before lib singletons are created."""
+    convex = FakeConvex()
+    convex.start()
+    try:
+        with tempfile.TemporaryDirectory(prefix="bench-service-chain-") as state_dir:
+            _isolate(state_dir, convex.url)
+            rows = [run_scenario(name, iterations, convex, seed) for name in names]
+            from lib.log_sink import get_log_sink
+            get_log_sink().flush(10.0)
+            return rows
+    finally:
+        convex.stop()
+
+
+def _fmt(value: Any) -> str:
+    return "-" if value is None else str(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the service fallback layer offline")
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS),
+                        help="Scenario to run (repeatable; default all)")
+    parser.add_argument("--iterations", type=int, default=1000,
+                        help="Calls per scenario (slow scenarios run a fraction)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for provider distributions")
+    parser.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+    parser.add_argument("--list", action="store_true", help="List scenarios and exit")
+    parser.add_argument("--max-overhead-us", type=float,
+                        help="Exit 1 if the 'overhead' scenario exceeds this per attempt")
+    args = parser.parse_args()
+
+    if args.list:
+        for name, spec in SCENARIOS.items():
+            print(f"  {name:<14} {spec['about']}")
+        return
+
+    rows = run(args.scenario or list(SCENARIOS), args.iterations, args.seed)
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        columns = ["scenario", "calls", "attempts", "failed", "throughput_per_s",
+                   "p50_ms", "p95_ms", "p99_ms", "overhead_us"]
+        table = [columns] + [[_fmt(row[c]) for c in columns] for row in rows]
+        widths = [max(len(r[i]) for r in table) for i in range(len(columns))]
+        for r in table:
+            print("  ".join(cell.ljust(w) for cell, w in zip(r, widths)).rstrip())
+
+    if args.max_overhead_us is not None:
+        overhead = next((r["overhead_us"] for r in rows if r["scenario"] == "overhead"), None)
+        if overhead is not None and overhead > args.max_overhead_us:
+            print(f"\nOverhead {overhead}us/attempt exceeds {args.max_overhead_us}us",
+                  file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
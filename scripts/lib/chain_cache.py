@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""Cross-process TTL cache for resolved service chains.
+
+Chains are stored in a SQLite database (WAL mode) under the project's
+.cache/ directory, keyed by capability, campaign and batch, so every agent
+process on the host shares the same resolutions.
+
+Settings (environment):
+  SERVICE_CHAIN_CACHE_TTL   Seconds a resolved chain stays fresh (default 60, 0 disables)
+  SERVICE_CHAIN_CACHE_PATH  Database path (default .cache/service_chains.db)
+
+Usage:
+  python scripts/lib/chain_cache.py stats
+  python scripts/lib/chain_cache.py invalidate
+  python scripts/lib/chain_cache.py invalidate --capability image_generation
+"""
+import argparse
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+DEFAULT_PATH = os.path.join(PROJECT_ROOT, ".cache", "service_chains.db")
+DEFAULT_TTL = 60.0
+COUNTER_FLUSH_INTERVAL = 30.0  # Seconds between folding hit/miss counts into the database
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chains (
+    key TEXT PRIMARY KEY,
+    capability TEXT NOT NULL,
+    chain TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chains_capability ON chains (capability);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+def _key(capability: str, campaign_id: Optional[str], batch_id: Optional[str]) -> str:
+    return f"{capability}|{campaign_id or ''}|{batch_id or ''}"
+
+
+class ChainCache:
+    """SQLite-backed chain cache shared by all processes on the host.
+
+    Every method swallows SQLite errors: a broken or locked cache degrades
+    to a miss, never to a failed resolution.
+
+    Hit/miss counts are kept in process and folded into the shared counters
+    at most every COUNTER_FLUSH_INTERVAL seconds (and at exit), so a lookup
+    is a single read with no write to the WAL.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: Optional[float] = None):
+        self.path = path or os.environ.get("SERVICE_CHAIN_CACHE_PATH") or DEFAULT_PATH
+        if ttl is None:
+            ttl = float(os.environ.get("SERVICE_CHAIN_CACHE_TTL", DEFAULT_TTL))
+        self.ttl = ttl
+        self._local = threading.local()
+        self._counts = {"hits": 0, "misses": 0}
+        self._counts_lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _bump(self, conn: sqlite3.Connection, name: str, by: int = 1) -> None:
+        conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, by),
+        )
+
+    def _count(self, name: str) -> None:
+        with self._counts_lock:
+            self._counts[name] += 1
+            due = time.monotonic() - self._flushed_at >= COUNTER_FLUSH_INTERVAL
+        if due:
+            self.flush_counters()
+
+    def flush_counters(self) -> None:
+        """Add the hit/miss counts gathered in this process to the shared counters."""
+        with self._counts_lock:
+            pending = {name: n for name, n in self._counts.items() if n}
+            self._counts = {"hits": 0, "misses": 0}
+            self._flushed_at = time.monotonic()
+        if not pending:
+            return
+        try:
+            conn = self._conn()
+            for name, n in pending.items():
+                self._bump(conn, name, n)
+        except sqlite3.Error:
+            pass
+
+    def get(
+        self,
+        capability: str,
+        campaign_id: Optional[str] = None,
+        batch_id: Optional[str] = None,
+    ) -> Optional[list[dict]]:
+        """Return the cached chain, or None on a miss or expired entry."""
+        if not self.enabled:
+            return None
+        try:
+            conn = self._conn()
+            row = conn.execute(
+                "SELECT chain FROM chains WHERE key = ? AND expires_at > ?",
+                (_key(capability, campaign_id, batch_id), time.time()),
+            ).fetchone()
+        except sqlite3.Error:
+            return None
+        self._count("hits" if row else "misses")
+        return json.loads(row[0]) if row else None
+
+    def put(
+        self,
+        capability: str,
+        campaign_id: Optional[str],
+        batch_id: Optional[str],
+        chain: list[dict],
+    ) -> None:
+        """Store a resolved chain for the configured TTL."""
+        if not self.enabled or not chain:
+            return
+        try:
+            self._conn().execute(
+                "INSERT OR REPLACE INTO chains (key, capability, chain, expires_at) "
+                "VALUES (?, ?, ?, ?)",
+                (
+                    _key(capability, campaign_id, batch_id),
+                    capability,
+                    json.dumps(chain),
+                    time.time() + self.ttl,
+                ),
+            )
+        except sqlite3.Error:
+            pass
+
+    def invalidate(self, capability: Optional[str] = None) -> int:
+        """Drop cached chains for one capability (or all). Returns rows removed."""
+        try:
+            conn = self._conn()
+            if capability:
+                cur = conn.execute("DELETE FROM chains WHERE capability = ?", (capability,))
+            else:
+                cur = conn.execute("DELETE FROM chains")
+            self._bump(conn, "invalidations")
+            return cur.rowcount
+        except sqlite3.Error:
+            return 0
+
+    def generation(self) -> int:
+        """Invalidation counter; changes whenever invalidate() runs in any process."""
+        try:
+            row = self._conn().execute(
+                "SELECT value FROM counters WHERE name = 'invalidations'"
+            ).fetchone()
+        except sqlite3.Error:
+            return 0
+        return row[0] if row else 0
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and current entry count."""
+        self.flush_counters()
+        try:
+            conn = self._conn()
+            counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+            entries = conn.execute(
+                "SELECT COUNT(*) FROM chains WHERE expires_at > ?", (time.time(),)
+            ).fetchone()[0]
+        except sqlite3.Error:
+            counters, entries = {}, 0
+        return {
+            "hits": counters.get("hits", 0),
+            "misses": counters.get("misses", 0),
+            "entries": entries,
+            "ttl": self.ttl,
+            "path": self.path,
+        }
+
+
+_cache: Optional[ChainCache] = None
+
+
+def get_cache() -> ChainCache:
+    """Return the process-wide shared cache."""
+    global _cache
+    if _cache is None:
+        _cache = ChainCache()
+        atexit.register(_cache.flush_counters)
+    return _cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or invalidate the service chain cache")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="Print hit/miss counters")
+    inv = sub.add_parser("invalidate", help="Drop cached chains")
+    inv.add_argument("--capability", help="Only drop chains for this capability")
+    args = parser.parse_args()
+
+    cache = get_cache()
+    if args.command == "stats":
+        print(json.dumps(cache.stats(), indent=2))
+    else:
+        removed = cache.invalidate(args.capability)
+        print(f"Invalidated {removed} cached chain(s).")
+
+
+if __name__ == "__main__":
+    main()
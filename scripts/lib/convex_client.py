@@ -0,0 +1,390 @@
+"""Persistent HTTP client for the self-hosted Convex backend.
+
+Talks to CONVEX_SELF_HOSTED_URL over the backend's /api/query and
+/api/mutation endpoints, reusing keep-alive connections between calls
+instead of starting a Node process per call. When the backend can't be
+reached over HTTP, falls back to `npx convex run`.
+
+A request is only resent (on a fresh connection, or through the CLI) when
+it cannot have reached the server: the connection failed, or was dropped
+before any response. A mutation that was sent but timed out raises
+ConvexResultUnknown instead, since resending it could apply it twice.
+
+Usage:
+    from lib.convex_client import get_client
+
+    client = get_client()
+    chain = client.query("services:resolveChain", {"categoryName": "image_generation"})
+    client.mutation("services:logServiceExecution", {...})
+
+    # asyncio code
+    from lib.convex_client import get_async_client
+
+    chain = await get_async_client().query("services:resolveChain", {...})
+"""
+import asyncio
+import http.client
+import json
+import os
+import queue
+import ssl
+import subprocess
+import urllib.parse
+from typing import Any, Optional
+
+DEFAULT_URL = "http://localhost:3210"
+
+
+class ConvexError(RuntimeError):
+    """A Convex function ran and reported an error."""
+
+
+class ConvexUnavailable(ConvexError):
+    """The Convex backend could not be reached."""
+
+
+class ConvexResultUnknown(ConvexError):
+    """A mutation was sent but no response arrived; it may or may not have run."""
+
+
+# Raised by a keep-alive connection the server closed while it sat idle
+_DROPPED = (ConnectionResetError, ConnectionAbortedError, BrokenPipeError)
+
+
+def _lost_response(url: str, kind: str, fn: str, e: BaseException) -> ConvexError:
+    if kind == "mutation":
+        return ConvexResultUnknown(f"Convex error ({fn}): no response from {url}: {e}")
+    return ConvexUnavailable(f"Convex unreachable at {url}: {e}")
+
+
+def _decode_response(url: str, fn: str, status: int, raw: bytes) -> Any:
+    if status == 404:
+        raise ConvexUnavailable(f"Convex HTTP API not found at {url}")
+    try:
+        payload = json.loads(raw) if raw else {}
+    except json.JSONDecodeError:
+        payload = None
+
+    if not isinstance(payload, dict):
+        if status >= 502:
+            # Proxy in front of a backend that is down or restarting.
+            raise ConvexUnavailable(f"Convex HTTP {status} at {url}")
+        raise ConvexError(f"Convex error ({fn}): HTTP {status}: {raw[:200]!r}")
+    if payload.get("status") == "success":
+        return payload.get("value")
+    message = payload.get("errorMessage") or payload.get("message") or f"HTTP {status}"
+    raise ConvexError(f"Convex error ({fn}): {message}")
+
+
+def _cli_command(url: str, fn: str, args: dict) -> list[str]:
+    return ["npx", "convex", "run", fn, json.dumps(args), "--url", url]
+
+
+def _decode_cli(fn: str, returncode: int, stdout: str, stderr: str) -> Any:
+    if returncode != 0:
+        raise ConvexError(f"Convex error ({fn}): {stderr.strip()}")
+    out = stdout.strip()
+    if not out:
+        return None
+    try:
+        return json.loads(out)
+    except json.JSONDecodeError:
+        return out
+
+
+class ConvexClient:
+    """Thread-safe Convex HTTP client with a small keep-alive connection pool."""
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        admin_key: Optional[str] = None,
+        timeout: float = 30.0,
+        pool_size: int = 4,
+        cli_fallback: bool = True,
+    ):
+        self.url = (url or os.environ.get("CONVEX_SELF_HOSTED_URL") or DEFAULT_URL).rstrip("/")
+        self.admin_key = admin_key or os.environ.get("CONVEX_SELF_HOSTED_ADMIN_KEY")
+        self.timeout = timeout
+        self.cli_fallback = cli_fallback
+
+        parsed = urllib.parse.urlsplit(self.url)
+        self._https = parsed.scheme == "https"
+        self._host = parsed.hostname or "localhost"
+        self._port = parsed.port
+        self._base_path = parsed.path.rstrip("/")
+        self._pool: queue.LifoQueue = queue.LifoQueue(maxsize=pool_size)
+
+    # ── public API ──────────────────────────────
+
+    def query(self, fn: str, args: Optional[dict] = None) -> Any:
+        """Run a Convex query and return its decoded value."""
+        return self._call("query", fn, args or {})
+
+    def mutation(self, fn: str, args: Optional[dict] = None) -> Any:
+        """Run a Convex mutation and return its decoded value."""
+        return self._call("mutation", fn, args or {})
+
+    def close(self) -> None:
+        """Close all pooled connections."""
+        while True:
+            try:
+                conn = self._pool.get_nowait()
+            except queue.Empty:
+                return
+            conn.close()
+
+    # ── internals ───────────────────────────────
+
+    def _call(self, kind: str, fn: str, args: dict) -> Any:
+        try:
+            return self._call_http(kind, fn, args)
+        except ConvexUnavailable:
+            if not self.cli_fallback:
+                raise
+            return self._call_cli(fn, args)
+
+    def _new_connection(self) -> http.client.HTTPConnection:
+        cls = http.client.HTTPSConnection if self._https else http.client.HTTPConnection
+        return cls(self._host, self._port, timeout=self.timeout)
+
+    def _headers(self) -> dict:
+        headers = {"Content-Type": "application/json", "Connection": "keep-alive"}
+        if self.admin_key:
+            headers["Authorization"] = f"Convex {self.admin_key}"
+        return headers
+
+    def _call_http(self, kind: str, fn: str, args: dict) -> Any:
+        body = json.dumps({"path": fn, "args": args, "format": "json"})
+        path = f"{self._base_path}/api/{kind}"
+
+        # A pooled connection may have been dropped by the server while idle;
+        # retry once on a fresh connection before declaring the backend down.
+        for attempt in range(2):
+            try:
+                conn = self._pool.get_nowait()
+                reused = True
+            except queue.Empty:
+                conn = self._new_connection()
+                reused = False
+
+            sent = False
+            status = None
+            try:
+                conn.request("POST", path, body=body, headers=self._headers())
+                sent = True
+                resp = conn.getresponse()
+                status = resp.status
+                raw = resp.read()
+            except (http.client.HTTPException, OSError) as e:
+                conn.close()
+                if sent and (status is not None or not isinstance(e, _DROPPED)):
+                    # Timed out or cut off after the server had the request
+                    raise _lost_response(self.url, kind, fn, e) from e
+                if reused and attempt == 0:
+                    continue
+                raise ConvexUnavailable(f"Convex unreachable at {self.url}: {e}") from e
+
+            if resp.will_close:
+                conn.close()
+            else:
+                try:
+                    self._pool.put_nowait(conn)
+                except queue.Full:
+                    conn.close()
+            return _decode_response(self.url, fn, status, raw)
+
+        raise ConvexUnavailable(f"Convex unreachable at {self.url}")
+
+    def _call_cli(self, fn: str, args: dict) -> Any:
+        result = subprocess.run(_cli_command(self.url, fn, args), capture_output=True, text=True)
+        return _decode_cli(fn, result.returncode, result.stdout, result.stderr)
+
+
+class AsyncConvexClient:
+    """Non-blocking Convex client with keep-alive connections on asyncio streams.
+
+    Pooled connections belong to the event loop that opened them; if the
+    client is used from a new loop, the old connections are dropped.
+    """
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        admin_key: Optional[str] = None,
+        timeout: float = 30.0,
+        pool_size: int = 16,
+        cli_fallback: bool = True,
+    ):
+        self.url = (url or os.environ.get("CONVEX_SELF_HOSTED_URL") or DEFAULT_URL).rstrip("/")
+        self.admin_key = admin_key or os.environ.get("CONVEX_SELF_HOSTED_ADMIN_KEY")
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.cli_fallback = cli_fallback
+
+        parsed = urllib.parse.urlsplit(self.url)
+        self._https = parsed.scheme == "https"
+        self._host = parsed.hostname or "localhost"
+        self._port = parsed.port or (443 if self._https else 80)
+        self._base_path = parsed.path.rstrip("/")
+        self._idle: list[tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    # ── public API ──────────────────────────────
+
+    async def query(self, fn: str, args: Optional[dict] = None) -> Any:
+        """Run a Convex query and return its decoded value."""
+        return await self._call("query", fn, args or {})
+
+    async def mutation(self, fn: str, args: Optional[dict] = None) -> Any:
+        """Run a Convex mutation and return its decoded value."""
+        return await self._call("mutation", fn, args or {})
+
+    async def aclose(self) -> None:
+        """Close all pooled connections."""
+        idle, self._idle = self._idle, []
+        for _, writer in idle:
+            writer.close()
+
+    # ── internals ───────────────────────────────
+
+    async def _call(self, kind: str, fn: str, args: dict) -> Any:
+        try:
+            return await self._call_http(kind, fn, args)
+        except ConvexUnavailable:
+            if not self.cli_fallback:
+                raise
+            return await self._call_cli(fn, args)
+
+    def _request_bytes(self, kind: str, fn: str, args: dict) -> bytes:
+        body = json.dumps({"path": fn, "args": args, "format": "json"}).encode()
+        lines = [
+            f"POST {self._base_path}/api/{kind} HTTP/1.1",
+            f"Host: {self._host}:{self._port}",
+            "Content-Type: application/json",
+            f"Content-Length: {len(body)}",
+            "Connection: keep-alive",
+        ]
+        if self.admin_key:
+            lines.append(f"Authorization: Convex {self.admin_key}")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode() + body
+
+    async def _checkout(self) -> tuple[asyncio.StreamReader, asyncio.StreamWriter, bool]:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._idle = []
+            self._loop = loop
+        if self._idle:
+            reader, writer = self._idle.pop()
+            return reader, writer, True
+        ssl_ctx = ssl.create_default_context() if self._https else None
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(self._host, self._port, ssl=ssl_ctx), self.timeout,
+        )
+        return reader, writer, False
+
+    async def _call_http(self, kind: str, fn: str, args: dict) -> Any:
+        request = self._request_bytes(kind, fn, args)
+
+        # Same stale-connection retry as the blocking client.
+        for attempt in range(2):
+            try:
+                reader, writer, reused = await self._checkout()
+            except OSError as e:
+                raise ConvexUnavailable(f"Convex unreachable at {self.url}: {e}") from e
+
+            sent = False
+            status = None
+            try:
+                writer.write(request)
+                await writer.drain()
+                sent = True
+                deadline = asyncio.get_running_loop().time() + self.timeout
+                status = await asyncio.wait_for(_read_status(reader), self.timeout)
+                keep_alive, raw = await asyncio.wait_for(
+                    _read_body(reader),
+                    max(deadline - asyncio.get_running_loop().time(), 0),
+                )
+            except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+                writer.close()
+                if sent and (status is not None or not isinstance(e, _DROPPED)):
+                    raise _lost_response(self.url, kind, fn, e) from e
+                if reused and attempt == 0:
+                    continue
+                raise ConvexUnavailable(f"Convex unreachable at {self.url}: {e}") from e
+
+            if keep_alive and len(self._idle) < self.pool_size:
+                self._idle.append((reader, writer))
+            else:
+                writer.close()
+            return _decode_response(self.url, fn, status, raw)
+
+        raise ConvexUnavailable(f"Convex unreachable at {self.url}")
+
+    async def _call_cli(self, fn: str, args: dict) -> Any:
+        proc = await asyncio.create_subprocess_exec(
+            *_cli_command(self.url, fn, args),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        stdout, stderr = await proc.communicate()
+        return _decode_cli(fn, proc.returncode, stdout.decode(), stderr.decode())
+
+
+async def _read_status(reader: asyncio.StreamReader) -> int:
+    """Read the status line of an HTTP/1.1 response."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionResetError("connection closed by server")
+    return int(status_line.split()[1])
+
+
+async def _read_body(reader: asyncio.StreamReader) -> tuple[bool, bytes]:
+    """Read the headers and body after the status line. Returns (keep_alive, body)."""
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    keep_alive = headers.get("connection", "").lower() != "close"
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            if size == 0:
+                # Skip trailers up to the blank line
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        body = b"".join(chunks)
+    elif "content-length" in headers:
+        body = await reader.readexactly(int(headers["content-length"]))
+    else:
+        body = await reader.read()
+        keep_alive = False
+    return keep_alive, body
+
+
+_client: Optional[ConvexClient] = None
+_async_client: Optional[AsyncConvexClient] = None
+
+
+def get_client() -> ConvexClient:
+    """Return the process-wide shared client."""
+    global _client
+    if _client is None:
+        _client = ConvexClient()
+    return _client
+
+
+def get_async_client() -> AsyncConvexClient:
+    """Return the process-wide shared asyncio client."""
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncConvexClient()
+    return _async_client
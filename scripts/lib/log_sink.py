@@ -0,0 +1,228 @@
+"""Background sink for service execution logs.
+
+Execution records are queued and written to Convex by a worker thread in
+batches through services:logServiceExecutionBatch, so callers never wait on
+telemetry. Pending records are flushed at interpreter exit. When Convex is
+unreachable, batches are appended to a local JSONL journal and replayed on
+the next successful flush. Entries the server rejects are reported and
+dropped one by one; a batch refused as a whole (e.g. failed argument
+validation) is split in half and resent until the bad entry is isolated.
+
+Settings (environment):
+  SERVICE_LOG_BATCH_SIZE      Max records per mutation (default 50)
+  SERVICE_LOG_FLUSH_INTERVAL  Seconds to wait for a batch to fill (default 1.0)
+  SERVICE_LOG_JOURNAL         Journal path (default .cache/service_exec_journal.jsonl)
+"""
+import atexit
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Optional
+
+from lib.convex_client import ConvexClient, ConvexError, ConvexResultUnknown, ConvexUnavailable
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+DEFAULT_JOURNAL = os.path.join(PROJECT_ROOT, ".cache", "service_exec_journal.jsonl")
+BATCH_MUTATION = "services:logServiceExecutionBatch"
+
+_FLUSH = object()
+
+
+class ExecutionLogSink:
+    """Queue of execution records drained by a daemon worker thread."""
+
+    def __init__(
+        self,
+        client: Optional[ConvexClient] = None,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        journal_path: Optional[str] = None,
+    ):
+        # No CLI fallback: if HTTP is down, journaling beats a slow npx call.
+        self.client = client or ConvexClient(timeout=10, cli_fallback=False)
+        self.batch_size = batch_size or int(os.environ.get("SERVICE_LOG_BATCH_SIZE", 50))
+        if flush_interval is None:
+            flush_interval = float(os.environ.get("SERVICE_LOG_FLUSH_INTERVAL", 1.0))
+        self.flush_interval = flush_interval
+        self.journal_path = (
+            journal_path or os.environ.get("SERVICE_LOG_JOURNAL") or DEFAULT_JOURNAL
+        )
+        self._queue: queue.Queue = queue.Queue()
+        self._journal_lock = threading.Lock()
+        self._worker = threading.Thread(
+            target=self._run, name="service-log-sink", daemon=True,
+        )
+        self._worker.start()
+
+    def submit(self, entry: dict) -> None:
+        """Queue one logServiceExecution record. Never blocks."""
+        entry.setdefault("executedAt", int(time.time() * 1000))
+        self._queue.put(entry)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Send everything queued so far. Returns False if the timeout expired."""
+        self._queue.put(_FLUSH)
+        done = self._queue.all_tasks_done
+        with done:
+            return done.wait_for(lambda: self._queue.unfinished_tasks == 0, timeout)
+
+    # ── worker ──────────────────────────────────
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                continue
+            try:
+                self._send(batch)
+            except Exception as e:
+                # A dead worker would stop logging and leave flush() hanging
+                print(f"Warning: execution log worker error: {e!r}", file=sys.stderr)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _take_batch(self) -> list[dict]:
+        batch: list[dict] = []
+        deadline = None
+        while len(batch) < self.batch_size:
+            if deadline is None:
+                item = self._queue.get()
+            else:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if item is _FLUSH:
+                self._queue.task_done()
+                break
+            batch.append(item)
+            if deadline is None:
+                deadline = time.monotonic() + self.flush_interval
+        return batch
+
+    def _send(self, batch: list[dict]) -> None:
+        try:
+            self._replay_journal()
+        except ConvexUnavailable:
+            self._journal(batch)
+            return
+        unsent = self._deliver(batch)
+        if unsent:
+            self._journal(unsent)
+
+    def _deliver(self, entries: list[dict]) -> list[dict]:
+        """Send entries in order, bisecting any chunk the server refuses.
+
+        Returns the entries not yet sent when Convex became unreachable or
+        stopped answering (empty once everything was sent or dropped).
+        """
+        pending = [entries[i:i + self.batch_size]
+                   for i in range(0, len(entries), self.batch_size)][::-1]
+        while pending:
+            chunk = pending.pop()
+            try:
+                result = self.client.mutation(BATCH_MUTATION, {"entries": chunk})
+            except ConvexUnavailable:
+                return chunk + [entry for rest in reversed(pending) for entry in rest]
+            except ConvexResultUnknown as e:
+                # May have been logged already; resending could double-count
+                print(f"Warning: {len(chunk)} execution log(s) may not have been "
+                      f"recorded: {e}", file=sys.stderr)
+                return [entry for rest in reversed(pending) for entry in rest]
+            except ConvexError as e:
+                if len(chunk) == 1:
+                    _warn_dropped(chunk[0], e)
+                else:
+                    mid = len(chunk) // 2
+                    pending += [chunk[mid:], chunk[:mid]]
+                continue
+            if isinstance(result, dict):
+                for rejected in result.get("rejected", []):
+                    _warn_dropped(chunk[rejected["index"]], rejected["error"])
+        return []
+
+    # ── journal ─────────────────────────────────
+
+    def _journal(self, batch: list[dict]) -> None:
+        with self._journal_lock:
+            try:
+                os.makedirs(os.path.dirname(self.journal_path), exist_ok=True)
+                cut_short = _ends_mid_line(self.journal_path)
+                with open(self.journal_path, "a") as f:
+                    if cut_short:
+                        # Don't glue the first entry onto a killed writer's partial line
+                        f.write("\n")
+                    for entry in batch:
+                        f.write(json.dumps(entry) + "\n")
+            except OSError as e:
+                print(f"Warning: failed to journal execution logs: {e}", file=sys.stderr)
+
+    def _replay_journal(self) -> None:
+        """Send journaled records. Raises ConvexUnavailable if Convex is still down."""
+        if not os.path.exists(self.journal_path):
+            return
+        # Renaming claims the journal, so only one process replays it.
+        claimed = f"{self.journal_path}.{os.getpid()}.replay"
+        try:
+            os.rename(self.journal_path, claimed)
+        except OSError:
+            return
+
+        try:
+            entries = self._read_journal(claimed)
+            unsent = self._deliver(entries)
+            if unsent:
+                self._journal(unsent)
+                raise ConvexUnavailable("Convex unreachable while replaying the journal")
+        finally:
+            os.remove(claimed)
+
+    @staticmethod
+    def _read_journal(path: str) -> list[dict]:
+        """Parse a claimed journal, skipping lines cut short by a killed writer."""
+        entries = []
+        with open(path) as f:
+            for lineno, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError as e:
+                    print(f"Warning: skipped corrupt journal line {lineno}: {e}",
+                          file=sys.stderr)
+        return entries
+
+
+def _ends_mid_line(path: str) -> bool:
+    try:
+        with open(path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b"\n"
+    except OSError:  # Missing or empty
+        return False
+
+
+def _warn_dropped(entry: dict, error) -> None:
+    print(f"Warning: dropped execution log for {entry.get('serviceId')} "
+          f"({entry.get('status')}): {error}", file=sys.stderr)
+
+
+_sink: Optional[ExecutionLogSink] = None
+_sink_lock = threading.Lock()
+
+
+def get_log_sink() -> ExecutionLogSink:
+    """Return the process-wide sink, starting it (and its atexit flush) on first use."""
+    global _sink
+    with _sink_lock:
+        if _sink is None:
+            _sink = ExecutionLogSink()
+            atexit.register(_sink.flush, 10.0)
+        return _sink
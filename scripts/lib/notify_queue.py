@@ -0,0 +1,406 @@
+"""Durable, rate-limited Telegram notification queue.
+
+notify.py appends messages to a SQLite spool (.cache/notify_spool.db) and
+returns; a single worker process drains it over one keep-alive HTTPS
+connection. The worker:
+
+  - respects Telegram's limits: 1 message/s per chat, 20/min per group chat
+    and 30/s overall, plus any retry_after the API hands back;
+  - merges everything pending for a chat into one message, collapsing
+    similar messages (same text once digits and ids are masked) into a
+    single line with a count;
+  - retries failed sends with exponential backoff, giving up after
+    MAX_ATTEMPTS (messages stay in the spool as 'failed').
+
+The worker holds an flock on .cache/notify_worker.lock and exits after
+NOTIFY_WORKER_IDLE seconds without work; notify.py starts one
+(spawn_worker) when none is running.
+
+Settings (environment):
+  NOTIFY_SPOOL_PATH    Spool database (default .cache/notify_spool.db)
+  NOTIFY_LINGER        Seconds a message waits for similar ones to join it (default 1)
+  NOTIFY_WORKER_IDLE   Seconds an idle worker stays alive (default 30)
+"""
+import fcntl
+import http.client
+import json
+import os
+import random
+import re
+import sqlite3
+import subprocess
+import sys
+import time
+import urllib.parse
+from typing import Callable, Optional
+
+from lib.rate_limits import TokenBucket
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+DEFAULT_SPOOL = os.path.join(PROJECT_ROOT, ".cache", "notify_spool.db")
+LOCK_PATH = os.path.join(PROJECT_ROOT, ".cache", "notify_worker.lock")
+WORKER_LOG = os.path.join(PROJECT_ROOT, ".cache", "notify_worker.log")
+NOTIFY_SCRIPT = os.path.join(PROJECT_ROOT, "scripts", "notify.py")
+
+TELEGRAM_HOST = "api.telegram.org"
+MAX_MESSAGE_CHARS = 4096
+MAX_BATCH = 200             # spooled messages folded into one send
+MAX_ATTEMPTS = 8
+BASE_BACKOFF = 2.0          # seconds, doubled per failed attempt
+MAX_BACKOFF = 600.0
+KEEP_SENT = 7 * 86400       # seconds sent/failed messages stay in the spool
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    chat_id TEXT NOT NULL,
+    text TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    sent_at REAL
+);
+CREATE INDEX IF NOT EXISTS messages_pending ON messages (status, next_attempt_at);
+"""
+
+_MASK = re.compile(r"[0-9a-f]{8,}|\d+", re.IGNORECASE)
+
+
+def fingerprint(text: str) -> str:
+    """Text with numbers and ids masked, so repeats of one alert compare equal."""
+    return " ".join(_MASK.sub("#", text).split())
+
+
+def build_digest(texts: list[str], limit: int = MAX_MESSAGE_CHARS) -> tuple[str, list[int]]:
+    """Fold queued messages for one chat into a single message.
+
+    Similar messages collapse into their first occurrence with a count;
+    distinct ones are kept in order, separated by blank lines. Returns the
+    digest and the positions in `texts` it covers. Groups that don't fit are
+    left out (the digest ends with how many) so the caller can keep them
+    queued for the next send; a first group too long on its own is truncated.
+    """
+    groups: dict[str, list[int]] = {}
+    for i, text in enumerate(texts):
+        groups.setdefault(fingerprint(text), []).append(i)
+
+    parts = []
+    for members in groups.values():
+        first = texts[members[0]]
+        if len(members) == 1:
+            line = first
+        elif all(texts[m] == first for m in members):
+            line = f"{first} (×{len(members)})"
+        else:
+            line = f"{first} (+{len(members) - 1} similar)"
+        parts.append((line, members))
+
+    def more(n: int) -> str:
+        return f"\n\n… and {n} more" if n else ""
+
+    lines: list[str] = []
+    covered: list[int] = []
+    for i, (line, members) in enumerate(parts):
+        if len("\n\n".join(lines + [line])) + len(more(len(parts) - i - 1)) > limit:
+            if not lines:
+                tail = "…" + more(len(parts) - 1)
+                return line[: limit - len(tail)] + tail, members
+            return "\n\n".join(lines) + more(len(parts) - i), sorted(covered)
+        lines.append(line)
+        covered.extend(members)
+    return "\n\n".join(lines), sorted(covered)
+
+
+def backoff(attempts: int) -> float:
+    """Seconds before retry number `attempts` (1-based), with jitter."""
+    delay = min(MAX_BACKOFF, BASE_BACKOFF * 2 ** (attempts - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+
+class NotifySpool:
+    """SQLite spool of outgoing messages. Writes are fsynced before returning."""
+
+    def __init__(self, path: Optional[str] = None, linger: Optional[float] = None):
+        self.path = path or os.environ.get("NOTIFY_SPOOL_PATH") or DEFAULT_SPOOL
+        if linger is None:
+            linger = float(os.environ.get("NOTIFY_LINGER", 1.0))
+        self.linger = linger
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def enqueue(self, chat_id: str, text: str) -> int:
+        now = time.time()
+        cur = self.conn().execute(
+            "INSERT INTO messages (chat_id, text, created_at, next_attempt_at) "
+            "VALUES (?, ?, ?, ?)",
+            (str(chat_id), text, now, now + self.linger),
+        )
+        return cur.lastrowid
+
+    def due(self, now: Optional[float] = None) -> dict[str, list[tuple[int, str, int]]]:
+        """Pending messages ready to send, grouped by chat: (id, text, attempts)."""
+        now = time.time() if now is None else now
+        rows = self.conn().execute(
+            "SELECT id, chat_id, text, attempts FROM messages "
+            "WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY id",
+            (now,),
+        ).fetchall()
+        chats: dict[str, list] = {}
+        for msg_id, chat_id, text, attempts in rows:
+            batch = chats.setdefault(chat_id, [])
+            if len(batch) < MAX_BATCH:
+                batch.append((msg_id, text, attempts))
+        return chats
+
+    def status(self, msg_id: int) -> Optional[str]:
+        row = self.conn().execute(
+            "SELECT status FROM messages WHERE id = ?", (msg_id,),
+        ).fetchone()
+        return row[0] if row else None
+
+    def next_due(self) -> Optional[float]:
+        row = self.conn().execute(
+            "SELECT MIN(next_attempt_at) FROM messages WHERE status = 'pending'"
+        ).fetchone()
+        return row[0]
+
+    def mark_sent(self, ids: list[int]) -> None:
+        now = time.time()
+        self.conn().executemany(
+            "UPDATE messages SET status = 'sent', sent_at = ? WHERE id = ?",
+            [(now, i) for i in ids],
+        )
+
+    def mark_failed(self, batch: list[tuple[int, str, int]], error: str) -> None:
+        """Schedule a retry for each message, or give up after MAX_ATTEMPTS."""
+        now = time.time()
+        conn = self.conn()
+        conn.execute("BEGIN")
+        for msg_id, _, attempts in batch:
+            attempts += 1
+            status = "failed" if attempts >= MAX_ATTEMPTS else "pending"
+            conn.execute(
+                "UPDATE messages SET status = ?, attempts = ?, next_attempt_at = ?, "
+                "last_error = ? WHERE id = ?",
+                (status, attempts, now + backoff(attempts), error[:500], msg_id),
+            )
+        conn.execute("COMMIT")
+
+    def defer(self, ids: list[int], until: float) -> None:
+        """Push messages back without counting an attempt (rate limited)."""
+        self.conn().executemany(
+            "UPDATE messages SET next_attempt_at = ? WHERE id = ?",
+            [(until, i) for i in ids],
+        )
+
+    def prune(self) -> int:
+        cur = self.conn().execute(
+            "DELETE FROM messages WHERE status != 'pending' AND created_at < ?",
+            (time.time() - KEEP_SENT,),
+        )
+        return cur.rowcount
+
+    def counts(self) -> dict[str, int]:
+        rows = self.conn().execute(
+            "SELECT status, COUNT(*) FROM messages GROUP BY status"
+        ).fetchall()
+        return {"pending": 0, "sent": 0, "failed": 0, **dict(rows)}
+
+
+class SendError(Exception):
+    """Telegram rejected or never received a message."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TelegramSender:
+    """sendMessage over one reused HTTPS connection."""
+
+    def __init__(self, token: str, timeout: float = 15.0):
+        self.token = token
+        self.timeout = timeout
+        self._conn: Optional[http.client.HTTPSConnection] = None
+
+    def _post(self, params: dict) -> dict:
+        body = urllib.parse.urlencode(params)
+        headers = {"Content-Type": "application/x-www-form-urlencoded"}
+        for attempt in range(2):
+            if self._conn is None:
+                self._conn = http.client.HTTPSConnection(TELEGRAM_HOST, timeout=self.timeout)
+            try:
+                self._conn.request("POST", f"/bot{self.token}/sendMessage", body, headers)
+                resp = self._conn.getresponse()
+                raw = resp.read()
+            except (http.client.HTTPException, OSError) as e:
+                self.close()
+                if attempt == 0:
+                    continue  # Idle connection dropped; retry on a fresh one
+                raise SendError(f"Telegram unreachable: {e}") from e
+            if resp.will_close:
+                self.close()
+            try:
+                return json.loads(raw)
+            except json.JSONDecodeError:
+                raise SendError(f"Telegram HTTP {resp.status}: {raw[:200]!r}")
+        raise SendError("Telegram unreachable")
+
+    def send(self, chat_id: str, text: str) -> None:
+        result = self._post({"chat_id": chat_id, "text": text, "parse_mode": "Markdown"})
+        if not result.get("ok") and "parse" in str(result.get("description", "")).lower():
+            # Merged or truncated Markdown can be malformed; plain text still gets through.
+            result = self._post({"chat_id": chat_id, "text": text})
+        if result.get("ok"):
+            return
+        retry_after = (result.get("parameters") or {}).get("retry_after")
+        raise SendError(f"Telegram API error: {result}", retry_after=retry_after)
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class _ChatLimits:
+    """Telegram's per-chat and global send limits, applied by the single worker."""
+
+    def __init__(self):
+        self.global_bucket = TokenBucket(30.0, burst=30.0)
+        self._chats: dict[str, list[TokenBucket]] = {}
+        self._held: dict[str, float] = {}
+
+    def _buckets(self, chat_id: str) -> list[TokenBucket]:
+        if chat_id not in self._chats:
+            buckets = [TokenBucket(1.0, burst=1.0)]
+            if chat_id.startswith("-"):  # groups and channels
+                buckets.append(TokenBucket(20 / 60, burst=20.0))
+            self._chats[chat_id] = buckets
+        return self._chats[chat_id]
+
+    def hold(self, chat_id: str, until: float) -> None:
+        self._held[chat_id] = until
+
+    def wait_time(self, chat_id: str) -> float:
+        waits = [b.wait_time() for b in [self.global_bucket, *self._buckets(chat_id)]]
+        held = self._held.get(chat_id, 0) - time.time()
+        return max([held, *waits])
+
+    def take(self, chat_id: str) -> None:
+        for bucket in [self.global_bucket, *self._buckets(chat_id)]:
+            bucket.try_take()
+
+
+def run_worker(
+    spool: NotifySpool,
+    send: Callable[[str, str], None],
+    idle_timeout: Optional[float] = None,
+    lock_path: str = LOCK_PATH,
+) -> int:
+    """Drain the spool until it has been empty for idle_timeout seconds.
+
+    Returns the number of messages delivered, or -1 if another worker holds
+    the lock.
+    """
+    if idle_timeout is None:
+        idle_timeout = float(os.environ.get("NOTIFY_WORKER_IDLE", 30))
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    lock = open(lock_path, "w")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock.close()
+        return -1
+
+    limits = _ChatLimits()
+    delivered = 0
+    idle_since = time.time()
+    spool.prune()
+    try:
+        while True:
+            now = time.time()
+            chats = spool.due(now)
+            sleep_for = 0.1
+            for chat_id, batch in chats.items():
+                wait = limits.wait_time(chat_id)
+                if wait > 0:
+                    sleep_for = min(sleep_for, wait)
+                    continue
+                limits.take(chat_id)
+                # Messages that didn't fit stay pending for the next send
+                digest, covered = build_digest([text for _, text, _ in batch])
+                batch = [batch[i] for i in covered]
+                ids = [msg_id for msg_id, _, _ in batch]
+                try:
+                    send(chat_id, digest)
+                except SendError as e:
+                    if e.retry_after:
+                        limits.hold(chat_id, time.time() + e.retry_after)
+                        spool.defer(ids, time.time() + e.retry_after)
+                    else:
+                        spool.mark_failed(batch, str(e))
+                    print(f"notify: {e}", file=sys.stderr)
+                    continue
+                spool.mark_sent(ids)
+                delivered += len(ids)
+
+            if chats:
+                idle_since = time.time()
+            else:
+                next_due = spool.next_due()
+                if next_due is not None:
+                    idle_since = time.time()
+                    sleep_for = min(max(0.05, next_due - time.time()), 5.0)
+                elif time.time() - idle_since >= idle_timeout:
+                    # Release first, then look once more: a message enqueued
+                    # while we still held the lock didn't start a new worker.
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+                    if spool.next_due() is None:
+                        return delivered
+                    try:
+                        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except OSError:
+                        return delivered  # Someone else picked it up
+                    idle_since = time.time()
+                    continue
+            time.sleep(sleep_for)
+    finally:
+        lock.close()
+
+
+def worker_running(lock_path: str = LOCK_PATH) -> bool:
+    """True if a worker currently holds the lock."""
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    with open(lock_path, "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return True
+        fcntl.flock(lock, fcntl.LOCK_UN)
+        return False
+
+
+def spawn_worker() -> None:
+    """Start a detached worker process unless one is already running."""
+    if worker_running():
+        return
+    with open(WORKER_LOG, "a") as log:
+        subprocess.Popen(
+            [sys.executable, NOTIFY_SCRIPT, "--worker"],
+            stdin=subprocess.DEVNULL,
+            stdout=log,
+            stderr=log,
+            start_new_session=True,
+            close_fds=True,
+        )
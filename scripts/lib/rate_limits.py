@@ -0,0 +1,155 @@
+"""Per-provider rate limits declared in services/*/manifest.json.
+
+A manifest may declare:
+
+    "rateLimits": {"requestsPerSecond": 2, "concurrentJobs": 4}
+
+Either field may be omitted or null (no limit). Limits apply per provider
+within one process and are enforced with a token bucket for the request
+rate plus a counter for jobs in flight.
+
+Usage:
+    from lib.rate_limits import get_limiter
+
+    limiter = get_limiter(service)
+    if limiter.try_acquire():
+        try:
+            call_provider(service)
+        finally:
+            limiter.release()
+"""
+import glob
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+SERVICES_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "services"))
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at `rate` tokens/sec up to `burst`."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_take(self) -> bool:
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def wait_time(self) -> float:
+        """Seconds until a token will be available."""
+        with self._lock:
+            self._refill()
+            return max(0.0, (1 - self._tokens) / self.rate)
+
+
+class ProviderLimiter:
+    """Request-rate and concurrency limits for one provider."""
+
+    def __init__(
+        self,
+        requests_per_second: Optional[float] = None,
+        concurrent_jobs: Optional[int] = None,
+    ):
+        self.bucket = TokenBucket(requests_per_second) if requests_per_second else None
+        self.concurrent_jobs = concurrent_jobs
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        """Claim a concurrency slot and a rate token, or neither."""
+        with self._lock:
+            if self.concurrent_jobs is not None and self._in_flight >= self.concurrent_jobs:
+                return False
+            if self.bucket is not None and not self.bucket.try_take():
+                return False
+            self._in_flight += 1
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    def wait_time(self) -> float:
+        """Rough seconds until try_acquire could succeed (0 if unknown)."""
+        return self.bucket.wait_time() if self.bucket is not None else 0.0
+
+
+_manifest_limits: Optional[dict[str, dict]] = None
+_service_providers: Optional[dict[str, str]] = None
+_limiters: dict[str, ProviderLimiter] = {}
+_registry_lock = threading.Lock()
+
+
+def _read_manifests(services_dir: str):
+    for path in sorted(glob.glob(os.path.join(services_dir, "*/manifest.json"))):
+        if os.path.basename(os.path.dirname(path)).startswith("_"):
+            continue
+        try:
+            with open(path) as f:
+                yield json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue
+
+
+def load_manifest_limits(services_dir: str = SERVICES_DIR) -> dict[str, dict]:
+    """Map provider (manifest) names to the rateLimits block of their manifest."""
+    return {
+        manifest["name"]: manifest["rateLimits"]
+        for manifest in _read_manifests(services_dir)
+        if manifest.get("rateLimits")
+    }
+
+
+def load_service_providers(services_dir: str = SERVICES_DIR) -> dict[str, str]:
+    """Map Convex service names to the provider (manifest name) behind them.
+
+    Multi-capability manifests are synced as "<name>-<category>" (see
+    sync_services.py); every such service shares its provider's limits.
+    """
+    providers: dict[str, str] = {}
+    for manifest in _read_manifests(services_dir):
+        name = manifest["name"]
+        providers[name] = name
+        for cap in manifest.get("capabilities", []):
+            providers[f"{name}-{cap['category']}"] = name
+    return providers
+
+
+def get_limiter(service: dict) -> ProviderLimiter:
+    """Return the process-wide limiter for a resolved service dict.
+
+    Services synced from the same manifest share one limiter.
+    """
+    global _manifest_limits, _service_providers
+    name = service.get("name", "")
+    with _registry_lock:
+        if _service_providers is None:
+            _service_providers = load_service_providers()
+        provider = _service_providers.get(name, name)
+        limiter = _limiters.get(provider)
+        if limiter is None:
+            if _manifest_limits is None:
+                _manifest_limits = load_manifest_limits()
+            declared = _manifest_limits.get(provider, {})
+            limiter = ProviderLimiter(
+                requests_per_second=declared.get("requestsPerSecond"),
+                concurrent_jobs=declared.get("concurrentJobs"),
+            )
+            _limiters[provider] = limiter
+        return limiter
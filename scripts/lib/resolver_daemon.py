@@ -0,0 +1,225 @@
+"""Resident chain resolver on a Unix socket.
+
+`resolve_service.py --serve` runs a ResolverServer: it keeps resolved
+chains in memory, re-resolves them from Convex in the background, and
+answers lookups without a Python start-up or Convex round trip per call.
+`resolve_service.py <capability>` asks the daemon first (see `request`)
+and resolves in-process when no daemon is listening.
+
+Chains are refreshed every SERVICE_RESOLVER_POLL seconds (default 10) and
+immediately after `chain_cache.py invalidate`, which the dashboard calls
+when services are toggled or reordered. Chains nobody asked for in
+IDLE_TTL seconds are dropped.
+
+Protocol: one JSON object per line in each direction.
+
+    > {"capability": "image_generation", "campaignId": null, "batchId": null, "noCache": false}
+    < {"chain": [...]}            or  {"error": "<Convex error message>"}
+
+This module only imports the standard library so the client side stays
+cheap; the server is handed its resolve function.
+
+Settings (environment):
+  SERVICE_RESOLVER_SOCKET  Socket path (default .cache/resolve_service.sock)
+  SERVICE_RESOLVER_POLL    Seconds between background refreshes (default 10)
+"""
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from typing import Callable, Optional
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+DEFAULT_SOCKET = os.path.join(PROJECT_ROOT, ".cache", "resolve_service.sock")
+DEFAULT_POLL = 10.0
+IDLE_TTL = 15 * 60          # seconds an unrequested chain stays warm
+WATCH_INTERVAL = 1.0        # seconds between invalidation checks
+CONNECT_TIMEOUT = 1.0
+RESPONSE_TIMEOUT = 60.0
+
+Key = tuple[str, Optional[str], Optional[str]]
+
+
+def socket_path() -> str:
+    return os.environ.get("SERVICE_RESOLVER_SOCKET") or DEFAULT_SOCKET
+
+
+def request(
+    capability: str,
+    campaign_id: Optional[str] = None,
+    batch_id: Optional[str] = None,
+    no_cache: bool = False,
+    path: Optional[str] = None,
+) -> Optional[dict]:
+    """Ask a running daemon for a chain. Returns None if no daemon answers."""
+    path = path or socket_path()
+    if not os.path.exists(path):
+        return None
+    payload = json.dumps({
+        "capability": capability,
+        "campaignId": campaign_id,
+        "batchId": batch_id,
+        "noCache": no_cache,
+    }).encode() + b"\n"
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(CONNECT_TIMEOUT)
+            sock.connect(path)
+            sock.settimeout(RESPONSE_TIMEOUT)
+            sock.sendall(payload)
+            with sock.makefile("rb") as f:
+                line = f.readline()
+    except OSError:
+        return None
+    try:
+        reply = json.loads(line)
+    except json.JSONDecodeError:
+        return None
+    return reply if isinstance(reply, dict) else None
+
+
+def _listening(path: str) -> bool:
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(CONNECT_TIMEOUT)
+            sock.connect(path)
+        return True
+    except OSError:
+        return False
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        try:
+            req = json.loads(line)
+            reply = self.server.resolver.lookup(
+                req["capability"], req.get("campaignId"), req.get("batchId"),
+                no_cache=bool(req.get("noCache")),
+            )
+        except (json.JSONDecodeError, KeyError, TypeError) as e:
+            reply = {"error": f"bad request: {e}"}
+        self.wfile.write(json.dumps(reply).encode() + b"\n")
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class ResolverServer:
+    """In-memory chain table kept fresh from Convex, served on a Unix socket.
+
+    resolve_fn(capability, campaign_id, batch_id, use_cache) returns a chain
+    or raises; generation_fn() returns a value that changes whenever the
+    shared chain cache is invalidated.
+    """
+
+    def __init__(
+        self,
+        resolve_fn: Callable[..., list],
+        generation_fn: Optional[Callable[[], int]] = None,
+        path: Optional[str] = None,
+        poll_interval: Optional[float] = None,
+    ):
+        self.resolve_fn = resolve_fn
+        self.generation_fn = generation_fn
+        self.path = path or socket_path()
+        if poll_interval is None:
+            poll_interval = float(os.environ.get("SERVICE_RESOLVER_POLL", DEFAULT_POLL))
+        self.poll_interval = poll_interval
+        self._chains: dict[Key, dict] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._server: Optional[_UnixServer] = None
+
+    def lookup(
+        self,
+        capability: str,
+        campaign_id: Optional[str] = None,
+        batch_id: Optional[str] = None,
+        no_cache: bool = False,
+    ) -> dict:
+        key = (capability, campaign_id, batch_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._chains.get(key)
+            if entry is not None and not no_cache:
+                entry["used"] = now
+                return {"chain": entry["chain"]}
+        try:
+            chain = self.resolve_fn(capability, campaign_id, batch_id, use_cache=not no_cache)
+        except Exception as e:
+            return {"error": str(e)}
+        if chain:
+            with self._lock:
+                self._chains[key] = {"chain": chain, "used": now}
+        return {"chain": chain}
+
+    def refresh(self) -> None:
+        """Re-resolve every warm chain; drop the ones nobody asked for lately."""
+        now = time.monotonic()
+        with self._lock:
+            for key in [k for k, e in self._chains.items() if now - e["used"] > IDLE_TTL]:
+                del self._chains[key]
+            keys = list(self._chains)
+        for key in keys:
+            try:
+                chain = self.resolve_fn(*key, use_cache=False)
+            except Exception:
+                continue  # Keep serving the last good chain
+            with self._lock:
+                if not chain:
+                    self._chains.pop(key, None)
+                elif key in self._chains:
+                    self._chains[key]["chain"] = chain
+
+    def _generation(self) -> Optional[int]:
+        if self.generation_fn is None:
+            return None
+        try:
+            return self.generation_fn()
+        except Exception:
+            return None
+
+    def _watch(self) -> None:
+        generation = self._generation()
+        last_refresh = time.monotonic()
+        while not self._stop.wait(WATCH_INTERVAL):
+            current = self._generation()
+            if current != generation or time.monotonic() - last_refresh >= self.poll_interval:
+                generation = current
+                self.refresh()
+                last_refresh = time.monotonic()
+
+    def start(self) -> None:
+        """Bind the socket and start serving in background threads."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if os.path.exists(self.path):
+            if _listening(self.path):
+                raise RuntimeError(f"A resolver daemon is already listening on {self.path}")
+            os.unlink(self.path)  # Stale socket from a dead daemon
+        self._server = _UnixServer(self.path, _Handler)
+        self._server.resolver = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        threading.Thread(target=self._watch, daemon=True).start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def serve_forever(self) -> None:
+        """Serve until stopped or interrupted; removes the socket on the way out."""
+        self.start()
+        try:
+            self._stop.wait()
+        finally:
+            self.stop()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""Content-addressed response cache for deterministic capabilities.
+
+Responses are keyed by capability plus the normalized request arguments
+(keys sorted, string whitespace collapsed) and stored in a size-bounded
+LRU in SQLite under .cache/. Only capabilities whose manifest entries
+declare a TTL are cached:
+
+    "capabilities": [
+      {"category": "seo_keywords", ..., "cacheTtlSeconds": 604800}
+    ]
+
+When several providers declare a TTL for the same capability, the
+shortest one wins.
+
+Settings (environment):
+  SERVICE_RESPONSE_CACHE_PATH    Database path (default .cache/service_responses.db)
+  SERVICE_RESPONSE_CACHE_MAX_MB  Size bound before LRU eviction (default 256)
+
+Usage:
+  python scripts/lib/response_cache.py stats
+  python scripts/lib/response_cache.py clear [--capability seo_keywords]
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+SERVICES_DIR = os.path.join(PROJECT_ROOT, "services")
+DEFAULT_PATH = os.path.join(PROJECT_ROOT, ".cache", "service_responses.db")
+DEFAULT_MAX_MB = 256
+
+CACHE_CONTROLS = ("default", "bypass", "refresh", "only-if-cached")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    capability TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access);
+CREATE INDEX IF NOT EXISTS responses_capability ON responses (capability);
+"""
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, str):
+        return " ".join(value.split())
+    return value
+
+
+def cache_key(capability: str, request_args: dict) -> str:
+    """Stable hash of a capability and its normalized request arguments."""
+    canonical = json.dumps(
+        {"capability": capability, "args": _normalize(request_args)},
+        sort_keys=True, separators=(",", ":"), default=str,
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def load_capability_ttls(services_dir: str = SERVICES_DIR) -> dict[str, float]:
+    """Map capability to the shortest cacheTtlSeconds declared in any manifest."""
+    ttls: dict[str, float] = {}
+    for path in sorted(glob.glob(os.path.join(services_dir, "*/manifest.json"))):
+        if os.path.basename(os.path.dirname(path)).startswith("_"):
+            continue
+        try:
+            with open(path) as f:
+                manifest = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue
+        for cap in manifest.get("capabilities", []):
+            ttl = cap.get("cacheTtlSeconds")
+            if ttl:
+                ttls[cap["category"]] = min(ttl, ttls.get(cap["category"], ttl))
+    return ttls
+
+
+class ResponseCache:
+    """Size-bounded LRU of (result, service) pairs shared across processes.
+
+    SQLite errors degrade to misses and skipped writes.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        ttls: Optional[dict[str, float]] = None,
+    ):
+        self.path = path or os.environ.get("SERVICE_RESPONSE_CACHE_PATH") or DEFAULT_PATH
+        if max_bytes is None:
+            max_mb = float(os.environ.get("SERVICE_RESPONSE_CACHE_MAX_MB", DEFAULT_MAX_MB))
+            max_bytes = int(max_mb * 1024 * 1024)
+        self.max_bytes = max_bytes
+        self._ttls = ttls
+        self._local = threading.local()
+
+    def ttl(self, capability: str) -> Optional[float]:
+        """Declared TTL for a capability, or None if it isn't cacheable."""
+        if self._ttls is None:
+            self._ttls = load_capability_ttls()
+        return self._ttls.get(capability)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[tuple[Any, dict]]:
+        """Return the cached (result, service) pair, or None."""
+        now = time.time()
+        try:
+            conn = self._conn()
+            row = conn.execute(
+                "SELECT payload FROM responses WHERE key = ? AND expires_at > ?", (key, now),
+            ).fetchone()
+            if not row:
+                return None
+            conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+        except sqlite3.Error:
+            return None
+        entry = json.loads(row[0])
+        return entry["result"], entry["service"]
+
+    def put(self, key: str, capability: str, result: Any, service: dict) -> bool:
+        """Store a response for the capability's TTL. Returns False if not stored."""
+        ttl = self.ttl(capability)
+        if not ttl:
+            return False
+        try:
+            payload = json.dumps({"result": result, "service": service})
+        except (TypeError, ValueError):
+            return False  # Not JSON-serializable; leave uncached
+        if len(payload) > self.max_bytes:
+            return False
+
+        now = time.time()
+        try:
+            conn = self._conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, capability, payload, size, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, capability, payload, len(payload), now + ttl, now),
+            )
+            self._evict(conn, now)
+        except sqlite3.Error:
+            return False
+        return True
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        freed = 0
+        doomed = []
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_access"):
+            doomed.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+
+    def clear(self, capability: Optional[str] = None) -> int:
+        """Drop cached responses for one capability (or all). Returns rows removed."""
+        try:
+            conn = self._conn()
+            if capability:
+                cur = conn.execute("DELETE FROM responses WHERE capability = ?", (capability,))
+            else:
+                cur = conn.execute("DELETE FROM responses")
+            return cur.rowcount
+        except sqlite3.Error:
+            return 0
+
+    def stats(self) -> dict:
+        """Entry count and bytes per capability."""
+        try:
+            rows = self._conn().execute(
+                "SELECT capability, COUNT(*), SUM(size) FROM responses "
+                "WHERE expires_at > ? GROUP BY capability",
+                (time.time(),),
+            ).fetchall()
+        except sqlite3.Error:
+            rows = []
+        return {
+            "capabilities": {cap: {"entries": n, "bytes": size} for cap, n, size in rows},
+            "max_bytes": self.max_bytes,
+            "path": self.path,
+        }
+
+
+_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> ResponseCache:
+    """Return the process-wide shared response cache."""
+    global _cache
+    if _cache is None:
+        _cache = ResponseCache()
+    return _cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or clear the service response cache")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="Print entries and bytes per capability")
+    clear = sub.add_parser("clear", help="Drop cached responses")
+    clear.add_argument("--capability", help="Only drop responses for this capability")
+    args = parser.parse_args()
+
+    cache = get_response_cache()
+    if args.command == "stats":
+        print(json.dumps(cache.stats(), indent=2))
+    else:
+        removed = cache.clear(args.capability)
+        print(f"Cleared {removed} cached response(s).")
+
+
+if __name__ == "__main__":
+    main()
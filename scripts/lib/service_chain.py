@@ -10,31 +10,70 @@ Usage:
         campaign_id="abc123",
         task_id="xyz789",
     )
+
+    # Hedged: start the next provider if the current one is slow
+    result, service_used = execute_with_fallback(
+        capability="image_generation",
+        execute_fn=lambda svc: call_image_api(svc),
+        agent_name="vibe-image-generator",
+        hedge=True,
+        hedge_after=15,
+    )
+
+    # asyncio
+    result, service_used = await execute_with_fallback_async(
+        capability="web_search",
+        execute_fn=call_search_api,          # async def call_search_api(svc)
+        agent_name="vibe-researcher",
+        attempt_timeout=20,
+    )
+
+    # Many inputs, spread across providers within their manifest rate limits
+    results = execute_many(
+        capability="image_generation",
+        inputs=prompts,
+        execute_fn=lambda svc, prompt: call_image_api(svc, prompt),
+        agent_name="vibe-image-generator",
+        concurrency=16,
+    )
+
+    # Deterministic lookups: reuse a cached response for identical arguments
+    result, service_used = execute_with_fallback(
+        capability="seo_keywords",
+        execute_fn=lambda svc: keyword_volume(svc, "protein powder"),
+        agent_name="vibe-keyword-researcher",
+        cache_args={"keyword": "protein powder", "location": "US"},
+    )
 """
-import json
-import os
-import subprocess
-import sys
+import asyncio
 import time
-from typing import Any, Callable, Optional, Tuple
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Iterable, Optional, Tuple
 
+from lib.chain_cache import get_cache
+from lib.convex_client import get_async_client, get_client
+from lib.log_sink import get_log_sink
+from lib.rate_limits import get_limiter
+from lib.response_cache import CACHE_CONTROLS, cache_key, get_response_cache
+from lib.service_health import get_health
+from lib.telemetry import get_span_store, payload_size
 
-def _run_convex(fn: str, args: dict) -> str:
-    env = os.environ.copy()
-    url = env.get("CONVEX_SELF_HOSTED_URL", "http://localhost:3210")
-    cmd = ["npx", "convex", "run", fn, json.dumps(args), "--url", url]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        raise RuntimeError(f"Convex error: {result.stderr}")
-    return result.stdout.strip()
+# Hedged-mode defaults per capability, in seconds: how long to wait on the
+# in-flight providers before starting the next, and the overall budget.
+HEDGE_POLICIES: dict[str, dict] = {
+    "image_generation": {"hedge_after": 20.0, "budget": 180.0},
+    "video_generation": {"hedge_after": 90.0, "budget": 900.0},
+    "web_search": {"hedge_after": 3.0, "budget": 30.0},
+    "web_scraping": {"hedge_after": 10.0, "budget": 90.0},
+}
+DEFAULT_HEDGE_POLICY = {"hedge_after": 10.0, "budget": 120.0}
 
 
-def resolve_chain(
+def _chain_query(
     capability: str,
-    campaign_id: Optional[str] = None,
-    batch_id: Optional[str] = None,
-) -> list[dict]:
-    """Resolve the full fallback chain for a capability."""
+    campaign_id: Optional[str],
+    batch_id: Optional[str],
+) -> Tuple[str, dict]:
     args: dict = {"categoryName": capability}
 
     if campaign_id or batch_id:
@@ -45,11 +84,57 @@ def resolve_chain(
             args["contentBatchId"] = batch_id
     else:
         fn = "services:resolveChain"
+    return fn, args
+
+
+def resolve_chain(
+    capability: str,
+    campaign_id: Optional[str] = None,
+    batch_id: Optional[str] = None,
+    use_cache: bool = True,
+) -> list[dict]:
+    """Resolve the full fallback chain for a capability.
+
+    Served from the shared chain cache when a fresh entry exists; pass
+    use_cache=False to force a Convex round trip.
+    """
+    cache = get_cache()
+    if use_cache:
+        cached = cache.get(capability, campaign_id, batch_id)
+        if cached is not None:
+            return cached
+
+    fn, args = _chain_query(capability, campaign_id, batch_id)
+    chain = get_client().query(fn, args)
+    if not isinstance(chain, list):
+        return []
+    cache.put(capability, campaign_id, batch_id, chain)
+    return chain
+
+
+async def resolve_chain_async(
+    capability: str,
+    campaign_id: Optional[str] = None,
+    batch_id: Optional[str] = None,
+    use_cache: bool = True,
+) -> list[dict]:
+    """Async resolve_chain, querying Convex through the asyncio client.
+
+    The chain cache is SQLite shared with other processes, so it is read and
+    written from a worker thread.
+    """
+    cache = get_cache()
+    if use_cache:
+        cached = await asyncio.to_thread(cache.get, capability, campaign_id, batch_id)
+        if cached is not None:
+            return cached
 
-    result = _run_convex(fn, args)
-    if not result or result in ("null", "[]"):
+    fn, args = _chain_query(capability, campaign_id, batch_id)
+    chain = await get_async_client().query(fn, args)
+    if not isinstance(chain, list):
         return []
-    return json.loads(result)
+    await asyncio.to_thread(cache.put, capability, campaign_id, batch_id, chain)
+    return chain
 
 
 def _log_execution(
@@ -65,7 +150,15 @@ def _log_execution(
     batch_id: Optional[str] = None,
     estimated_cost: Optional[float] = None,
 ) -> None:
-    """Log a service execution attempt to Convex."""
+    """Queue a service execution attempt for logging to Convex.
+
+    Returns immediately; the background log sink writes records in batches.
+    The outcome also feeds the local health model and circuit breakers
+    (cache hits excepted: no provider was called).
+    """
+    if status != "cache_hit":
+        get_health().record(service_id, status, duration_ms)
+
     args: dict = {
         "serviceId": service_id,
         "categoryName": category_name,
@@ -86,10 +179,293 @@ def _log_execution(
     if estimated_cost is not None:
         args["estimatedCost"] = estimated_cost
 
+    get_log_sink().submit(args)
+
+
+def _finish_attempt(
+    service: dict,
+    attempt: int,
+    start: float,
+    log_ctx: dict,
+    error: Optional[Exception] = None,
+    result: Any = None,
+) -> Optional[str]:
+    """Log the outcome of one attempt. Returns an error summary on failure."""
+    service_id = service.get("_id", "")
+    label = service.get("displayName", service.get("name"))
+    duration_ms = int((time.time() - start) * 1000)
+
+    if error is None:
+        cost = get_span_store().record(
+            capability=log_ctx["category_name"],
+            service=service,
+            attempt=attempt,
+            status="success",
+            duration_ms=duration_ms,
+            agent=log_ctx["agent_name"],
+            response_bytes=payload_size(result),
+        )
+        _log_execution(
+            service_id=service_id,
+            status="success",
+            retry_attempt=attempt,
+            duration_ms=duration_ms,
+            estimated_cost=cost,
+            **log_ctx,
+        )
+        return None
+
+    error_msg = str(error)
+    if isinstance(error, TimeoutError):
+        status = "timeout"
+        summary = f"{label}: timeout - {error_msg}"
+    else:
+        status = "rate_limited" if "rate" in error_msg.lower() else "failed"
+        summary = f"{label}: {error_msg}"
+
+    get_span_store().record(
+        capability=log_ctx["category_name"],
+        service=service,
+        attempt=attempt,
+        status=status,
+        duration_ms=duration_ms,
+        agent=log_ctx["agent_name"],
+    )
+    _log_execution(
+        service_id=service_id,
+        status=status,
+        retry_attempt=attempt,
+        duration_ms=duration_ms,
+        error_message=error_msg,
+        **log_ctx,
+    )
+    return summary
+
+
+def _probe_busy(service: dict) -> Optional[str]:
+    """Claim the breaker probe for a service about to be called.
+
+    Returns an error summary when another caller already holds the probe;
+    the service is skipped without being called or logged.
+    """
+    if get_health().claim_probe(service.get("_id", "")):
+        return None
+    label = service.get("displayName", service.get("name"))
+    return f"{label}: skipped, circuit breaker probe in progress"
+
+
+def _attempt(
+    service: dict,
+    attempt: int,
+    execute_fn: Callable[[dict], Any],
+    log_ctx: dict,
+) -> Tuple[bool, Any]:
+    """Run execute_fn against one service and log the outcome.
+
+    Returns (True, result) on success or (False, error_summary) on failure.
+    """
+    busy = _probe_busy(service)
+    if busy:
+        return False, busy
+    start = time.time()
     try:
-        _run_convex("services:logServiceExecution", args)
+        result = execute_fn(service)
     except Exception as e:
-        print(f"Warning: failed to log execution: {e}", file=sys.stderr)
+        return False, _finish_attempt(service, attempt, start, log_ctx, e)
+    _finish_attempt(service, attempt, start, log_ctx, result=result)
+    return True, result
+
+
+async def _attempt_async(
+    service: dict,
+    attempt: int,
+    execute_fn: Callable[[dict], Awaitable[Any]],
+    log_ctx: dict,
+    timeout: Optional[float],
+) -> Tuple[bool, Any]:
+    """Await execute_fn against one service, cancelling it after timeout seconds.
+
+    The health, span and log writes are blocking SQLite calls that can wait
+    on other processes' locks, so they run in a worker thread.
+    """
+    busy = await asyncio.to_thread(_probe_busy, service)
+    if busy:
+        return False, busy
+    start = time.time()
+    try:
+        if timeout is None:
+            result = await execute_fn(service)
+        else:
+            result = await asyncio.wait_for(execute_fn(service), timeout)
+    except TimeoutError as e:
+        if not str(e):
+            e = TimeoutError(f"no response after {timeout:g}s")
+        return False, await asyncio.to_thread(_finish_attempt, service, attempt, start, log_ctx, e)
+    except Exception as e:
+        return False, await asyncio.to_thread(_finish_attempt, service, attempt, start, log_ctx, e)
+    await asyncio.to_thread(_finish_attempt, service, attempt, start, log_ctx, result=result)
+    return True, result
+
+
+def _healthy_chain(capability: str, chain: list[dict]) -> list[dict]:
+    if not chain:
+        raise RuntimeError(
+            f"No active services for capability '{capability}'. "
+            f"Configure at least one provider in the dashboard."
+        )
+    # Healthy providers first; providers with an open circuit breaker skipped
+    return get_health().order(chain)
+
+
+def _log_context(
+    capability: str,
+    agent_name: str,
+    task_id: Optional[str],
+    campaign_id: Optional[str],
+    batch_id: Optional[str],
+) -> dict:
+    return {
+        "category_name": capability,
+        "agent_name": agent_name,
+        "task_id": task_id,
+        "campaign_id": campaign_id,
+        "batch_id": batch_id,
+    }
+
+
+def _cached_response(
+    capability: str,
+    cache_args: Optional[dict],
+    cache_control: str,
+    log_ctx: dict,
+) -> Tuple[Optional[str], Optional[Tuple[Any, dict]]]:
+    """Consult the response cache per cache_control.
+
+    Returns (key to store a fresh response under or None, cached hit or None).
+    """
+    if cache_control not in CACHE_CONTROLS:
+        raise ValueError(f"cache_control must be one of {CACHE_CONTROLS}, got {cache_control!r}")
+    if cache_args is None or cache_control == "bypass":
+        return None, None
+
+    cache = get_response_cache()
+    if not cache.ttl(capability):
+        if cache_control == "only-if-cached":
+            raise RuntimeError(f"Capability '{capability}' has no cacheTtlSeconds in its manifests")
+        return None, None
+
+    key = cache_key(capability, cache_args)
+    if cache_control != "refresh":
+        start = time.time()
+        hit = cache.get(key)
+        if hit is not None:
+            duration_ms = int((time.time() - start) * 1000)
+            get_span_store().record(
+                capability=capability,
+                service=hit[1],
+                attempt=0,
+                status="cache_hit",
+                duration_ms=duration_ms,
+                agent=log_ctx["agent_name"],
+            )
+            _log_execution(
+                service_id=hit[1].get("_id", ""),
+                status="cache_hit",
+                retry_attempt=0,
+                duration_ms=duration_ms,
+                **log_ctx,
+            )
+            return key, hit
+    if cache_control == "only-if-cached":
+        raise RuntimeError(f"No cached response for capability '{capability}'")
+    return key, None
+
+
+def _all_failed(capability: str, chain: list[dict], errors: list[str]) -> RuntimeError:
+    return RuntimeError(
+        f"All {len(chain)} services failed for capability '{capability}':\n"
+        + "\n".join(f"  [{i+1}] {e}" for i, e in enumerate(errors))
+    )
+
+
+def _execute_hedged(
+    chain: list[dict],
+    execute_fn: Callable[[dict], Any],
+    log_ctx: dict,
+    hedge_after: float,
+    latency_budget: Optional[float],
+) -> Tuple[bool, Any, list[str]]:
+    """Race providers: start the next one whenever the in-flight ones stall.
+
+    A provider is launched immediately when every in-flight attempt has
+    failed, or after hedge_after seconds without an answer. The first
+    success wins; losers keep running in their threads and log their own
+    outcome, but their results are discarded.
+
+    Returns (found, (result, service) or None, errors). Raises RuntimeError
+    if latency_budget runs out first.
+    """
+    pool = ThreadPoolExecutor(max_workers=len(chain), thread_name_prefix="hedge")
+    pending: dict[Future, dict] = {}
+    errors: list[str] = []
+    next_index = 0
+    deadline = time.monotonic() + latency_budget if latency_budget else None
+
+    def launch() -> None:
+        nonlocal next_index
+        service = chain[next_index]
+        fut = pool.submit(_attempt, service, next_index, execute_fn, log_ctx)
+        pending[fut] = service
+        next_index += 1
+
+    try:
+        launch()
+        while pending:
+            timeout = hedge_after if next_index < len(chain) else None
+            if deadline is not None:
+                remaining = max(deadline - time.monotonic(), 0)
+                timeout = remaining if timeout is None else min(timeout, remaining)
+
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise RuntimeError(
+                        f"Capability '{log_ctx['category_name']}' exceeded its "
+                        f"{latency_budget:g}s latency budget with {len(pending)} "
+                        f"attempt(s) still running"
+                        + "".join(f"\n  [{i+1}] {e}" for i, e in enumerate(errors))
+                    )
+                if next_index < len(chain):
+                    launch()
+                continue
+
+            for fut in done:
+                service = pending.pop(fut)
+                ok, value = fut.result()
+                if ok:
+                    return True, (value, service), errors
+                errors.append(value)
+
+            if not pending and next_index < len(chain):
+                launch()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    return False, None, errors
+
+
+def _run_sequential(
+    chain: list[dict],
+    execute_fn: Callable[[dict], Any],
+    log_ctx: dict,
+) -> Tuple[bool, Any, list[str]]:
+    errors = []
+    for i, service in enumerate(chain):
+        ok, value = _attempt(service, i, execute_fn, log_ctx)
+        if ok:
+            return True, (value, service), errors
+        errors.append(value)
+    return False, None, errors
 
 
 def execute_with_fallback(
@@ -99,9 +475,17 @@ def execute_with_fallback(
     campaign_id: Optional[str] = None,
     batch_id: Optional[str] = None,
     task_id: Optional[str] = None,
+    hedge: bool = False,
+    hedge_after: Optional[float] = None,
+    latency_budget: Optional[float] = None,
+    cache_args: Optional[dict] = None,
+    cache_control: str = "default",
 ) -> Tuple[Any, dict]:
     """Execute a capability using the fallback chain.
 
+    The resolved chain is reordered by recent provider health, and providers
+    whose circuit breaker is open are skipped (see lib/service_health.py).
+
     Args:
         capability: The capability name (e.g. "image_generation")
         execute_fn: Function that takes a service dict and returns result.
@@ -110,82 +494,224 @@ def execute_with_fallback(
         campaign_id: Optional campaign ID for override resolution
         batch_id: Optional batch ID for override resolution
         task_id: Optional task ID for logging
+        hedge: Race providers instead of trying them strictly in turn.
+               execute_fn must be thread-safe.
+        hedge_after: Seconds to wait on in-flight providers before starting
+                     the next one (default from HEDGE_POLICIES)
+        latency_budget: Overall seconds to wait for a hedged result
+                        (default from HEDGE_POLICIES)
+        cache_args: Request arguments that fully determine the response.
+                    Passing them opts in to the response cache for
+                    capabilities with a manifest cacheTtlSeconds
+                    (see lib/response_cache.py).
+        cache_control: "default" (read and write), "bypass" (neither),
+                       "refresh" (write only) or "only-if-cached"
 
     Returns:
         Tuple of (result, service_used_dict)
 
     Raises:
-        RuntimeError: If all services in the chain fail
+        RuntimeError: If all services in the chain fail, a hedged call runs
+                      past its latency budget, or "only-if-cached" misses
     """
-    chain = resolve_chain(capability, campaign_id, batch_id)
-    if not chain:
-        raise RuntimeError(
-            f"No active services for capability '{capability}'. "
-            f"Configure at least one provider in the dashboard."
+    log_ctx = _log_context(capability, agent_name, task_id, campaign_id, batch_id)
+    key, hit = _cached_response(capability, cache_args, cache_control, log_ctx)
+    if hit is not None:
+        return hit
+
+    chain = _healthy_chain(capability, resolve_chain(capability, campaign_id, batch_id))
+
+    if hedge and len(chain) > 1:
+        policy = HEDGE_POLICIES.get(capability, DEFAULT_HEDGE_POLICY)
+        found, winner, errors = _execute_hedged(
+            chain,
+            execute_fn,
+            log_ctx,
+            hedge_after=hedge_after if hedge_after is not None else policy["hedge_after"],
+            latency_budget=latency_budget if latency_budget is not None else policy["budget"],
         )
+    else:
+        found, winner, errors = _run_sequential(chain, execute_fn, log_ctx)
+
+    if not found:
+        raise _all_failed(capability, chain, errors)
+    if key:
+        get_response_cache().put(key, capability, *winner)
+    return winner
+
 
+def _run_limited(
+    capability: str,
+    chain: list[dict],
+    execute_fn: Callable[[dict], Any],
+    log_ctx: dict,
+) -> Tuple[Any, dict]:
+    """Walk the chain, spilling over past providers that are at their limit.
+
+    Each provider is attempted at most once. When every untried provider is
+    saturated, waits for the soonest one to free up.
+    """
+    untried = list(enumerate(chain))
     errors = []
-    for i, service in enumerate(chain):
-        service_id = service.get("_id", "")
-        start = time.time()
+    while untried:
+        for pos, (i, service) in enumerate(untried):
+            limiter = get_limiter(service)
+            if not limiter.try_acquire():
+                continue
+            del untried[pos]
+            try:
+                ok, value = _attempt(service, i, execute_fn, log_ctx)
+            finally:
+                limiter.release()
+            if ok:
+                return value, service
+            errors.append(value)
+            break
+        else:
+            wait_for = min(get_limiter(svc).wait_time() for _, svc in untried)
+            time.sleep(max(wait_for, 0.01))
+    raise _all_failed(capability, chain, errors)
+
+
+def execute_many(
+    capability: str,
+    inputs: Iterable[Any],
+    execute_fn: Callable[[dict, Any], Any],
+    agent_name: str,
+    concurrency: int = 8,
+    campaign_id: Optional[str] = None,
+    batch_id: Optional[str] = None,
+    task_id: Optional[str] = None,
+) -> list[Any]:
+    """Run a capability over many inputs with bounded parallelism.
+
+    Providers are throttled by the rateLimits declared in their manifests
+    (see lib/rate_limits.py). An item goes to the first provider in the
+    chain with spare capacity, so once the primary is saturated, work spills
+    over to the next provider.
+
+    Args:
+        capability: The capability name (e.g. "image_generation")
+        inputs: Items to process
+        execute_fn: Function taking (service dict, item) and returning result.
+                   Should raise on failure. Must be thread-safe.
+        agent_name: Name of the calling agent (for logging)
+        concurrency: Max items in flight
+        campaign_id: Optional campaign ID for override resolution
+        batch_id: Optional batch ID for override resolution
+        task_id: Optional task ID for logging
+
+    Returns:
+        One entry per input, in input order: (result, service_used_dict),
+        or the RuntimeError for an item whose whole chain failed.
+    """
+    chain = _healthy_chain(capability, resolve_chain(capability, campaign_id, batch_id))
+    log_ctx = _log_context(capability, agent_name, task_id, campaign_id, batch_id)
 
+    def run_one(item: Any) -> Any:
         try:
-            result = execute_fn(service)
-            duration_ms = int((time.time() - start) * 1000)
+            return _run_limited(capability, chain, lambda svc: execute_fn(svc, item), log_ctx)
+        except RuntimeError as e:
+            return e
 
-            _log_execution(
-                service_id=service_id,
-                category_name=capability,
-                agent_name=agent_name,
-                status="success",
-                retry_attempt=i,
-                duration_ms=duration_ms,
-                task_id=task_id,
-                campaign_id=campaign_id,
-                batch_id=batch_id,
-            )
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="execute-many") as pool:
+        return list(pool.map(run_one, inputs))
 
-            return result, service
 
-        except TimeoutError as e:
-            duration_ms = int((time.time() - start) * 1000)
-            error_msg = str(e)
-            errors.append(f"{service.get('displayName', service.get('name'))}: timeout - {error_msg}")
+async def _run_chain_async(
+    capability: str,
+    chain: list[dict],
+    execute_fn: Callable[[dict], Awaitable[Any]],
+    log_ctx: dict,
+    attempt_timeout: Optional[float],
+) -> Tuple[Any, dict]:
+    errors = []
+    for i, service in enumerate(chain):
+        ok, value = await _attempt_async(service, i, execute_fn, log_ctx, attempt_timeout)
+        if ok:
+            return value, service
+        errors.append(value)
+    raise _all_failed(capability, chain, errors)
 
-            _log_execution(
-                service_id=service_id,
-                category_name=capability,
-                agent_name=agent_name,
-                status="timeout",
-                retry_attempt=i,
-                duration_ms=duration_ms,
-                error_message=error_msg,
-                task_id=task_id,
-                campaign_id=campaign_id,
-                batch_id=batch_id,
-            )
 
-        except Exception as e:
-            duration_ms = int((time.time() - start) * 1000)
-            error_msg = str(e)
+async def execute_with_fallback_async(
+    capability: str,
+    execute_fn: Callable[[dict], Awaitable[Any]],
+    agent_name: str,
+    campaign_id: Optional[str] = None,
+    batch_id: Optional[str] = None,
+    task_id: Optional[str] = None,
+    attempt_timeout: Optional[float] = None,
+    cache_args: Optional[dict] = None,
+    cache_control: str = "default",
+) -> Tuple[Any, dict]:
+    """Async execute_with_fallback for coroutine execute_fns.
 
-            status = "rate_limited" if "rate" in error_msg.lower() else "failed"
-            errors.append(f"{service.get('displayName', service.get('name'))}: {error_msg}")
+    Args:
+        capability: The capability name (e.g. "image_generation")
+        execute_fn: Coroutine function that takes a service dict and returns
+                    result. Should raise on failure.
+        agent_name: Name of the calling agent (for logging)
+        campaign_id: Optional campaign ID for override resolution
+        batch_id: Optional batch ID for override resolution
+        task_id: Optional task ID for logging
+        attempt_timeout: Seconds before an attempt is cancelled and logged
+                         as a timeout (default: no limit)
+        cache_args: Opt in to the response cache (see execute_with_fallback)
+        cache_control: "default", "bypass", "refresh" or "only-if-cached"
 
-            _log_execution(
-                service_id=service_id,
-                category_name=capability,
-                agent_name=agent_name,
-                status=status,
-                retry_attempt=i,
-                duration_ms=duration_ms,
-                error_message=error_msg,
-                task_id=task_id,
-                campaign_id=campaign_id,
-                batch_id=batch_id,
-            )
+    Returns:
+        Tuple of (result, service_used_dict)
 
-    raise RuntimeError(
-        f"All {len(chain)} services failed for capability '{capability}':\n"
-        + "\n".join(f"  [{i+1}] {e}" for i, e in enumerate(errors))
+    Raises:
+        RuntimeError: If all services in the chain fail or "only-if-cached"
+                      misses
+    """
+    log_ctx = _log_context(capability, agent_name, task_id, campaign_id, batch_id)
+    # Cache, health and log stores are SQLite; keep them off the event loop
+    key, hit = await asyncio.to_thread(
+        _cached_response, capability, cache_args, cache_control, log_ctx,
+    )
+    if hit is not None:
+        return hit
+
+    chain = await asyncio.to_thread(
+        _healthy_chain, capability, await resolve_chain_async(capability, campaign_id, batch_id),
+    )
+    winner = await _run_chain_async(capability, chain, execute_fn, log_ctx, attempt_timeout)
+    if key:
+        await asyncio.to_thread(get_response_cache().put, key, capability, *winner)
+    return winner
+
+
+async def gather_with_fallback(
+    capability: str,
+    inputs: Iterable[Any],
+    execute_fn: Callable[[dict, Any], Awaitable[Any]],
+    agent_name: str,
+    concurrency: int = 50,
+    campaign_id: Optional[str] = None,
+    batch_id: Optional[str] = None,
+    task_id: Optional[str] = None,
+    attempt_timeout: Optional[float] = None,
+) -> list[Any]:
+    """Run execute_with_fallback_async over many inputs on one event loop.
+
+    The chain is resolved once and shared. At most `concurrency` inputs
+    are in flight at a time. Like asyncio.gather(return_exceptions=True),
+    results come back in input order: a (result, service_used) tuple, or
+    the RuntimeError for an input whose whole chain failed.
+    """
+    chain = await asyncio.to_thread(
+        _healthy_chain, capability, await resolve_chain_async(capability, campaign_id, batch_id),
     )
+    log_ctx = _log_context(capability, agent_name, task_id, campaign_id, batch_id)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(item: Any) -> Tuple[Any, dict]:
+        async with semaphore:
+            return await _run_chain_async(
+                capability, chain, lambda svc: execute_fn(svc, item), log_ctx, attempt_timeout,
+            )
+
+    return await asyncio.gather(*(run_one(item) for item in inputs), return_exceptions=True)
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""Rolling service health and circuit breakers shared across processes.
+
+Every execution outcome recorded by service_chain._log_execution is also
+written here: a rolling window of outcomes per service (success rate, p95
+latency, rate-limit hits) and a circuit breaker per service. State lives in
+a SQLite database (WAL mode) under .cache/, so every agent on the host sees
+what the others have seen.
+
+Breakers:
+  closed     Service is tried normally.
+  open       FAILURE_THRESHOLD consecutive failures; skipped for COOLDOWN seconds.
+  half_open  Cooldown over; one caller claims a probe attempt. Success closes
+             the breaker, failure reopens it.
+
+Ordering a chain only reads breaker state. The probe is claimed
+(claim_probe) by the attempt that actually calls the service, so a chain
+shared by many calls, or a call that succeeds on an earlier provider, never
+holds a probe it doesn't use.
+
+Settings (environment):
+  SERVICE_HEALTH            Set to 0 to disable reordering and breakers
+  SERVICE_HEALTH_PATH       Database path (default .cache/service_health.db)
+
+Usage:
+  python scripts/lib/service_health.py stats
+  python scripts/lib/service_health.py reset [--service-id <id>]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+DEFAULT_PATH = os.path.join(PROJECT_ROOT, ".cache", "service_health.db")
+
+WINDOW = 15 * 60            # seconds of outcomes kept for the health model
+FAILURE_THRESHOLD = 5       # consecutive failures that open a breaker
+COOLDOWN = 60.0             # seconds a breaker stays open before a probe
+PROBE_TIMEOUT = 300.0       # seconds before an unanswered probe can be reclaimed
+MIN_SAMPLES = 5             # outcomes needed before success rate is trusted
+DEGRADED_SUCCESS_RATE = 0.5
+RATE_LIMIT_BACKOFF = 60.0   # seconds a rate-limit hit demotes a service
+SLOW_P95_FACTOR = 3.0       # p95 this many times the chain's fastest demotes a service
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outcomes (
+    service_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    duration_ms INTEGER,
+    at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outcomes_service_at ON outcomes (service_id, at);
+CREATE INDEX IF NOT EXISTS outcomes_at ON outcomes (at);
+CREATE TABLE IF NOT EXISTS breakers (
+    service_id TEXT PRIMARY KEY,
+    state TEXT NOT NULL DEFAULT 'closed',
+    failures INTEGER NOT NULL DEFAULT 0,
+    opened_at REAL,
+    probe_at REAL
+);
+"""
+
+
+def _p95(values: list[int]) -> Optional[int]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+
+class ServiceHealth:
+    """Health model and circuit breakers over a shared SQLite database.
+
+    SQLite errors never propagate: a broken health store means the chain is
+    used in its static order.
+    """
+
+    def __init__(self, path: Optional[str] = None, enabled: Optional[bool] = None):
+        self.path = path or os.environ.get("SERVICE_HEALTH_PATH") or DEFAULT_PATH
+        if enabled is None:
+            enabled = os.environ.get("SERVICE_HEALTH", "1") != "0"
+        self.enabled = enabled
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    # ── recording ───────────────────────────────
+
+    def record(self, service_id: str, status: str, duration_ms: Optional[int] = None) -> None:
+        """Add one execution outcome and advance the service's breaker."""
+        if not self.enabled or not service_id:
+            return
+        now = time.time()
+        try:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT INTO outcomes (service_id, status, duration_ms, at) VALUES (?, ?, ?, ?)",
+                    (service_id, status, duration_ms, now),
+                )
+                conn.execute("DELETE FROM outcomes WHERE at < ?", (now - WINDOW,))
+
+                row = conn.execute(
+                    "SELECT state, failures, opened_at FROM breakers WHERE service_id = ?",
+                    (service_id,),
+                ).fetchone()
+                state, failures, opened_at = row if row else ("closed", 0, None)
+
+                if status == "success":
+                    state, failures, opened_at = "closed", 0, None
+                else:
+                    failures += 1
+                    if state == "half_open" or (
+                        state == "closed" and failures >= FAILURE_THRESHOLD
+                    ):
+                        state, opened_at = "open", now
+
+                conn.execute(
+                    "INSERT OR REPLACE INTO breakers "
+                    "(service_id, state, failures, opened_at, probe_at) "
+                    "VALUES (?, ?, ?, ?, NULL)",
+                    (service_id, state, failures, opened_at),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error:
+            pass
+
+    # ── breakers ────────────────────────────────
+
+    @staticmethod
+    def _phase(row: Optional[tuple], now: float) -> str:
+        """closed, cooling (open, in cooldown), probe_due or probing."""
+        if not row or row[0] == "closed":
+            return "closed"
+        state, opened_at, probe_at = row
+        if state == "open":
+            return "cooling" if now - (opened_at or 0) < COOLDOWN else "probe_due"
+        # half_open: another caller holds the probe unless it went stale
+        if probe_at is not None and now - probe_at < PROBE_TIMEOUT:
+            return "probing"
+        return "probe_due"
+
+    def _claim(self, service_id: str, probe_only: bool) -> bool:
+        if not self.enabled:
+            return True
+        now = time.time()
+        try:
+            conn = self._conn()
+            row = conn.execute(
+                "SELECT state, opened_at, probe_at FROM breakers WHERE service_id = ?",
+                (service_id,),
+            ).fetchone()
+            phase = self._phase(row, now)
+            if phase == "closed" or (phase == "cooling" and probe_only):
+                return True
+            if phase != "probe_due":
+                return False
+            if row[0] == "open":
+                cur = conn.execute(
+                    "UPDATE breakers SET state = 'half_open', probe_at = ? "
+                    "WHERE service_id = ? AND state = 'open'",
+                    (now, service_id),
+                )
+            else:
+                cur = conn.execute(
+                    "UPDATE breakers SET probe_at = ? "
+                    "WHERE service_id = ? AND state = 'half_open' AND probe_at IS ?",
+                    (now, service_id, row[2]),
+                )
+            return cur.rowcount == 1
+        except sqlite3.Error:
+            return True
+
+    def allow(self, service_id: str) -> bool:
+        """Whether the breaker lets a call through. Claims the probe when half-open."""
+        return self._claim(service_id, probe_only=False)
+
+    def claim_probe(self, service_id: str) -> bool:
+        """Claim the probe right before calling a service that is due for one.
+
+        False only when another caller holds (or just won) the probe. Closed
+        breakers and breakers still cooling down pass: order() has already
+        left the latter out unless every breaker in the chain was open.
+        """
+        return self._claim(service_id, probe_only=True)
+
+    # ── health model ────────────────────────────
+
+    def stats(self, service_ids: Optional[list[str]] = None) -> dict[str, dict]:
+        """Rolling health per service: samples, success rate, p95, rate limits, breaker."""
+        now = time.time()
+        try:
+            conn = self._conn()
+            sql = "SELECT service_id, status, duration_ms, at FROM outcomes WHERE at >= ?"
+            params: list = [now - WINDOW]
+            if service_ids is not None:
+                sql += f" AND service_id IN ({', '.join('?' * len(service_ids))})"
+                params.extend(service_ids)
+            outcomes = conn.execute(sql, params).fetchall()
+            breakers = {
+                r[0]: {"state": r[1], "failures": r[2], "phase": self._phase(r[1:2] + r[3:], now)}
+                for r in conn.execute(
+                    "SELECT service_id, state, failures, opened_at, probe_at FROM breakers"
+                )
+            }
+        except sqlite3.Error:
+            outcomes, breakers = [], {}
+
+        grouped: dict[str, list] = {}
+        for service_id, status, duration_ms, at in outcomes:
+            grouped.setdefault(service_id, []).append((status, duration_ms, at))
+
+        ids = service_ids if service_ids is not None else sorted(set(grouped) | set(breakers))
+        result = {}
+        for service_id in ids:
+            rows = grouped.get(service_id, [])
+            successes = sum(1 for status, _, _ in rows if status == "success")
+            breaker = breakers.get(service_id, {"state": "closed", "failures": 0,
+                                                "phase": "closed"})
+            result[service_id] = {
+                "samples": len(rows),
+                "success_rate": successes / len(rows) if rows else None,
+                "p95_ms": _p95([d for _, d, _ in rows if d is not None]),
+                "rate_limited": sum(1 for status, _, _ in rows if status == "rate_limited"),
+                "recent_rate_limit": any(
+                    status == "rate_limited" and now - at < RATE_LIMIT_BACKOFF
+                    for status, _, at in rows
+                ),
+                "breaker": breaker["state"],
+                "consecutive_failures": breaker["failures"],
+                # Read-only: a probe_due breaker is claimed at attempt time
+                "available": breaker["phase"] in ("closed", "probe_due"),
+            }
+        return result
+
+    def order(self, chain: list[dict]) -> list[dict]:
+        """Reorder a chain by health and drop services whose breaker is open.
+
+        Only reads breaker state; see claim_probe. Healthy services keep
+        their configured priority order and come first; slow ones (p95 at
+        least SLOW_P95_FACTOR times the fastest in the chain) follow, then
+        degraded ones (low success rate or a recent rate limit). If every
+        breaker is open the static chain is returned, so a call is not
+        refused just because all providers failed recently.
+        """
+        if not self.enabled or not chain:
+            return chain
+        stats = self.stats([svc.get("_id", "") for svc in chain])
+
+        def degraded(s: dict) -> bool:
+            low_success = (
+                s["samples"] >= MIN_SAMPLES and s["success_rate"] < DEGRADED_SUCCESS_RATE
+            )
+            return low_success or s["recent_rate_limit"]
+
+        p95s = [s["p95_ms"] for s in stats.values()
+                if s["samples"] >= MIN_SAMPLES and s["p95_ms"] is not None]
+        fastest = min(p95s) if p95s else None
+
+        def slow(s: dict) -> bool:
+            return (
+                fastest is not None and s["samples"] >= MIN_SAMPLES
+                and s["p95_ms"] is not None
+                and s["p95_ms"] >= SLOW_P95_FACTOR * max(fastest, 1)
+            )
+
+        allowed = [svc for svc in chain if stats[svc.get("_id", "")]["available"]]
+        if not allowed:
+            return chain
+        return sorted(allowed, key=lambda svc: (
+            degraded(stats[svc.get("_id", "")]), slow(stats[svc.get("_id", "")]),
+        ))
+
+    def reset(self, service_id: Optional[str] = None) -> None:
+        """Close breakers and forget outcomes for one service (or all)."""
+        try:
+            conn = self._conn()
+            if service_id:
+                conn.execute("DELETE FROM outcomes WHERE service_id = ?", (service_id,))
+                conn.execute("DELETE FROM breakers WHERE service_id = ?", (service_id,))
+            else:
+                conn.execute("DELETE FROM outcomes")
+                conn.execute("DELETE FROM breakers")
+        except sqlite3.Error:
+            pass
+
+
+_health: Optional[ServiceHealth] = None
+
+
+def get_health() -> ServiceHealth:
+    """Return the process-wide shared health model."""
+    global _health
+    if _health is None:
+        _health = ServiceHealth()
+    return _health
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or reset service health state")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="Print rolling health and breaker state per service")
+    reset = sub.add_parser("reset", help="Close breakers and clear outcomes")
+    reset.add_argument("--service-id", help="Only reset this service")
+    args = parser.parse_args()
+
+    health = get_health()
+    if args.command == "stats":
+        print(json.dumps(health.stats(), indent=2))
+    else:
+        health.reset(args.service_id)
+        print("Reset.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""Local span telemetry for service chain attempts.
+
+service_chain records one span per provider attempt (and per response cache
+hit): capability, service, attempt index, duration, status, estimated cost
+and response size. Spans go to a SQLite database (WAL mode) under .cache/
+and are pruned past the retention window, so the store rotates on its own.
+
+Estimated cost comes from the manifest's costInfo block and is charged on
+successful attempts only:
+
+    "costInfo": {"summary": "$0.03 per image", "freeTier": false, "costPerCall": 0.03}
+
+Settings (environment):
+  SERVICE_TELEMETRY                 Set to 0 to stop recording spans
+  SERVICE_TELEMETRY_PATH            Database path (default .cache/service_telemetry.db)
+  SERVICE_TELEMETRY_RETENTION_DAYS  Days of spans kept (default 30)
+
+Usage:
+  python scripts/lib/telemetry.py report                       # last 24h, per provider
+  python scripts/lib/telemetry.py report --since 7d --by capability
+  python scripts/lib/telemetry.py report --since 2026-01-01 --until 2026-01-08 --capability web_search
+  python scripts/lib/telemetry.py report --json
+  python scripts/lib/telemetry.py prune
+"""
+import argparse
+import datetime
+import glob
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+SERVICES_DIR = os.path.join(PROJECT_ROOT, "services")
+DEFAULT_PATH = os.path.join(PROJECT_ROOT, ".cache", "service_telemetry.db")
+DEFAULT_RETENTION_DAYS = 30
+PRUNE_EVERY = 1000          # spans recorded between retention sweeps
+
+ERROR_STATUSES = ("failed", "timeout", "rate_limited")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS spans (
+    at REAL NOT NULL,
+    capability TEXT NOT NULL,
+    service TEXT NOT NULL,
+    service_id TEXT,
+    agent TEXT,
+    attempt INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    duration_ms INTEGER,
+    cost REAL,
+    response_bytes INTEGER
+);
+CREATE INDEX IF NOT EXISTS spans_at ON spans (at);
+CREATE INDEX IF NOT EXISTS spans_capability_at ON spans (capability, at);
+"""
+
+
+def load_costs(services_dir: str = SERVICES_DIR) -> dict[str, float]:
+    """Map Convex service names to costInfo.costPerCall from their manifest.
+
+    Multi-capability manifests are synced as "<name>-<category>" (see
+    sync_services.py), so both forms are registered.
+    """
+    costs: dict[str, float] = {}
+    for path in sorted(glob.glob(os.path.join(services_dir, "*/manifest.json"))):
+        if os.path.basename(os.path.dirname(path)).startswith("_"):
+            continue
+        try:
+            with open(path) as f:
+                manifest = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue
+        cost_info = manifest.get("costInfo")
+        cost = cost_info.get("costPerCall") if isinstance(cost_info, dict) else None
+        if cost is None:
+            continue
+        costs[manifest["name"]] = cost
+        for cap in manifest.get("capabilities", []):
+            costs[f"{manifest['name']}-{cap['category']}"] = cost
+    return costs
+
+
+def payload_size(value: Any) -> Optional[int]:
+    """Approximate serialized size of a provider response in bytes."""
+    if value is None:
+        return None
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode())
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return None
+
+
+def _percentile(ordered: list[int], q: float) -> Optional[int]:
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def parse_time(value: str, now: Optional[float] = None) -> float:
+    """Parse a relative window ("30m", "24h", "7d") or an ISO date/time."""
+    now = time.time() if now is None else now
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)([smhd])", value.strip())
+    if match:
+        unit = {"s": 1, "m": 60, "h": 3600, "d": 86400}[match.group(2)]
+        return now - float(match.group(1)) * unit
+    try:
+        parsed = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Expected a duration like 24h/7d or an ISO date, got {value!r}")
+    if parsed.tzinfo is None:
+        parsed = parsed.astimezone()
+    return parsed.timestamp()
+
+
+class SpanStore:
+    """Append-only span log over a shared SQLite database.
+
+    SQLite errors never propagate: telemetry must not break a provider call.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        enabled: Optional[bool] = None,
+        retention_days: Optional[float] = None,
+        costs: Optional[dict[str, float]] = None,
+    ):
+        self.path = path or os.environ.get("SERVICE_TELEMETRY_PATH") or DEFAULT_PATH
+        if enabled is None:
+            enabled = os.environ.get("SERVICE_TELEMETRY", "1") != "0"
+        self.enabled = enabled
+        if retention_days is None:
+            retention_days = float(
+                os.environ.get("SERVICE_TELEMETRY_RETENTION_DAYS", DEFAULT_RETENTION_DAYS)
+            )
+        self.retention = retention_days * 86400
+        self._costs = costs
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._since_prune = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def cost(self, service_name: str) -> Optional[float]:
+        """Declared cost per successful call for a service, if any."""
+        if self._costs is None:
+            self._costs = load_costs()
+        return self._costs.get(service_name)
+
+    def record(
+        self,
+        capability: str,
+        service: dict,
+        attempt: int,
+        status: str,
+        duration_ms: Optional[int],
+        agent: Optional[str] = None,
+        response_bytes: Optional[int] = None,
+    ) -> Optional[float]:
+        """Record one attempt span. Returns the estimated cost charged, if any."""
+        name = service.get("name", "")
+        cost = self.cost(name) if status == "success" else None
+        if not self.enabled:
+            return cost
+        try:
+            conn = self._conn()
+            conn.execute(
+                "INSERT INTO spans (at, capability, service, service_id, agent, attempt, "
+                "status, duration_ms, cost, response_bytes) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), capability, name, service.get("_id"), agent, attempt,
+                 status, duration_ms, cost, response_bytes),
+            )
+            with self._lock:
+                self._since_prune += 1
+                due = self._since_prune >= PRUNE_EVERY
+                if due:
+                    self._since_prune = 0
+            if due:
+                self.prune()
+        except sqlite3.Error:
+            pass
+        return cost
+
+    def prune(self) -> int:
+        """Drop spans older than the retention window. Returns rows removed."""
+        try:
+            cur = self._conn().execute(
+                "DELETE FROM spans WHERE at < ?", (time.time() - self.retention,),
+            )
+            return cur.rowcount
+        except sqlite3.Error:
+            return 0
+
+    def report(
+        self,
+        since: float,
+        until: Optional[float] = None,
+        capability: Optional[str] = None,
+        by: str = "service",
+    ) -> list[dict]:
+        """Latency percentiles, error rate and cost per group over a window.
+
+        Latency covers provider attempts only; cache hits are counted
+        separately.
+        """
+        if by not in ("service", "capability"):
+            raise ValueError(f"by must be 'service' or 'capability', got {by!r}")
+        sql = (
+            "SELECT capability, service, status, duration_ms, cost, response_bytes "
+            "FROM spans WHERE at >= ? AND at < ?"
+        )
+        params: list = [since, until if until is not None else time.time() + 1]
+        if capability:
+            sql += " AND capability = ?"
+            params.append(capability)
+        try:
+            rows = self._conn().execute(sql, params).fetchall()
+        except sqlite3.Error:
+            rows = []
+
+        groups: dict[tuple, list] = {}
+        for cap, service, status, duration, cost, size in rows:
+            key = (cap, service) if by == "service" else (cap,)
+            groups.setdefault(key, []).append((status, duration, cost, size))
+
+        report = []
+        for key, spans in sorted(groups.items()):
+            calls = [s for s in spans if s[0] != "cache_hit"]
+            durations = sorted(d for status, d, _, _ in calls if d is not None)
+            errors = sum(1 for status, _, _, _ in calls if status in ERROR_STATUSES)
+            successes = sum(1 for status, _, _, _ in calls if status == "success")
+            sizes = [size for status, _, _, size in calls if size is not None]
+            cost = sum(c for _, _, c, _ in calls if c is not None)
+            entry = {"capability": key[0]}
+            if by == "service":
+                entry["service"] = key[1]
+            entry.update({
+                "calls": len(calls),
+                "cache_hits": len(spans) - len(calls),
+                "error_rate": round(errors / len(calls), 4) if calls else None,
+                "p50_ms": _percentile(durations, 0.50),
+                "p95_ms": _percentile(durations, 0.95),
+                "p99_ms": _percentile(durations, 0.99),
+                "cost": round(cost, 6),
+                "cost_per_success": round(cost / successes, 6) if successes else None,
+                "avg_response_bytes": int(sum(sizes) / len(sizes)) if sizes else None,
+            })
+            report.append(entry)
+        return report
+
+
+_store: Optional[SpanStore] = None
+
+
+def get_span_store() -> SpanStore:
+    """Return the process-wide span store."""
+    global _store
+    if _store is None:
+        _store = SpanStore()
+    return _store
+
+
+def _fmt(value: Any) -> str:
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.4g}"
+    return str(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report on local service chain telemetry")
+    sub = parser.add_subparsers(dest="command", required=True)
+    report = sub.add_parser("report", help="Latency percentiles, error rate and cost")
+    report.add_argument("--since", default="24h",
+                        help="Window start: 30m, 24h, 7d or an ISO date (default 24h)")
+    report.add_argument("--until", help="Window end: duration ago or an ISO date (default now)")
+    report.add_argument("--capability", help="Only this capability")
+    report.add_argument("--by", choices=["service", "capability"], default="service")
+    report.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+    sub.add_parser("prune", help="Drop spans past the retention window")
+    args = parser.parse_args()
+
+    store = get_span_store()
+    if args.command == "prune":
+        print(f"Pruned {store.prune()} span(s).")
+        return
+
+    try:
+        since = parse_time(args.since)
+        until = parse_time(args.until) if args.until else None
+    except ValueError as e:
+        parser.error(str(e))
+    rows = store.report(since, until, capability=args.capability, by=args.by)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    if not rows:
+        print("No spans in window.")
+        return
+
+    columns = ["capability"] + (["service"] if args.by == "service" else []) + [
+        "calls", "cache_hits", "error_rate", "p50_ms", "p95_ms", "p99_ms",
+        "cost", "cost_per_success",
+    ]
+    table = [columns] + [[_fmt(row[c]) for c in columns] for row in rows]
+    widths = [max(len(r[i]) for r in table) for i in range(len(columns))]
+    for r in table:
+        print("  ".join(cell.ljust(w) for cell, w in zip(r, widths)).rstrip())
+
+
+if __name__ == "__main__":
+    main()
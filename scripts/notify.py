@@ -1,16 +1,32 @@
 #!/usr/bin/env python3
 """Send Telegram notification.
 
+Messages are written to a local spool and delivered by a background worker
+(scripts/lib/notify_queue.py), which respects Telegram's rate limits, merges
+bursts of similar messages into one digest and retries failures with
+backoff. The command returns as soon as the message is durably queued.
+
 Usage: python scripts/notify.py "message text"
    or: echo "message" | python scripts/notify.py
+       python scripts/notify.py --wait "message"   # block until delivered (up to 60s)
+       python scripts/notify.py --wait --wait-timeout 300 "message"
+       python scripts/notify.py --status           # spool counts
+       python scripts/notify.py --worker           # run the delivery worker in the foreground
 
 Reads TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID from environment or .env file.
 """
+import argparse
 import json
 import os
 import sys
-import urllib.request
-import urllib.parse
+import time
+
+from lib.notify_queue import (
+    NotifySpool,
+    TelegramSender,
+    run_worker,
+    spawn_worker,
+)
 
 
 def load_env():
@@ -25,47 +41,75 @@ def load_env():
                     os.environ.setdefault(key.strip(), value.strip())
 
 
-def send_telegram(message: str):
-    """Send message via Telegram Bot API."""
+def require_config() -> tuple[str, str]:
     token = os.environ.get("TELEGRAM_BOT_TOKEN")
     chat_id = os.environ.get("TELEGRAM_CHAT_ID")
 
     if not token or not chat_id:
         print("ERROR: TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID must be set", file=sys.stderr)
         sys.exit(1)
+    return token, chat_id
 
-    url = f"https://api.telegram.org/bot{token}/sendMessage"
-    data = urllib.parse.urlencode({
-        "chat_id": chat_id,
-        "text": message,
-        "parse_mode": "Markdown",
-    }).encode()
-
-    req = urllib.request.Request(url, data=data)
-    try:
-        with urllib.request.urlopen(req) as resp:
-            result = json.loads(resp.read())
-            if not result.get("ok"):
-                print(f"Telegram API error: {result}", file=sys.stderr)
-                sys.exit(1)
-    except Exception as e:
-        print(f"Failed to send Telegram message: {e}", file=sys.stderr)
-        sys.exit(1)
+
+def wait_for(spool: NotifySpool, msg_id: int, timeout: float) -> str:
+    """Poll the spool until a message leaves 'pending'. Returns its status."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = spool.status(msg_id)
+        if status != "pending":
+            return status
+        time.sleep(0.2)
+    return "pending"
 
 
 def main():
     load_env()
 
-    if len(sys.argv) > 1:
-        message = " ".join(sys.argv[1:])
+    parser = argparse.ArgumentParser(description="Queue a Telegram notification")
+    parser.add_argument("message", nargs="*", help="Message text (default: stdin)")
+    parser.add_argument("--wait", action="store_true",
+                        help="Block until the message is delivered")
+    parser.add_argument("--wait-timeout", type=float, default=60.0, metavar="SECONDS",
+                        help="How long --wait blocks before giving up (default 60)")
+    parser.add_argument("--status", action="store_true", help="Print spool counts")
+    parser.add_argument("--worker", action="store_true",
+                        help="Deliver queued messages in the foreground")
+    args = parser.parse_args()
+
+    spool = NotifySpool()
+    if args.status:
+        print(json.dumps(spool.counts(), indent=2))
+        return
+    if args.worker:
+        token, _ = require_config()
+        sender = TelegramSender(token)
+        try:
+            run_worker(spool, sender.send)
+        finally:
+            sender.close()
+        return
+
+    if args.message:
+        message = " ".join(args.message)
     elif not sys.stdin.isatty():
         message = sys.stdin.read().strip()
     else:
         print("Usage: notify.py 'message' or echo 'message' | notify.py", file=sys.stderr)
         sys.exit(1)
 
-    send_telegram(message)
-    print("Sent.")
+    _, chat_id = require_config()
+    msg_id = spool.enqueue(chat_id, message)
+    spawn_worker()
+
+    if not args.wait:
+        print("Queued.")
+        return
+    status = wait_for(spool, msg_id, args.wait_timeout)
+    if status == "sent":
+        print("Sent.")
+    else:
+        print(f"Not delivered yet (status: {status}); it stays queued.", file=sys.stderr)
+        sys.exit(1)
 
 
 if __name__ == "__main__":
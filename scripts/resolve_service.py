@@ -2,12 +2,20 @@
 """Resolve service chain for a capability.
 
 Returns a JSON array of active services sorted by priority (fallback chain).
-Supports campaign/batch-level overrides.
+Supports campaign/batch-level overrides. Results come from the shared chain
+cache (scripts/lib/chain_cache.py) when fresh; --no-cache bypasses it.
+
+When a resolver daemon is running (--serve), lookups are answered from its
+warm in-memory chains over a Unix socket (scripts/lib/resolver_daemon.py);
+otherwise the chain is resolved in-process. Output is the same either way.
 
 Usage:
   python scripts/resolve_service.py <capability_name>
   python scripts/resolve_service.py <capability_name> --campaign-id <id>
   python scripts/resolve_service.py <capability_name> --batch-id <id>
+  python scripts/resolve_service.py <capability_name> --no-cache
+  python scripts/resolve_service.py <capability_name> --no-daemon
+  python scripts/resolve_service.py --serve [--socket <path>]
 
 Examples:
   python scripts/resolve_service.py image_generation
@@ -15,53 +23,77 @@ Examples:
 """
 import argparse
 import json
-import os
-import subprocess
+import signal
 import sys
 
+from lib import resolver_daemon
 
-def run_convex(fn: str, args: dict) -> str:
-    """Run a Convex function via CLI."""
-    env = os.environ.copy()
-    url = env.get("CONVEX_SELF_HOSTED_URL", "http://localhost:3210")
+# lib.service_chain and the Convex client are imported only where needed:
+# a daemon-answered lookup shouldn't pay for loading them.
 
-    cmd = ["npx", "convex", "run", fn, json.dumps(args), "--url", url]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        print(f"Error querying Convex: {result.stderr}", file=sys.stderr)
-        sys.exit(1)
-    return result.stdout.strip()
+
+def serve(socket_path=None):
+    from lib.chain_cache import get_cache
+    from lib.service_chain import resolve_chain
+
+    server = resolver_daemon.ResolverServer(
+        resolve_fn=resolve_chain,
+        generation_fn=get_cache().generation,
+        path=socket_path,
+    )
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"Resolving service chains on {server.path}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+def resolve_in_process(capability, campaign_id, batch_id, no_cache):
+    from lib.convex_client import ConvexError
+    from lib.service_chain import resolve_chain
+
+    try:
+        return {"chain": resolve_chain(capability, campaign_id, batch_id, use_cache=not no_cache)}
+    except ConvexError as e:
+        return {"error": str(e)}
 
 
 def main():
     parser = argparse.ArgumentParser(description="Resolve service chain for a capability")
-    parser.add_argument("capability", help="Capability/category name (e.g. image_generation)")
+    parser.add_argument("capability", nargs="?",
+                        help="Capability/category name (e.g. image_generation)")
     parser.add_argument("--campaign-id", help="Campaign ID for override lookup")
     parser.add_argument("--batch-id", help="Content batch ID for override lookup")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the shared chain cache")
+    parser.add_argument("--no-daemon", action="store_true",
+                        help="Resolve in-process even if a resolver daemon is running")
+    parser.add_argument("--serve", action="store_true",
+                        help="Run the resident resolver daemon on a Unix socket")
+    parser.add_argument("--socket", help="Daemon socket path (default .cache/resolve_service.sock)")
     args = parser.parse_args()
 
-    query_args: dict = {"categoryName": args.capability}
-
-    if args.campaign_id or args.batch_id:
-        fn = "services:resolveChainWithOverrides"
-        if args.campaign_id:
-            query_args["campaignId"] = args.campaign_id
-        if args.batch_id:
-            query_args["contentBatchId"] = args.batch_id
-    else:
-        fn = "services:resolveChain"
-
-    result = run_convex(fn, query_args)
-
-    if not result or result in ("null", "[]"):
-        print(json.dumps({
-            "error": f"No active services for capability: {args.capability}",
-            "chain": [],
-        }))
+    if args.serve:
+        serve(args.socket)
+        return
+    if not args.capability:
+        parser.error("capability is required unless --serve is given")
+
+    reply = None
+    if not args.no_daemon:
+        reply = resolver_daemon.request(
+            args.capability, args.campaign_id, args.batch_id,
+            no_cache=args.no_cache, path=args.socket,
+        )
+    if reply is None:
+        reply = resolve_in_process(args.capability, args.campaign_id, args.batch_id, args.no_cache)
+
+    if "error" in reply:
+        print(f"Error querying Convex: {reply['error']}", file=sys.stderr)
         sys.exit(1)
 
-    chain = json.loads(result)
-    if not isinstance(chain, list) or len(chain) == 0:
+    chain = reply.get("chain")
+    if not chain:
         print(json.dumps({
             "error": f"No active services for capability: {args.capability}",
             "chain": [],
@@ -3,127 +3,228 @@
 
 Reads services/*/manifest.json and upserts each capability to the Convex
 services table. Preserves isActive, priority, apiKeyConfigured, apiKeyValue
-(only updates metadata fields).
+(only updates metadata fields). Invalidates the shared chain cache afterwards.
 
-Usage: python scripts/sync_services.py
+Only new or changed manifests are sent: content hashes of the last
+successful sync are kept in .cache/manifest_sync_state.json (per Convex
+URL). All upserts go out in one services:upsertFromManifestBatch call.
+
+Usage:
+  python scripts/sync_services.py            # sync new/changed manifests
+  python scripts/sync_services.py --force    # re-send every manifest
+  python scripts/sync_services.py --check    # report drift, write nothing (exit 1 on drift)
 """
+import argparse
 import glob
+import hashlib
 import json
 import os
-import subprocess
 import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from lib.chain_cache import get_cache
+from lib.convex_client import ConvexError, get_client
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "services"))
+STATE_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", ".cache", "manifest_sync_state.json")
+)
+
+
+def build_entries(manifest: dict, folder: str) -> list[dict]:
+    """Build upsertFromManifest args for each capability of a manifest."""
+    name = manifest["name"]
+    caps = manifest.get("capabilities", [])
+    entries = []
+
+    for cap in caps:
+        category_name = cap["category"]
+        default_priority = cap.get("defaultPriority", 99)
+        use_cases = cap.get("useCases", [])
+
+        auth = manifest.get("auth", {})
+        primary_env = auth.get("primaryEnvVar") or ""
+        docs_url = auth.get("docsUrl")
+
+        cost = manifest.get("costInfo", {})
+        cost_summary = cost.get("summary", "") if isinstance(cost, dict) else str(cost)
+        free_tier = cost.get("freeTier", False) if isinstance(cost, dict) else False
+
+        mcp_config = manifest.get("mcp")
+        mcp_server = mcp_config.get("serverName") if mcp_config else None
+
+        self_hosted = manifest.get("selfHosted")
+        self_hosted_config = None
+        if self_hosted:
+            self_hosted_config = {
+                "dockerCompose": self_hosted.get("dockerCompose"),
+                "healthCheckUrl": self_hosted.get("healthCheckUrl"),
+                "defaultPort": self_hosted.get("defaultPort"),
+            }
 
-
-def run_convex(fn: str, args: dict) -> str:
-    """Run a Convex mutation/query via CLI."""
-    env = os.environ.copy()
-    url = env.get("CONVEX_SELF_HOSTED_URL", "http://localhost:3210")
-
-    cmd = [
-        "npx", "convex", "run", fn, json.dumps(args),
-        "--url", url,
-    ]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        return json.dumps({"error": result.stderr.strip()})
-    return result.stdout.strip()
+        # Build service name — for multi-capability services, append category
+        svc_name = name if len(caps) == 1 else f"{name}-{category_name}"
+
+        args = {
+            "categoryName": category_name,
+            "name": svc_name,
+            "displayName": manifest["displayName"],
+            "description": manifest["description"],
+            "scriptPath": manifest.get("scriptPath", f"services/{folder}/query.py"),
+            "apiKeyEnvVar": primary_env,
+            "costInfo": cost_summary,
+            "useCases": use_cases,
+            "defaultPriority": default_priority,
+            "integrationType": manifest.get("integrationType", "script"),
+            "freeTier": free_tier,
+        }
+        if mcp_server:
+            args["mcpServer"] = mcp_server
+        if docs_url:
+            args["docsUrl"] = docs_url
+        if manifest.get("version"):
+            args["manifestVersion"] = manifest["version"]
+        if self_hosted_config:
+            args["selfHostedConfig"] = self_hosted_config
+        entries.append(args)
+
+    return entries
+
+
+def load_state(convex_url: str) -> dict[str, str]:
+    """Manifest hashes from the last sync against this Convex URL."""
+    try:
+        with open(STATE_PATH) as f:
+            state = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+    if state.get("convexUrl") != convex_url:
+        return {}
+    return state.get("manifests", {})
+
+
+def save_state(convex_url: str, hashes: dict[str, str]) -> None:
+    os.makedirs(os.path.dirname(STATE_PATH), exist_ok=True)
+    tmp = f"{STATE_PATH}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"convexUrl": convex_url, "manifests": hashes}, f, indent=2, sort_keys=True)
+    os.replace(tmp, STATE_PATH)
+
+
+def upsert_entries(entries: list[dict]) -> list[dict]:
+    """Upsert all entries, one result dict per entry in the same order.
+
+    Uses the batch mutation; if the deployed backend doesn't have it yet,
+    falls back to single upserts over a few pooled connections.
+    """
+    client = get_client()
+    try:
+        results = client.mutation("services:upsertFromManifestBatch", {"entries": entries})
+        if isinstance(results, list) and len(results) == len(entries):
+            return results
+    except ConvexError:
+        pass
+
+    def upsert_one(args: dict) -> dict:
+        try:
+            result = client.mutation("services:upsertFromManifest", args)
+        except ConvexError as e:
+            return {"name": args["name"], "error": str(e)}
+        if not isinstance(result, dict):
+            return {"name": args["name"], "error": f"unexpected response: {str(result)[:200]}"}
+        return {"name": args["name"], **result}
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        return list(pool.map(upsert_one, entries))
 
 
 def main():
-    base_dir = os.path.join(os.path.dirname(__file__), "..", "services")
-    base_dir = os.path.abspath(base_dir)
-
-    manifests = sorted(glob.glob(os.path.join(base_dir, "*/manifest.json")))
+    parser = argparse.ArgumentParser(description="Sync service manifests to Convex")
+    parser.add_argument("--check", action="store_true",
+                        help="Report new/changed/removed manifests without writing")
+    parser.add_argument("--force", action="store_true",
+                        help="Re-send every manifest, ignoring the sync state")
+    opts = parser.parse_args()
+
+    manifests = sorted(glob.glob(os.path.join(BASE_DIR, "*/manifest.json")))
     if not manifests:
         print("No manifests found in services/*/manifest.json")
         sys.exit(1)
 
     print(f"Found {len(manifests)} manifests")
 
-    created = 0
-    updated = 0
+    convex_url = get_client().url
+    previous = {} if opts.force else load_state(convex_url)
+    hashes: dict[str, str] = {}
+    pending: dict[str, list[dict]] = {}  # folder -> entries to send
+    seen: set[str] = set()
+    drift: list[str] = []
     errors = []
 
     for path in manifests:
         folder = os.path.basename(os.path.dirname(path))
         if folder.startswith("_"):
             continue  # Skip template
+        seen.add(folder)
 
-        with open(path) as f:
-            manifest = json.load(f)
+        with open(path, "rb") as f:
+            raw = f.read()
+        digest = hashlib.sha256(raw).hexdigest()
+        if previous.get(folder) == digest:
+            hashes[folder] = digest
+            continue
 
-        name = manifest["name"]
-        caps = manifest.get("capabilities", [])
-        if not caps:
-            errors.append(f"{name}: no capabilities defined")
+        drift.append(f"{'~' if folder in previous else '+'} {folder}")
+        manifest = json.loads(raw)
+        if not manifest.get("capabilities"):
+            errors.append(f"{manifest['name']}: no capabilities defined")
             continue
+        pending[folder] = build_entries(manifest, folder)
+        hashes[folder] = digest
 
-        for cap in caps:
-            category_name = cap["category"]
-            default_priority = cap.get("defaultPriority", 99)
-            use_cases = cap.get("useCases", [])
-
-            auth = manifest.get("auth", {})
-            primary_env = auth.get("primaryEnvVar") or ""
-            docs_url = auth.get("docsUrl")
-
-            cost = manifest.get("costInfo", {})
-            cost_summary = cost.get("summary", "") if isinstance(cost, dict) else str(cost)
-            free_tier = cost.get("freeTier", False) if isinstance(cost, dict) else False
-
-            mcp_config = manifest.get("mcp")
-            mcp_server = mcp_config.get("serverName") if mcp_config else None
-
-            self_hosted = manifest.get("selfHosted")
-            self_hosted_config = None
-            if self_hosted:
-                self_hosted_config = {
-                    "dockerCompose": self_hosted.get("dockerCompose"),
-                    "healthCheckUrl": self_hosted.get("healthCheckUrl"),
-                    "defaultPort": self_hosted.get("defaultPort"),
-                }
-
-            # Build service name — for multi-capability services, append category
-            svc_name = name if len(caps) == 1 else f"{name}-{category_name}"
-
-            args = {
-                "categoryName": category_name,
-                "name": svc_name,
-                "displayName": manifest["displayName"],
-                "description": manifest["description"],
-                "scriptPath": manifest.get("scriptPath", f"services/{folder}/query.py"),
-                "apiKeyEnvVar": primary_env,
-                "costInfo": cost_summary,
-                "useCases": use_cases,
-                "defaultPriority": default_priority,
-                "integrationType": manifest.get("integrationType", "script"),
-                "freeTier": free_tier,
-            }
-            if mcp_server:
-                args["mcpServer"] = mcp_server
-            if docs_url:
-                args["docsUrl"] = docs_url
-            if manifest.get("version"):
-                args["manifestVersion"] = manifest["version"]
-            if self_hosted_config:
-                args["selfHostedConfig"] = self_hosted_config
-
-            result_str = run_convex("services:upsertFromManifest", args)
-            try:
-                result = json.loads(result_str)
-                if "error" in result:
-                    errors.append(f"{svc_name}: {result['error']}")
-                elif result.get("action") == "created":
-                    created += 1
-                    print(f"  + {svc_name} ({category_name})")
-                else:
-                    updated += 1
-                    print(f"  ~ {svc_name} ({category_name})")
-            except json.JSONDecodeError:
-                errors.append(f"{svc_name}: unexpected response: {result_str[:200]}")
-
-    print(f"\nSynced {created + updated} services from {len(manifests) - 1} manifests.")
-    print(f"  New: {created}, Updated: {updated}, Errors: {len(errors)}")
+    unchanged = len(hashes) - len(pending)  # Before failed folders leave hashes
+    removed = sorted(set(previous) - seen)
+    drift.extend(f"- {folder}" for folder in removed)
+
+    if opts.check:
+        if drift:
+            print("\nDrift:")
+            for line in drift:
+                print(f"  {line}")
+        print(f"\n{len(drift)} manifest(s) out of sync.")
+        sys.exit(1 if drift or errors else 0)
+
+    entries = [entry for folder_entries in pending.values() for entry in folder_entries]
+    results = upsert_entries(entries) if entries else []
+    by_name = {r.get("name"): r for r in results}
+
+    created = 0
+    updated = 0
+    for folder, folder_entries in pending.items():
+        failed = False
+        for args in folder_entries:
+            result = by_name.get(args["name"], {})
+            svc_name, category_name = args["name"], args["categoryName"]
+            if "error" in result or "action" not in result:
+                errors.append(f"{svc_name}: {result.get('error', 'no result')}")
+                failed = True
+            elif result["action"] == "created":
+                created += 1
+                print(f"  + {svc_name} ({category_name})")
+            else:
+                updated += 1
+                print(f"  ~ {svc_name} ({category_name})")
+        if failed:
+            # Retry this manifest next run
+            hashes.pop(folder, None)
+
+    save_state(convex_url, hashes)
+    if created or updated:
+        get_cache().invalidate()
+
+    print(f"\nSynced {created + updated} services from {len(pending)} changed manifests.")
+    print(f"  New: {created}, Updated: {updated}, Unchanged manifests: {unchanged}, "
+          f"Errors: {len(errors)}")
     if errors:
         print("\nErrors:")
         for e in errors:
@@ -0,0 +1,34 @@
+"""Smoke test for scripts/bench_service_chain.py — offline fallback benchmark."""
+import json
+import os
+import subprocess
+import sys
+
+SCRIPT = os.path.join(os.path.dirname(__file__), "..", "..", "scripts", "bench_service_chain.py")
+
+
+def _run(*args):
+    # Separate process: the benchmark repoints the lib singletons at its sandbox.
+    return subprocess.run(
+        [sys.executable, SCRIPT, *args], capture_output=True, text=True, timeout=120,
+    )
+
+
+class TestBenchServiceChain:
+    def test_scenarios_report(self):
+        result = _run(
+            "--json", "--iterations", "20",
+            "--scenario", "resolve_cold", "--scenario", "fallback", "--scenario", "gather",
+        )
+        assert result.returncode == 0, result.stderr
+        rows = {r["scenario"]: r for r in json.loads(result.stdout)}
+        assert rows["resolve_cold"]["calls"] == 20
+        assert rows["fallback"]["attempts"] == 40
+        assert rows["fallback"]["failed"] == 0
+        assert rows["fallback"]["overhead_us"] > 0
+        assert rows["gather"]["failed"] == 0
+
+    def test_overhead_gate(self):
+        result = _run("--iterations", "20", "--scenario", "overhead", "--max-overhead-us", "0")
+        assert result.returncode == 1
+        assert "exceeds" in result.stderr
@@ -0,0 +1,110 @@
+"""Tests for lib/chain_cache.py — cross-process service chain cache."""
+import os
+import sys
+import time
+
+import pytest
+
+# Add scripts dir to path
+SCRIPTS_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "scripts")
+sys.path.insert(0, SCRIPTS_DIR)
+
+CHAIN = [{"_id": "svc1", "name": "fal-flux"}, {"_id": "svc2", "name": "recraft-v3"}]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    from lib.chain_cache import ChainCache
+    return ChainCache(path=str(tmp_path / "chains.db"), ttl=60)
+
+
+class TestChainCache:
+    def test_miss_then_hit(self, cache):
+        assert cache.get("image_generation") is None
+        cache.put("image_generation", None, None, CHAIN)
+        assert cache.get("image_generation") == CHAIN
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["entries"] == 1
+
+    def test_lookups_do_not_write(self, cache, tmp_path, monkeypatch):
+        import lib.chain_cache as chain_cache
+        from lib.chain_cache import ChainCache
+        cache.put("image_generation", None, None, CHAIN)
+        other = ChainCache(path=str(tmp_path / "chains.db"), ttl=60)
+        for _ in range(5):
+            assert cache.get("image_generation") == CHAIN
+        assert cache.get("web_search") is None
+        # Counts stay in process until folded in
+        assert other.stats()["hits"] == 0
+        cache.flush_counters()
+        assert (other.stats()["hits"], other.stats()["misses"]) == (5, 1)
+
+        monkeypatch.setattr(chain_cache, "COUNTER_FLUSH_INTERVAL", 0)
+        cache.get("image_generation")
+        assert other.stats()["hits"] == 6
+
+    def test_keyed_by_campaign_and_batch(self, cache):
+        cache.put("image_generation", "camp1", None, CHAIN)
+        assert cache.get("image_generation") is None
+        assert cache.get("image_generation", "camp1", "batch1") is None
+        assert cache.get("image_generation", "camp1") == CHAIN
+
+    def test_expired_entry_is_miss(self, tmp_path):
+        from lib.chain_cache import ChainCache
+        cache = ChainCache(path=str(tmp_path / "chains.db"), ttl=0.01)
+        cache.put("image_generation", None, None, CHAIN)
+        time.sleep(0.02)
+        assert cache.get("image_generation") is None
+
+    def test_zero_ttl_disables(self, tmp_path):
+        from lib.chain_cache import ChainCache
+        cache = ChainCache(path=str(tmp_path / "chains.db"), ttl=0)
+        cache.put("image_generation", None, None, CHAIN)
+        assert cache.get("image_generation") is None
+
+    def test_empty_chain_not_cached(self, cache):
+        cache.put("image_generation", None, None, [])
+        assert cache.get("image_generation") is None
+
+    def test_invalidate_one_capability(self, cache):
+        cache.put("image_generation", None, None, CHAIN)
+        cache.put("seo_keywords", None, None, CHAIN)
+        assert cache.invalidate("image_generation") == 1
+        assert cache.get("image_generation") is None
+        assert cache.get("seo_keywords") == CHAIN
+
+    def test_invalidate_all(self, cache):
+        cache.put("image_generation", None, None, CHAIN)
+        cache.put("seo_keywords", "camp1", None, CHAIN)
+        assert cache.invalidate() == 2
+        assert cache.stats()["entries"] == 0
+
+    def test_shared_between_instances(self, tmp_path):
+        from lib.chain_cache import ChainCache
+        path = str(tmp_path / "chains.db")
+        ChainCache(path=path, ttl=60).put("image_generation", None, None, CHAIN)
+        assert ChainCache(path=path, ttl=60).get("image_generation") == CHAIN
+
+
+class TestResolveChainCaching:
+    def test_second_resolve_skips_convex(self, cache, monkeypatch):
+        from lib import chain_cache, service_chain
+
+        calls = []
+
+        class FakeClient:
+            def query(self, fn, args):
+                calls.append((fn, args))
+                return CHAIN
+
+        monkeypatch.setattr(chain_cache, "_cache", cache)
+        monkeypatch.setattr(service_chain, "get_client", lambda: FakeClient())
+
+        assert service_chain.resolve_chain("image_generation") == CHAIN
+        assert service_chain.resolve_chain("image_generation") == CHAIN
+        assert len(calls) == 1
+
+        service_chain.resolve_chain("image_generation", use_cache=False)
+        assert len(calls) == 2
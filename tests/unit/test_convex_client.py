@@ -0,0 +1,221 @@
+"""Tests for lib/convex_client.py — pooled HTTP client for Convex."""
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# Add scripts dir to path
+SCRIPTS_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "scripts")
+sys.path.insert(0, SCRIPTS_DIR)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append((self.path, body, self.client_address))
+        if body["path"] == "services:slow":
+            time.sleep(1.0)
+        if body["path"] == "services:boom":
+            payload = {"status": "error", "errorMessage": "Unknown category: nope"}
+        else:
+            payload = {"status": "success", "value": {"echo": body["args"]}}
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        if body["path"] == "services:hangup":
+            # Keep-alive response, then drop the connection as if it idled out
+            self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    srv.requests = []
+    srv.handle_error = lambda *a: None  # Slow handlers write to closed sockets
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def _url(srv):
+    return f"http://127.0.0.1:{srv.server_address[1]}"
+
+
+class TestConvexClient:
+    def test_query_posts_to_query_endpoint(self, server):
+        from lib.convex_client import ConvexClient
+        client = ConvexClient(url=_url(server), cli_fallback=False)
+        value = client.query("services:resolveChain", {"categoryName": "x"})
+        assert value == {"echo": {"categoryName": "x"}}
+        path, body, _ = server.requests[0]
+        assert path == "/api/query"
+        assert body["path"] == "services:resolveChain"
+
+    def test_mutation_posts_to_mutation_endpoint(self, server):
+        from lib.convex_client import ConvexClient
+        client = ConvexClient(url=_url(server), cli_fallback=False)
+        client.mutation("services:logServiceExecution", {"status": "success"})
+        assert server.requests[0][0] == "/api/mutation"
+
+    def test_connection_is_reused(self, server):
+        from lib.convex_client import ConvexClient
+        client = ConvexClient(url=_url(server), cli_fallback=False)
+        for _ in range(5):
+            client.query("services:resolveChain", {})
+        ports = {addr for _, _, addr in server.requests}
+        assert len(ports) == 1
+
+    def test_function_error_raises(self, server):
+        from lib.convex_client import ConvexClient, ConvexError, ConvexUnavailable
+        client = ConvexClient(url=_url(server), cli_fallback=False)
+        with pytest.raises(ConvexError, match="Unknown category") as exc:
+            client.mutation("services:boom", {})
+        assert not isinstance(exc.value, ConvexUnavailable)
+
+    def test_unreachable_without_fallback(self):
+        from lib.convex_client import ConvexClient, ConvexUnavailable
+        client = ConvexClient(url="http://127.0.0.1:1", cli_fallback=False, timeout=1)
+        with pytest.raises(ConvexUnavailable):
+            client.query("services:resolveChain", {})
+
+    def test_stale_pooled_connection_retried(self, server):
+        from lib.convex_client import ConvexClient
+        client = ConvexClient(url=_url(server), cli_fallback=False)
+        client.query("services:hangup", {})
+        time.sleep(0.1)
+        assert client.mutation("services:logServiceExecution", {"n": 1}) == {"echo": {"n": 1}}
+        assert [b["path"] for _, b, _ in server.requests] == [
+            "services:hangup", "services:logServiceExecution",
+        ]
+
+    def test_mutation_timeout_not_resent(self, server, monkeypatch):
+        from lib import convex_client
+        cli = []
+        monkeypatch.setattr(convex_client.subprocess, "run", lambda cmd, **kw: cli.append(cmd))
+        client = convex_client.ConvexClient(url=_url(server), timeout=0.3)
+        client.query("services:resolveChain", {})  # pool a connection
+        with pytest.raises(convex_client.ConvexResultUnknown):
+            client.mutation("services:slow", {})
+        assert [b["path"] for _, b, _ in server.requests].count("services:slow") == 1
+        assert cli == []
+
+    def test_query_timeout_falls_back_to_cli(self, server, monkeypatch):
+        from lib import convex_client
+
+        class _Result:
+            returncode = 0
+            stdout = "1\n"
+            stderr = ""
+
+        monkeypatch.setattr(convex_client.subprocess, "run", lambda cmd, **kw: _Result())
+        client = convex_client.ConvexClient(url=_url(server), timeout=0.3)
+        assert client.query("services:slow", {}) == 1
+
+    def test_unreachable_falls_back_to_cli(self, monkeypatch):
+        from lib import convex_client
+        calls = []
+
+        class _Result:
+            returncode = 0
+            stdout = '[{"name": "fal"}]\n'
+            stderr = ""
+
+        def fake_run(cmd, **kwargs):
+            calls.append(cmd)
+            return _Result()
+
+        monkeypatch.setattr(convex_client.subprocess, "run", fake_run)
+        client = convex_client.ConvexClient(url="http://127.0.0.1:1", timeout=1)
+        assert client.query("services:resolveChain", {}) == [{"name": "fal"}]
+        assert calls[0][:4] == ["npx", "convex", "run", "services:resolveChain"]
+
+
+class TestAsyncConvexClient:
+    def test_query_and_mutation(self, server):
+        from lib.convex_client import AsyncConvexClient
+
+        async def run():
+            client = AsyncConvexClient(url=_url(server), cli_fallback=False)
+            q = await client.query("services:resolveChain", {"categoryName": "x"})
+            await client.mutation("services:logServiceExecution", {})
+            await client.aclose()
+            return q
+
+        assert asyncio.run(run()) == {"echo": {"categoryName": "x"}}
+        assert [p for p, _, _ in server.requests] == ["/api/query", "/api/mutation"]
+
+    def test_connection_is_reused(self, server):
+        from lib.convex_client import AsyncConvexClient
+
+        async def run():
+            client = AsyncConvexClient(url=_url(server), cli_fallback=False)
+            for _ in range(5):
+                await client.query("services:resolveChain", {})
+            await client.aclose()
+
+        asyncio.run(run())
+        assert len({addr for _, _, addr in server.requests}) == 1
+
+    def test_concurrent_calls(self, server):
+        from lib.convex_client import AsyncConvexClient
+
+        async def run():
+            client = AsyncConvexClient(url=_url(server), cli_fallback=False)
+            values = await asyncio.gather(
+                *(client.query("services:resolveChain", {"i": i}) for i in range(20))
+            )
+            await client.aclose()
+            return values
+
+        values = asyncio.run(run())
+        assert [v["echo"]["i"] for v in values] == list(range(20))
+
+    def test_function_error_raises(self, server):
+        from lib.convex_client import AsyncConvexClient, ConvexError
+
+        async def run():
+            client = AsyncConvexClient(url=_url(server), cli_fallback=False)
+            await client.mutation("services:boom", {})
+
+        with pytest.raises(ConvexError, match="Unknown category"):
+            asyncio.run(run())
+
+    def test_unreachable_without_fallback(self):
+        from lib.convex_client import AsyncConvexClient, ConvexUnavailable
+
+        async def run():
+            client = AsyncConvexClient(url="http://127.0.0.1:1", cli_fallback=False, timeout=1)
+            await client.query("services:resolveChain", {})
+
+        with pytest.raises(ConvexUnavailable):
+            asyncio.run(run())
+
+    def test_mutation_timeout_not_resent(self, server):
+        from lib.convex_client import AsyncConvexClient, ConvexResultUnknown
+
+        async def run():
+            client = AsyncConvexClient(url=_url(server), cli_fallback=False, timeout=0.3)
+            await client.query("services:resolveChain", {})
+            try:
+                await client.mutation("services:slow", {})
+            finally:
+                await client.aclose()
+
+        with pytest.raises(ConvexResultUnknown):
+            asyncio.run(run())
+        assert [b["path"] for _, b, _ in server.requests].count("services:slow") == 1
@@ -0,0 +1,256 @@
+"""Tests for data/gov/NM/ingest_nm.py — row preparation, COPY encoding and merge."""
+import os
+import sys
+from datetime import date
+
+import pytest
+
+pytest.importorskip("psycopg2")
+
+# Add NM scraper dir to path
+NM_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "data", "gov", "NM")
+sys.path.insert(0, NM_DIR)
+
+# Merge tests need a throwaway Postgres database; they create and drop the
+# master, meta and staging schemas in it
+PG_DSN = os.environ.get("NM_INGEST_TEST_DSN")
+
+ROW = {
+    "license_number": " 350019 ",
+    "company_name": "Sandia Mechanical Inc",
+    "phone": "1 (505) 555-0134",
+    "license_status": "Active",
+    "issue_date": "03/15/2004",
+    "expiry_date": "2026-11-30",
+    "volume": "$1000000.00 +",
+    "street": "4410 JEFFERSON ST NE",
+    "city": "Albuquerque",
+    "state": "NM",
+    "zip_code": "87109",
+    "qp_name": "DOE, JOHN A",
+    "qp_certificate_no": "QP-48213",
+    "qp_classification": "MM98",
+    "qp_attach_date": "01/02/2010",
+    "qp_status": "Attached",
+    "license_id": "1029398",
+    "license_application_id": "2203966",
+    "company_id": "884120",
+}
+
+
+class TestPrepareRow:
+    def test_full_row(self):
+        from ingest_nm import prepare_row
+        p, skip = prepare_row(ROW)
+        assert skip is None
+        assert p["license_number"] == "350019"
+        assert p["dedup_key"] == ("SANDIA MECHANICAL INC", "ALBUQUERQUE")
+        assert p["normalized"] == "SANDIA MECHANICAL"
+        assert p["phone"] == "5055550134"
+        assert p["entity_type"] == "Corporation"
+        assert p["trade"] == "HVAC/Mechanical"
+        assert p["raw_classification"] == "MM98"
+        assert (p["status"], p["status_desc"]) == ("ACTIVE", "Active")
+        assert p["issue_date"] == date(2004, 3, 15)
+        assert p["expiration_date"] == date(2026, 11, 30)
+        assert p["raw_data"] == {
+            "psi_license_id": "1029398", "psi_license_app_id": "2203966",
+            "psi_company_id": "884120", "volume": "$1000000.00 +",
+            "qp_name": "DOE, JOHN A", "qp_cert_no": "QP-48213",
+            "qp_classification": "MM98",
+        }
+        assert p["tp_raw"]["license_number"] == "350019"
+
+    def test_blank_fields_become_none(self):
+        from ingest_nm import prepare_row
+        row = {**ROW, "phone": "", "street": " ", "city": "", "zip_code": None,
+               "issue_date": "", "expiry_date": "not a date", "volume": "",
+               "qp_name": "", "qp_classification": ""}
+        p, skip = prepare_row(row)
+        assert skip is None
+        assert p["phone"] is None
+        assert p["street"] is None and p["city"] is None and p["zip"] is None
+        assert p["issue_date"] is None and p["expiration_date"] is None
+        assert p["qp_name"] is None and p["tp_raw"] is None
+        assert "volume" not in p["raw_data"] and "qp_name" not in p["raw_data"]
+        assert p["dedup_key"] == ("SANDIA MECHANICAL INC", "")
+        assert (p["classification_desc"], p["raw_classification"]) == ("Contractor", "Contractor")
+
+    def test_unknown_status_kept(self):
+        from ingest_nm import prepare_row
+        p, _ = prepare_row({**ROW, "license_status": "Under Review"})
+        assert (p["status"], p["status_desc"]) == ("UNDER_REVIEW", "Under Review")
+
+    def test_skip_reasons(self):
+        from ingest_nm import prepare_row
+        assert prepare_row({**ROW, "company_name": "  "}) == (None, "no_name")
+        assert prepare_row({**ROW, "license_number": ""}) == (None, "no_license")
+
+
+class TestCopyValue:
+    def test_null_and_empty_string_differ(self):
+        from ingest_nm import _copy_value
+        assert _copy_value(None) == "\\N"
+        assert _copy_value("") == ""
+
+    def test_escapes_separators(self):
+        from ingest_nm import _copy_value
+        assert _copy_value("a\tb\nc\rd") == "a\\tb\\nc\\rd"
+        assert _copy_value("C:\\PATH") == "C:\\\\PATH"
+        # A literal backslash-N must not read back as NULL
+        assert _copy_value("\\N") == "\\\\N"
+
+    def test_non_strings(self):
+        from ingest_nm import _copy_value
+        assert _copy_value(date(2026, 11, 30)) == "2026-11-30"
+        assert _copy_value({"note": "tab\there"}) == '{"note": "tab\\\\there"}'
+
+
+SCHEMA = """
+CREATE SCHEMA master;
+CREATE SCHEMA meta;
+CREATE TABLE meta.sources (
+    id SERIAL PRIMARY KEY, state_code TEXT, source_name TEXT, source_type TEXT,
+    source_url TEXT, format TEXT, agency TEXT, category TEXT,
+    records_available INT, records_ingested INT, status TEXT, ingested_at TIMESTAMPTZ,
+    UNIQUE (state_code, source_name)
+);
+CREATE TABLE meta.ingestion_runs (
+    id SERIAL PRIMARY KEY, source_id INT, started_at TIMESTAMPTZ, completed_at TIMESTAMPTZ,
+    records_total INT, records_new INT, records_errors INT
+);
+CREATE TABLE master.contractors (
+    id BIGSERIAL PRIMARY KEY, business_name TEXT, business_name_normalized TEXT,
+    dba_name TEXT, phone TEXT, email TEXT, street TEXT, city TEXT, state TEXT, zip TEXT,
+    county TEXT, entity_type TEXT, entity_type_desc TEXT, owner_name TEXT, source TEXT
+);
+CREATE TABLE master.licenses (
+    id BIGSERIAL PRIMARY KEY, contractor_id BIGINT, state TEXT, license_number TEXT,
+    license_type TEXT, license_type_desc TEXT, classification TEXT,
+    classification_desc TEXT, status TEXT, status_desc TEXT, issue_date DATE,
+    expiration_date DATE, source TEXT, source_url TEXT, raw_data JSONB
+);
+CREATE TABLE master.tradespersons (
+    id BIGSERIAL PRIMARY KEY, name TEXT, trade TEXT, classification TEXT,
+    certification_number TEXT, state TEXT, employer_contractor_id BIGINT,
+    source TEXT, raw_data JSONB
+);
+CREATE TABLE master.categories (
+    id BIGSERIAL PRIMARY KEY, contractor_id BIGINT, trade TEXT,
+    raw_classification TEXT, source TEXT
+);
+"""
+
+
+@pytest.fixture
+def pg():
+    if not PG_DSN:
+        pytest.skip("set NM_INGEST_TEST_DSN to a scratch Postgres database")
+    import psycopg2
+    conn = psycopg2.connect(PG_DSN)
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM pg_namespace WHERE nspname IN ('master', 'meta', 'staging')")
+    if cur.fetchone():
+        conn.close()
+        pytest.skip("NM_INGEST_TEST_DSN already has master/meta/staging schemas")
+    cur.execute(SCHEMA)
+    conn.commit()
+    try:
+        yield conn
+    finally:
+        conn.rollback()
+        cur = conn.cursor()
+        cur.execute("DROP SCHEMA IF EXISTS master, meta, staging CASCADE")
+        conn.commit()
+        conn.close()
+
+
+def _table_counts(cur):
+    counts = {}
+    for table in ("contractors", "licenses", "tradespersons", "categories"):
+        cur.execute(f"SELECT COUNT(*) FROM master.{table}")
+        counts[table] = cur.fetchone()[0]
+    return counts
+
+
+def _merge(pg, rows):
+    from ingest_nm import load_prepared, merge_prepared, prepare_row
+    cur = pg.cursor()
+    load_prepared(cur, [prepare_row(r)[0] for r in rows])
+    counts = merge_prepared(cur)
+    pg.commit()
+    return counts
+
+
+class TestMergePrepared:
+    ROWS = [
+        ROW,
+        # Same contractor, second license without a QP
+        {**ROW, "license_number": "350020", "license_id": "1029399", "qp_name": ""},
+        {**ROW, "license_number": "350021", "license_id": "1029400",
+         "company_name": "O'BRIEN ROOFING", "city": "SANTA FE", "qp_classification": "RG01",
+         "street": "12\tBACK\\ROAD"},
+    ]
+
+    def test_rerun_is_idempotent(self, pg):
+        first = _merge(pg, self.ROWS)
+        assert first["contractors_new"] == 2
+        assert first["licenses_new"] == 3
+        assert first["tradespersons_new"] == 2
+        after_first = _table_counts(pg.cursor())
+
+        second = _merge(pg, self.ROWS)
+        assert second["contractors_new"] == 0
+        assert second["licenses_new"] == 0
+        assert second["licenses_updated"] == 3
+        assert second["tradespersons_new"] == 0
+        assert second["categories_new"] == 0
+        assert _table_counts(pg.cursor()) == after_first
+
+    def test_rerun_updates_in_place(self, pg):
+        _merge(pg, self.ROWS)
+        _merge(pg, [{**ROW, "license_status": "Expired", "qp_name": "ROE, JANE"}])
+        cur = pg.cursor()
+        cur.execute("SELECT status FROM master.licenses WHERE license_number = '350019'")
+        assert cur.fetchall() == [("EXPIRED",)]
+        cur.execute("SELECT name FROM master.tradespersons "
+                    "WHERE raw_data->>'license_number' = '350019'")
+        assert cur.fetchall() == [("ROE, JANE",)]
+
+    def test_copy_round_trip(self, pg):
+        _merge(pg, self.ROWS)
+        cur = pg.cursor()
+        cur.execute("SELECT street, zip FROM master.contractors ORDER BY business_name")
+        assert cur.fetchall() == [("12\tBACK\\ROAD", "87109"),
+                                  ("4410 JEFFERSON ST NE", "87109")]
+        _merge(pg, [{**ROW, "license_number": "350030", "company_name": "NO CITY LLC",
+                     "city": "", "zip_code": ""}])
+        cur.execute("SELECT city, zip FROM master.contractors WHERE business_name = 'NO CITY LLC'")
+        assert cur.fetchall() == [(None, None)]
+
+
+class TestMergeFromStaging:
+    def _stage(self, pg, rows):
+        from psi_staging import copy_batch, ensure_staging_table
+        cur = pg.cursor()
+        ensure_staging_table(cur)
+        copy_batch(cur, rows)
+        pg.commit()
+
+    def test_only_new_or_changed_rows_merged(self, pg):
+        from ingest_nm import merge_from_staging
+        self._stage(pg, TestMergePrepared.ROWS)
+        assert merge_from_staging(pg) == 3
+        assert merge_from_staging(pg) == 0
+
+        # Re-sending an unchanged record leaves it merged
+        self._stage(pg, [ROW])
+        assert merge_from_staging(pg) == 0
+
+        self._stage(pg, [{**ROW, "license_status": "Expired"}])
+        assert merge_from_staging(pg) == 1
+        cur = pg.cursor()
+        cur.execute("SELECT COUNT(*) FROM staging.nm_psi "
+                    "WHERE merged_at IS NULL OR merged_at < updated_at")
+        assert cur.fetchone()[0] == 0
+        assert _table_counts(cur)["licenses"] == 3
@@ -0,0 +1,180 @@
+"""Tests for lib/log_sink.py — batched background execution logging."""
+import json
+import os
+import sys
+import threading
+
+import pytest
+
+# Add scripts dir to path
+SCRIPTS_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "scripts")
+sys.path.insert(0, SCRIPTS_DIR)
+
+
+class FakeClient:
+    def __init__(self):
+        self.calls = []
+        self.down = False
+        self.invalid = set()   # serviceIds that fail argument validation
+        self.unknown = set()   # serviceIds the mutation rejects per entry
+        self.timeouts = 0      # calls that reach the server but get no reply
+        self.lock = threading.Lock()
+
+    def mutation(self, fn, args):
+        from lib.convex_client import ConvexError, ConvexResultUnknown, ConvexUnavailable
+        if self.down:
+            raise ConvexUnavailable("down")
+        if self.timeouts:
+            self.timeouts -= 1
+            with self.lock:
+                self.calls.append((fn, args))
+            raise ConvexResultUnknown("no response")
+        entries = args["entries"]
+        if any(e["serviceId"] in self.invalid for e in entries):
+            raise ConvexError("ArgumentValidationError")
+        rejected = [{"index": i, "error": "Unknown service"}
+                    for i, e in enumerate(entries) if e["serviceId"] in self.unknown]
+        with self.lock:
+            self.calls.append((fn, args))
+        return {"logged": len(entries) - len(rejected), "rejected": rejected}
+
+    def logged(self):
+        skip = self.unknown
+        return [e["serviceId"] for _, args in self.calls for e in args["entries"]
+                if e["serviceId"] not in skip]
+
+
+def _entry(i):
+    return {"serviceId": f"svc{i}", "categoryName": "image_generation",
+            "agentName": "test", "status": "success", "retryAttempt": 0}
+
+
+@pytest.fixture
+def client():
+    return FakeClient()
+
+
+@pytest.fixture
+def sink(client, tmp_path):
+    from lib.log_sink import ExecutionLogSink
+    return ExecutionLogSink(client=client, batch_size=10, flush_interval=0.05,
+                            journal_path=str(tmp_path / "journal.jsonl"))
+
+
+class TestExecutionLogSink:
+    def test_submit_does_not_call_convex_inline(self, client, tmp_path):
+        from lib.log_sink import ExecutionLogSink
+        sink = ExecutionLogSink(client=client, batch_size=10, flush_interval=5,
+                                journal_path=str(tmp_path / "journal.jsonl"))
+        sink.submit(_entry(0))
+        assert client.calls == []
+        assert sink.flush(timeout=2)
+        assert len(client.calls) == 1
+
+    def test_batches_entries(self, sink, client):
+        for i in range(25):
+            sink.submit(_entry(i))
+        assert sink.flush(timeout=2)
+        sizes = [len(args["entries"]) for _, args in client.calls]
+        assert sum(sizes) == 25
+        assert max(sizes) <= 10
+        assert all(fn == "services:logServiceExecutionBatch" for fn, _ in client.calls)
+
+    def test_entries_are_timestamped(self, sink, client):
+        sink.submit(_entry(0))
+        sink.flush(timeout=2)
+        assert isinstance(client.calls[0][1]["entries"][0]["executedAt"], int)
+
+    def test_unreachable_spills_to_journal(self, sink, client):
+        client.down = True
+        for i in range(3):
+            sink.submit(_entry(i))
+        sink.flush(timeout=2)
+        with open(sink.journal_path) as f:
+            lines = [json.loads(line) for line in f]
+        assert [e["serviceId"] for e in lines] == ["svc0", "svc1", "svc2"]
+
+    def test_journal_replayed_when_convex_returns(self, sink, client):
+        client.down = True
+        sink.submit(_entry(0))
+        sink.flush(timeout=2)
+
+        client.down = False
+        sink.submit(_entry(1))
+        sink.flush(timeout=2)
+
+        sent = [e["serviceId"] for _, args in client.calls for e in args["entries"]]
+        assert sent == ["svc0", "svc1"]
+        assert not os.path.exists(sink.journal_path)
+
+    def test_invalid_entry_only_drops_itself(self, sink, client, capsys):
+        client.invalid = {"svc3"}
+        for i in range(8):
+            sink.submit(_entry(i))
+        assert sink.flush(timeout=2)
+        assert client.logged() == [f"svc{i}" for i in range(8) if i != 3]
+        assert "dropped execution log for svc3" in capsys.readouterr().err
+
+    def test_rejected_entries_reported(self, sink, client, capsys):
+        client.unknown = {"svc1"}
+        for i in range(3):
+            sink.submit(_entry(i))
+        assert sink.flush(timeout=2)
+        assert len(client.calls) == 1
+        assert client.logged() == ["svc0", "svc2"]
+        assert "dropped execution log for svc1" in capsys.readouterr().err
+
+    def test_invalid_entry_in_journal_only_drops_itself(self, sink, client):
+        client.down = True
+        for i in range(4):
+            sink.submit(_entry(i))
+        sink.flush(timeout=2)
+
+        client.down = False
+        client.invalid = {"svc2"}
+        sink.submit(_entry(4))
+        sink.flush(timeout=2)
+
+        assert client.logged() == ["svc0", "svc1", "svc3", "svc4"]
+        assert not os.path.exists(sink.journal_path)
+
+    def test_timed_out_batch_not_resent(self, client, tmp_path):
+        from lib.log_sink import ExecutionLogSink
+        sink = ExecutionLogSink(client=client, batch_size=2, flush_interval=5,
+                                journal_path=str(tmp_path / "journal.jsonl"))
+        client.timeouts = 1
+        for i in range(4):
+            sink.submit(_entry(i))
+        assert sink.flush(timeout=2)
+        sent = [e["serviceId"] for _, args in client.calls for e in args["entries"]]
+        assert sent.count("svc0") == 1
+
+    def test_corrupt_journal_line_skipped(self, sink, client, capsys):
+        with open(sink.journal_path, "w") as f:
+            f.write(json.dumps(_entry(0)) + "\n" + json.dumps(_entry(1))[:20])
+        sink.submit(_entry(2))
+        assert sink.flush(timeout=2)
+        assert client.logged() == ["svc0", "svc2"]
+        assert "corrupt journal line 2" in capsys.readouterr().err
+        assert os.listdir(os.path.dirname(sink.journal_path)) == []
+
+    def test_journal_append_after_partial_line(self, sink, client):
+        with open(sink.journal_path, "w") as f:
+            f.write(json.dumps(_entry(0))[:20])
+        sink._journal([_entry(1)])
+        assert sink._read_journal(sink.journal_path) == [_entry(1)]
+
+    def test_worker_survives_unexpected_error(self, sink, client, monkeypatch):
+        calls = []
+
+        def broken(fn, args):
+            calls.append(args)
+            raise ValueError("boom")
+
+        monkeypatch.setattr(client, "mutation", broken)
+        sink.submit(_entry(0))
+        assert sink.flush(timeout=2)
+        monkeypatch.undo()
+        sink.submit(_entry(1))
+        assert sink.flush(timeout=2)
+        assert client.logged() == ["svc1"]
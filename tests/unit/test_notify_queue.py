@@ -0,0 +1,164 @@
+"""Tests for lib/notify_queue.py — spooled Telegram notifications."""
+import fcntl
+import os
+import sys
+import time
+
+import pytest
+
+# Add scripts dir to path
+SCRIPTS_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "scripts")
+sys.path.insert(0, SCRIPTS_DIR)
+
+
+@pytest.fixture
+def spool(tmp_path):
+    from lib.notify_queue import NotifySpool
+    return NotifySpool(path=str(tmp_path / "spool.db"), linger=0)
+
+
+class TestDigest:
+    def test_single_message_unchanged(self):
+        from lib.notify_queue import build_digest
+        assert build_digest(["Pipeline done"]) == ("Pipeline done", [0])
+
+    def test_identical_messages_counted(self):
+        from lib.notify_queue import build_digest
+        assert build_digest(["Build failed"] * 3) == ("Build failed (×3)", [0, 1, 2])
+
+    def test_similar_messages_collapse(self):
+        from lib.notify_queue import build_digest
+        texts = [
+            "Agent vibe-writer crashed (exit 1) on task 8f3a9c2e11",
+            "Pipeline complete",
+            "Agent vibe-writer crashed (exit 137) on task 77aa00bb99",
+        ]
+        assert build_digest(texts) == (
+            "Agent vibe-writer crashed (exit 1) on task 8f3a9c2e11 (+1 similar)"
+            "\n\nPipeline complete",
+            [0, 1, 2],
+        )
+
+    def test_respects_telegram_length_limit(self):
+        from lib.notify_queue import build_digest
+        texts = [f"{word} " * 300 for word in ("alpha", "beta", "gamma", "delta")]
+        digest, covered = build_digest(texts, limit=4096)
+        assert len(digest) <= 4096
+        assert digest.endswith("… and 2 more")
+        assert covered == [0, 1]
+
+    def test_oversized_first_message_truncated(self):
+        from lib.notify_queue import build_digest
+        digest, covered = build_digest(["x" * 5000, "short"], limit=4096)
+        assert len(digest) <= 4096
+        assert digest.endswith("…\n\n… and 1 more")
+        assert covered == [0]
+        digest, covered = build_digest(["x" * 5000], limit=4096)
+        assert len(digest) == 4096 and digest.endswith("x…")
+        assert covered == [0]
+
+
+class TestSpool:
+    def test_linger_delays_delivery(self, tmp_path):
+        from lib.notify_queue import NotifySpool
+        spool = NotifySpool(path=str(tmp_path / "s.db"), linger=60)
+        spool.enqueue("123", "hi")
+        assert spool.due() == {}
+        assert spool.due(now=time.time() + 61) != {}
+
+    def test_due_grouped_by_chat(self, spool):
+        spool.enqueue("1", "a")
+        spool.enqueue("2", "b")
+        spool.enqueue("1", "c")
+        due = spool.due()
+        assert [t for _, t, _ in due["1"]] == ["a", "c"]
+        assert [t for _, t, _ in due["2"]] == ["b"]
+
+    def test_failures_back_off_then_give_up(self, spool, monkeypatch):
+        from lib import notify_queue
+        monkeypatch.setattr(notify_queue, "MAX_ATTEMPTS", 2)
+        msg_id = spool.enqueue("1", "a")
+        spool.mark_failed(spool.due()["1"], "boom")
+        assert spool.status(msg_id) == "pending"
+        assert spool.due() == {}
+        spool.mark_failed(spool.due(now=time.time() + 3600)["1"], "boom")
+        assert spool.status(msg_id) == "failed"
+
+
+class TestWorker:
+    def _run(self, spool, send, tmp_path, idle=0.2):
+        from lib.notify_queue import run_worker
+        return run_worker(spool, send, idle_timeout=idle, lock_path=str(tmp_path / "w.lock"))
+
+    def test_burst_sent_as_one_digest(self, spool, tmp_path):
+        sent = []
+        for i in range(5):
+            spool.enqueue("42", f"Task {i} failed")
+        assert self._run(spool, lambda chat, text: sent.append((chat, text)), tmp_path) == 5
+        assert sent == [("42", "Task 0 failed (+4 similar)")]
+        assert spool.counts()["sent"] == 5
+
+    def test_overflow_stays_queued_for_next_send(self, spool, tmp_path):
+        sent = []
+        for word in ("alpha", "beta", "gamma", "delta"):
+            spool.enqueue("42", f"{word} " * 300)
+        assert self._run(spool, lambda chat, text: sent.append(text), tmp_path, idle=1.5) == 4
+        assert len(sent) == 2
+        assert sent[0].startswith("alpha") and sent[0].endswith("… and 2 more")
+        assert sent[1].startswith("gamma") and "delta" in sent[1]
+        assert spool.counts() == {"pending": 0, "sent": 4, "failed": 0}
+
+    def test_per_chat_rate_limit(self, spool, tmp_path):
+        sent = []
+
+        def send(chat, text):
+            sent.append(time.monotonic())
+            if len(sent) == 1:
+                spool.enqueue("42", "second")
+
+        spool.enqueue("42", "first")
+        self._run(spool, send, tmp_path)
+        assert len(sent) == 2
+        assert sent[1] - sent[0] >= 0.9
+
+    def test_retry_after_defers_without_counting_attempt(self, spool, tmp_path):
+        from lib.notify_queue import SendError
+        calls = []
+
+        def send(chat, text):
+            calls.append(time.monotonic())
+            if len(calls) == 1:
+                raise SendError("Too Many Requests", retry_after=0.3)
+
+        msg_id = spool.enqueue("42", "hello")
+        self._run(spool, send, tmp_path, idle=0.5)
+        assert len(calls) == 2
+        assert spool.status(msg_id) == "sent"
+
+    def test_second_worker_backs_off(self, spool, tmp_path):
+        from lib.notify_queue import run_worker
+        lock_path = str(tmp_path / "w.lock")
+        with open(lock_path, "w") as held:
+            fcntl.flock(held, fcntl.LOCK_EX)
+            assert run_worker(spool, lambda c, t: None, idle_timeout=0, lock_path=lock_path) == -1
+
+
+class TestNotifyCli:
+    def test_wait_flag_before_message(self, tmp_path, monkeypatch, capsys):
+        import notify
+        from lib.notify_queue import NotifySpool, run_worker
+        monkeypatch.setenv("TELEGRAM_BOT_TOKEN", "token")
+        monkeypatch.setenv("TELEGRAM_CHAT_ID", "42")
+        monkeypatch.setenv("NOTIFY_SPOOL_PATH", str(tmp_path / "spool.db"))
+        monkeypatch.setenv("NOTIFY_LINGER", "0")
+        sent = []
+
+        def deliver():
+            run_worker(NotifySpool(), lambda chat, text: sent.append((chat, text)),
+                       idle_timeout=0, lock_path=str(tmp_path / "w.lock"))
+
+        monkeypatch.setattr(notify, "spawn_worker", deliver)
+        monkeypatch.setattr(sys, "argv", ["notify.py", "--wait", "Deploy finished"])
+        notify.main()
+        assert sent == [("42", "Deploy finished")]
+        assert capsys.readouterr().out.strip() == "Sent."
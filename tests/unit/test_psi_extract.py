@@ -0,0 +1,166 @@
+"""Tests for data/gov/NM/psi_extract.py — fast-path PSI page extractors."""
+import os
+import sys
+
+import pytest
+
+# Add NM scraper dir to path
+NM_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "data", "gov", "NM")
+sys.path.insert(0, NM_DIR)
+
+FIXTURES = os.path.join(NM_DIR, "fixtures", "psi")
+
+SANDIA = {
+    "company_name": "SANDIA MECHANICAL INC",
+    "license_number": "350019",
+    "phone": "(505) 555-0134",
+    "license_status": "Active",
+    "issue_date": "03/15/2004",
+    "expiry_date": "11/30/2026",
+    "volume": "$1000000.00 +",
+    "street": "4410 JEFFERSON ST NE STE 200",
+    "city": "ALBUQUERQUE",
+    "state": "NM",
+    "zip_code": "87109",
+    "company_id": "884120",
+    "qp_name": "DOE, JOHN A",
+    "qp_certificate_no": "QP-48213",
+    "qp_classification": "MM98",
+    "qp_attach_date": "01/02/2010",
+    "qp_status": "Attached",
+}
+NO_QP = {"qp_name": "", "qp_certificate_no": "", "qp_classification": "",
+         "qp_attach_date": "", "qp_status": ""}
+
+
+def _fixture(name):
+    # newline="" keeps the CRLF fixtures' line endings
+    with open(os.path.join(FIXTURES, name), encoding="utf-8", newline="") as f:
+        return f.read()
+
+
+def _fixture_names(kind):
+    return sorted(n for n in os.listdir(FIXTURES) if n.startswith(kind))
+
+
+class TestExtractDetail:
+    def test_full_page(self):
+        from psi_extract import extract_detail
+        assert extract_detail(_fixture("detail_full.html"), "1029398") == SANDIA
+
+    def test_crlf_and_entities(self):
+        from psi_extract import extract_detail
+        assert extract_detail(_fixture("detail_crlf.html"), "1") == {
+            **SANDIA, "company_name": "NAVAJO SOLAR – SERVICES",
+        }
+
+    def test_no_qp_section(self):
+        from psi_extract import extract_detail
+        assert extract_detail(_fixture("detail_no_qp.html"), "1") == {
+            **SANDIA, **NO_QP, "license_status": "Expired",
+        }
+
+    def test_multiple_qps_takes_first(self):
+        from psi_extract import extract_detail
+        result = extract_detail(_fixture("detail_multiple_qp.html"), "1")
+        assert result == {
+            **SANDIA, "company_name": "RIO GRANDE PLUMBING & HEATING",
+            "license_number": "350044",
+        }
+
+    def test_no_hidden_form_reads_labels(self):
+        from psi_extract import extract_detail
+        assert extract_detail(_fixture("detail_no_hiddenform.html"), "1") == {
+            **SANDIA, "company_name": "O'BRIEN ROOFING", "license_number": "350027",
+            "street": "", "city": "", "state": "", "zip_code": "", "company_id": "",
+        }
+
+    def test_comment_in_field_needs_fallback(self):
+        from psi_extract import FastPathError, extract_detail
+        with pytest.raises(FastPathError, match="comment or script in field"):
+            extract_detail(_fixture("detail_comment_in_field.html"), "1")
+
+    def test_session_expired_needs_fallback(self):
+        from psi_extract import FastPathError, extract_detail
+        with pytest.raises(FastPathError, match="no license number or company name"):
+            extract_detail(_fixture("detail_session_expired.html"), "1")
+
+
+class TestExtractSearchResults:
+    def test_first_page(self):
+        from psi_extract import extract_search_results
+        total, rows = extract_search_results(_fixture("search_first_page.html"))
+        assert total == 143
+        assert len(rows) == 18
+        assert rows[0] == {
+            "license_number": "350012",
+            "company_name": "A & B ELECTRIC, LLC",
+            "address": "123 MAIN ST",
+            "city_zip": "ALBUQUERQUE, NM 87102",
+            "expiry_date": "06/30/2027",
+            "status": "Active",
+            "license_id": "1029391",
+            "license_application_id": "2203959",
+        }
+        # Inner whitespace is kept as the portal sent it
+        assert rows[1]["company_name"] == "SANDIA   MECHANICAL INC"
+        assert rows[4]["expiry_date"] == ""
+
+    def test_last_page_crlf(self):
+        from psi_extract import extract_search_results
+        total, rows = extract_search_results(_fixture("search_last_page_crlf.html"))
+        assert total == 143
+        assert [r["license_id"] for r in rows] == ["1030371", "1030378", "1030385"]
+
+    def test_mixed_rows(self):
+        from psi_extract import extract_search_results
+        total, rows = extract_search_results(_fixture("search_mixed_rows.html"))
+        assert total == 5
+        assert [(r["license_number"], r["company_name"], r["license_id"],
+                 r["license_application_id"]) for r in rows] == [
+            ("350012", "A & B ELECTRIC, LLC", "1029391", "2203959"),
+            ("350077", "NO LINK CONSTRUCTION", "", ""),
+            ("350079", "UPPER   CASE & CO", "55501", "66602"),
+            ("350080", "PLAIN", "", ""),
+        ]
+        assert rows[3]["address"] == "NO CLOSE TAGS"
+
+    def test_no_records(self):
+        from psi_extract import extract_search_results
+        assert extract_search_results(_fixture("search_no_records.html")) == (0, [])
+
+
+class TestFallback:
+    """parse_page agrees with BeautifulSoup and falls back where it must."""
+
+    @pytest.fixture(autouse=True)
+    def _soup(self):
+        pytest.importorskip("aiohttp")
+        pytest.importorskip("bs4")
+        pytest.importorskip("lxml")
+
+    @pytest.mark.parametrize("name", _fixture_names("detail"))
+    def test_detail_matches_soup(self, name):
+        from scrape_nm_psi import parse_page, soup_parse_detail
+        html = _fixture(name)
+        parsed, used_fallback = parse_page("detail", html, "1")
+        assert parsed == soup_parse_detail(html, "1")
+        assert used_fallback == (name in ("detail_comment_in_field.html",
+                                          "detail_session_expired.html"))
+
+    @pytest.mark.parametrize("name", _fixture_names("search"))
+    def test_search_matches_soup(self, name):
+        from scrape_nm_psi import parse_page, soup_parse_search_results
+        html = _fixture(name)
+        parsed, used_fallback = parse_page("search", html)
+        assert parsed == soup_parse_search_results(html)
+        assert not used_fallback
+
+    def test_comment_in_field_fallback_result(self):
+        from scrape_nm_psi import parse_detail
+        assert parse_detail(_fixture("detail_comment_in_field.html"), "1") == SANDIA
+
+    def test_session_expired_fallback_is_empty(self):
+        from scrape_nm_psi import parse_detail
+        result = parse_detail(_fixture("detail_session_expired.html"), "1")
+        assert not result["license_number"] and not result["company_name"]
@@ -0,0 +1,102 @@
+"""Tests for lib/rate_limits.py — manifest-declared provider limits."""
+import json
+import os
+import sys
+import time
+
+# Add scripts dir to path
+SCRIPTS_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "scripts")
+sys.path.insert(0, SCRIPTS_DIR)
+
+
+class TestTokenBucket:
+    def test_burst_then_empty(self):
+        from lib.rate_limits import TokenBucket
+        bucket = TokenBucket(rate=2)
+        assert bucket.try_take()
+        assert bucket.try_take()
+        assert not bucket.try_take()
+        assert 0 < bucket.wait_time() <= 0.5
+
+    def test_refills(self):
+        from lib.rate_limits import TokenBucket
+        bucket = TokenBucket(rate=50, burst=1)
+        assert bucket.try_take()
+        assert not bucket.try_take()
+        time.sleep(0.03)
+        assert bucket.try_take()
+
+
+class TestProviderLimiter:
+    def test_unlimited(self):
+        from lib.rate_limits import ProviderLimiter
+        limiter = ProviderLimiter()
+        assert all(limiter.try_acquire() for _ in range(100))
+        assert limiter.wait_time() == 0
+
+    def test_concurrency_slots(self):
+        from lib.rate_limits import ProviderLimiter
+        limiter = ProviderLimiter(concurrent_jobs=2)
+        assert limiter.try_acquire()
+        assert limiter.try_acquire()
+        assert not limiter.try_acquire()
+        limiter.release()
+        assert limiter.try_acquire()
+
+    def test_no_slot_consumed_without_token(self):
+        from lib.rate_limits import ProviderLimiter
+        limiter = ProviderLimiter(requests_per_second=1, concurrent_jobs=5)
+        assert limiter.try_acquire()
+        assert not limiter.try_acquire()
+        assert limiter._in_flight == 1
+
+
+class TestManifestLimits:
+    def test_loads_declared_limits(self, tmp_path):
+        from lib.rate_limits import load_manifest_limits
+        for name, caps, limits in [
+            ("single", ["image_generation"], {"requestsPerSecond": 2, "concurrentJobs": 3}),
+            ("multi", ["web_search", "web_scraping"], {"concurrentJobs": 1}),
+            ("unlimited", ["seo_keywords"], None),
+            ("_template", ["web_search"], {"concurrentJobs": 9}),
+        ]:
+            (tmp_path / name).mkdir()
+            (tmp_path / name / "manifest.json").write_text(json.dumps({
+                "name": name,
+                "capabilities": [{"category": c} for c in caps],
+                "rateLimits": limits,
+            }))
+
+        limits = load_manifest_limits(str(tmp_path))
+        assert limits["single"] == {"requestsPerSecond": 2, "concurrentJobs": 3}
+        assert limits["multi"] == {"concurrentJobs": 1}
+        assert "multi-web_search" not in limits
+        assert "unlimited" not in limits
+        assert "_template" not in limits
+
+        from lib.rate_limits import load_service_providers
+        providers = load_service_providers(str(tmp_path))
+        assert providers["multi-web_search"] == "multi"
+        assert providers["multi-web_scraping"] == "multi"
+        assert providers["single"] == "single"
+        assert "_template" not in providers
+
+    def test_one_limiter_per_provider(self, monkeypatch):
+        import lib.rate_limits as rate_limits
+        monkeypatch.setattr(rate_limits, "_limiters", {})
+        monkeypatch.setattr(rate_limits, "_manifest_limits", {"multi": {"concurrentJobs": 1}})
+        monkeypatch.setattr(rate_limits, "_service_providers", {
+            "multi-web_search": "multi", "multi-web_scraping": "multi",
+        })
+        search = rate_limits.get_limiter({"name": "multi-web_search"})
+        scraping = rate_limits.get_limiter({"name": "multi-web_scraping"})
+        assert search is scraping
+        assert search.try_acquire()
+        assert not scraping.try_acquire()
+        # Services without a manifest get their own unlimited limiter
+        assert rate_limits.get_limiter({"name": "adhoc"}).try_acquire()
+
+    def test_repo_manifests_parse(self):
+        from lib.rate_limits import load_manifest_limits
+        limits = load_manifest_limits()
+        assert limits["brave-search"]["requestsPerSecond"] == 1
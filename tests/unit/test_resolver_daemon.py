@@ -0,0 +1,139 @@
+"""Tests for lib/resolver_daemon.py and resolve_service.py --serve."""
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# Add scripts dir to path
+SCRIPTS_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "scripts")
+sys.path.insert(0, SCRIPTS_DIR)
+
+CHAIN = [{"_id": "svc_a", "name": "a", "priority": 1}]
+
+
+class FakeResolver:
+    def __init__(self):
+        self.calls = []
+        self.chain = list(CHAIN)
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def resolve(self, capability, campaign_id=None, batch_id=None, use_cache=True):
+        with self.lock:
+            self.calls.append((capability, campaign_id, batch_id, use_cache))
+        if capability == "boom":
+            raise RuntimeError("Convex error (services:resolveChain): Unknown category: boom")
+        if capability == "empty":
+            return []
+        return list(self.chain)
+
+
+@pytest.fixture
+def daemon(tmp_path, monkeypatch):
+    from lib import resolver_daemon
+    monkeypatch.setattr(resolver_daemon, "WATCH_INTERVAL", 0.02)
+    fake = FakeResolver()
+    server = resolver_daemon.ResolverServer(
+        resolve_fn=fake.resolve,
+        generation_fn=lambda: fake.generation,
+        path=str(tmp_path / "r.sock"),
+        poll_interval=3600,
+    )
+    server.start()
+    yield server, fake
+    server.stop()
+
+
+def _wait_for(predicate, timeout=2.0):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class TestResolverDaemon:
+    def test_repeat_lookups_served_from_memory(self, daemon):
+        from lib.resolver_daemon import request
+        server, fake = daemon
+        for _ in range(3):
+            assert request("image_generation", path=server.path) == {"chain": CHAIN}
+        assert len(fake.calls) == 1
+
+    def test_no_cache_resolves_again(self, daemon):
+        from lib.resolver_daemon import request
+        server, fake = daemon
+        request("image_generation", path=server.path)
+        request("image_generation", no_cache=True, path=server.path)
+        assert [c[3] for c in fake.calls] == [True, False]
+
+    def test_invalidation_refreshes_warm_chains(self, daemon):
+        from lib.resolver_daemon import request
+        server, fake = daemon
+        request("image_generation", campaign_id="c1", path=server.path)
+        fake.chain = [{"_id": "svc_b", "name": "b", "priority": 1}]
+        fake.generation += 1
+        assert _wait_for(lambda: len(fake.calls) == 2)
+        assert fake.calls[1] == ("image_generation", "c1", None, False)
+        reply = request("image_generation", campaign_id="c1", path=server.path)
+        assert reply["chain"][0]["name"] == "b"
+
+    def test_errors_and_empty_chains_not_kept(self, daemon):
+        from lib.resolver_daemon import request
+        server, fake = daemon
+        assert "Unknown category" in request("boom", path=server.path)["error"]
+        assert request("empty", path=server.path) == {"chain": []}
+        request("empty", path=server.path)
+        assert len(fake.calls) == 3
+
+    def test_no_daemon_returns_none(self, tmp_path):
+        from lib.resolver_daemon import request
+        assert request("image_generation", path=str(tmp_path / "missing.sock")) is None
+
+    def test_refuses_second_daemon_and_replaces_stale_socket(self, daemon, tmp_path):
+        from lib.resolver_daemon import ResolverServer
+        server, fake = daemon
+        with pytest.raises(RuntimeError, match="already listening"):
+            ResolverServer(fake.resolve, path=server.path).start()
+
+        stale = tmp_path / "stale.sock"
+        stale.write_text("")
+        other = ResolverServer(fake.resolve, path=str(stale))
+        other.start()
+        other.stop()
+        assert not stale.exists()
+
+
+class TestResolveServiceCli:
+    def _run(self, monkeypatch, capsys, *argv):
+        import resolve_service
+        monkeypatch.setattr(sys, "argv", ["resolve_service.py", *argv])
+        try:
+            resolve_service.main()
+            code = 0
+        except SystemExit as e:
+            code = e.code
+        out = capsys.readouterr()
+        return code, out.out, out.err
+
+    def test_output_identical_with_and_without_daemon(self, daemon, monkeypatch, capsys):
+        import resolve_service
+        server, fake = daemon
+
+        def in_process(capability, campaign_id, batch_id, no_cache):
+            try:
+                return {"chain": fake.resolve(capability, campaign_id, batch_id)}
+            except RuntimeError as e:
+                return {"error": str(e)}
+
+        monkeypatch.setattr(resolve_service, "resolve_in_process", in_process)
+        for capability in ("image_generation", "empty", "boom"):
+            via_daemon = self._run(monkeypatch, capsys, capability, "--socket", server.path)
+            in_proc = self._run(
+                monkeypatch, capsys, capability, "--socket", server.path, "--no-daemon",
+            )
+            assert via_daemon == in_proc
+        assert via_daemon[0] == 1 and via_daemon[2].startswith("Error querying Convex:")
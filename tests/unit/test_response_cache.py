@@ -0,0 +1,92 @@
+"""Tests for lib/response_cache.py — content-addressed response cache."""
+import json
+import os
+import sys
+import time
+
+import pytest
+
+# Add scripts dir to path
+SCRIPTS_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "scripts")
+sys.path.insert(0, SCRIPTS_DIR)
+
+SERVICE = {"_id": "svc1", "name": "dataforseo-keywords"}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    from lib.response_cache import ResponseCache
+    return ResponseCache(path=str(tmp_path / "r.db"), ttls={"seo_keywords": 60})
+
+
+class TestCacheKey:
+    def test_normalizes_key_order_and_whitespace(self):
+        from lib.response_cache import cache_key
+        a = cache_key("seo_keywords", {"keyword": "protein powder", "loc": "US"})
+        b = cache_key("seo_keywords", {"loc": "US", "keyword": "  protein   powder "})
+        assert a == b
+
+    def test_capability_and_values_matter(self):
+        from lib.response_cache import cache_key
+        args = {"keyword": "protein powder"}
+        assert cache_key("seo_keywords", args) != cache_key("web_search", args)
+        assert cache_key("seo_keywords", args) != cache_key("seo_keywords", {"keyword": "Protein powder"})
+
+
+class TestResponseCache:
+    def test_round_trip(self, cache):
+        assert cache.put("k1", "seo_keywords", {"volume": 10}, SERVICE)
+        assert cache.get("k1") == ({"volume": 10}, SERVICE)
+
+    def test_uncacheable_capability(self, cache):
+        assert not cache.put("k1", "image_generation", "x", SERVICE)
+        assert cache.get("k1") is None
+
+    def test_unserializable_result_skipped(self, cache):
+        assert not cache.put("k1", "seo_keywords", object(), SERVICE)
+
+    def test_expiry(self, tmp_path):
+        from lib.response_cache import ResponseCache
+        cache = ResponseCache(path=str(tmp_path / "r.db"), ttls={"seo_keywords": 0.01})
+        cache.put("k1", "seo_keywords", 1, SERVICE)
+        time.sleep(0.02)
+        assert cache.get("k1") is None
+
+    def test_lru_eviction_by_size(self, tmp_path):
+        from lib.response_cache import ResponseCache
+        cache = ResponseCache(path=str(tmp_path / "r.db"), max_bytes=600,
+                              ttls={"seo_keywords": 60})
+        blob = "x" * 150
+        cache.put("k1", "seo_keywords", blob, SERVICE)
+        time.sleep(0.01)
+        cache.put("k2", "seo_keywords", blob, SERVICE)
+        time.sleep(0.01)
+        cache.get("k1")  # k1 becomes most recently used
+        time.sleep(0.01)
+        cache.put("k3", "seo_keywords", blob, SERVICE)
+        assert cache.get("k2") is None
+        assert cache.get("k1") is not None
+        assert cache.get("k3") is not None
+
+    def test_clear(self, cache):
+        cache.put("k1", "seo_keywords", 1, SERVICE)
+        assert cache.clear("seo_keywords") == 1
+        assert cache.get("k1") is None
+
+
+class TestManifestTtls:
+    def test_shortest_ttl_wins(self, tmp_path):
+        from lib.response_cache import load_capability_ttls
+        for name, ttl in [("a", 600), ("b", 60), ("c", None)]:
+            (tmp_path / name).mkdir()
+            (tmp_path / name / "manifest.json").write_text(json.dumps({
+                "name": name,
+                "capabilities": [{"category": "web_search", "cacheTtlSeconds": ttl}],
+            }))
+        assert load_capability_ttls(str(tmp_path)) == {"web_search": 60}
+
+    def test_repo_manifests(self):
+        from lib.response_cache import load_capability_ttls
+        ttls = load_capability_ttls()
+        assert "seo_keywords" in ttls
+        assert "image_generation" not in ttls
@@ -0,0 +1,417 @@
+"""Tests for data/gov/NM/scrape_nm_psi.py — prefix tree, journal and replay logic."""
+import asyncio
+import csv
+import io
+import os
+import sys
+import threading
+
+import pytest
+
+pytest.importorskip("aiohttp")
+pytest.importorskip("bs4")
+
+# Add NM scraper dir to path
+NM_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "data", "gov", "NM")
+sys.path.insert(0, NM_DIR)
+
+
+class FakeSession:
+    """Serves detail pages from memory; tracks concurrency across sessions."""
+
+    def __init__(self, session_id, ceiling, load, fail=(), listings=None, flaky=()):
+        from scrape_nm_psi import AdaptiveLimiter
+        self.session_id = session_id
+        self.search_limiter = AdaptiveLimiter("search", ceiling=1)
+        self.detail_limiter = AdaptiveLimiter("detail", ceiling=ceiling, start=ceiling)
+        self.load = load
+        self.fail = set(fail)
+        self.listings = listings or {}
+        self.flaky = set(flaky)
+        self.search_failures = 0
+
+    async def search(self, prefix, start=1):
+        if prefix in self.flaky:
+            # A page that failed after retries comes back empty
+            self.search_failures += 1
+        rows = self.listings.get(prefix, [])
+        return len(rows), rows[start - 1:start - 1 + 20]
+
+    async def fetch_detail_once(self, license_id, license_application_id):
+        self.load["now"] += 1
+        self.load["peak"] = max(self.load["peak"], self.load["now"])
+        try:
+            await asyncio.sleep(0.01)
+            if license_id in self.fail:
+                raise RuntimeError("HTTP 503")
+            return {"license_id": license_id, "license_number": license_id}
+        finally:
+            self.load["now"] -= 1
+
+    def note_retry(self, kind):
+        pass
+
+    def limits(self):
+        return ""
+
+
+def _rows(n, start=0):
+    return [{"license_id": str(i), "license_application_id": ""} for i in range(start, start + n)]
+
+
+def _run_pool(checkpoint, sessions, submissions):
+    import scrape_nm_psi
+
+    async def run():
+        out = io.StringIO()
+        stats = {"start_time": 0, "prefixes_done": 0, "details_fetched": 0,
+                 "total_prefixes": len(submissions)}
+        pool = scrape_nm_psi.DetailPool(sessions, asyncio.Lock(), csv.writer(out), out,
+                                        checkpoint, stats)
+        pool.start()
+        for prefix, rows in submissions:
+            await pool.submit(sessions[0], prefix, rows)
+        await pool.drain()
+        return pool
+
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def checkpoint(tmp_path):
+    from scrape_nm_psi import Checkpoint
+    return Checkpoint(tmp_path / "checkpoint.json", tmp_path / "out.csv")
+
+
+class TestDetailPool:
+    def test_concurrency_follows_all_sessions(self, checkpoint):
+        load = {"now": 0, "peak": 0}
+        sessions = [FakeSession(i, ceiling=4, load=load) for i in range(3)]
+        _run_pool(checkpoint, sessions, [("12", _rows(60))])
+        assert load["peak"] > 4
+        assert load["peak"] <= 12
+        assert checkpoint.completed_prefixes == {"12"}
+
+    def test_prefix_with_failed_detail_left_for_resume(self, checkpoint, monkeypatch):
+        import scrape_nm_psi
+        monkeypatch.setattr(scrape_nm_psi, "RETRY_BASE_DELAY", 0)
+        load = {"now": 0, "peak": 0}
+        sessions = [FakeSession(0, ceiling=2, load=load, fail={"3"})]
+        _run_pool(checkpoint, sessions, [("12", _rows(5)), ("13", _rows(3, start=10))])
+        assert checkpoint.completed_prefixes == {"13"}
+        assert checkpoint.fetched_ids == {"0", "1", "2", "4", "10", "11", "12"}
+
+
+class FakeResponse:
+    def __init__(self, raw):
+        self.raw = raw
+        self.charset = "utf-8"
+
+    async def read(self):
+        return self.raw
+
+
+class TestArchiveOffLoop:
+    def test_archive_written_on_writer_thread(self, tmp_path, monkeypatch):
+        import psi_archive
+        import scrape_nm_psi
+        archive = psi_archive.ResponseArchive(tmp_path)
+        put = archive.put
+        threads = []
+
+        def tracking_put(*args):
+            threads.append(threading.current_thread())
+            return put(*args)
+
+        monkeypatch.setattr(archive, "put", tracking_put)
+        with open(os.path.join(NM_DIR, "fixtures", "psi", "search_first_page.html"), "rb") as f:
+            raw = f.read()
+        session = scrape_nm_psi.PSISession(0, parser=scrape_nm_psi.ParserPool(workers=0),
+                                           archive=archive)
+
+        async def run():
+            return await session.parser.parse_response(
+                FakeResponse(raw), "search", record=session._archiver("search", "12", 1))
+
+        total, rows = asyncio.run(run())
+        assert rows
+        assert threads and threads[0] is not threading.main_thread()
+        assert archive.latest("search", "12", 1) == (raw, "utf-8")
+        archive.close()
+
+
+class TestReplayPrefixes:
+    def test_unrelated_prefixes_all_replayed(self):
+        from scrape_nm_psi import replay_prefixes
+        assert replay_prefixes({"12": "2024-01-01", "13": "2024-01-01"}) == ["12", "13"]
+
+    def test_split_mid_run_replays_children(self):
+        from scrape_nm_psi import replay_prefixes
+        fetched = {"12": "2024-01-01T10:00:00"}
+        fetched.update({f"12{d}": f"2024-01-01T10:0{d}:00" for d in range(10)})
+        assert replay_prefixes(fetched) == [f"12{d}" for d in range(10)]
+
+    def test_collapsed_parent_rescraped_later_wins(self):
+        from scrape_nm_psi import replay_prefixes
+        fetched = {f"12{d}": "2024-01-01T10:00:00" for d in range(10)}
+        fetched["12"] = "2024-02-01T10:00:00"
+        assert replay_prefixes(fetched) == ["12"]
+
+    def test_newer_grandchildren_count_for_subtree(self):
+        from scrape_nm_psi import replay_prefixes
+        # 12 collapsed in February; 125 was split again in March
+        fetched = {f"12{d}": "2024-01-01" for d in range(10)}
+        fetched["12"] = "2024-02-01"
+        fetched.update({f"125{d}": "2024-03-01" for d in range(10)})
+        chosen = replay_prefixes(fetched)
+        assert chosen == [f"12{d}" for d in range(5)] + [f"125{d}" for d in range(10)] \
+            + [f"12{d}" for d in range(6, 10)]
+
+
+class TestArchiveLatestFetches:
+    def test_newest_fetch_per_key(self, tmp_path):
+        import psi_archive
+        archive = psi_archive.ResponseArchive(tmp_path)
+        archive.put("search", "12", 1, b"old")
+        archive.put("search", "12", 1, b"new")
+        archive.put("search", "12", 21, b"page 2")
+        archive.put("detail", "999", 0, b"detail")
+        fetched = archive.latest_fetches("search", page=1)
+        rows = archive.db.execute(
+            "SELECT MAX(fetched_at) FROM responses WHERE kind = 'search' AND page = 1"
+        ).fetchone()
+        assert fetched == {"12": rows[0]}
+        archive.close()
+
+
+class TestPrefixTree:
+    def test_record_below_cap_stays_leaf(self, tmp_path):
+        from scrape_nm_psi import MAX_RESULTS_CAP, PrefixTree
+        tree = PrefixTree(tmp_path / "tree.json")
+        assert tree.record("12", MAX_RESULTS_CAP - 1) == []
+        assert not tree.is_split("12")
+        assert tree.nodes["12"]["count"] == MAX_RESULTS_CAP - 1
+
+    def test_record_at_cap_splits(self, tmp_path):
+        from scrape_nm_psi import MAX_RESULTS_CAP, PrefixTree
+        tree = PrefixTree(tmp_path / "tree.json")
+        children = tree.record("12", MAX_RESULTS_CAP)
+        assert children == [f"12{d}" for d in range(10)]
+        assert tree.is_split("12")
+        assert tree.leaves() == children
+        assert all(tree.nodes[c]["count"] is None for c in children)
+        # Probing a split node again doesn't re-split it
+        assert tree.record("12", MAX_RESULTS_CAP + 5) == []
+
+    def test_longest_prefix_never_splits(self, tmp_path):
+        from scrape_nm_psi import MAX_PREFIX_LEN, MAX_RESULTS_CAP, PrefixTree
+        tree = PrefixTree(tmp_path / "tree.json")
+        prefix = "1" * MAX_PREFIX_LEN
+        assert tree.record(prefix, MAX_RESULTS_CAP) == []
+        assert tree.leaves() == [prefix]
+
+    def _split(self, tree, prefix, counts):
+        from scrape_nm_psi import MAX_RESULTS_CAP
+        tree.record(prefix, MAX_RESULTS_CAP)
+        for child, count in zip(tree.children(prefix), counts):
+            tree.record(child, count)
+
+    def test_collapse_at_threshold(self, tmp_path):
+        from scrape_nm_psi import COLLAPSE_BELOW, PrefixTree
+        tree = PrefixTree(tmp_path / "tree.json")
+        self._split(tree, "12", [COLLAPSE_BELOW // 10] * 10)
+        tree.nodes["125"]["probed_at"] = "2024-01-01T00:00:00"
+        assert tree.collapse() == 1
+        assert tree.leaves() == ["12"]
+        assert tree.nodes["12"] == {"count": COLLAPSE_BELOW, "split": False,
+                                    "probed_at": "2024-01-01T00:00:00"}
+
+    def test_no_collapse_above_threshold(self, tmp_path):
+        from scrape_nm_psi import COLLAPSE_BELOW, PrefixTree
+        tree = PrefixTree(tmp_path / "tree.json")
+        self._split(tree, "12", [COLLAPSE_BELOW // 10] * 9 + [COLLAPSE_BELOW // 10 + 1])
+        assert tree.collapse() == 0
+        assert tree.is_split("12")
+
+    def test_no_collapse_with_unprobed_child(self, tmp_path):
+        from scrape_nm_psi import MAX_RESULTS_CAP, PrefixTree
+        tree = PrefixTree(tmp_path / "tree.json")
+        self._split(tree, "12", [0] * 9)
+        assert tree.collapse() == 0
+        tree.record("129", 0)
+        assert tree.collapse() == 1
+
+    def test_collapse_cascades_up(self, tmp_path):
+        from scrape_nm_psi import PrefixTree
+        tree = PrefixTree(tmp_path / "tree.json")
+        self._split(tree, "12", [1] * 10)
+        self._split(tree, "125", [1] * 10)
+        assert tree.collapse() == 2
+        assert tree.leaves() == ["12"]
+        assert tree.nodes["12"]["count"] == 19
+
+    def test_seed_and_save_round_trip(self, tmp_path):
+        from scrape_nm_psi import PrefixTree
+        tree = PrefixTree(tmp_path / "tree.json")
+        tree.seed(["12", "134"])
+        assert tree.is_split("1") and tree.is_split("13")
+        assert "10" in tree.leaves() and "139" in tree.leaves()
+        assert tree.nodes["10"]["count"] == 0 and tree.nodes["12"]["count"] is None
+        tree.save()
+        assert PrefixTree.load_or_seed(tmp_path / "tree.json").nodes == tree.nodes
+
+
+class TestCheckpoint:
+    def test_resume_from_journal(self, tmp_path, checkpoint):
+        from scrape_nm_psi import Checkpoint
+        checkpoint.record_detail("12", "1", {"license_id": "1", "license_number": "12001"})
+        checkpoint.record_detail("12", "2", {"license_id": "2", "license_number": "12002"})
+        checkpoint.mark_complete("12", 2)
+        checkpoint.record_detail("13", "3", {"license_id": "3", "license_number": "13001"})
+
+        # A crash before the JSON summary is saved loses nothing
+        resumed = Checkpoint(tmp_path / "checkpoint.json", tmp_path / "out.csv")
+        resumed.load()
+        assert resumed.completed_prefixes == {"12"}
+        assert resumed.fetched_ids == {"1", "2", "3"}
+        assert resumed.total_details == 3
+        assert resumed.is_fetched("3")
+        assert resumed.get_detail("3") == {"license_id": "3", "license_number": "13001"}
+
+    def test_unloaded_checkpoint_starts_fresh(self, tmp_path, checkpoint):
+        from scrape_nm_psi import Checkpoint
+        checkpoint.record_detail("12", "1", {"license_id": "1"})
+        checkpoint._conn.close()
+        fresh = Checkpoint(tmp_path / "checkpoint.json", tmp_path / "out.csv")
+        fresh.record_detail("13", "9", {"license_id": "9"})
+        assert fresh.get_detail("1") is None
+        assert fresh.fetched_ids == {"9"}
+
+    def test_imports_legacy_checkpoint(self, tmp_path):
+        import json
+        from scrape_nm_psi import CSV_COLUMNS, Checkpoint
+        (tmp_path / "checkpoint.json").write_text(json.dumps(
+            {"completed_prefixes": ["12", "13"], "started_at": "2024-01-01"}))
+        with open(tmp_path / "out.csv", "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, CSV_COLUMNS)
+            writer.writeheader()
+            writer.writerow({"license_id": "1", "license_number": "12001"})
+            writer.writerow({"license_id": "", "license_number": "12002"})
+        checkpoint = Checkpoint(tmp_path / "checkpoint.json", tmp_path / "out.csv")
+        checkpoint.load()
+        assert checkpoint.completed_prefixes == {"12", "13"}
+        assert checkpoint.fetched_ids == {"1"}
+        assert checkpoint.started_at == "2024-01-01"
+
+    def test_compact_csv_one_row_per_license(self, tmp_path, checkpoint):
+        checkpoint.record_detail("13", "3", {"license_id": "3", "license_number": "13001"})
+        checkpoint.record_detail("12", "1", {"license_id": "1", "license_number": "12001",
+                                             "company_name": "OLD"})
+        checkpoint.record_detail("12", "1", {"license_id": "1", "license_number": "12001",
+                                             "company_name": "NEW"})
+        assert checkpoint.compact_csv() == 2
+        with open(tmp_path / "out.csv", newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        assert [(r["license_id"], r["company_name"]) for r in rows] == [("1", "NEW"), ("3", "")]
+
+    def test_forget(self, checkpoint):
+        checkpoint.record_detail("12", "1", {"license_id": "1"})
+        checkpoint.forget("1")
+        checkpoint.forget("1")
+        assert checkpoint.get_detail("1") is None
+        assert checkpoint.fetched_ids == set() and checkpoint.total_details == 0
+
+
+def _search_row(license_id, number, **fields):
+    return {"license_number": number, "company_name": f"CO {license_id}", "address": "1 MAIN ST",
+            "city_zip": "SANTA FE, NM 87501", "expiry_date": "06/30/2027", "status": "Active",
+            "license_id": license_id, "license_application_id": f"9{license_id}", **fields}
+
+
+class TestSearchSnapshot:
+    def test_fingerprint_fields(self):
+        from scrape_nm_psi import fingerprint
+        row = _search_row("1", "100001")
+        assert fingerprint(row) == fingerprint({**row, "license_id": "other", "extra": "x"})
+        assert fingerprint(row) == fingerprint({**row, "status": " Active "})
+        assert fingerprint(row) != fingerprint({**row, "status": "Expired"})
+        assert fingerprint(row) != fingerprint({**row, "license_application_id": "1"})
+
+    def test_update_load_remove(self, tmp_path):
+        from scrape_nm_psi import SearchSnapshot, fingerprint
+        snapshot = SearchSnapshot(tmp_path / "snapshot.db")
+        row = _search_row("1", "100001")
+        snapshot.update({"1": ("10", row), "2": ("10", _search_row("2", "100002"))})
+        snapshot.update({"1": ("10", {**row, "status": "Expired"})})
+        snapshot.remove(["2"])
+        snapshot.close()
+        known = SearchSnapshot(tmp_path / "snapshot.db").load()
+        assert list(known) == ["1"]
+        assert known["1"]["license_number"] == "100001"
+        assert known["1"]["row"]["status"] == "Expired"
+        assert known["1"]["fingerprint"] == fingerprint({**row, "status": "Expired"})
+
+
+class TestRefreshPrefixes:
+    def test_change_set(self, tmp_path, checkpoint, monkeypatch):
+        import functools
+        import scrape_nm_psi
+        monkeypatch.setattr(scrape_nm_psi, "RETRY_BASE_DELAY", 0)
+        monkeypatch.setattr(scrape_nm_psi, "RAW_DIR", tmp_path / "raw")
+        snapshot_path = tmp_path / "snapshot.db"
+        monkeypatch.setattr(scrape_nm_psi, "SearchSnapshot",
+                            functools.partial(scrape_nm_psi.SearchSnapshot, snapshot_path))
+
+        unchanged = _search_row("1", "100001")
+        changed = _search_row("2", "100002")
+        gone = _search_row("3", "100003")
+        failing = _search_row("5", "100005")
+        unlisted = _search_row("6", "200001")
+        baseline = scrape_nm_psi.SearchSnapshot()
+        baseline.update({r["license_id"]: (r["license_number"][:2], r)
+                         for r in (unchanged, changed, gone, failing, unlisted)})
+        baseline.close()
+        checkpoint.record_detail("10", "3", {"license_id": "3", "license_number": "100003",
+                                             "company_name": "GONE LLC"})
+
+        listings = {
+            "10": [unchanged, {**changed, "status": "Expired"}, _search_row("4", "100004"),
+                   {**failing, "company_name": "RENAMED"}],
+            # 20's search failed part way, so 6 missing from it proves nothing
+            "20": [],
+        }
+        load = {"now": 0, "peak": 0}
+        session = FakeSession(0, ceiling=2, load=load, fail={"5"}, listings=listings,
+                              flaky={"20"})
+
+        async def run():
+            prefix_queue = asyncio.Queue()
+            for prefix in listings:
+                prefix_queue.put_nowait(prefix)
+            out = io.StringIO()
+            stats = {"start_time": 0, "prefixes_done": 0, "details_fetched": 0,
+                     "total_prefixes": len(listings)}
+            return await scrape_nm_psi.refresh_prefixes(
+                [session], prefix_queue, asyncio.Lock(), csv.writer(out), out,
+                checkpoint, stats)
+
+        pool = asyncio.run(run())
+        assert pool.fetched_ids == {"2", "4"}
+
+        [changes_csv] = (tmp_path / "raw").glob("nm_psi_changes_*.csv")
+        with open(changes_csv, newline="", encoding="utf-8") as f:
+            changes = [(r["change"], r["changed_fields"], r["license_id"], r["company_name"])
+                       for r in csv.DictReader(f)]
+        assert changes == [
+            ("changed", "status", "2", "CO 2"),
+            ("added", "", "4", "CO 4"),
+            ("disappeared", "", "3", "GONE LLC"),
+        ]
+        assert checkpoint.get_detail("3") is None
+        assert checkpoint.get_detail("2") is not None
+
+        known = scrape_nm_psi.SearchSnapshot().load()
+        assert sorted(known) == ["1", "2", "4", "5", "6"]
+        assert known["2"]["row"]["status"] == "Expired"
+        # The failed detail keeps its old baseline, so the next refresh retries it
+        assert known["5"]["fingerprint"] == scrape_nm_psi.fingerprint(failing)
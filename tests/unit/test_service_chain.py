@@ -0,0 +1,458 @@
+"""Tests for lib/service_chain.py — fallback executor."""
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# Add scripts dir to path
+SCRIPTS_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "scripts")
+sys.path.insert(0, SCRIPTS_DIR)
+
+CHAIN = [
+    {"_id": "svc_a", "name": "a", "displayName": "A"},
+    {"_id": "svc_b", "name": "b", "displayName": "B"},
+    {"_id": "svc_c", "name": "c", "displayName": "C"},
+]
+
+
+class FakeSink:
+    def __init__(self):
+        self.entries = []
+        self.lock = threading.Lock()
+
+    def submit(self, entry):
+        with self.lock:
+            self.entries.append(entry)
+
+    def statuses(self):
+        with self.lock:
+            return {e["serviceId"]: e["status"] for e in self.entries}
+
+
+@pytest.fixture
+def sink(monkeypatch, tmp_path):
+    from lib import service_chain
+    from lib.response_cache import ResponseCache
+    from lib.service_health import ServiceHealth
+    from lib.telemetry import SpanStore
+    fake = FakeSink()
+    fake.spans = SpanStore(path=str(tmp_path / "telemetry.db"), costs={"b": 0.02})
+    health = ServiceHealth(path=str(tmp_path / "health.db"), enabled=False)
+    responses = ResponseCache(path=str(tmp_path / "responses.db"), ttls={"seo_keywords": 60})
+    monkeypatch.setattr(service_chain, "get_health", lambda: health)
+    monkeypatch.setattr(service_chain, "get_response_cache", lambda: responses)
+    monkeypatch.setattr(service_chain, "get_log_sink", lambda: fake)
+    monkeypatch.setattr(service_chain, "get_span_store", lambda: fake.spans)
+    monkeypatch.setattr(service_chain, "resolve_chain", lambda *a, **kw: list(CHAIN))
+
+    async def resolve_async(*a, **kw):
+        return list(CHAIN)
+
+    monkeypatch.setattr(service_chain, "resolve_chain_async", resolve_async)
+    return fake
+
+
+def _wait_for(predicate, timeout=2.0):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class TestSequentialFallback:
+    def test_first_success_wins(self, sink):
+        from lib.service_chain import execute_with_fallback
+        result, svc = execute_with_fallback("image_generation", lambda s: s["name"], "test")
+        assert (result, svc["_id"]) == ("a", "svc_a")
+        assert sink.statuses() == {"svc_a": "success"}
+
+    def test_falls_through_failures(self, sink):
+        from lib.service_chain import execute_with_fallback
+
+        def fn(svc):
+            if svc["name"] == "a":
+                raise TimeoutError("slow")
+            if svc["name"] == "b":
+                raise RuntimeError("429 rate limit")
+            return "ok"
+
+        result, svc = execute_with_fallback("image_generation", fn, "test")
+        assert (result, svc["_id"]) == ("ok", "svc_c")
+        assert sink.statuses() == {
+            "svc_a": "timeout", "svc_b": "rate_limited", "svc_c": "success",
+        }
+
+    def test_all_fail_raises(self, sink):
+        from lib.service_chain import execute_with_fallback
+
+        def fn(svc):
+            raise RuntimeError(f"{svc['name']} broke")
+
+        with pytest.raises(RuntimeError, match="All 3 services failed") as exc:
+            execute_with_fallback("image_generation", fn, "test")
+        assert "[1] A: a broke" in str(exc.value)
+
+
+class TestBreakerProbe:
+    @pytest.fixture
+    def health(self, monkeypatch, tmp_path):
+        from lib import service_chain, service_health
+        health = service_health.ServiceHealth(path=str(tmp_path / "h.db"), enabled=True)
+        for _ in range(service_health.FAILURE_THRESHOLD):
+            health.record("svc_b", "failed")
+        monkeypatch.setattr(service_health, "COOLDOWN", 0)
+        monkeypatch.setattr(service_chain, "get_health", lambda: health)
+        return health
+
+    def test_untried_service_keeps_probe(self, sink, health):
+        from lib.service_chain import execute_with_fallback
+        result, svc = execute_with_fallback("image_generation", lambda s: s["name"], "test")
+        assert svc["_id"] == "svc_a"
+        assert health.stats(["svc_b"])["svc_b"]["breaker"] == "open"
+        assert health.claim_probe("svc_b")
+
+    def test_probe_held_elsewhere_is_skipped(self, sink, health):
+        from lib.service_chain import execute_with_fallback
+        called = []
+
+        def fn(svc):
+            called.append(svc["name"])
+            if svc["name"] == "a":
+                # Another process claims svc_b's probe after the chain was ordered
+                assert health.claim_probe("svc_b")
+                raise RuntimeError("a broke")
+            return svc["name"]
+
+        result, svc = execute_with_fallback("image_generation", fn, "test")
+        assert (result, svc["_id"]) == ("c", "svc_c")
+        assert called == ["a", "c"]
+        assert sink.statuses() == {"svc_a": "failed", "svc_c": "success"}
+
+
+class TestHedgedMode:
+    def test_slow_primary_is_hedged(self, sink):
+        from lib.service_chain import execute_with_fallback
+        release = threading.Event()
+
+        def fn(svc):
+            if svc["name"] == "a":
+                release.wait(2)
+                return "late"
+            return svc["name"]
+
+        start = time.monotonic()
+        result, svc = execute_with_fallback(
+            "image_generation", fn, "test", hedge=True, hedge_after=0.05,
+        )
+        elapsed = time.monotonic() - start
+        assert (result, svc["_id"]) == ("b", "svc_b")
+        assert elapsed < 1.0
+
+        # The loser still logs its real outcome once it finishes
+        release.set()
+        assert _wait_for(lambda: sink.statuses().get("svc_a") == "success")
+
+    def test_failure_starts_next_immediately(self, sink):
+        from lib.service_chain import execute_with_fallback
+
+        def fn(svc):
+            if svc["name"] == "a":
+                raise RuntimeError("boom")
+            return svc["name"]
+
+        start = time.monotonic()
+        result, _ = execute_with_fallback(
+            "image_generation", fn, "test", hedge=True, hedge_after=5,
+        )
+        assert result == "b"
+        assert time.monotonic() - start < 1.0
+
+    def test_fast_primary_does_not_hedge(self, sink):
+        from lib.service_chain import execute_with_fallback
+        result, _ = execute_with_fallback(
+            "image_generation", lambda s: s["name"], "test", hedge=True, hedge_after=1,
+        )
+        assert result == "a"
+        assert list(sink.statuses()) == ["svc_a"]
+
+    def test_latency_budget(self, sink):
+        from lib.service_chain import execute_with_fallback
+        release = threading.Event()
+
+        with pytest.raises(RuntimeError, match="latency budget"):
+            execute_with_fallback(
+                "image_generation", lambda s: release.wait(2), "test",
+                hedge=True, hedge_after=0.02, latency_budget=0.15,
+            )
+        release.set()
+
+    def test_all_fail_raises(self, sink):
+        from lib.service_chain import execute_with_fallback
+
+        def fn(svc):
+            raise RuntimeError("nope")
+
+        with pytest.raises(RuntimeError, match="All 3 services failed"):
+            execute_with_fallback("image_generation", fn, "test", hedge=True, hedge_after=1)
+
+
+class TestAsync:
+    def test_stores_not_touched_on_event_loop(self, sink, monkeypatch):
+        from lib import service_chain
+        health = service_chain.get_health()
+        spans = service_chain.get_span_store()
+        loop_threads = []
+
+        def on_loop_check(obj, name):
+            fn = getattr(obj, name)
+
+            def wrapped(*a, **kw):
+                try:
+                    asyncio.get_running_loop()
+                    loop_threads.append(name)
+                except RuntimeError:
+                    pass
+                return fn(*a, **kw)
+
+            monkeypatch.setattr(obj, name, wrapped)
+
+        for name in ("claim_probe", "order", "record"):
+            on_loop_check(health, name)
+        on_loop_check(spans, "record")
+
+        async def fn(svc):
+            if svc["name"] == "a":
+                raise RuntimeError("boom")
+            return svc["name"]
+
+        asyncio.run(service_chain.execute_with_fallback_async("web_search", fn, "test"))
+        assert sink.statuses() == {"svc_a": "failed", "svc_b": "success"}
+        assert loop_threads == []
+
+    def test_falls_through_failures(self, sink):
+        from lib.service_chain import execute_with_fallback_async
+
+        async def fn(svc):
+            if svc["name"] == "a":
+                raise RuntimeError("boom")
+            return svc["name"]
+
+        result, svc = asyncio.run(execute_with_fallback_async("web_search", fn, "test"))
+        assert (result, svc["_id"]) == ("b", "svc_b")
+        assert sink.statuses() == {"svc_a": "failed", "svc_b": "success"}
+
+    def test_attempt_timeout_cancels_and_falls_back(self, sink):
+        from lib.service_chain import execute_with_fallback_async
+        cancelled = []
+
+        async def fn(svc):
+            if svc["name"] == "a":
+                try:
+                    await asyncio.sleep(5)
+                except asyncio.CancelledError:
+                    cancelled.append(svc["name"])
+                    raise
+            return svc["name"]
+
+        result, _ = asyncio.run(
+            execute_with_fallback_async("web_search", fn, "test", attempt_timeout=0.05)
+        )
+        assert result == "b"
+        assert cancelled == ["a"]
+        assert sink.statuses()["svc_a"] == "timeout"
+        entry = next(e for e in sink.entries if e["serviceId"] == "svc_a")
+        assert "no response after 0.05s" in entry["errorMessage"]
+
+    def test_all_fail_raises(self, sink):
+        from lib.service_chain import execute_with_fallback_async
+
+        async def fn(svc):
+            raise RuntimeError("nope")
+
+        with pytest.raises(RuntimeError, match="All 3 services failed"):
+            asyncio.run(execute_with_fallback_async("web_search", fn, "test"))
+
+    def test_gather_preserves_order_and_bounds_concurrency(self, sink):
+        from lib.service_chain import gather_with_fallback
+        in_flight = 0
+        peak = 0
+
+        async def fn(svc, item):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            if item == 3:
+                raise RuntimeError("bad item")
+            return item * 10
+
+        results = asyncio.run(
+            gather_with_fallback("web_search", range(8), fn, "test", concurrency=3)
+        )
+        assert [r[0] for i, r in enumerate(results) if i != 3] == [0, 10, 20, 40, 50, 60, 70]
+        assert isinstance(results[3], RuntimeError)
+        assert peak <= 3
+
+
+class TestExecuteMany:
+    def test_results_in_input_order(self, sink, monkeypatch):
+        from lib import service_chain
+        from lib.rate_limits import ProviderLimiter
+        monkeypatch.setattr(service_chain, "get_limiter", lambda svc: ProviderLimiter())
+
+        def fn(svc, item):
+            if item == 2:
+                raise RuntimeError("bad item")
+            time.sleep(0.01 * (5 - item))
+            return item * 10
+
+        results = service_chain.execute_many("image_generation", range(5), fn, "test")
+        assert [r[0] for i, r in enumerate(results) if i != 2] == [0, 10, 30, 40]
+        assert all(r[1]["_id"] == "svc_a" for i, r in enumerate(results) if i != 2)
+        assert isinstance(results[2], RuntimeError)
+
+    def test_spills_over_when_primary_saturated(self, sink, monkeypatch):
+        from lib import service_chain
+        from lib.rate_limits import ProviderLimiter
+        limiters = {
+            "a": ProviderLimiter(concurrent_jobs=1),
+            "b": ProviderLimiter(concurrent_jobs=1),
+            "c": ProviderLimiter(concurrent_jobs=1),
+        }
+        monkeypatch.setattr(service_chain, "get_limiter", lambda svc: limiters[svc["name"]])
+
+        def fn(svc, item):
+            time.sleep(0.05)
+            return item
+
+        start = time.monotonic()
+        results = service_chain.execute_many(
+            "image_generation", range(6), fn, "test", concurrency=3,
+        )
+        elapsed = time.monotonic() - start
+        assert [r[0] for r in results] == list(range(6))
+        assert {r[1]["_id"] for r in results} == {"svc_a", "svc_b", "svc_c"}
+        # 6 items over 3 single-slot providers ~ 2 rounds, not 6
+        assert elapsed < 0.25
+
+
+class TestResponseCache:
+    def _counting_fn(self):
+        calls = []
+
+        def fn(svc):
+            calls.append(svc["name"])
+            return {"volume": 1200}
+
+        return fn, calls
+
+    def test_repeat_served_from_cache(self, sink):
+        from lib.service_chain import execute_with_fallback
+        fn, calls = self._counting_fn()
+        args = {"keyword": "protein powder", "location": "US"}
+
+        first = execute_with_fallback("seo_keywords", fn, "test", cache_args=args)
+        second = execute_with_fallback(
+            "seo_keywords", fn, "test", cache_args={"location": "US", "keyword": " protein  powder"},
+        )
+        assert first == second
+        assert calls == ["a"]
+        assert [e["status"] for e in sink.entries] == ["success", "cache_hit"]
+        assert sink.entries[1]["serviceId"] == "svc_a"
+
+    def test_not_cached_without_args_or_ttl(self, sink):
+        from lib.service_chain import execute_with_fallback
+        fn, calls = self._counting_fn()
+        execute_with_fallback("seo_keywords", fn, "test")
+        execute_with_fallback("seo_keywords", fn, "test")
+        execute_with_fallback("web_search", fn, "test", cache_args={"q": "x"})
+        execute_with_fallback("web_search", fn, "test", cache_args={"q": "x"})
+        assert len(calls) == 4
+
+    def test_cache_controls(self, sink):
+        from lib.service_chain import execute_with_fallback
+        fn, calls = self._counting_fn()
+        args = {"keyword": "creatine"}
+
+        with pytest.raises(RuntimeError, match="No cached response"):
+            execute_with_fallback(
+                "seo_keywords", fn, "test", cache_args=args, cache_control="only-if-cached",
+            )
+        execute_with_fallback("seo_keywords", fn, "test", cache_args=args, cache_control="bypass")
+        assert len(calls) == 1
+        with pytest.raises(RuntimeError):
+            execute_with_fallback(
+                "seo_keywords", fn, "test", cache_args=args, cache_control="only-if-cached",
+            )
+
+        execute_with_fallback("seo_keywords", fn, "test", cache_args=args, cache_control="refresh")
+        execute_with_fallback("seo_keywords", fn, "test", cache_args=args, cache_control="refresh")
+        assert len(calls) == 3
+        result, _ = execute_with_fallback(
+            "seo_keywords", fn, "test", cache_args=args, cache_control="only-if-cached",
+        )
+        assert result == {"volume": 1200}
+
+    def test_invalid_cache_control(self, sink):
+        from lib.service_chain import execute_with_fallback
+        with pytest.raises(ValueError):
+            execute_with_fallback("seo_keywords", lambda s: 1, "test", cache_control="sometimes")
+
+    def test_async_uses_cache(self, sink):
+        from lib.service_chain import execute_with_fallback_async
+        calls = []
+
+        async def fn(svc):
+            calls.append(svc["name"])
+            return [1, 2]
+
+        async def run():
+            for _ in range(3):
+                await execute_with_fallback_async(
+                    "seo_keywords", fn, "test", cache_args={"keyword": "x"},
+                )
+
+        asyncio.run(run())
+        assert calls == ["a"]
+
+
+class TestTelemetry:
+    def test_attempts_recorded_as_spans_with_cost(self, sink):
+        from lib.service_chain import execute_with_fallback
+
+        def fn(svc):
+            if svc["name"] == "a":
+                raise RuntimeError("boom")
+            return {"url": "https://example.com/img.png"}
+
+        execute_with_fallback("image_generation", fn, "test")
+        rows = sink.spans.report(since=0)
+        by_service = {r["service"]: r for r in rows}
+        assert by_service["a"]["error_rate"] == 1.0
+        assert by_service["a"]["cost"] == 0
+        assert by_service["b"]["error_rate"] == 0.0
+        assert by_service["b"]["cost"] == 0.02
+        assert by_service["b"]["avg_response_bytes"] > 0
+        success = next(e for e in sink.entries if e["status"] == "success")
+        assert success["estimatedCost"] == 0.02
+
+    def test_cache_hit_span_not_charged(self, sink):
+        from lib.service_chain import execute_with_fallback
+
+        def fn(svc):
+            if svc["name"] == "a":
+                raise RuntimeError("boom")
+            return {"volume": 10}
+
+        execute_with_fallback("seo_keywords", fn, "test", cache_args={"keyword": "x"})
+        execute_with_fallback("seo_keywords", fn, "test", cache_args={"keyword": "x"})
+        (row,) = sink.spans.report(since=0, by="capability")
+        assert row["calls"] == 2
+        assert row["cache_hits"] == 1
+        assert row["cost"] == 0.02
@@ -0,0 +1,179 @@
+"""Tests for lib/service_health.py — rolling health and circuit breakers."""
+import os
+import sys
+
+import pytest
+
+# Add scripts dir to path
+SCRIPTS_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "scripts")
+sys.path.insert(0, SCRIPTS_DIR)
+
+CHAIN = [{"_id": "svc_a"}, {"_id": "svc_b"}, {"_id": "svc_c"}]
+
+
+@pytest.fixture
+def health(tmp_path):
+    from lib.service_health import ServiceHealth
+    return ServiceHealth(path=str(tmp_path / "health.db"), enabled=True)
+
+
+def _ids(chain):
+    return [svc["_id"] for svc in chain]
+
+
+class TestStats:
+    def test_success_rate_and_p95(self, health):
+        for ms in range(1, 21):
+            health.record("svc_a", "success", ms * 100)
+        health.record("svc_a", "failed", 50)
+        s = health.stats(["svc_a"])["svc_a"]
+        assert s["samples"] == 21
+        assert s["success_rate"] == pytest.approx(20 / 21)
+        assert s["p95_ms"] == 1900
+        assert s["breaker"] == "closed"
+
+    def test_unknown_service(self, health):
+        s = health.stats(["svc_x"])["svc_x"]
+        assert s["samples"] == 0
+        assert s["success_rate"] is None
+
+
+class TestBreaker:
+    def test_opens_after_consecutive_failures(self, health):
+        from lib.service_health import FAILURE_THRESHOLD
+        for _ in range(FAILURE_THRESHOLD - 1):
+            health.record("svc_a", "failed")
+        assert health.allow("svc_a")
+        health.record("svc_a", "timeout")
+        assert health.stats(["svc_a"])["svc_a"]["breaker"] == "open"
+        assert not health.allow("svc_a")
+
+    def test_success_resets_failures(self, health):
+        from lib.service_health import FAILURE_THRESHOLD
+        for _ in range(FAILURE_THRESHOLD - 1):
+            health.record("svc_a", "failed")
+        health.record("svc_a", "success")
+        health.record("svc_a", "failed")
+        assert health.allow("svc_a")
+
+    def test_half_open_allows_single_probe(self, health, monkeypatch):
+        from lib import service_health
+        for _ in range(service_health.FAILURE_THRESHOLD):
+            health.record("svc_a", "failed")
+        monkeypatch.setattr(service_health, "COOLDOWN", 0)
+
+        assert health.claim_probe("svc_a")
+        assert health.stats(["svc_a"])["svc_a"]["breaker"] == "half_open"
+        assert not health.claim_probe("svc_a")
+        assert not health.allow("svc_a")
+
+    def test_probe_success_closes(self, health, monkeypatch):
+        from lib import service_health
+        for _ in range(service_health.FAILURE_THRESHOLD):
+            health.record("svc_a", "failed")
+        monkeypatch.setattr(service_health, "COOLDOWN", 0)
+        health.claim_probe("svc_a")
+        health.record("svc_a", "success")
+        assert health.stats(["svc_a"])["svc_a"]["breaker"] == "closed"
+        assert health.allow("svc_a")
+
+    def test_probe_failure_reopens(self, health, monkeypatch):
+        from lib import service_health
+        for _ in range(service_health.FAILURE_THRESHOLD):
+            health.record("svc_a", "failed")
+        monkeypatch.setattr(service_health, "COOLDOWN", 0)
+        health.claim_probe("svc_a")
+        health.record("svc_a", "failed")
+        assert health.stats(["svc_a"])["svc_a"]["breaker"] == "open"
+
+    def test_state_shared_between_instances(self, health):
+        from lib.service_health import FAILURE_THRESHOLD, ServiceHealth
+        for _ in range(FAILURE_THRESHOLD):
+            health.record("svc_a", "failed")
+        other = ServiceHealth(path=health.path, enabled=True)
+        assert not other.allow("svc_a")
+
+    def test_claim_probe_passes_cooling_breaker(self, health):
+        # Only reached through the all-open static chain; don't refuse it
+        from lib.service_health import FAILURE_THRESHOLD
+        for _ in range(FAILURE_THRESHOLD):
+            health.record("svc_a", "failed")
+        assert health.claim_probe("svc_a")
+        assert health.stats(["svc_a"])["svc_a"]["breaker"] == "open"
+
+    def test_stale_probe_reclaimed(self, health, monkeypatch):
+        from lib import service_health
+        for _ in range(service_health.FAILURE_THRESHOLD):
+            health.record("svc_a", "failed")
+        monkeypatch.setattr(service_health, "COOLDOWN", 0)
+        assert health.claim_probe("svc_a")
+        monkeypatch.setattr(service_health, "PROBE_TIMEOUT", 0)
+        assert health.claim_probe("svc_a")
+
+
+class TestOrder:
+    def test_healthy_keeps_priority_order(self, health):
+        assert _ids(health.order(CHAIN)) == ["svc_a", "svc_b", "svc_c"]
+
+    def test_open_breaker_skipped(self, health):
+        from lib.service_health import FAILURE_THRESHOLD
+        for _ in range(FAILURE_THRESHOLD):
+            health.record("svc_a", "failed")
+        assert _ids(health.order(CHAIN)) == ["svc_b", "svc_c"]
+
+    def test_degraded_demoted(self, health):
+        from lib.service_health import MIN_SAMPLES
+        # Alternating outcomes keep the breaker closed but the rate low
+        for _ in range(MIN_SAMPLES):
+            health.record("svc_a", "failed")
+            health.record("svc_a", "failed")
+            health.record("svc_a", "success")
+        assert _ids(health.order(CHAIN)) == ["svc_b", "svc_c", "svc_a"]
+
+    def test_recent_rate_limit_demoted(self, health):
+        health.record("svc_b", "rate_limited")
+        assert _ids(health.order(CHAIN)) == ["svc_a", "svc_c", "svc_b"]
+
+    def test_order_does_not_claim_probe(self, health, monkeypatch):
+        from lib import service_health
+        for _ in range(service_health.FAILURE_THRESHOLD):
+            health.record("svc_a", "failed")
+        monkeypatch.setattr(service_health, "COOLDOWN", 0)
+        # Due a probe but degraded by its failures: last, still present
+        assert _ids(health.order(CHAIN)) == ["svc_b", "svc_c", "svc_a"]
+        assert _ids(health.order(CHAIN)) == ["svc_b", "svc_c", "svc_a"]
+        assert health.stats(["svc_a"])["svc_a"]["breaker"] == "open"
+        assert health.claim_probe("svc_a")
+        assert not health.claim_probe("svc_a")
+        # While the probe is out the service is left out of new orderings
+        assert _ids(health.order(CHAIN)) == ["svc_b", "svc_c"]
+
+    def test_slow_p95_demoted(self, health):
+        from lib.service_health import MIN_SAMPLES, SLOW_P95_FACTOR
+        for _ in range(MIN_SAMPLES):
+            health.record("svc_a", "success", int(200 * SLOW_P95_FACTOR))
+            health.record("svc_b", "success", 200)
+            health.record("svc_c", "success", 300)
+        assert _ids(health.order(CHAIN)) == ["svc_b", "svc_c", "svc_a"]
+
+    def test_slow_ranks_ahead_of_degraded(self, health):
+        from lib.service_health import MIN_SAMPLES
+        for _ in range(MIN_SAMPLES):
+            health.record("svc_a", "success", 5000)
+            health.record("svc_b", "success", 100)
+        health.record("svc_c", "rate_limited")
+        assert _ids(health.order(CHAIN)) == ["svc_b", "svc_a", "svc_c"]
+
+    def test_all_open_returns_static_chain(self, health):
+        from lib.service_health import FAILURE_THRESHOLD
+        for svc in CHAIN:
+            for _ in range(FAILURE_THRESHOLD):
+                health.record(svc["_id"], "failed")
+        assert _ids(health.order(CHAIN)) == ["svc_a", "svc_b", "svc_c"]
+
+    def test_disabled_is_passthrough(self, tmp_path):
+        from lib.service_health import FAILURE_THRESHOLD, ServiceHealth
+        health = ServiceHealth(path=str(tmp_path / "h.db"), enabled=False)
+        for _ in range(FAILURE_THRESHOLD):
+            health.record("svc_a", "failed")
+        assert _ids(health.order(CHAIN)) == ["svc_a", "svc_b", "svc_c"]
@@ -0,0 +1,126 @@
+"""Tests for scripts/sync_services.py — incremental manifest sync."""
+import json
+import os
+import sys
+
+import pytest
+
+# Add scripts dir to path
+SCRIPTS_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "scripts")
+sys.path.insert(0, SCRIPTS_DIR)
+
+
+class FakeClient:
+    url = "http://convex.test"
+
+    def __init__(self):
+        self.batches = []
+
+    def mutation(self, fn, args):
+        assert fn == "services:upsertFromManifestBatch"
+        self.batches.append(args["entries"])
+        return [{"name": e["name"], "action": "created", "id": "x"} for e in args["entries"]]
+
+
+class FakeCache:
+    def __init__(self):
+        self.invalidated = 0
+
+    def invalidate(self):
+        self.invalidated += 1
+
+
+def _write_manifest(services_dir, folder, **extra):
+    os.makedirs(services_dir / folder, exist_ok=True)
+    manifest = {
+        "name": folder,
+        "displayName": folder.title(),
+        "description": "test",
+        "capabilities": [{"category": "web_search", "defaultPriority": 1}],
+        **extra,
+    }
+    (services_dir / folder / "manifest.json").write_text(json.dumps(manifest))
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    import sync_services
+    services_dir = tmp_path / "services"
+    _write_manifest(services_dir, "alpha")
+    _write_manifest(services_dir, "beta")
+    client, cache = FakeClient(), FakeCache()
+    monkeypatch.setattr(sync_services, "BASE_DIR", str(services_dir))
+    monkeypatch.setattr(sync_services, "STATE_PATH", str(tmp_path / "state.json"))
+    monkeypatch.setattr(sync_services, "get_client", lambda: client)
+    monkeypatch.setattr(sync_services, "get_cache", lambda: cache)
+    return sync_services, services_dir, client, cache
+
+
+def _run(module, monkeypatch, *argv):
+    monkeypatch.setattr(sys, "argv", ["sync_services.py", *argv])
+    try:
+        module.main()
+    except SystemExit as e:
+        return e.code or 0
+    return 0
+
+
+class TestSyncServices:
+    def test_first_run_sends_everything_in_one_batch(self, env, monkeypatch):
+        module, _, client, cache = env
+        assert _run(module, monkeypatch) == 0
+        assert len(client.batches) == 1
+        assert sorted(e["name"] for e in client.batches[0]) == ["alpha", "beta"]
+        assert cache.invalidated == 1
+
+    def test_unchanged_manifests_are_skipped(self, env, monkeypatch):
+        module, _, client, cache = env
+        _run(module, monkeypatch)
+        _run(module, monkeypatch)
+        assert len(client.batches) == 1
+        assert cache.invalidated == 1
+
+    def test_only_changed_manifest_is_resent(self, env, monkeypatch):
+        module, services_dir, client, _ = env
+        _run(module, monkeypatch)
+        _write_manifest(services_dir, "beta", version="2.0")
+        _run(module, monkeypatch)
+        assert [e["name"] for e in client.batches[1]] == ["beta"]
+        assert client.batches[1][0]["manifestVersion"] == "2.0"
+
+    def test_force_resends_everything(self, env, monkeypatch):
+        module, _, client, _ = env
+        _run(module, monkeypatch)
+        _run(module, monkeypatch, "--force")
+        assert len(client.batches[1]) == 2
+
+    def test_check_reports_drift_without_writing(self, env, monkeypatch, capsys):
+        module, services_dir, client, _ = env
+        assert _run(module, monkeypatch, "--check") == 1
+        assert client.batches == []
+        _run(module, monkeypatch)
+        assert _run(module, monkeypatch, "--check") == 0
+        (services_dir / "alpha" / "manifest.json").unlink()
+        assert _run(module, monkeypatch, "--check") == 1
+        assert "- alpha" in capsys.readouterr().out
+
+    def test_summary_counts_unchanged_despite_failures(self, env, monkeypatch, capsys):
+        module, services_dir, client, _ = env
+        _run(module, monkeypatch)
+        _write_manifest(services_dir, "beta", version="2.0")
+        _write_manifest(services_dir, "gamma")
+        client.mutation = lambda fn, args: [{"name": e["name"], "error": "boom"}
+                                            for e in args["entries"]]
+        capsys.readouterr()
+        assert _run(module, monkeypatch) == 1
+        out = capsys.readouterr().out
+        assert "Unchanged manifests: 1," in out
+        assert "Errors: 2" in out
+
+    def test_multi_capability_names(self):
+        from sync_services import build_entries
+        manifest = {
+            "name": "svc", "displayName": "Svc", "description": "d",
+            "capabilities": [{"category": "a"}, {"category": "b"}],
+        }
+        assert [e["name"] for e in build_entries(manifest, "svc")] == ["svc-a", "svc-b"]
@@ -0,0 +1,95 @@
+"""Tests for lib/telemetry.py — local span store and reports."""
+import json
+import os
+import sys
+import time
+
+import pytest
+
+# Add scripts dir to path
+SCRIPTS_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "scripts")
+sys.path.insert(0, SCRIPTS_DIR)
+
+SVC_A = {"_id": "svc_a", "name": "a"}
+SVC_B = {"_id": "svc_b", "name": "b"}
+
+
+@pytest.fixture
+def store(tmp_path):
+    from lib.telemetry import SpanStore
+    return SpanStore(path=str(tmp_path / "telemetry.db"), costs={"a": 0.5})
+
+
+class TestSpanStore:
+    def test_percentiles_and_error_rate(self, store):
+        for ms in range(1, 101):
+            store.record("web_search", SVC_A, 0, "success", ms)
+        store.record("web_search", SVC_A, 0, "timeout", 5000)
+        (row,) = store.report(since=0)
+        assert row["calls"] == 101
+        assert row["p50_ms"] == 51
+        assert row["p99_ms"] == 100
+        assert row["error_rate"] == round(1 / 101, 4)
+        assert row["cost"] == 50.0
+        assert row["cost_per_success"] == 0.5
+
+    def test_cost_only_on_success(self, store):
+        assert store.record("web_search", SVC_A, 0, "failed", 10) is None
+        assert store.record("web_search", SVC_A, 1, "success", 10) == 0.5
+        assert store.record("web_search", SVC_B, 0, "success", 10) is None
+
+    def test_group_by_capability_and_filter(self, store):
+        store.record("web_search", SVC_A, 0, "success", 10)
+        store.record("web_search", SVC_B, 1, "success", 20)
+        store.record("image_generation", SVC_A, 0, "success", 30)
+        rows = store.report(since=0, by="capability")
+        assert [(r["capability"], r["calls"]) for r in rows] == [
+            ("image_generation", 1), ("web_search", 2),
+        ]
+        rows = store.report(since=0, capability="web_search")
+        assert [r["service"] for r in rows] == ["a", "b"]
+
+    def test_window(self, store):
+        store.record("web_search", SVC_A, 0, "success", 10)
+        assert store.report(since=time.time() + 10) == []
+        assert store.report(since=0, until=1) == []
+
+    def test_prune_drops_old_spans(self, tmp_path):
+        from lib.telemetry import SpanStore
+        store = SpanStore(path=str(tmp_path / "t.db"), retention_days=0)
+        store.record("web_search", SVC_A, 0, "success", 10)
+        assert store.prune() == 1
+        assert store.report(since=0) == []
+
+    def test_disabled_records_nothing(self, tmp_path):
+        from lib.telemetry import SpanStore
+        store = SpanStore(path=str(tmp_path / "t.db"), enabled=False, costs={"a": 1.0})
+        assert store.record("web_search", SVC_A, 0, "success", 10) == 1.0
+        assert store.report(since=0) == []
+
+
+class TestHelpers:
+    def test_parse_time(self):
+        from lib.telemetry import parse_time
+        assert parse_time("2h", now=10000) == 10000 - 7200
+        assert parse_time("7d", now=10**6) == 10**6 - 7 * 86400
+        assert parse_time("2026-01-01T00:00:00+00:00") == 1767225600
+        with pytest.raises(ValueError):
+            parse_time("yesterday")
+
+    def test_payload_size(self):
+        from lib.telemetry import payload_size
+        assert payload_size(None) is None
+        assert payload_size(b"abc") == 3
+        assert payload_size({"a": 1}) == len(json.dumps({"a": 1}))
+
+    def test_load_costs_from_manifests(self, tmp_path):
+        from lib.telemetry import load_costs
+        svc = tmp_path / "svc"
+        svc.mkdir()
+        (svc / "manifest.json").write_text(json.dumps({
+            "name": "svc",
+            "capabilities": [{"category": "x"}, {"category": "y"}],
+            "costInfo": {"summary": "$0.01", "costPerCall": 0.01},
+        }))
+        assert load_costs(str(tmp_path)) == {"svc": 0.01, "svc-x": 0.01, "svc-y": 0.01}